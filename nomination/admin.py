@@ -1,8 +1,112 @@
+from django.conf import settings
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db.models import Count, IntegerField, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils.functional import cached_property
 from django import forms
+from nomination.intake import requeue_failed
 from nomination.models import (Project, Project_Metadata, Metadata_Values,
                                Valueset_Values, Nominator, URL, Metadata,
-                               Value, ValueSet)
+                               Value, ValueSet, Submission)
+
+
+# Rows counted at most to paginate the URL changelist; see the
+# NOMINATION_ADMIN_COUNT_LIMIT setting.
+ADMIN_COUNT_LIMIT = 100000
+
+
+class CappedCountPaginator(Paginator):
+    """Paginator that stops counting rows at NOMINATION_ADMIN_COUNT_LIMIT.
+
+    Counting every row of a very large table is what makes a changelist
+    slow; past the limit only the first pages are reachable without a filter.
+    """
+
+    @cached_property
+    def count(self):
+        limit = getattr(settings, 'NOMINATION_ADMIN_COUNT_LIMIT', ADMIN_COUNT_LIMIT)
+        return self.object_list.values('pk')[:limit].count()
+
+
+class InputFilter(admin.ListFilter):
+    """A list filter that takes a typed value instead of listing every choice."""
+
+    template = 'admin/nomination/input_filter.html'
+    # The query string parameter holding the typed value.
+    parameter_name = None
+
+    def __init__(self, request, params, model, model_admin):
+        super().__init__(request, params, model, model_admin)
+        if self.parameter_name in params:
+            self.used_parameters[self.parameter_name] = params.pop(self.parameter_name)
+
+    def value(self):
+        return self.used_parameters.get(self.parameter_name)
+
+    def has_output(self):
+        return True
+
+    def expected_parameters(self):
+        return [self.parameter_name]
+
+    def choices(self, changelist):
+        # Only the "All" choice, carrying the other active filters along.
+        yield {
+            'selected': self.value() is None,
+            'query_string': changelist.get_query_string(remove=[self.parameter_name]),
+            'query_parts': [(key, value) for key, value in changelist.get_filters_params().items()
+                            if key != self.parameter_name],
+            'display': 'All',
+        }
+
+
+class ProjectFilter(InputFilter):
+    """Filter URLs by project slug."""
+
+    title = 'project'
+    parameter_name = 'project'
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(url_project__project_slug=self.value().strip())
+
+
+class NominatorFilter(InputFilter):
+    """Filter URLs by nominator id, email address or name."""
+
+    title = 'nominator'
+    parameter_name = 'nominator'
+
+    def queryset(self, request, queryset):
+        value = (self.value() or '').strip()
+        if not value:
+            return None
+        if value.isdigit():
+            return queryset.filter(url_nominator_id=value)
+        nominators = Nominator.objects.filter(Q(nominator_email__iexact=value)
+                                              | Q(nominator_name__iexact=value))
+        return queryset.filter(url_nominator__in=nominators)
+
+
+class AttributeFilter(admin.SimpleListFilter):
+    """Filter URLs by attribute, offering the metadata field names as choices.
+
+    The choices come from the small metadata table rather than a DISTINCT
+    over every URL row.
+    """
+
+    title = 'attribute'
+    parameter_name = 'attribute'
+
+    def lookups(self, request, model_admin):
+        names = {name.lower() for name in Metadata.objects.values_list('name', flat=True)}
+        names.update(('surt', 'nomination'))
+        return [(name, name) for name in sorted(names)]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(attribute_norm=self.value().lower())
 
 
 class ProjectMetadataInline(admin.TabularInline):
@@ -15,6 +119,7 @@ class ProjectAdmin(admin.ModelAdmin):
     list_display = ('project_slug', 'project_name', 'project_active', 'nomination_active')
     inlines = [ProjectMetadataInline]
     ordering = ('project_slug',)
+    search_fields = ('project_slug', 'project_name')
 
 
 class NominatorAdmin(admin.ModelAdmin):
@@ -22,16 +127,54 @@ class NominatorAdmin(admin.ModelAdmin):
     list_display = ('nominator_name', 'nominator_email', 'nominator_institution', 'nominations')
     list_display_links = ('nominator_name',)
     ordering = ('nominator_name',)
+    search_fields = ('nominator_name', 'nominator_email', 'nominator_institution')
+
+    def get_queryset(self, request):
+        # Count each listed nominator's URL rows in the same query, one
+        # subquery per row of the page.
+        counts = (URL.objects.filter(url_nominator=OuterRef('pk'))
+                             .order_by()
+                             .values('url_nominator')
+                             .annotate(count=Count('pk'))
+                             .values('count'))
+        return super().get_queryset(request).annotate(
+            nomination_count=Coalesce(Subquery(counts, output_field=IntegerField()), 0))
+
+    @admin.display(description='Nominations', ordering='nomination_count')
+    def nominations(self, obj):
+        return obj.nomination_count
 
 
 class URLAdmin(admin.ModelAdmin):
     """ URL class that determines how comment appears in admin """
     list_display = ('get_project', 'get_nominator', 'entity_display', 'attribute', 'value', 'date')
-    list_filter = ('url_project', 'url_nominator', 'attribute', 'date',)
+    list_select_related = ('url_project', 'url_nominator')
+    list_filter = (ProjectFilter, NominatorFilter, AttributeFilter, 'date',)
     search_fields = ('entity', 'attribute', 'value',)
     list_display_links = ('attribute', 'value',)
-    ordering = ('entity', 'attribute',)
-    date_hierarchy = 'date'
+    # Newest first by primary key; sorting by entity has no usable index.
+    ordering = ('-pk',)
+    autocomplete_fields = ('url_project', 'url_nominator')
+    paginator = CappedCountPaginator
+    show_full_result_count = False
+
+
+class SubmissionAdmin(admin.ModelAdmin):
+    """ Submissions queued by async intake, with their outcome """
+    list_display = ('pk', 'token', 'project', 'action', 'status', 'attempts', 'created',
+                    'updated')
+    list_select_related = ('project',)
+    list_filter = ('status', 'action')
+    search_fields = ('project__project_slug',)
+    ordering = ('-pk',)
+    readonly_fields = ('token', 'project', 'action', 'form_data', 'status', 'attempts',
+                       'available_at', 'claimed_by', 'summary', 'error', 'created', 'updated')
+    actions = ['requeue']
+
+    @admin.action(description='Retry the selected failed submissions')
+    def requeue(self, request, queryset):
+        count = requeue_failed(queryset)
+        self.message_user(request, '%s submissions will be retried.' % count)
 
 
 class ProjectAdminForm(forms.ModelForm):
@@ -86,3 +229,4 @@ admin.site.register(URL, URLAdmin)
 admin.site.register(Metadata, MetadataAdmin)
 admin.site.register(Value, ValueAdmin)
 admin.site.register(ValueSet, ValueSetAdmin)
+admin.site.register(Submission, SubmissionAdmin)
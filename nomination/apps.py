@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class NominationConfig(AppConfig):
+    name = 'nomination'
+
+    def ready(self):
+        # Connect the handlers that keep the denormalized tables current.
+        from nomination import signals  # noqa: F401
@@ -0,0 +1,229 @@
+"""In-memory sorted index of each project's entities, for prefix lookups.
+
+Every process keeps, per project, the entities of the project's surt rows in
+two sorted lists: one keyed by the lowercased entity and one keyed by the
+lowercased entity without its scheme. Prefix searches are a bisection into
+one of the lists. Entities written by this process are added once their
+transaction commits; entities written elsewhere are picked up by reading
+surt rows past the last seen id, at most once per
+NOMINATION_ENTITY_INDEX_REFRESH seconds. Deleted and edited surt rows are
+recorded as EntityChange rows, which every process replays past the last
+change it has seen, so an index is loaded once and never reloaded.
+"""
+import bisect
+import re
+import threading
+import time
+
+from django.conf import settings
+from django.db import transaction
+
+from nomination.models import URL, EntityChange
+
+
+SCHEME_PATTERN = re.compile(r'^[a-z][a-z0-9+.-]*://', re.IGNORECASE)
+# Ids below the last seen id that are read again on refresh, so rows from
+# transactions that committed out of id order are not missed.
+REFRESH_OVERLAP = 1000
+# Above this many changed entities the lists are rebuilt instead of edited in place.
+INSORT_LIMIT = 100
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def scheme_agnostic_key(entity):
+    """Return the lowercased entity without its scheme."""
+    return SCHEME_PATTERN.sub('', entity, count=1).lower()
+
+
+class EntityIndex:
+    """The sorted entities of one project.
+
+    lock guards the lists; refresh_lock lets one thread at a time read the
+    database for them, without holding up searches while it does.
+    """
+
+    def __init__(self, project_id):
+        self.project_id = project_id
+        self.lock = threading.Lock()
+        self.refresh_lock = threading.Lock()
+        # entity -> id of the surt row it came from
+        self.ids = {}
+        self.keys = []
+        self.agnostic_keys = []
+        self.last_id = 0
+        self.last_change_id = 0
+        self.checked_at = None
+        self.stale = False
+
+    def add(self, rows):
+        """Index (surt row id, entity) pairs."""
+        new = set()
+        for url_id, entity in rows:
+            if entity not in self.ids:
+                new.add(entity)
+            self.ids[entity] = url_id
+        if not new:
+            return
+        keys = [(entity.lower(), entity) for entity in new]
+        agnostic_keys = [(scheme_agnostic_key(entity), entity) for entity in new]
+        if len(new) > INSORT_LIMIT:
+            self.keys.extend(keys)
+            self.keys.sort()
+            self.agnostic_keys.extend(agnostic_keys)
+            self.agnostic_keys.sort()
+        else:
+            for key in keys:
+                bisect.insort(self.keys, key)
+            for key in agnostic_keys:
+                bisect.insort(self.agnostic_keys, key)
+
+    def remove(self, rows):
+        """Drop (surt row id, entity) pairs, unless the entity now comes from another row."""
+        gone = {entity for url_id, entity in rows if self.ids.get(entity) == url_id}
+        if not gone:
+            return
+        for entity in gone:
+            del self.ids[entity]
+        if len(gone) > INSORT_LIMIT:
+            self.keys = [key for key in self.keys if key[1] not in gone]
+            self.agnostic_keys = [key for key in self.agnostic_keys if key[1] not in gone]
+            return
+        for entity in gone:
+            for keys, key in ((self.keys, (entity.lower(), entity)),
+                              (self.agnostic_keys, (scheme_agnostic_key(entity), entity))):
+                position = bisect.bisect_left(keys, key)
+                if position < len(keys) and keys[position] == key:
+                    del keys[position]
+
+    def apply_changes(self, changes):
+        """Replay (change id, surt row id, entity, deleted) rows in order."""
+        run, run_deleted = [], None
+        for change_id, url_id, entity, deleted in changes:
+            self.last_change_id = max(self.last_change_id, change_id)
+            if deleted != run_deleted and run:
+                (self.remove if run_deleted else self.add)(run)
+                run = []
+            run.append((url_id, entity))
+            run_deleted = deleted
+        if run:
+            (self.remove if run_deleted else self.add)(run)
+
+    def is_due(self):
+        if self.checked_at is None or self.stale:
+            return True
+        interval = getattr(settings, 'NOMINATION_ENTITY_INDEX_REFRESH', 5)
+        return time.monotonic() - self.checked_at >= interval
+
+    def refresh(self):
+        """Read the surt rows and entity changes written since the last refresh.
+
+        The queries run without holding lock, so searches of this project
+        are served from the current lists meanwhile.
+        """
+        with self.lock:
+            last_id, last_change_id = self.last_id, self.last_change_id
+            self.stale = False
+        checked_at = time.monotonic()
+        rows = list(URL.objects.filter(url_project_id=self.project_id, attribute_norm='surt',
+                                       id__gt=max(last_id - REFRESH_OVERLAP, 0))
+                               .order_by('id')
+                               .values_list('id', 'entity')
+                               .iterator(chunk_size=5000))
+        changes = list(EntityChange.objects.filter(
+            project_id=self.project_id,
+            id__gt=max(last_change_id - REFRESH_OVERLAP, 0),
+        ).order_by('id').values_list('id', 'url_id', 'entity', 'deleted'))
+        with self.lock:
+            if rows:
+                self.last_id = max(self.last_id, rows[-1][0])
+            self.add(rows)
+            self.apply_changes(changes)
+            self.checked_at = checked_at
+
+    def search(self, prefix='', limit=None, any_scheme=False, cursor=None):
+        """Return (entities, next cursor) for entities starting with prefix.
+
+        With any_scheme, the prefix and entities are compared without their
+        schemes. The cursor is the last entity of the previous page; the
+        returned cursor is None when there are no more matches.
+        """
+        if any_scheme:
+            keys, key_of = self.agnostic_keys, scheme_agnostic_key
+        else:
+            keys, key_of = self.keys, str.lower
+        prefix = key_of(prefix)
+        position = bisect.bisect_left(keys, (prefix,))
+        if cursor:
+            position = max(position, bisect.bisect_right(keys, (key_of(cursor), cursor)))
+        results = []
+        while position < len(keys) and keys[position][0].startswith(prefix):
+            if limit is not None and len(results) >= limit:
+                return results, results[-1]
+            results.append(keys[position][1])
+            position += 1
+        return results, None
+
+
+def get_entity_index(project_id):
+    """Return the refreshed entity index of a project.
+
+    Requests wait for the first load of a project's index; after that a
+    request finding another thread already refreshing it searches the
+    current lists instead of waiting.
+    """
+    with _indexes_lock:
+        index = _indexes.get(project_id)
+        if index is None:
+            index = _indexes[project_id] = EntityIndex(project_id)
+    if index.is_due() and index.refresh_lock.acquire(blocking=index.checked_at is None):
+        try:
+            if index.is_due():
+                index.refresh()
+        finally:
+            index.refresh_lock.release()
+    return index
+
+
+def search_entities(project_id, prefix='', limit=None, any_scheme=False, cursor=None):
+    """Return (entities, next cursor) for a project's entities starting with prefix."""
+    index = get_entity_index(project_id)
+    with index.lock:
+        return index.search(prefix, limit, any_scheme, cursor)
+
+
+def add_entities(project_id, rows):
+    """Index (surt row id, entity) pairs once the current transaction commits.
+
+    Only this process's index, if it has one, is updated; others read the
+    rows on their next refresh. Rows without an id (bulk_create on backends
+    that do not return them) are left to the refresh as well.
+    """
+    rows = [(url_id, entity) for url_id, entity in rows if url_id is not None]
+
+    def add():
+        index = _indexes.get(project_id)
+        if index is not None:
+            with index.lock:
+                index.add(rows)
+    if rows:
+        transaction.on_commit(add)
+
+
+def expire(project_id):
+    """Have this process replay the project's entity changes on its next search.
+
+    Registered to run once the current transaction commits.
+    """
+    def mark():
+        index = _indexes.get(project_id)
+        if index is not None:
+            index.stale = True
+    transaction.on_commit(mark)
+
+
+def reset():
+    """Drop every index held by this process."""
+    with _indexes_lock:
+        _indexes.clear()
@@ -1,101 +1,150 @@
+from django.conf import settings
 from django.urls import reverse
 from django.shortcuts import get_object_or_404
 from django.contrib.syndication.views import Feed, FeedDoesNotExist
-from nomination.models import Project
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from nomination.models import Project, URL
+from nomination.url_handler import get_project_validators
 from django.utils.feedgenerator import Atom1Feed
 
 
-class url_feed(Feed):
+# Default number of entries in a feed; see the NOMINATION_FEED_ITEMS setting.
+FEED_ITEMS = 50
+# Attributes used to decorate feed entries.
+DESCRIBING_ATTRIBUTES = ('site_name', 'title', 'description')
 
-    feed_type = Atom1Feed
 
-    def get_object(self, request, slug):
-        self.slug = slug
-        self.project = get_object_or_404(Project, project_slug=self.slug)
-        # Save these dicts of URLs and attributes in the class so we can save on queries later.
-        self.site_names = dict(self.project.url_set.filter(attribute__iexact='Site_Name')
-                               .order_by('-date').values_list('entity', 'value'))
-        self.url_titles = dict(self.project.url_set.filter(attribute__iexact='Title')
-                               .order_by('-date').values_list('entity', 'value'))
-        self.descriptions = dict(self.project.url_set.filter(attribute__iexact='Description')
-                                 .order_by('-date').values_list('entity', 'value'))
-
-        return self.project
+def feed_item_count():
+    """Return the number of entries a feed holds."""
+    return getattr(settings, 'NOMINATION_FEED_ITEMS', FEED_ITEMS)
 
-    def title(self, obj):
-        """Returns the title for the feed."""
-        return "Latest URLs for " + obj.project_name
 
-    def link(self, obj):
-        """Returns the link for the feed."""
-        if not obj:
-            raise FeedDoesNotExist
-        return reverse('url_feed', args=[self.slug])
+class ProjectFeed(Feed):
+    """Base for the feeds of a project's most recent URL rows of one attribute.
 
-    def subtitle(self, obj):
-        """Returns the subtitle for the feed."""
-        return "RSS feed for the most recent URLs added to " + \
-            obj.project_name + "."
+    Only the newest feed_item_count() rows are listed, and their site names,
+    titles and descriptions are read in one query for the entities listed.
+    Responses carry an ETag and Last-Modified derived from the project's
+    change watermark, and conditional requests are answered with a 304.
+    One instance serves every request, so nothing about a request is kept
+    on it: the looked up attributes are kept on the items themselves.
+    """
+
+    feed_type = Atom1Feed
+    # The attribute of the URL rows listed in the feed.
+    item_attribute = None
+
+    def __call__(self, request, *args, **kwargs):
+        project = get_object_or_404(Project, project_slug=kwargs['slug'])
+        etag, last_modified = get_project_validators(project, self.__class__.__name__,
+                                                     feed_item_count())
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = super().__call__(request, *args, **kwargs)
+            # the feed sets Last-Modified from its newest entry; use the
+            # watermark the conditional check is made against instead.
+            if last_modified is not None:
+                response.headers['Last-Modified'] = http_date(last_modified)
+            response.headers['ETag'] = etag
+        return response
+
+    def get_object(self, request, slug):
+        return get_object_or_404(Project, project_slug=slug)
+
+    def attribute_dict(self, pairs):
+        """Create the entity to value dict of one attribute from (entity, value) pairs."""
+        return dict(pairs)
+
+    def resolve_attributes(self, project_id, items):
+        """Read the describing attributes of the items' entities in one query.
+
+        Each item gets a feed_attributes dict of attribute to value.
+        """
+        entities = {item.entity for item in items}
+        if not entities:
+            return
+        rows = (URL.objects.filter(url_project_id=project_id,
+                                   entity_norm__in={entity.lower() for entity in entities},
+                                   attribute_norm__in=DESCRIBING_ATTRIBUTES)
+                           .order_by('-date')
+                           .values_list('attribute_norm', 'entity', 'value'))
+        pairs = {attribute: [] for attribute in DESCRIBING_ATTRIBUTES}
+        for attribute, entity, value in rows:
+            if entity in entities:
+                pairs[attribute].append((entity, value))
+        values = {attribute: self.attribute_dict(attribute_pairs)
+                  for attribute, attribute_pairs in pairs.items()}
+        for item in items:
+            item.feed_attributes = {attribute: values[attribute][item.entity]
+                                    for attribute in DESCRIBING_ATTRIBUTES
+                                    if item.entity in values[attribute]}
+
+    def get_attributes(self, item):
+        """Return the describing attributes of an item, reading them if needed."""
+        if not hasattr(item, 'feed_attributes'):
+            self.resolve_attributes(item.url_project_id, [item])
+        return item.feed_attributes
 
     def items(self, obj):
         """Returns the items for the feed."""
-        return obj.url_set.all().filter(attribute__iexact='surt').order_by('-date')
+        items = list(obj.url_set.filter(attribute_norm=self.item_attribute)
+                                .order_by('-date')[:feed_item_count()])
+        self.resolve_attributes(obj.pk, items)
+        return items
 
     def item_link(self, item):
         """Takes an item from items(), and returns its URL."""
-        return reverse('url_listing', args=[self.slug, item.entity])
+        return reverse('url_listing', args=[item.url_project.project_slug, item.entity])
 
     def item_pubdate(self, item):
-        """Takes an item from items(), and returns its added date."""
+        """Takes an item from items(), and returns its date."""
         return item.date
 
     def item_title(self, item):
         """Takes an item from items(), and returns its title."""
+        attributes = self.get_attributes(item)
         # return url if there is no title
         title = item.entity
         try:
-            title = self.site_names[item.entity]
+            title = attributes['site_name']
         except KeyError:
             try:
-                title = self.url_titles[item.entity]
+                title = attributes['title']
             except KeyError:
                 pass
         return title
 
     def item_description(self, item):
         try:
-            return "%s - %s" % (item.entity, self.descriptions[item.entity])
+            return "%s - %s" % (item.entity, self.get_attributes(item)['description'])
         except KeyError:
             return item.entity
 
 
-class nomination_feed(Feed):
+class url_feed(ProjectFeed):
 
-    feed_type = Atom1Feed
+    item_attribute = 'surt'
+
+    def title(self, obj):
+        """Returns the title for the feed."""
+        return "Latest URLs for " + obj.project_name
+
+    def link(self, obj):
+        """Returns the link for the feed."""
+        if not obj:
+            raise FeedDoesNotExist
+        return reverse('url_feed', args=[obj.project_slug])
+
+    def subtitle(self, obj):
+        """Returns the subtitle for the feed."""
+        return "RSS feed for the most recent URLs added to " + \
+            obj.project_name + "."
 
-    def get_object(self, request, slug):
-        self.slug = slug
-        self.project = get_object_or_404(Project, project_slug=self.slug)
-
-        # Generate URL/attribute value dicts, excluding entities with multiple values
-        # for the same attribute (using no_dup_dict). This prevents incorrectly
-        # associating attribute values from other nominations of the same entity.
-        temp = (
-            self.project.url_set.filter(attribute__iexact='Site_Name')
-                                .values_list('entity', 'value')
-        )
-        self.site_names = no_dup_dict(temp)
-        temp = (
-            self.project.url_set.filter(attribute__iexact='Title')
-                                .values_list('entity', 'value')
-        )
-        self.url_titles = no_dup_dict(temp)
-        temp = (
-            self.project.url_set.filter(attribute__iexact='Description')
-                                .values_list('entity', 'value')
-        )
-        self.descriptions = no_dup_dict(temp)
-        return self.project
+
+class nomination_feed(ProjectFeed):
+
+    item_attribute = 'nomination'
 
     def title(self, obj):
         """Returns the title for the feed."""
@@ -105,7 +154,7 @@ class nomination_feed(Feed):
         """Returns the link for the feed."""
         if not obj:
             raise FeedDoesNotExist
-        return reverse('nomination_feed', args=[self.slug])
+        return reverse('nomination_feed', args=[obj.project_slug])
 
     def subtitle(self, obj):
         """Returns the subtitle for the feed."""
@@ -113,36 +162,11 @@ class nomination_feed(Feed):
             obj.project_name + ". Includes newly added URLs " + \
             "and subsequent nominations of those URLs."
 
-    def items(self, obj):
-        """Returns the items for the feed."""
-        return obj.url_set.all().filter(attribute__iexact='nomination').order_by('-date')
-
-    def item_link(self, item):
-        """Takes an item from items(), and returns its URL."""
-        return reverse('url_listing', args=[self.slug, item.entity])
-
-    def item_pubdate(self, item):
-        """Takes an item from items(), and returns its nomination date."""
-        return item.date
-
-    def item_title(self, item):
-        """Takes an item from items(), and returns its title."""
-        # return url if there is no title
-        title = item.entity
-        try:
-            title = self.site_names[item.entity]
-        except KeyError:
-            try:
-                title = self.url_titles[item.entity]
-            except KeyError:
-                pass
-        return title
-
-    def item_description(self, item):
-        try:
-            return "%s - %s" % (item.entity, self.descriptions[item.entity])
-        except KeyError:
-            return item.entity
+    def attribute_dict(self, pairs):
+        # Exclude entities with multiple values for the same attribute. This
+        # prevents incorrectly associating attribute values from other
+        # nominations of the same entity.
+        return no_dup_dict(pairs)
 
 
 def no_dup_dict(url_set):
@@ -0,0 +1,162 @@
+"""Per-request SQL query, template and response-size measurements.
+
+measure() is a context manager that counts the queries run on every
+database connection inside its block, adds up their time and the time spent
+rendering Django templates. MetricsMiddleware measures each request with
+it, logs the results to the nomination.metrics logger and, when DEBUG or
+NOMINATION_METRICS_HEADERS is on, adds them to the response headers.
+Requests to views that run more queries than their entry in
+NOMINATION_QUERY_BUDGETS (a dict of URL names to counts) are logged as
+warnings. query_budget() is the same measurement for tests.
+
+Queries and rendering of streamed responses happen after the middleware
+returns and are not included.
+"""
+import contextlib
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections
+from django.template.backends.django import Template
+
+
+logger = logging.getLogger('nomination.metrics')
+
+_local = threading.local()
+_install_lock = threading.Lock()
+_original_render = None
+
+
+class RequestMetrics:
+    """The measurements of one measure() block."""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.render_time = 0.0
+        self.total_time = 0.0
+        self.response_size = None
+        self.view_name = None
+
+    def as_dict(self):
+        return {
+            'view': self.view_name,
+            'queries': self.queries,
+            'db_time': round(self.db_time, 6),
+            'render_time': round(self.render_time, 6),
+            'total_time': round(self.total_time, 6),
+            'response_size': self.response_size,
+        }
+
+    def record_query(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.queries += 1
+
+
+def get_active_metrics():
+    """Return the metrics of the measure() blocks open in this thread."""
+    if not hasattr(_local, 'active'):
+        _local.active = []
+    return _local.active
+
+
+def _timed_render(self, context=None, request=None):
+    active = get_active_metrics()
+    # only the outermost render is timed, so nested ones are not counted twice
+    if not active or getattr(_local, 'rendering', False):
+        return _original_render(self, context, request)
+    _local.rendering = True
+    start = time.perf_counter()
+    try:
+        return _original_render(self, context, request)
+    finally:
+        _local.rendering = False
+        elapsed = time.perf_counter() - start
+        for metrics in active:
+            metrics.render_time += elapsed
+
+
+def install_render_timer():
+    """Wrap Django template rendering so measure() blocks can time it."""
+    global _original_render
+    with _install_lock:
+        if _original_render is None:
+            _original_render = Template.render
+            Template.render = _timed_render
+
+
+@contextlib.contextmanager
+def measure():
+    """Measure the queries and template rendering of a block; yields RequestMetrics."""
+    install_render_timer()
+    metrics = RequestMetrics()
+    active = get_active_metrics()
+    active.append(metrics)
+    start = time.perf_counter()
+    try:
+        with contextlib.ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(metrics.record_query))
+            yield metrics
+    finally:
+        metrics.total_time = time.perf_counter() - start
+        active.remove(metrics)
+
+
+@contextlib.contextmanager
+def query_budget(max_queries):
+    """Fail with an AssertionError if a block runs more than max_queries queries."""
+    with measure() as metrics:
+        yield metrics
+    assert metrics.queries <= max_queries, (
+        '%s queries were run, over the budget of %s.' % (metrics.queries, max_queries))
+
+
+def get_response_size(response):
+    """Return the size of a response body, or None if it is streamed."""
+    if response.streaming:
+        return int(response['Content-Length']) if response.has_header('Content-Length') else None
+    return len(response.content)
+
+
+def get_query_budget(view_name):
+    return getattr(settings, 'NOMINATION_QUERY_BUDGETS', {}).get(view_name)
+
+
+class MetricsMiddleware:
+    """Measure each request; see the module docstring."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with measure() as metrics:
+            response = self.get_response(request)
+        resolver_match = getattr(request, 'resolver_match', None)
+        metrics.view_name = resolver_match.view_name if resolver_match else None
+        metrics.response_size = get_response_size(response)
+        self.report(request, response, metrics)
+        return response
+
+    def report(self, request, response, metrics):
+        logger.info('%s %s %s: %s queries, %.1f ms in the database, %.1f ms rendering',
+                    request.method, request.path, response.status_code, metrics.queries,
+                    metrics.db_time * 1000, metrics.render_time * 1000,
+                    extra={'metrics': metrics.as_dict()})
+        budget = get_query_budget(metrics.view_name)
+        if budget is not None and metrics.queries > budget:
+            logger.warning('%s ran %s queries, over its budget of %s.',
+                           metrics.view_name, metrics.queries, budget,
+                           extra={'metrics': metrics.as_dict()})
+        if settings.DEBUG or getattr(settings, 'NOMINATION_METRICS_HEADERS', False):
+            response['X-Nomination-Queries'] = str(metrics.queries)
+            if metrics.response_size is not None:
+                response['X-Nomination-Response-Size'] = str(metrics.response_size)
+            response['Server-Timing'] = 'db;dur=%.3f, render;dur=%.3f, total;dur=%.3f' % (
+                metrics.db_time * 1000, metrics.render_time * 1000, metrics.total_time * 1000)
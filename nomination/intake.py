@@ -0,0 +1,132 @@
+"""Asynchronous intake of nomination form submissions.
+
+With NOMINATION_ASYNC_INTAKE on, url_add and url_listing validate a
+submission, store it as a pending Submission and answer at once; the
+process_submissions command then claims pending submissions in batches and
+writes them through add_url or add_metadata. A failed submission is
+retried after NOMINATION_INTAKE_RETRY_DELAY seconds, doubled on each try,
+and marked failed once it has been tried max_attempts times. Submissions
+left processing by a worker that died are claimed again after stale_after
+seconds.
+"""
+import datetime
+import uuid
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.http import Http404
+from django.utils import timezone
+
+from nomination.models import Submission
+from nomination.url_handler import add_metadata, add_url
+
+
+DEFAULT_BATCH_SIZE = 100
+DEFAULT_MAX_ATTEMPTS = 5
+DEFAULT_STALE_AFTER = 600
+DEFAULT_RETRY_DELAY = 30
+MAX_RETRY_DELAY = 3600
+# Form fields that are not part of the submission.
+IGNORED_FIELDS = ('csrfmiddlewaretoken',)
+NOMINATOR_ERROR = 'The nominator details match more than one nominator.'
+
+ACTIONS = {
+    Submission.ADD_URL: add_url,
+    Submission.ADD_METADATA: add_metadata,
+}
+
+
+def async_intake_enabled():
+    return getattr(settings, 'NOMINATION_ASYNC_INTAKE', False)
+
+
+def enqueue(project, action, posted_data):
+    """Store validated form data as a pending submission and return it."""
+    form_data = {key: posted_data[key] for key in posted_data if key not in IGNORED_FIELDS}
+    return Submission.objects.create(project=project, action=action, form_data=form_data)
+
+
+def get_retry_delay(attempts):
+    """Return the delay before a submission that failed attempts times is tried again."""
+    delay = getattr(settings, 'NOMINATION_INTAKE_RETRY_DELAY', DEFAULT_RETRY_DELAY)
+    return min(delay * 2 ** max(attempts - 1, 0), MAX_RETRY_DELAY)
+
+
+def claim(batch_size=DEFAULT_BATCH_SIZE, stale_after=DEFAULT_STALE_AFTER):
+    """Mark up to batch_size due submissions as processing and return them.
+
+    The claim is a conditional update, so two workers never claim the same
+    submission. Each claim counts as an attempt.
+    """
+    now = timezone.now()
+    due = (Q(status=Submission.PENDING, available_at__lte=now)
+           | Q(status=Submission.PROCESSING,
+               updated__lt=now - datetime.timedelta(seconds=stale_after)))
+    ids = list(Submission.objects.filter(due).order_by('id')
+                                 .values_list('id', flat=True)[:batch_size])
+    if not ids:
+        return []
+    worker = uuid.uuid4().hex
+    Submission.objects.filter(due, id__in=ids).update(
+        status=Submission.PROCESSING, claimed_by=worker, attempts=F('attempts') + 1,
+        updated=now)
+    return list(Submission.objects.filter(claimed_by=worker, status=Submission.PROCESSING)
+                                  .select_related('project').order_by('id'))
+
+
+def process(submission, max_attempts=DEFAULT_MAX_ATTEMPTS):
+    """Write one claimed submission and record its outcome.
+
+    Each submission is written in its own transaction, so one that fails
+    rolls back alone (caches are only filled once it commits) and the rest
+    of the batch is still written.
+    """
+    try:
+        with transaction.atomic():
+            summary_list = ACTIONS[submission.action](submission.project,
+                                                      dict(submission.form_data))
+    except Http404:
+        fail(submission, 'The submission could not be written.', max_attempts)
+    except Exception as error:
+        fail(submission, '%s: %s' % (type(error).__name__, error), max_attempts)
+    else:
+        if summary_list is False:
+            # retrying cannot resolve an ambiguous nominator
+            fail(submission, NOMINATOR_ERROR, max_attempts=0)
+        else:
+            submission.status = Submission.DONE
+            submission.summary = summary_list
+            submission.error = ''
+            submission.save(update_fields=['status', 'summary', 'error', 'updated'])
+    return submission.status
+
+
+def fail(submission, error, max_attempts=DEFAULT_MAX_ATTEMPTS):
+    """Schedule a retry of a failed submission, or mark it failed after the last try."""
+    submission.error = error
+    if submission.attempts >= max_attempts:
+        submission.status = Submission.FAILED
+    else:
+        submission.status = Submission.PENDING
+        submission.available_at = timezone.now() + datetime.timedelta(
+            seconds=get_retry_delay(submission.attempts))
+    submission.save(update_fields=['status', 'error', 'available_at', 'updated'])
+
+
+def process_batch(batch_size=DEFAULT_BATCH_SIZE, max_attempts=DEFAULT_MAX_ATTEMPTS,
+                  stale_after=DEFAULT_STALE_AFTER):
+    """Claim and write one batch; return the number of submissions per outcome."""
+    counts = {Submission.DONE: 0, Submission.PENDING: 0, Submission.FAILED: 0}
+    for submission in claim(batch_size, stale_after):
+        counts[process(submission, max_attempts)] += 1
+    return counts
+
+
+def requeue_failed(submissions=None):
+    """Make failed submissions (of a queryset, or all) pending again with fresh attempts."""
+    if submissions is None:
+        submissions = Submission.objects.all()
+    now = timezone.now()
+    return submissions.filter(status=Submission.FAILED).update(
+        status=Submission.PENDING, attempts=0, available_at=now, updated=now)
@@ -0,0 +1,266 @@
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import statistics
+import tempfile
+import time
+import tracemalloc
+from urllib.parse import urlencode, urlparse
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from nomination import nominator_cache, summaries
+from nomination.management.commands import fielded_batch_ingest
+from nomination.models import URL, Nominator, Project
+from nomination.url_handler import get_domain_surt
+
+
+DEFAULT_REPEAT = 3
+DEFAULT_INGEST = 1000
+
+
+class Command(BaseCommand):
+
+    help = """benchmark_project - Times the project's views, reports, feeds and ingest.
+
+    Requests every page of the project through the test client and runs a
+    fielded_batch_ingest of new URLs (rolled back afterwards), recording the
+    wall time of each run, the number of queries and the peak Python memory
+    of one extra traced run. Results are written to a JSON file; pass a
+    previous file with --compare to print the change of each benchmark.
+
+    example: benchmark_project bigproject -o after.json --compare before.json"""
+
+    def add_arguments(self, parser):
+        """Set command-line arguments."""
+        parser.add_argument('project_slug', help='slug of the project to benchmark')
+        parser.add_argument('-o', '--output', dest='output', required=True,
+                            help='file the JSON results are written to (required)')
+        parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT,
+                            help='number of timed runs per benchmark (default: %(default)s)')
+        parser.add_argument('--ingest', type=int, default=DEFAULT_INGEST,
+                            help='number of URLs in the timed ingest; 0 skips it '
+                                 '(default: %(default)s)')
+        parser.add_argument('--compare', dest='compare', default=None,
+                            help='JSON results of a previous run to compare against')
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError('--repeat must be a positive number.')
+        if options['ingest'] < 0:
+            raise CommandError('--ingest must not be negative.')
+        try:
+            project = Project.objects.get(project_slug=options['project_slug'])
+        except Project.DoesNotExist:
+            raise CommandError('Project %s does not exist.' % options['project_slug'])
+        previous = None
+        if options['compare']:
+            with open(options['compare']) as compare_file:
+                previous = json.load(compare_file)
+
+        benchmarks = [Benchmark(name, path) for name, path in get_project_requests(project)]
+        if options['ingest']:
+            benchmarks.append(IngestBenchmark(project, options['ingest']))
+        results = {
+            'project': project.project_slug,
+            'created': datetime.datetime.now().isoformat(timespec='seconds'),
+            'environment': {
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+            },
+            'url_rows': URL.objects.filter(url_project=project).count(),
+            'entities': (URL.objects.filter(url_project=project, attribute_norm='surt')
+                                    .count()),
+            'repeat': options['repeat'],
+            'benchmarks': [benchmark.run(options['repeat']) for benchmark in benchmarks],
+        }
+        with open(options['output'], 'w') as output_file:
+            json.dump(results, output_file, indent=2)
+        self.report(results, previous)
+
+    def report(self, results, previous=None):
+        previous_times = {}
+        if previous:
+            previous_times = {benchmark['name']: benchmark['median']
+                              for benchmark in previous.get('benchmarks', [])}
+        for benchmark in results['benchmarks']:
+            line = '%-24s %6s %9.4fs %6s queries %10s bytes' % (
+                benchmark['name'], benchmark['status'], benchmark['median'],
+                benchmark['queries'], benchmark['peak_memory'])
+            if previous_times.get(benchmark['name']):
+                line += ' %+7.1f%%' % (
+                    (benchmark['median'] / previous_times[benchmark['name']] - 1) * 100)
+            self.stdout.write(line)
+
+
+def get_project_requests(project):
+    """Return (name, path) for each page, report, feed and JSON endpoint of a project.
+
+    Pages that need a URL, metadata field or nominator use the project's
+    first surt row, metadata row and nomination.
+    """
+    slug = project.project_slug
+    requests = [
+        ('project_listing', reverse('project_listing')),
+        ('project_urls', reverse('project_urls', args=[slug])),
+        ('project_about', reverse('project_about', args=[slug])),
+        ('url_add', reverse('url_add', args=[slug])),
+        ('reports_view', reverse('reports_view', args=[slug])),
+        ('url_report', reverse('url_report', args=[slug])),
+        ('url_score_report', reverse('url_score_report', args=[slug])),
+        ('url_nomination_report', reverse('url_nomination_report', args=[slug])),
+        ('url_date_report', reverse('url_date_report', args=[slug])),
+        ('surt_report', reverse('surt_report', args=[slug])),
+        ('nominator_report', reverse('nominator_report', args=[slug, 'nominator'])),
+        ('institution_report', reverse('nominator_report', args=[slug, 'institution'])),
+        ('project_dump', reverse('project_dump', args=[slug])),
+        ('browse_json', reverse('browse_json', args=[slug, 'surt'])),
+        ('search_json', reverse('search_json', args=[slug])),
+        ('url_feed', reverse('url_feed', args=[slug])),
+        ('nomination_feed', reverse('nomination_feed', args=[slug])),
+        ('institutions_json', reverse('institutions_json', args=[slug]) + '?q=i'),
+    ]
+    surt = (URL.objects.filter(url_project=project, attribute_norm='surt')
+                       .order_by('id').values_list('entity', 'value').first())
+    if surt is not None:
+        entity, surt_value = surt
+        parsed = urlparse(entity)
+        host_prefix = '%s://%s' % (parsed.scheme, parsed.netloc)
+        requests += [
+            ('url_listing', reverse('url_listing', args=[slug, entity])),
+            ('related_json', '%s?%s' % (
+                reverse('related_json', args=[slug]), urlencode({'url': entity}))),
+            ('url_surt', reverse('url_surt', args=[slug, get_domain_surt(surt_value)])),
+            ('url_lookup', '%s?%s' % (
+                reverse('url_lookup', args=[slug]),
+                urlencode({'search-url-value': host_prefix, 'partial-search': ''}))),
+            ('search_json_prefix', '%s?%s' % (
+                reverse('search_json', args=[slug]), urlencode({'q': host_prefix, 'limit': 100}))),
+            ('typeahead_json', '%s?%s' % (
+                reverse('typeahead_json', args=[slug]), urlencode({'q': host_prefix}))),
+        ]
+    field_value = (URL.objects.filter(url_project=project)
+                              .exclude(attribute_norm__in=['surt', 'nomination'])
+                              .order_by('id').values_list('attribute', 'value').first())
+    if field_value is not None:
+        field, value = field_value
+        requests += [
+            ('field_report', reverse('field_report', args=[slug, field])),
+            ('value_report', reverse('value_report', args=[slug, field, value])),
+        ]
+    nominator_id = (URL.objects.filter(url_project=project, attribute_norm='nomination')
+                               .order_by('id').values_list('url_nominator_id', flat=True)
+                               .first())
+    if nominator_id is not None:
+        requests.append(('nominator_url_report',
+                         reverse('nominator_url_report', args=[slug, 'nominator', nominator_id])))
+    return requests
+
+
+def get_client():
+    """Return a test client that passes the ALLOWED_HOSTS check."""
+    hosts = [host for host in settings.ALLOWED_HOSTS if host != '*' and not host.startswith('.')]
+    if hosts:
+        return Client(HTTP_HOST=hosts[0])
+    return Client() if '*' in settings.ALLOWED_HOSTS else Client(HTTP_HOST='localhost')
+
+
+class Benchmark:
+    """Time one GET request."""
+
+    def __init__(self, name, path):
+        self.name = name
+        self.path = path
+        self.client = get_client()
+        self.status = None
+
+    def execute(self):
+        response = self.client.get(self.path)
+        # read streamed responses so their queries and rendering are measured
+        if response.streaming:
+            for _ in response.streaming_content:
+                pass
+        else:
+            response.content
+        self.status = response.status_code
+
+    def run(self, repeat):
+        """Run once to count queries, repeat times to time, and once traced for memory."""
+        with CaptureQueriesContext(connection) as queries:
+            self.execute()
+        query_count = len(queries)
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            self.execute()
+            times.append(time.perf_counter() - start)
+        tracemalloc.start()
+        try:
+            self.execute()
+            _, peak_memory = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        return {
+            'name': self.name,
+            'path': self.path,
+            'status': self.status,
+            'queries': query_count,
+            'times': times,
+            'min': min(times),
+            'median': statistics.median(times),
+            'max': max(times),
+            'peak_memory': peak_memory,
+        }
+
+
+class Rollback(Exception):
+    pass
+
+
+class IngestBenchmark(Benchmark):
+    """Time a fielded_batch_ingest of new URLs, undone after each run."""
+
+    def __init__(self, project, url_count):
+        self.name = 'fielded_batch_ingest'
+        self.path = None
+        self.project = project
+        self.url_count = url_count
+        self.status = None
+        self.runs = 0
+
+    def execute(self):
+        self.runs += 1
+        with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as url_file:
+            for i in range(self.url_count):
+                url_file.write('http://benchmark%s.example.com/run%s/page%s\n'
+                               % (i % 100, self.runs, i))
+        nominator = None
+        try:
+            with transaction.atomic():
+                nominator = Nominator.objects.create(
+                    nominator_name='Benchmark', nominator_institution='Benchmark',
+                    nominator_email='benchmark-%s@example.com' % self.runs)
+                with contextlib.redirect_stdout(io.StringIO()):
+                    fielded_batch_ingest.url_ingest(url_file.name, nominator.id,
+                                                    self.project.project_slug, False)
+                self.status = 'ok'
+                raise Rollback
+        except Rollback:
+            pass
+        finally:
+            os.remove(url_file.name)
+            # drop whatever the rolled back ingest left in the caches; its
+            # nominator id may be handed out again
+            summaries.invalidate_browse_index(self.project.id)
+            if nominator is not None:
+                nominator_cache.invalidate(nominator)
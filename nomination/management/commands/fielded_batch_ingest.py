@@ -1,16 +1,31 @@
 import csv
+import http.client
+import os
 import pickle
-import re
+import socket
 import sys
-from urllib.error import HTTPError, URLError
-from urllib.request import Request, urlopen
+import threading
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import urljoin, urlsplit
 
 from django.conf import settings
-from django.core.exceptions import ObjectDoesNotExist, MultipleObjectsReturned
-from django.core.management.base import BaseCommand
-from django.db import IntegrityError
+from django.core.exceptions import ObjectDoesNotExist
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, transaction
 
-from nomination.models import URL, Nominator, Project
+from nomination import nominator_cache, summaries
+from nomination.models import URL, Project
+from nomination.surt import addImpliedHttpIfNecessary, surtize_batch
+
+
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_VERIFY_WORKERS = 16
+DEFAULT_VERIFY_PER_HOST = 2
+VERIFY_SUFFIX = '.verified'
+VERIFIED = 'ok'
+MAX_REDIRECTS = 10
+REDIRECT_STATUSES = (301, 302, 303, 307, 308)
 
 
 class Command(BaseCommand):
@@ -38,164 +53,253 @@ class Command(BaseCommand):
                                      help='file is pickled dictionary format')
         parser.add_argument('--verify', action='store_true', dest='verify_url',
                             default=False, help='verify url is valid and available')
+        parser.add_argument('--verify-workers', dest='verify_workers', type=int,
+                            default=DEFAULT_VERIFY_WORKERS,
+                            help='number of URLs verified at once (default: %(default)s)')
+        parser.add_argument('--verify-per-host', dest='verify_per_host', type=int,
+                            default=DEFAULT_VERIFY_PER_HOST,
+                            help='number of URLs verified at once on the same host '
+                                 '(default: %(default)s)')
+        parser.add_argument('--batch-size', dest='batch_size', type=int,
+                            default=DEFAULT_BATCH_SIZE,
+                            help='number of URL rows written per transaction '
+                                 '(default: %(default)s)')
+        parser.add_argument('--progress', action='store_true', dest='progress', default=False,
+                            help='report progress to stderr after each batch')
 
     def handle(self, *args, **options):
         """Ingest URLs from plain text, CSV, or pickled dictionary format file."""
+        for option in ('batch_size', 'verify_workers', 'verify_per_host'):
+            if options[option] < 1:
+                raise CommandError('--%s must be a positive number.'
+                                   % option.replace('_', '-'))
         options['ingest_function'](options['file_name'], options['nominator_id'],
-                                   options['project_slug'], options['verify_url'])
+                                   options['project_slug'], options['verify_url'],
+                                   batch_size=options['batch_size'],
+                                   progress=options['progress'],
+                                   verify_workers=options['verify_workers'],
+                                   verify_per_host=options['verify_per_host'])
+
 
+class URLBatchWriter:
+    """Queue new URL rows and write them with bulk_create, one transaction per batch.
 
-def url_ingest(file_name, nominator_id, project_slug, verify_url):
+    The normalized keys of the project's existing SURTs and of the
+    nominator's existing rows are loaded up front, so duplicates are skipped
+    without a database lookup per row. To retain data integrity, do not
+    ingest more than one file per project at a time.
+    """
+
+    def __init__(self, project, nominator, system_nominator,
+                 batch_size=DEFAULT_BATCH_SIZE, progress=False):
+        self.project = project
+        self.nominator = nominator
+        self.system_nominator = system_nominator
+        self.batch_size = batch_size
+        self.progress = progress
+        self.nominator_keys = set(
+            URL.objects.filter(url_project=project, url_nominator=nominator)
+                       .values_list('entity_norm', 'attribute_norm', 'value_norm'))
+        self.surt_entities = set(
+            URL.objects.filter(url_project=project, attribute_norm='surt')
+                       .values_list('entity_norm', flat=True))
+        self.pending = []
+        self.counts = {'surt': 0, 'nomination': 0, 'other': 0}
+        self.records = 0
+
+    def add_surt(self, url_entity):
+        """Queue a SURT row for url_entity unless the URL already has one."""
+        entity_norm = url_entity.lower()
+        if entity_norm in self.surt_entities:
+            return False
+        self.surt_entities.add(entity_norm)
+        # the SURT value is filled in for the whole batch when it is flushed
+        return self._queue(self.system_nominator, url_entity, 'surt', None)
+
+    def add(self, url_entity, url_attribute, url_value):
+        """Queue a nominator row unless the nominator already has the same one."""
+        key = (url_entity.lower(), url_attribute.lower(), str(url_value).lower())
+        if key in self.nominator_keys:
+            return False
+        self.nominator_keys.add(key)
+        return self._queue(self.nominator, url_entity, url_attribute, url_value)
+
+    def record_done(self):
+        """Count one input record as processed."""
+        self.records += 1
+
+    def _queue(self, nominator, url_entity, url_attribute, url_value):
+        url = URL(url_project=self.project, url_nominator=nominator, entity=url_entity,
+                  attribute=url_attribute, value=url_value)
+        self.pending.append(url)
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+        return True
+
+    def flush(self):
+        """Write the queued rows and update the derived tables in one transaction."""
+        if not self.pending:
+            return
+        urls, self.pending = self.pending, []
+        surt_urls = [url for url in urls if url.attribute == 'surt']
+        for url, surt in zip(surt_urls, surtize_batch(url.entity for url in surt_urls)):
+            url.value = surt
+        for url in urls:
+            url.normalize()
+        try:
+            with transaction.atomic():
+                URL.objects.bulk_create(urls)
+                summaries.record_new_urls(urls)
+        except IntegrityError:
+            # fall back to writing the batch row by row to skip the bad rows
+            urls = [url for url in urls if self._create_one(url)]
+        for url in urls:
+            if url.attribute_norm in ('surt', 'nomination'):
+                self.counts[url.attribute_norm] += 1
+            else:
+                self.counts['other'] += 1
+        if self.progress:
+            print('Processed %s records, created %s URL rows.'
+                  % (self.records, sum(self.counts.values())), file=sys.stderr)
+
+    def _create_one(self, url):
+        try:
+            with transaction.atomic():
+                url.save()
+        except IntegrityError:
+            print('Failed to create a new entry for url: %s attribute: %s value: %s'
+                  % (url.entity, url.attribute, url.value))
+            return False
+        return True
+
+
+def url_ingest(file_name, nominator_id, project_slug, verify_url,
+               batch_size=DEFAULT_BATCH_SIZE, progress=False,
+               verify_workers=DEFAULT_VERIFY_WORKERS, verify_per_host=DEFAULT_VERIFY_PER_HOST):
     """
         Get all the urls from the file and add them as a table entry to the
         URL table (not repeating if there is a prior entry with a surt).
     """
-
-    # Make sure the project and nominator exist in the database
-    project = get_project(project_slug)
-    nominator = get_nominator(nominator_id)
-    # Get the system nominator
-    system_nominator = get_system_nominator()
-
+    writer = get_writer(project_slug, nominator_id, batch_size, progress)
+    verified = None
+    if verify_url:
+        verified = verify_file_urls(file_name, iter_text_urls(file_name),
+                                    verify_workers, verify_per_host)
     entry_count = 0
-    new_entries = 0
-    surt_entries = 0
-    with open(file_name, 'r') as text_file:
-        for line in text_file.readlines():
-            if line.isspace():
-                continue
-            url_entity = url_formatter(line)
-            if verify_url:
-                if not verifyURL(url_entity):
-                    continue
-            # Attempt to create new url entry
-            new_url = create_url_entry(project, nominator, url_entity, 'nomination', '1')
-            # Create a SURT if the url doesn't already have one
-            new_surt = create_url_entry(project, system_nominator, url_entity,
-                                        'surt', surtize(url_entity))
-            if new_url:
-                new_entries += 1
-            if new_surt:
-                surt_entries += 1
-            entry_count += 1
-    print('Created %s new url surt entries.' % (surt_entries))
+    for url_entity in iter_text_urls(file_name):
+        if verified is not None and url_entity not in verified:
+            continue
+        # Attempt to create new url entry
+        writer.add(url_entity, 'nomination', '1')
+        # Create a SURT if the url doesn't already have one
+        writer.add_surt(url_entity)
+        writer.record_done()
+        entry_count += 1
+    writer.flush()
+    print('Created %s new url surt entries.' % (writer.counts['surt']))
     print('Created %s new url nomination entries out of %s possible entries.'
-          % (new_entries, entry_count))
+          % (writer.counts['nomination'], entry_count))
 
 
-def csv_ingest(file_name, nominator_id, project_slug, verify_url):
-    # Make sure the project and nominator exist in the database
-    project = get_project(project_slug)
-    nominator = get_nominator(nominator_id)
-    # Get the system nominator
-    system_nominator = get_system_nominator()
-    nominator_urls = list(URL.objects.filter(url_project=project,
-                                             url_nominator=nominator).values('entity',
-                                                                             'attribute',
-                                                                             'value'))
-    nominator_urls = ['{}{}{}'.format(i['entity'].lower(),
-                                      i['attribute'].lower(),
-                                      i['value'].lower()) for i in nominator_urls]
-    nominator_urls_set = set(nominator_urls)
-    surts = list(URL.objects.filter(url_project=project,
-                                    attribute='surt').values_list('entity', flat=True))
-    surts = [s.lower() for s in surts]
-    surts_set = set(surts)
-    nomination_count = 0
-    entry_count = 0
-    surt_count = 0
-    new_entry = None
-    with open(file_name, 'r', newline='') as csv_file:
-        csv_reader = csv.DictReader(csv_file)
-        for data in csv_reader:
-            url_entity = url_formatter(data['url'])
-            if verify_url:
-                if not verifyURL(url_entity):
-                    continue
-            # Attempt to create new url nomination entry
-            new_nomination = create_url_entry_less_db(project, nominator, url_entity, 'nomination',
-                                                      '1', nominator_urls_set=nominator_urls_set)
-            # Create a SURT if the url doesn't already have one
-            new_surt = create_url_entry_less_db(project, system_nominator, url_entity, 'surt',
-                                                surtize(url_entity), surts_set=surts_set)
-            for attribute_name in data.keys():
-                if not attribute_name == 'url':
-                    if data[attribute_name] != '':
-                        new_entry = create_url_entry_less_db(project, nominator, url_entity,
-                                                             attribute_name, data[attribute_name],
-                                                             nominator_urls_set=nominator_urls_set)
-                    if new_entry:
-                        entry_count += 1
-
-            if new_nomination:
-                nomination_count += 1
-            if new_surt:
-                surt_count += 1
-    print('Created %s new SURT entries.' % (surt_count))
-    print('Created %s new nomination entries.' % (nomination_count))
-    print('Created %s other attribute entries.' % (entry_count))
-
-
-def pydict_ingest(file_name, nominator_id, project_slug, verify_url):
+def csv_ingest(file_name, nominator_id, project_slug, verify_url,
+               batch_size=DEFAULT_BATCH_SIZE, progress=False,
+               verify_workers=DEFAULT_VERIFY_WORKERS, verify_per_host=DEFAULT_VERIFY_PER_HOST):
+    records_ingest(file_name, iter_csv_records, nominator_id, project_slug, verify_url,
+                   batch_size, progress, verify_workers, verify_per_host)
+
+
+def pydict_ingest(file_name, nominator_id, project_slug, verify_url,
+                  batch_size=DEFAULT_BATCH_SIZE, progress=False,
+                  verify_workers=DEFAULT_VERIFY_WORKERS,
+                  verify_per_host=DEFAULT_VERIFY_PER_HOST):
     """Ingest pickled dictionary into nomination tool.
 
     Useful for multivalue attributes that can be stored in the dictionary
     as lists.
     """
+    records_ingest(file_name, iter_pydict_records, nominator_id, project_slug, verify_url,
+                   batch_size, progress, verify_workers, verify_per_host)
+
+
+def records_ingest(file_name, read_records, nominator_id, project_slug, verify_url,
+                   batch_size, progress, verify_workers, verify_per_host):
+    """Ingest the dictionary records yielded by read_records(file_name)."""
+    writer = get_writer(project_slug, nominator_id, batch_size, progress)
+    verified = None
+    if verify_url:
+        urls = (url_formatter(data['url']) for data in read_records(file_name))
+        verified = verify_file_urls(file_name, urls, verify_workers, verify_per_host)
+    for data in read_records(file_name):
+        ingest_record(writer, data, verified)
+    writer.flush()
+    print_ingest_counts(writer)
+
+
+def iter_text_urls(file_name):
+    """Yield the formatted URL of each non-blank line of a text file."""
+    with open(file_name, 'r') as text_file:
+        for line in text_file:
+            if not line.isspace():
+                yield url_formatter(line)
+
+
+def iter_csv_records(file_name):
+    with open(file_name, 'r', newline='') as csv_file:
+        yield from csv.DictReader(csv_file)
+
+
+def iter_pydict_records(file_name):
+    with open(file_name, 'rb') as rff:
+        # Process each subdomain
+        while True:
+            try:
+                yield pickle.load(rff)
+            except EOFError:
+                break
+
+
+def get_writer(project_slug, nominator_id, batch_size, progress):
+    """Return a URLBatchWriter for the project and nominator, exiting if either is missing."""
     # Make sure the project and nominator exist in the database
     project = get_project(project_slug)
     nominator = get_nominator(nominator_id)
     # Get the system nominator
     system_nominator = get_system_nominator()
-    rff = open(file_name, 'r')
-    nomination_count = 0
-    entry_count = 0
-    surt_count = 0
-    new_entry = None
-    # Process each subdomain
-    while True:
-        try:
-            data = pickle.load(rff)
-            url_entity = url_formatter(data['url'])
-            if verify_url:
-                if not verifyURL(url_entity):
-                    continue
-            # Attempt to create new url nomination entry
-            new_nomination = create_url_entry(project, nominator, url_entity, 'nomination', '1')
-            # Create a SURT if the url doesn't already have one
-            new_surt = create_url_entry(project, system_nominator, url_entity, 'surt',
-                                        surtize(url_entity))
-            for attribute_name in data.keys():
-                if not attribute_name == 'url' and data[attribute_name] != '':
-                    # Check if the attribute has multiple values
-                    if isinstance(data[attribute_name], list):
-                        for val in data[attribute_name]:
-                            new_entry = create_url_entry(project, nominator, url_entity,
-                                                         attribute_name, val)
-                            if new_entry:
-                                entry_count += 1
-                    else:
-                        new_entry = create_url_entry(project, nominator, url_entity,
-                                                     attribute_name, data[attribute_name])
-                        if new_entry:
-                            entry_count += 1
-
-            if new_nomination:
-                nomination_count += 1
-            if new_surt:
-                surt_count += 1
-        except EOFError:
-            break
-
-    print('Created %s new SURT entries.' % (surt_count))
-    print('Created %s new nomination entries.' % (nomination_count))
-    print('Created %s other attribute entries.' % (entry_count))
-    rff.close()
+    return URLBatchWriter(project, nominator, system_nominator, batch_size, progress)
+
+
+def ingest_record(writer, data, verified=None):
+    """Queue the nomination, SURT and attribute rows of one CSV or dictionary record.
+
+    Records whose URL is not in the verified set (when given) are skipped.
+    """
+    url_entity = url_formatter(data['url'])
+    if verified is not None and url_entity not in verified:
+        return
+    # Attempt to create new url nomination entry
+    writer.add(url_entity, 'nomination', '1')
+    # Create a SURT if the url doesn't already have one
+    writer.add_surt(url_entity)
+    for attribute_name, attribute_value in data.items():
+        if attribute_name == 'url' or attribute_value == '':
+            continue
+        # Check if the attribute has multiple values
+        if not isinstance(attribute_value, list):
+            attribute_value = [attribute_value]
+        for val in attribute_value:
+            writer.add(url_entity, attribute_name, val)
+    writer.record_done()
+
+
+def print_ingest_counts(writer):
+    print('Created %s new SURT entries.' % (writer.counts['surt']))
+    print('Created %s new nomination entries.' % (writer.counts['nomination']))
+    print('Created %s other attribute entries.' % (writer.counts['other']))
 
 
 def get_nominator(nominator_id):
     try:
-        nominator = Nominator.objects.get(id=nominator_id)
+        nominator = nominator_cache.get_by_id(nominator_id)
     except ObjectDoesNotExist:
         print('Nominator ID:%s was not found in the Nominator table. Please add the nominator,'
               ' or use the correct ID.' % (nominator_id))
@@ -206,7 +310,7 @@ def get_nominator(nominator_id):
 
 def get_system_nominator():
     try:
-        system_nominator = Nominator.objects.get(id=settings.SYSTEM_NOMINATOR_ID)
+        system_nominator = nominator_cache.get_by_id(settings.SYSTEM_NOMINATOR_ID)
     except ObjectDoesNotExist:
         print('Could not get the system nominator.')
         sys.exit()
@@ -225,76 +329,6 @@ def get_project(slug):
     return project
 
 
-def create_url_entry(project, nominator, url_entity, url_attribute, url_value):
-    """Create a new url entry if it doesn't already exist."""
-    try:
-        if url_attribute == 'surt':
-            URL.objects.get(url_project=project,
-                            entity__iexact=url_entity,
-                            attribute__iexact=url_attribute,
-                            value__iexact=url_value
-                            )
-        else:
-            URL.objects.get(url_project=project,
-                            url_nominator=nominator,
-                            entity__iexact=url_entity,
-                            attribute__iexact=url_attribute,
-                            value__iexact=url_value
-                            )
-    except ObjectDoesNotExist:
-        try:
-            URL.objects.create(url_project=project,
-                               url_nominator=nominator,
-                               entity=url_entity,
-                               attribute=url_attribute,
-                               value=url_value)
-        except IntegrityError:
-            print('Failed to create a new entry for url: %s attribute: %s value: %s'
-                  % (url_entity, url_attribute, url_value))
-            return False
-    except MultipleObjectsReturned:
-        print('Failed to create a new entry for url: %s attribute: %s value: %s'
-              % (url_entity, url_attribute, url_value))
-        return False
-    else:
-        return False
-    return True
-
-
-def create_url_entry_less_db(project, nominator, url_entity, url_attribute, url_value,
-                             surts_set=set(), nominator_urls_set=set()):
-    """Create a new url entry if it doesn't already exist.
-
-    This version of create_url_entry is much faster for large batches because
-    of the reduction in database lookups, but to retain data integrity,
-    do not process more than one file with this script per project at a time.
-    """
-    if url_attribute == 'surt':
-        if url_entity.lower() in surts_set:
-            return False
-    else:
-        key = '{}{}{}'.format(url_entity.lower(), url_attribute.lower(), url_value.lower())
-        if key in nominator_urls_set:
-            return False
-    try:
-        URL.objects.create(url_project=project,
-                           url_nominator=nominator,
-                           entity=url_entity,
-                           attribute=url_attribute,
-                           value=url_value)
-    except IntegrityError:
-        print('Failed to create a new entry for url: %s attribute: %s value: %s'
-              % (url_entity, url_attribute, url_value))
-        return False
-    if url_attribute == 'surt':
-        # Add entity for future lookups to surts_set.
-        surts_set.add(url_entity.lower())
-    else:
-        # Add key for future value lookups.
-        nominator_urls_set.add(key)
-    return True
-
-
 def url_formatter(line):
     """Format the given url into the proper url format."""
     url = line.strip().replace(' ', '%20')
@@ -303,115 +337,268 @@ def url_formatter(line):
     return url
 
 
-def surtize(orig_url, preserveCase=False):
-    """Create a surt from a url. Based on Heritrix's SURT.java."""
-    # if url is submitted without scheme, add http://
-    orig_url = addImpliedHttpIfNecessary(orig_url)
-
-    # 1: scheme://
-    # 2: userinfo (if present)
-    # 3: @ (if present)
-    # 4: dotted-quad host
-    # 5: other host
-    # 6: :port
-    # 7: path
-    # group def.      1          2                           3
-    URI_SPLITTER = r"^(\w+://)(?:([-\w\.!~\*'\(\)%;:&=+$,]+?)(@))?" + \
-                   r"(?:((?:\d{1,3}\.){3}\d{1,3})|(\S+?))(:\d+)?(/\S*)?$"
-    #                   4                         5      6      7
-
-    # check URI validity
-    m = re.compile(URI_SPLITTER)
-    mobj = m.match(orig_url)
-    if not mobj:
-        return ''
-
-    # start building surt form
-    if mobj.group(1) == 'https://':
-        surt = 'http://('
-    else:
-        surt = mobj.group(1) + '('
-    # if dotted-quad ip match, don't reverse
-    if mobj.group(4) is not None:
-        surt += mobj.group(4)
-    # otherwise, reverse host
-    else:
-        splithost = mobj.group(5).split('.')
-        splithost.reverse()
-        hostpart = ','.join(splithost)
-        surt += hostpart + ','
-    # add port if it exists
-    surt = appendToSurt(mobj, 6, surt)
-    # add @ if it exists
-    surt = appendToSurt(mobj, 3, surt)
-    # add userinfo if it exists
-    surt = appendToSurt(mobj, 2, surt)
-    # close parentheses before path
-    surt += ')'
-    # add path if it exists
-    surt = appendToSurt(mobj, 7, surt)
-
-    # return surt
-    if not preserveCase:
-        return surt.lower()
-    else:
-        return surt
-
-
-def appendToSurt(matchobj, groupnum, surt):
-    if matchobj.group(groupnum) is not None:
-        surt += matchobj.group(groupnum)
-    return surt
-
-
-def addImpliedHttpIfNecessary(uri):
-    colon = uri.find(':')
-    period = uri.find('.')
-    if colon == -1 or (period >= 0 and period < colon):
-        uri = 'http://' + uri
-    return uri
-
-
-class HeadRequest(Request):
-    def get_method(self):
-        return 'HEAD'
+def verify_file_urls(file_name, urls, workers=DEFAULT_VERIFY_WORKERS,
+                     per_host=DEFAULT_VERIFY_PER_HOST):
+    """Verify urls concurrently and return the set of available ones.
+
+    Results are kept in a sidecar file next to the input file, so a rerun
+    of the same ingest only checks URLs that were not checked before.
+    """
+    verifier = URLVerifier(workers, per_host, results_file=str(file_name) + VERIFY_SUFFIX)
+    return verifier.verify(urls)
+
+
+class URLVerifier:
+    """Check that URLs respond, many at a time.
+
+    At most `workers` URLs are checked at once and at most `per_host` of
+    them on the same host. URLs wait in a queue per host and a worker is
+    only handed one whose host has a free slot, taking the hosts in turn,
+    so input sorted by host still keeps every worker busy. Each worker keeps
+    connections open to the last `max_connections` hosts it used and closes
+    its connection to a host once no URLs for that host are queued.
+    Redirects are followed (at most MAX_REDIRECTS of them) and a URL counts
+    as available only if the final response is not an error. Hosts that
+    cannot be resolved, refuse connections or time out are not contacted
+    again, and every result is cached in memory and appended to
+    results_file (when given).
+    """
 
+    max_connections = 8
 
-def verifyURL(url):
-    """Test status response from URL."""
-    try:
-        url = url.encode('utf-8')
-    except UnicodeEncodeError as e:
-        print(str(e) + '; skipping URL ' + url)
-        return False
     headers = {
         'Accept': 'text/xml,application/xml,application/xhtml+xml,text/html;q=0.9,'
                   'text/plain;q=0.8,image/png,*/*;q=0.5',
         'Accept-Language': 'en-us,en;q=0.5',
         'Accept-Charset': 'ISO-8859-1,utf-8;q=0.7,*;q=0.7',
-        'Connection': 'close',
         'User-Agent': 'Mozilla/5.0 (X11; Linux i686)',
     }
-    try:
-        req = HeadRequest(url, None, headers)
-        urlopen(req, timeout=5)
-    except ValueError as e:
-        print(str(e) + '; skipping invalid URL ' + url)
-        return False
-    except HTTPError as e:
-        if e.code in (405, 501):
+
+    def __init__(self, workers=DEFAULT_VERIFY_WORKERS, per_host=DEFAULT_VERIFY_PER_HOST,
+                 timeout=5, results_file=None):
+        self.workers = workers
+        self.per_host = per_host
+        self.timeout = timeout
+        self.results_file = results_file
+        self.results = {}
+        self.dead_hosts = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._connections = set()
+        self._queued = Counter()
+        if results_file and os.path.exists(results_file):
+            with open(results_file, 'r') as results:
+                for line in results:
+                    url, _, reason = line.rstrip('\n').partition('\t')
+                    self.results[url] = reason == VERIFIED
+
+    def verify(self, urls):
+        """Check every url not checked before and return the set of available urls."""
+        schedule = HostSchedule(self.per_host)
+        for url in urls:
+            if url not in self.results:
+                self.results[url] = None
+                schedule.add(url, url, 0)
+                self._queued[schedule.host(url)] += 1
+        results = open(self.results_file, 'a') if self.results_file else None
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                running = {}
+                while schedule or running:
+                    while len(running) < self.workers:
+                        job = schedule.take()
+                        if job is None:
+                            break
+                        url, current, redirects = job
+                        running[executor.submit(self.check, current, redirects)] = job
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        url, current, redirects = running.pop(future)
+                        schedule.release(current)
+                        available, reason, location = future.result()
+                        if location:
+                            schedule.add(url, location, redirects + 1)
+                            continue
+                        self.results[url] = available
+                        if results:
+                            results.write('%s\t%s\n' % (url, ' '.join(reason.split())))
+                            results.flush()
+                        if not available:
+                            print('%s; skipping URL %s' % (reason, url))
+        finally:
+            if results:
+                results.close()
+            self.close()
+        return {url for url, available in self.results.items() if available}
+
+    def check(self, url, redirects=0):
+        """Request url once and return (available, reason, redirect location).
+
+        The location is set when the response is a redirect that should be
+        followed; it is then queued under its own host by verify().
+        redirects is the number of redirects followed to reach url.
+        """
+        host = urlsplit(url).netloc.lower()
+        try:
+            available, reason, location = self._check(url, redirects)
+            if location:
+                with self._lock:
+                    self._queued[urlsplit(location).netloc.lower()] += 1
+            return available, reason, location
+        finally:
+            self._done(host)
+
+    def close(self):
+        """Close every connection opened by the workers."""
+        with self._lock:
+            connections, self._connections = self._connections, set()
+        for connection in connections:
+            connection.close()
+
+    def _check(self, url, redirects):
+        parts = urlsplit(url)
+        if parts.scheme not in ('http', 'https') or not parts.hostname:
+            return False, 'Not an http(s) URL', None
+        host = parts.netloc.lower()
+        if host in self.dead_hosts:
+            return False, self.dead_hosts[host], None
+        try:
+            status, location = self._request(parts)
+        except (OSError, http.client.HTTPException) as e:
+            reason = 'Failed HTTP response/broken link (%s)' % (e or type(e).__name__)
+            if isinstance(e, (socket.gaierror, socket.timeout, ConnectionRefusedError)):
+                self.dead_hosts[host] = reason
+            return False, reason, None
+        if status in REDIRECT_STATUSES and location:
+            if redirects >= MAX_REDIRECTS:
+                return False, 'Too many redirects', None
+            return None, None, urljoin(url, location)
+        if status >= 400:
+            return False, 'Response: %s' % status, None
+        return True, VERIFIED, None
+
+    def _done(self, host):
+        """Close this worker's connections to host once no more of its URLs are queued."""
+        with self._lock:
+            if self._queued[host] > 1:
+                self._queued[host] -= 1
+                return
+            self._queued.pop(host, None)
+        connections = self._local.__dict__.setdefault('connections', OrderedDict())
+        for key in [key for key in connections if key[1].lower() == host]:
+            self._discard(connections.pop(key))
+
+    def _discard(self, connection):
+        with self._lock:
+            self._connections.discard(connection)
+        connection.close()
+
+    def _connection(self, scheme, netloc):
+        connections = self._local.__dict__.setdefault('connections', OrderedDict())
+        key = (scheme, netloc)
+        if key in connections:
+            connections.move_to_end(key)
+            return connections[key]
+        connection_class = (http.client.HTTPSConnection if scheme == 'https'
+                            else http.client.HTTPConnection)
+        connection = connection_class(netloc, timeout=self.timeout)
+        connections[key] = connection
+        with self._lock:
+            self._connections.add(connection)
+        while len(connections) > self.max_connections:
+            self._discard(connections.popitem(last=False)[1])
+        return connection
+
+    def _request(self, parts):
+        connection = self._connection(parts.scheme, parts.netloc)
+        path = parts.path or '/'
+        if parts.query:
+            path += '?' + parts.query
+        try:
+            response = self._send(connection, 'HEAD', path)
+        except (ConnectionError, http.client.RemoteDisconnected,
+                http.client.CannotSendRequest):
+            # the server may have closed the kept-alive connection; reconnect once
+            connection.close()
+            response = self._send(connection, 'HEAD', path)
+        if response.status in (405, 501):
             # Try a GET request (HEAD refused)
             # See also: http://www.w3.org/Protocols/rfc2616/rfc2616.html
-            try:
-                req = Request(url, None, headers)
-                urlopen(req, timeout=5)
-            except (URLError, HTTPError):
-                print(str(e) + '; Response: ' + str(e.code) + '; skipping URL ' + url)
-                return False
-        else:
-            print(str(e) + '; Response: ' + str(e.code) + '; skipping URL ' + url)
-            return False
-    except (URLError, HTTPError):
-        print('Failed HTTP response/broken link; skipping URL ' + url)
-        return False
-    return True
+            response = self._send(connection, 'GET', path)
+        return response.status, response.getheader('Location')
+
+    def _send(self, connection, method, path):
+        try:
+            connection.request(method, path, headers=self.headers)
+            response = connection.getresponse()
+            if method == 'HEAD':
+                response.read()
+            else:
+                # don't download the body; the connection is reopened on next use
+                connection.close()
+        except Exception:
+            connection.close()
+            raise
+        if response.will_close:
+            connection.close()
+        return response
+
+
+class HostSchedule:
+    """Queues of URLs to check, one per host, handed out in turn.
+
+    take() only returns a job whose host has fewer than per_host jobs taken
+    and not yet released, so a URL never waits on a busy host while URLs
+    for other hosts are queued. Jobs are (url, url to request, redirects
+    followed) tuples.
+    """
+
+    def __init__(self, per_host):
+        self.per_host = per_host
+        self.waiting = {}
+        self.active = Counter()
+        # hosts with waiting jobs and a free slot, in the order they are served
+        self.ready = deque()
+
+    def __bool__(self):
+        return bool(self.waiting)
+
+    @staticmethod
+    def host(url):
+        return urlsplit(url).netloc.lower()
+
+    def add(self, url, current, redirects):
+        host = self.host(current)
+        if host not in self.waiting:
+            self.waiting[host] = deque()
+            if self.active[host] < self.per_host:
+                self.ready.append(host)
+        self.waiting[host].append((url, current, redirects))
+
+    def take(self):
+        """Return the next job whose host has a free slot, or None."""
+        if not self.ready:
+            return None
+        host = self.ready.popleft()
+        queue = self.waiting[host]
+        job = queue.popleft()
+        self.active[host] += 1
+        if not queue:
+            del self.waiting[host]
+        elif self.active[host] < self.per_host:
+            self.ready.append(host)
+        return job
+
+    def release(self, current):
+        """Free the slot taken by the job that requested current."""
+        host = self.host(current)
+        self.active[host] -= 1
+        if not self.active[host]:
+            del self.active[host]
+        if host in self.waiting and self.active[host] == self.per_host - 1:
+            self.ready.append(host)
+
+
+def verifyURL(url):
+    """Test status response from URL."""
+    return url in URLVerifier(workers=1, per_host=1).verify([url])
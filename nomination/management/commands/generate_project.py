@@ -0,0 +1,279 @@
+import datetime
+import itertools
+import random
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from nomination import summaries
+from nomination.models import (
+    URL, Metadata, Metadata_Values, Nominator, Project, Project_Metadata, Value, ValueSet,
+    Valueset_Values
+)
+from nomination.surt import surtize
+
+
+DEFAULT_ENTITIES = 10000
+DEFAULT_NOMINATORS = 200
+DEFAULT_FIELDS = 5
+DEFAULT_VALUE_SETS = 2
+DEFAULT_VALUES = 10
+DEFAULT_BATCH_SIZE = 5000
+
+# Top-level domains with rough relative frequencies of a web archiving crawl.
+TOP_DOMAINS = (('com', 45), ('org', 15), ('edu', 8), ('gov', 8), ('net', 7), ('us', 4),
+               ('uk', 4), ('de', 3), ('io', 3), ('info', 3))
+SUBDOMAINS = ('www', 'www', 'www', '', 'news', 'library', 'en', 'data')
+WORDS = ('news', 'library', 'archive', 'data', 'report', 'texas', 'state', 'city', 'health',
+         'water', 'energy', 'press', 'about', 'index', 'events', 'files', 'county', 'school',
+         'museum', 'policy', 'research', 'public', 'media', 'story')
+FORM_TYPES = ('checkbox', 'radio', 'select', 'selectsingle', 'text')
+# Share of URLs that get each metadata field, a second nomination, or an
+# out-of-scope nomination.
+FIELD_RATE = 0.5
+RENOMINATION_RATE = 0.35
+OUT_OF_SCOPE_RATE = 0.1
+# Share of hosts given as dotted-quad addresses.
+IP_HOST_RATE = 0.01
+
+
+class Command(BaseCommand):
+
+    help = """generate_project - Creates a project filled with synthetic nominations.
+
+    Writes a new project with the given slug, nominators, metadata fields,
+    value sets and URLs whose hosts, paths and nomination counts follow
+    skewed, crawl-like distributions. Rows are bulk inserted and the derived
+    tables are rebuilt once at the end. Intended for benchmarking; see
+    benchmark_project.
+
+    example: generate_project bigproject --entities 1000000 --nominators 5000"""
+
+    def add_arguments(self, parser):
+        """Set command-line arguments."""
+        parser.add_argument('project_slug', help='slug of the project to create')
+        parser.add_argument('--entities', type=int, default=DEFAULT_ENTITIES,
+                            help='number of URLs (default: %(default)s)')
+        parser.add_argument('--nominators', type=int, default=DEFAULT_NOMINATORS,
+                            help='number of nominators (default: %(default)s)')
+        parser.add_argument('--hosts', type=int, default=None,
+                            help='number of distinct hosts (default: entities / 20)')
+        parser.add_argument('--fields', type=int, default=DEFAULT_FIELDS,
+                            help='number of metadata fields (default: %(default)s)')
+        parser.add_argument('--value-sets', dest='value_sets', type=int,
+                            default=DEFAULT_VALUE_SETS,
+                            help='number of value sets shared by the fields '
+                                 '(default: %(default)s)')
+        parser.add_argument('--values', type=int, default=DEFAULT_VALUES,
+                            help='number of values per field and per value set '
+                                 '(default: %(default)s)')
+        parser.add_argument('--seed', type=int, default=0,
+                            help='random seed, for repeatable projects (default: %(default)s)')
+        parser.add_argument('--batch-size', dest='batch_size', type=int,
+                            default=DEFAULT_BATCH_SIZE,
+                            help='number of URL rows written per insert (default: %(default)s)')
+        parser.add_argument('--progress', action='store_true', default=False,
+                            help='report progress to stderr after each batch')
+
+    def handle(self, *args, **options):
+        for option in ('entities', 'nominators', 'batch_size'):
+            if options[option] < 1:
+                raise CommandError('--%s must be a positive number.'
+                                   % option.replace('_', '-'))
+        for option in ('fields', 'value_sets', 'values'):
+            if options[option] < 0:
+                raise CommandError('--%s must not be negative.' % option.replace('_', '-'))
+        if options['hosts'] is not None and options['hosts'] < 1:
+            raise CommandError('--hosts must be a positive number.')
+        if Project.objects.filter(project_slug=options['project_slug']).exists():
+            raise CommandError('Project %s already exists.' % options['project_slug'])
+        generator = ProjectGenerator(
+            options['project_slug'], entities=options['entities'],
+            nominators=options['nominators'], hosts=options['hosts'],
+            fields=options['fields'], value_sets=options['value_sets'],
+            values=options['values'], seed=options['seed'],
+            batch_size=options['batch_size'], progress=options['progress'])
+        project = generator.run()
+        self.stdout.write('Created project %s with %s URL rows for %s URLs.'
+                          % (project.project_slug, generator.row_count, options['entities']))
+
+
+def zipf_weights(count, exponent=1.1):
+    """Return cumulative weights that favour the first of count items, Zipf-like."""
+    return list(itertools.accumulate(1 / (rank ** exponent) for rank in range(1, count + 1)))
+
+
+class ProjectGenerator:
+    """Build one synthetic project; see the generate_project command."""
+
+    def __init__(self, slug, entities=DEFAULT_ENTITIES, nominators=DEFAULT_NOMINATORS,
+                 hosts=None, fields=DEFAULT_FIELDS, value_sets=DEFAULT_VALUE_SETS,
+                 values=DEFAULT_VALUES, seed=0, batch_size=DEFAULT_BATCH_SIZE, progress=False):
+        self.slug = slug
+        self.entity_count = entities
+        self.nominator_count = nominators
+        self.host_count = hosts or max(entities // 20, 1)
+        self.field_count = fields
+        self.value_set_count = value_sets
+        self.value_count = values
+        self.rand = random.Random(seed)
+        self.batch_size = batch_size
+        self.progress = progress
+        self.row_count = 0
+
+    def run(self):
+        """Create the project and its rows, then rebuild its derived tables."""
+        with transaction.atomic():
+            self.project = self.create_project()
+            self.fields = self.create_metadata()
+            self.nominators = self.create_nominators()
+        self.system_nominator = self.get_system_nominator()
+        self.write_urls()
+        for rebuild in summaries.REBUILDERS.values():
+            rebuild(self.project, batch_size=self.batch_size)
+        summaries.touch_projects([self.project.id])
+        return self.project
+
+    def create_project(self):
+        now = datetime.datetime.now()
+        return Project.objects.create(
+            project_name='Generated project %s' % self.slug,
+            project_description='Synthetic project created by generate_project.',
+            project_slug=self.slug,
+            project_start=now - datetime.timedelta(days=30),
+            project_end=now + datetime.timedelta(days=365),
+            nomination_start=now - datetime.timedelta(days=30),
+            nomination_end=now + datetime.timedelta(days=365),
+            admin_name='Generator',
+            admin_email='generator@example.com',
+            project_url='http://example.com/%s' % self.slug,
+            registration_required=False,
+        )
+
+    def create_values(self, label, count):
+        values = Value.objects.bulk_create(
+            [Value(value='%s value %s' % (label, i), key='%s_%s_%s' % (self.slug, label, i))
+             for i in range(count)])
+        if values and values[0].pk is None:
+            values = list(Value.objects.filter(key__startswith='%s_%s_' % (self.slug, label)))
+        return values
+
+    def create_metadata(self):
+        """Create the fields, values and value sets; return {field name: [value keys]}."""
+        value_sets = []
+        for i in range(self.value_set_count):
+            value_set = ValueSet.objects.create(name='%s set %s' % (self.slug, i))
+            values = self.create_values('s%s' % i, self.value_count)
+            Valueset_Values.objects.bulk_create(
+                [Valueset_Values(valueset=value_set, value=value, value_order=order)
+                 for order, value in enumerate(values)])
+            value_sets.append((value_set, [value.key for value in values]))
+        fields = {}
+        for i in range(self.field_count):
+            metadata = Metadata.objects.create(name='%s_field_%s' % (self.slug, i))
+            values = self.create_values('f%s' % i, self.value_count)
+            Metadata_Values.objects.bulk_create(
+                [Metadata_Values(metadata=metadata, value=value, value_order=order)
+                 for order, value in enumerate(values)])
+            keys = [value.key for value in values]
+            if value_sets:
+                value_set, set_keys = value_sets[i % len(value_sets)]
+                metadata.value_sets.add(value_set)
+                keys.extend(set_keys)
+            Project_Metadata.objects.create(
+                project=self.project, metadata=metadata, required=False,
+                form_type=FORM_TYPES[i % len(FORM_TYPES)],
+                description='Field %s' % i, metadata_order=i)
+            fields[metadata.name] = keys or ['free text']
+        return fields
+
+    def create_nominators(self):
+        Nominator.objects.bulk_create(
+            [Nominator(nominator_name='Nominator %s' % i,
+                       nominator_email='nominator%s@%s.example.com' % (i, self.slug),
+                       nominator_institution='Institution %s' % (i % 50))
+             for i in range(self.nominator_count)])
+        return list(Nominator.objects.filter(nominator_email__endswith='@%s.example.com'
+                                             % self.slug).order_by('id'))
+
+    def get_system_nominator(self):
+        system_nominator, _ = Nominator.objects.get_or_create(
+            id=settings.SYSTEM_NOMINATOR_ID,
+            defaults={'nominator_name': 'system', 'nominator_institution': 'system',
+                      'nominator_email': 'system@example.com'})
+        return system_nominator
+
+    def make_hosts(self):
+        domain_names, domain_weights = zip(*TOP_DOMAINS)
+        hosts = []
+        for i in range(self.host_count):
+            if self.rand.random() < IP_HOST_RATE:
+                hosts.append('.'.join(str(self.rand.randint(1, 254)) for _ in range(4)))
+                continue
+            subdomain = self.rand.choice(SUBDOMAINS)
+            name = '%s%s' % (self.rand.choice(WORDS), i)
+            top_domain = self.rand.choices(domain_names, weights=domain_weights)[0]
+            hosts.append('.'.join(part for part in (subdomain, name, top_domain) if part))
+        return hosts
+
+    def make_entity(self, host):
+        scheme = 'https' if self.rand.random() < 0.6 else 'http'
+        path = '/'.join(self.rand.choice(WORDS) for _ in range(self.rand.randint(0, 4)))
+        entity = '%s://%s/%s' % (scheme, host, path)
+        if self.rand.random() < 0.1:
+            entity += '?id=%s' % self.rand.randint(1, 100000)
+        return entity.rstrip('/')
+
+    def iter_entities(self):
+        """Yield entity_count distinct URLs over Zipf-distributed hosts."""
+        hosts = self.make_hosts()
+        host_weights = zipf_weights(len(hosts))
+        seen = set()
+        while len(seen) < self.entity_count:
+            entity = self.make_entity(self.rand.choices(hosts, cum_weights=host_weights)[0])
+            if entity.lower() in seen:
+                entity = '%s/%s' % (entity, len(seen))
+            if entity.lower() not in seen:
+                seen.add(entity.lower())
+                yield entity
+
+    def iter_rows(self):
+        """Yield the surt, nomination and metadata rows of every URL."""
+        nominator_weights = zipf_weights(len(self.nominators))
+        for entity in self.iter_entities():
+            yield URL(url_project=self.project, url_nominator=self.system_nominator,
+                      entity=entity, attribute='surt', value=surtize(entity))
+            nominators = {self.rand.choices(self.nominators, cum_weights=nominator_weights)[0]}
+            while (self.rand.random() < RENOMINATION_RATE
+                   and len(nominators) < len(self.nominators)):
+                nominators.add(self.rand.choices(self.nominators,
+                                                 cum_weights=nominator_weights)[0])
+            for nominator in sorted(nominators, key=lambda nominator: nominator.id):
+                scope = '-1' if self.rand.random() < OUT_OF_SCOPE_RATE else '1'
+                yield URL(url_project=self.project, url_nominator=nominator, entity=entity,
+                          attribute='nomination', value=scope)
+            first_nominator = min(nominators, key=lambda nominator: nominator.id)
+            for name, keys in self.fields.items():
+                if self.rand.random() < FIELD_RATE:
+                    yield URL(url_project=self.project, url_nominator=first_nominator,
+                              entity=entity, attribute=name, value=self.rand.choice(keys))
+
+    def write_urls(self):
+        batch = []
+        for url in self.iter_rows():
+            url.normalize()
+            batch.append(url)
+            if len(batch) >= self.batch_size:
+                self.write_batch(batch)
+                batch = []
+        self.write_batch(batch)
+
+    def write_batch(self, batch):
+        if not batch:
+            return
+        URL.objects.bulk_create(batch)
+        self.row_count += len(batch)
+        if self.progress:
+            print('Created %s URL rows.' % self.row_count, file=sys.stderr)
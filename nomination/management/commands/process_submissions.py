@@ -0,0 +1,68 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from nomination import intake
+from nomination.models import Project, Submission
+
+
+class Command(BaseCommand):
+
+    help = """process_submissions - Writes nomination submissions queued by async intake.
+
+    Claims pending submissions in batches and writes them with the same code
+    as the synchronous forms. Failed submissions are retried with a growing
+    delay and marked failed after --max-attempts tries. Without --loop the
+    command exits once no submission is due; with --retry-failed it first
+    makes failed submissions pending again.
+
+    example: process_submissions --loop --batch-size 200"""
+
+    def add_arguments(self, parser):
+        """Set command-line arguments."""
+        parser.add_argument('--batch-size', dest='batch_size', type=int,
+                            default=intake.DEFAULT_BATCH_SIZE,
+                            help='number of submissions claimed at once (default: %(default)s)')
+        parser.add_argument('--max-attempts', dest='max_attempts', type=int,
+                            default=intake.DEFAULT_MAX_ATTEMPTS,
+                            help='number of tries before a submission is marked failed '
+                                 '(default: %(default)s)')
+        parser.add_argument('--stale-after', dest='stale_after', type=int,
+                            default=intake.DEFAULT_STALE_AFTER,
+                            help='seconds after which a claimed but unfinished submission is '
+                                 'claimed again (default: %(default)s)')
+        parser.add_argument('--loop', action='store_true', default=False,
+                            help='keep polling for submissions instead of exiting')
+        parser.add_argument('--sleep', type=float, default=1.0,
+                            help='seconds to wait when no submission is due, with --loop '
+                                 '(default: %(default)s)')
+        parser.add_argument('--retry-failed', dest='retry_failed', action='store_true',
+                            default=False, help='make failed submissions pending again first')
+        parser.add_argument('-p', '--project', dest='project_slug', default=None,
+                            help='only retry the failed submissions of this project')
+
+    def handle(self, *args, **options):
+        for option in ('batch_size', 'max_attempts', 'stale_after'):
+            if options[option] < 1:
+                raise CommandError('--%s must be a positive number.'
+                                   % option.replace('_', '-'))
+        if options['retry_failed']:
+            submissions = Submission.objects.all()
+            if options['project_slug']:
+                if not Project.objects.filter(project_slug=options['project_slug']).exists():
+                    raise CommandError('Unknown project slug: %s' % options['project_slug'])
+                submissions = submissions.filter(project__project_slug=options['project_slug'])
+            self.stdout.write('Requeued %s failed submissions.'
+                              % intake.requeue_failed(submissions))
+        totals = {'done': 0, 'pending': 0, 'failed': 0}
+        while True:
+            counts = intake.process_batch(options['batch_size'], options['max_attempts'],
+                                          options['stale_after'])
+            for status, count in counts.items():
+                totals[status] += count
+            if not any(counts.values()):
+                if not options['loop']:
+                    break
+                time.sleep(options['sleep'])
+        self.stdout.write('Wrote %(done)s submissions, %(pending)s will be retried and '
+                          '%(failed)s failed.' % totals)
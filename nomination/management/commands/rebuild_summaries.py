@@ -0,0 +1,63 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from nomination.models import Project
+from nomination.summaries import CHECKERS, REBUILDERS
+
+
+class Command(BaseCommand):
+
+    help = """rebuild_summaries - Regenerates the tables derived from the URL table.
+
+    Rebuilds the derived tables (all of them, or those named with --table) for
+    the given projects, or for every project if none are given. With --check,
+    tables that support it are compared against a full scan of the URL table
+    instead of being rebuilt.
+
+    example: rebuild_summaries -p <PROJECT_SLUG> -t url_summary"""
+
+    def add_arguments(self, parser):
+        """Set command-line arguments."""
+        parser.add_argument('-p', '--project', dest='project_slugs', action='append',
+                            default=[], help='project slug to rebuild (may be repeated)')
+        parser.add_argument('-t', '--table', dest='tables', action='append',
+                            choices=sorted(REBUILDERS), default=[],
+                            help='derived table to rebuild (may be repeated; default all)')
+        parser.add_argument('--batch-size', dest='batch_size', type=int, default=1000,
+                            help='number of rows written per insert')
+        parser.add_argument('--check', action='store_true', default=False,
+                            help='report differences from a full scan instead of rebuilding')
+
+    def handle(self, *args, **options):
+        projects = Project.objects.all()
+        if options['project_slugs']:
+            projects = projects.filter(project_slug__in=options['project_slugs'])
+            missing = set(options['project_slugs']) - {p.project_slug for p in projects}
+            if missing:
+                raise CommandError('Unknown project slug(s): %s' % ', '.join(sorted(missing)))
+        tables = options['tables'] or list(REBUILDERS)
+        if options['check']:
+            self.check_tables(projects, [table for table in tables if table in CHECKERS])
+            return
+        for project in projects.order_by('project_slug'):
+            for table in tables:
+                count = REBUILDERS[table](project, batch_size=options['batch_size'])
+                self.stdout.write('Rebuilt %s %s rows for %s.'
+                                  % (count, table, project.project_slug))
+
+    def check_tables(self, projects, tables):
+        if not tables:
+            raise CommandError('None of the selected tables support --check.')
+        inconsistent = False
+        for project in projects.order_by('project_slug'):
+            for table in tables:
+                differences = CHECKERS[table](project)
+                if differences:
+                    inconsistent = True
+                    self.stdout.write('%s for %s differs from the URL table:'
+                                      % (table, project.project_slug))
+                    for difference in differences:
+                        self.stdout.write('    %s' % difference)
+                else:
+                    self.stdout.write('%s for %s is consistent.' % (table, project.project_slug))
+        if inconsistent:
+            raise CommandError('Inconsistencies found; rerun without --check to rebuild.')
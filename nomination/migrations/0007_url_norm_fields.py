@@ -0,0 +1,28 @@
+# Generated by Django 4.2.30 on 2026-10-18 12:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nomination', '0006_alter_url_value'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='url',
+            name='attribute_norm',
+            field=models.CharField(default='', editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='url',
+            name='entity_norm',
+            field=models.CharField(default='', editable=False, max_length=300),
+        ),
+        migrations.AddField(
+            model_name='url',
+            name='value_norm',
+            field=models.CharField(default='', editable=False, max_length=305),
+        ),
+    ]
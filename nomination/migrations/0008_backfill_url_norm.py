@@ -0,0 +1,42 @@
+from django.db import migrations, transaction
+
+BATCH_SIZE = 5000
+
+
+def backfill_url_norm(apps, schema_editor):
+    """Populate the lowercased lookup columns for existing URL rows.
+
+    Rows are walked in primary key order in batches, each batch written in
+    its own transaction, so the backfill never holds the whole table.
+    """
+    URL = apps.get_model('nomination', 'URL')
+    db_alias = schema_editor.connection.alias
+    last_id = 0
+    while True:
+        batch = list(URL.objects.using(db_alias)
+                                .filter(id__gt=last_id)
+                                .order_by('id')
+                                .only('id', 'entity', 'attribute', 'value')[:BATCH_SIZE])
+        if not batch:
+            break
+        for url in batch:
+            url.entity_norm = url.entity.lower()
+            url.attribute_norm = url.attribute.lower()
+            url.value_norm = url.value.lower()
+        with transaction.atomic(using=db_alias):
+            URL.objects.using(db_alias).bulk_update(
+                batch, ['entity_norm', 'attribute_norm', 'value_norm'])
+        last_id = batch[-1].id
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('nomination', '0007_url_norm_fields'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_url_norm, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-18 12:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nomination', '0008_backfill_url_norm'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='url',
+            index=models.Index(fields=['url_project', 'attribute_norm', 'value_norm'], name='url_project_attr_value_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='url',
+            index=models.Index(fields=['url_project', 'entity_norm'], name='url_project_entity_idx'),
+        ),
+    ]
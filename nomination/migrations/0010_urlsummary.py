@@ -0,0 +1,36 @@
+# Generated by Django 4.2.30 on 2026-10-18 12:55
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nomination', '0009_url_norm_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='URLSummary',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entity', models.CharField(max_length=300)),
+                ('entity_norm', models.CharField(max_length=300)),
+                ('surt', models.CharField(blank=True, max_length=305)),
+                ('nomination_count', models.IntegerField(default=0)),
+                ('nomination_score', models.IntegerField(default=0)),
+                ('nominator_count', models.IntegerField(default=0)),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='nomination.project')),
+            ],
+            options={
+                'verbose_name': 'URL summary',
+                'verbose_name_plural': 'URL summaries',
+                'indexes': [models.Index(fields=['project', '-nomination_score'], name='urlsummary_score_idx'), models.Index(fields=['project', '-nomination_count'], name='urlsummary_count_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='urlsummary',
+            constraint=models.UniqueConstraint(fields=('project', 'entity_norm'), name='urlsummary_project_entity_uniq'),
+        ),
+    ]
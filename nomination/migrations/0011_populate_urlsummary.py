@@ -0,0 +1,72 @@
+from django.db import migrations
+
+BATCH_SIZE = 1000
+
+
+def summarize_rows(rows):
+    """Build URLSummary field values from (entity, attribute_norm, value, nominator_id) rows."""
+    summary = {
+        'entity': None,
+        'surt': '',
+        'nomination_count': 0,
+        'nomination_score': 0,
+        'nominator_count': 0,
+    }
+    nominators = set()
+    for entity, attribute, value, nominator_id in rows:
+        if attribute == 'surt':
+            summary['surt'] = value
+            # Prefer the entity as written on the surt row.
+            summary['entity'] = entity
+        elif attribute == 'nomination':
+            summary['nomination_count'] += 1
+            try:
+                summary['nomination_score'] += int(value)
+            except ValueError:
+                pass
+            nominators.add(nominator_id)
+            if summary['entity'] is None:
+                summary['entity'] = entity
+    summary['nominator_count'] = len(nominators)
+    return summary
+
+
+def populate_urlsummary(apps, schema_editor):
+    """Build URLSummary rows for URLs nominated before the table existed."""
+    URL = apps.get_model('nomination', 'URL')
+    URLSummary = apps.get_model('nomination', 'URLSummary')
+    db_alias = schema_editor.connection.alias
+    rows = (URL.objects.using(db_alias)
+                       .filter(attribute_norm__in=('nomination', 'surt'))
+                       .order_by('url_project_id', 'entity_norm', 'id')
+                       .values_list('url_project_id', 'entity_norm', 'entity', 'attribute_norm',
+                                    'value', 'url_nominator_id'))
+    batch = []
+    current = None
+    entity_rows = []
+    for row in rows.iterator(chunk_size=BATCH_SIZE):
+        if row[:2] != current:
+            if entity_rows:
+                batch.append(URLSummary(project_id=current[0], entity_norm=current[1],
+                                        **summarize_rows(entity_rows)))
+            current = row[:2]
+            entity_rows = []
+        entity_rows.append(row[2:])
+        if len(batch) >= BATCH_SIZE:
+            URLSummary.objects.using(db_alias).bulk_create(batch)
+            batch = []
+    if entity_rows:
+        batch.append(URLSummary(project_id=current[0], entity_norm=current[1],
+                                **summarize_rows(entity_rows)))
+    URLSummary.objects.using(db_alias).bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nomination', '0010_urlsummary'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_urlsummary, migrations.RunPython.noop),
+    ]
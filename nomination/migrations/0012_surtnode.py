@@ -0,0 +1,35 @@
+# Generated by Django 4.2.30 on 2026-10-18 12:56
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nomination', '0011_populate_urlsummary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SURTNode',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('parent', models.CharField(blank=True, max_length=305)),
+                ('node', models.CharField(max_length=305)),
+                ('name', models.CharField(max_length=305)),
+                ('child_count', models.IntegerField(default=0)),
+                ('url_count', models.IntegerField(default=0)),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='nomination.project')),
+            ],
+            options={
+                'verbose_name': 'SURT node',
+                'verbose_name_plural': 'SURT nodes',
+                'indexes': [models.Index(fields=['project', 'parent', 'name'], name='surtnode_parent_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='surtnode',
+            constraint=models.UniqueConstraint(fields=('project', 'node'), name='surtnode_project_node_uniq'),
+        ),
+    ]
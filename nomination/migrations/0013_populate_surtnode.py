@@ -0,0 +1,56 @@
+import re
+
+from django.db import migrations
+
+BATCH_SIZE = 1000
+SURT_HOST_PATTERN = re.compile(r'^[^:]+://\(([^)]*)')
+
+
+def build_surt_tree(surts):
+    """Compute SURT tree nodes from an iterable of SURT values.
+
+    Returns a dict of node -> {'parent', 'name', 'child_count', 'url_count'}.
+    """
+    tree = {}
+    for surt in surts:
+        match = SURT_HOST_PATTERN.search(surt)
+        parent = ''
+        for name in (match.group(1).split(',') if match else []):
+            if not name:
+                continue
+            node = parent + name + ','
+            if node not in tree:
+                tree[node] = {'parent': parent, 'name': name, 'child_count': 0, 'url_count': 0}
+                if parent:
+                    tree[parent]['child_count'] += 1
+            tree[node]['url_count'] += 1
+            parent = node
+    return tree
+
+
+def populate_surtnode(apps, schema_editor):
+    """Build the SURT tree for surt rows added before the table existed."""
+    Project = apps.get_model('nomination', 'Project')
+    URL = apps.get_model('nomination', 'URL')
+    SURTNode = apps.get_model('nomination', 'SURTNode')
+    db_alias = schema_editor.connection.alias
+    for project_id in Project.objects.using(db_alias).values_list('id', flat=True):
+        surts = (URL.objects.using(db_alias)
+                            .filter(url_project_id=project_id, attribute_norm='surt')
+                            .values_list('value', flat=True))
+        tree = build_surt_tree(surts.iterator(chunk_size=BATCH_SIZE))
+        SURTNode.objects.using(db_alias).bulk_create(
+            (SURTNode(project_id=project_id, node=node, **fields)
+             for node, fields in tree.items()),
+            batch_size=BATCH_SIZE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nomination', '0012_surtnode'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_surtnode, migrations.RunPython.noop),
+    ]
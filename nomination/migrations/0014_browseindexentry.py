@@ -0,0 +1,32 @@
+# Generated by Django 4.2.30 on 2026-10-18 12:58
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nomination', '0013_populate_surtnode'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BrowseIndexEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('top_domain', models.CharField(max_length=305)),
+                ('letter', models.CharField(blank=True, max_length=4)),
+                ('surt_prefix', models.CharField(blank=True, max_length=305)),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='nomination.project')),
+            ],
+            options={
+                'verbose_name': 'browse index entry',
+                'verbose_name_plural': 'browse index entries',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='browseindexentry',
+            constraint=models.UniqueConstraint(fields=('project', 'top_domain', 'letter'), name='browseindex_project_letter_uniq'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+import re
+
+from django.db import migrations
+
+BATCH_SIZE = 1000
+TOP_DOMAIN_PATTERN = re.compile(r'^[^:]+://\(([^,]+),')
+DOMAIN_LETTER_PATTERN = re.compile(r'^[^:]+://(\([^,]+,([^,\)]{1}))')
+
+
+def build_browse_index(surts):
+    """Compute {(top_domain, letter): surt_prefix} browse index entries from SURT values."""
+    entries = {}
+    for surt in surts:
+        top_domain_search = TOP_DOMAIN_PATTERN.search(surt, 0)
+        if not top_domain_search:
+            continue
+        top_domain = top_domain_search.group(1)
+        entries.setdefault((top_domain, ''), '')
+        domain_single_search = DOMAIN_LETTER_PATTERN.search(surt, 0)
+        if domain_single_search:
+            entries.setdefault((top_domain, domain_single_search.group(2).upper()),
+                               domain_single_search.group(1))
+    return entries
+
+
+def populate_browseindexentry(apps, schema_editor):
+    """Build the alphabetical browse index for surt rows added before the table existed."""
+    Project = apps.get_model('nomination', 'Project')
+    URL = apps.get_model('nomination', 'URL')
+    BrowseIndexEntry = apps.get_model('nomination', 'BrowseIndexEntry')
+    db_alias = schema_editor.connection.alias
+    for project_id in Project.objects.using(db_alias).values_list('id', flat=True):
+        surts = (URL.objects.using(db_alias)
+                            .filter(url_project_id=project_id, attribute_norm='surt')
+                            .values_list('value', flat=True))
+        entries = build_browse_index(surts.iterator(chunk_size=BATCH_SIZE))
+        BrowseIndexEntry.objects.using(db_alias).bulk_create(
+            (BrowseIndexEntry(project_id=project_id, top_domain=top_domain, letter=letter,
+                              surt_prefix=surt_prefix)
+             for (top_domain, letter), surt_prefix in entries.items()),
+            batch_size=BATCH_SIZE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nomination', '0014_browseindexentry'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_browseindexentry, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.30 on 2026-10-18 13:14
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nomination', '0015_populate_browseindexentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EntityTrigram',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trigram', models.CharField(max_length=3)),
+                ('entity_norm', models.CharField(max_length=300)),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='nomination.project')),
+            ],
+            options={
+                'verbose_name': 'entity trigram',
+                'verbose_name_plural': 'entity trigrams',
+                'indexes': [models.Index(fields=['project', 'entity_norm'], name='entitytrigram_entity_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='entitytrigram',
+            constraint=models.UniqueConstraint(fields=('project', 'trigram', 'entity_norm'), name='entitytrigram_project_trigram_uniq'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+from django.db import migrations
+
+BATCH_SIZE = 1000
+
+
+def entity_trigrams(entity_norm):
+    """Return the set of three-character substrings of a lowercased entity."""
+    return {entity_norm[i:i + 3] for i in range(len(entity_norm) - 2)}
+
+
+def populate_entitytrigram(apps, schema_editor):
+    """Index the trigrams of entities whose surt rows were added before the table existed."""
+    Project = apps.get_model('nomination', 'Project')
+    URL = apps.get_model('nomination', 'URL')
+    EntityTrigram = apps.get_model('nomination', 'EntityTrigram')
+    db_alias = schema_editor.connection.alias
+    for project_id in Project.objects.using(db_alias).values_list('id', flat=True):
+        entity_norms = (URL.objects.using(db_alias)
+                                   .filter(url_project_id=project_id, attribute_norm='surt')
+                                   .values_list('entity_norm', flat=True)
+                                   .distinct())
+        EntityTrigram.objects.using(db_alias).bulk_create(
+            (EntityTrigram(project_id=project_id, trigram=trigram, entity_norm=entity_norm)
+             for entity_norm in list(entity_norms.iterator(chunk_size=BATCH_SIZE))
+             for trigram in entity_trigrams(entity_norm)),
+            batch_size=BATCH_SIZE, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nomination', '0016_entitytrigram'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_entitytrigram, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-18 13:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nomination', '0017_populate_entitytrigram'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='url',
+            index=models.Index(fields=['url_project', 'date'], name='url_project_date_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+from django.db import migrations
+from django.db.models import Max
+
+
+def populate_project_watermark(apps, schema_editor):
+    """Start each project's watermark at the date of its newest URL row."""
+    Project = apps.get_model('nomination', 'Project')
+    URL = apps.get_model('nomination', 'URL')
+    db_alias = schema_editor.connection.alias
+    latest = (URL.objects.using(db_alias)
+                         .values('url_project_id')
+                         .annotate(latest=Max('date'))
+                         .values_list('url_project_id', 'latest'))
+    for project_id, date in latest.iterator():
+        Project.objects.using(db_alias).filter(pk=project_id).update(last_modified=date,
+                                                                     revision=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nomination', '0019_project_watermark'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_project_watermark, migrations.RunPython.noop),
+    ]
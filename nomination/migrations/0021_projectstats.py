@@ -0,0 +1,27 @@
+# Generated by Django 4.2.30 on 2026-10-18 13:23
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nomination', '0020_populate_project_watermark'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjectStats',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('url_count', models.IntegerField(default=0)),
+                ('nominator_count', models.IntegerField(default=0)),
+                ('project', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='stats', to='nomination.project')),
+            ],
+            options={
+                'verbose_name': 'project statistics',
+                'verbose_name_plural': 'project statistics',
+            },
+        ),
+    ]
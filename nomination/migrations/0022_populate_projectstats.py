@@ -0,0 +1,28 @@
+from django.db import migrations
+
+
+def populate_projectstats(apps, schema_editor):
+    """Count the URLs and nominators of projects created before the table existed."""
+    Project = apps.get_model('nomination', 'Project')
+    ProjectStats = apps.get_model('nomination', 'ProjectStats')
+    URL = apps.get_model('nomination', 'URL')
+    db_alias = schema_editor.connection.alias
+    for project_id in Project.objects.using(db_alias).values_list('id', flat=True):
+        urls = URL.objects.using(db_alias).filter(url_project_id=project_id)
+        ProjectStats.objects.using(db_alias).create(
+            project_id=project_id,
+            url_count=urls.filter(attribute_norm='surt').count(),
+            nominator_count=(urls.filter(attribute_norm='nomination', value_norm='1')
+                                 .values('url_nominator_id').distinct().count()),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nomination', '0021_projectstats'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_projectstats, migrations.RunPython.noop),
+    ]
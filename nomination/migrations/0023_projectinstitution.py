@@ -0,0 +1,32 @@
+# Generated by Django 4.2.30 on 2026-10-18 13:25
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nomination', '0022_populate_projectstats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjectInstitution',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('institution', models.CharField(max_length=100)),
+                ('institution_norm', models.CharField(max_length=100)),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='nomination.project')),
+            ],
+            options={
+                'verbose_name': 'project institution',
+                'verbose_name_plural': 'project institutions',
+                'indexes': [models.Index(fields=['project', 'institution_norm'], name='projectinstitution_norm_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='projectinstitution',
+            constraint=models.UniqueConstraint(fields=('project', 'institution'), name='projectinstitution_project_uniq'),
+        ),
+    ]
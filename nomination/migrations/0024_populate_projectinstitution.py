@@ -0,0 +1,30 @@
+from django.db import migrations
+
+BATCH_SIZE = 1000
+
+
+def populate_projectinstitution(apps, schema_editor):
+    """Index the institutions of nominators who added URLs before the table existed."""
+    URL = apps.get_model('nomination', 'URL')
+    ProjectInstitution = apps.get_model('nomination', 'ProjectInstitution')
+    db_alias = schema_editor.connection.alias
+    rows = (URL.objects.using(db_alias)
+                       .exclude(url_nominator__nominator_institution='')
+                       .values_list('url_project_id', 'url_nominator__nominator_institution')
+                       .distinct())
+    ProjectInstitution.objects.using(db_alias).bulk_create(
+        [ProjectInstitution(project_id=project_id, institution=institution,
+                            institution_norm=institution.lower())
+         for project_id, institution in rows],
+        batch_size=BATCH_SIZE, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nomination', '0023_projectinstitution'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_projectinstitution, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.30 on 2026-10-18 13:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nomination', '0025_submission'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='urlsummary',
+            name='surt_norm',
+            field=models.CharField(blank=True, max_length=305),
+        ),
+        migrations.AddIndex(
+            model_name='urlsummary',
+            index=models.Index(fields=['project', 'surt_norm', 'entity_norm'], name='urlsummary_surt_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+import re
+
+from django.db import migrations
+
+BATCH_SIZE = 1000
+SURT_SCHEME_PATTERN = re.compile(r'^[^:(]+://')
+
+
+def populate_surt_norm(apps, schema_editor):
+    """Fill in the normalized SURT of summaries written before the column existed."""
+    URLSummary = apps.get_model('nomination', 'URLSummary')
+    db_alias = schema_editor.connection.alias
+    summaries = URLSummary.objects.using(db_alias).exclude(surt='').only('id', 'surt')
+    batch = []
+    for summary in summaries.iterator(chunk_size=BATCH_SIZE):
+        summary.surt_norm = SURT_SCHEME_PATTERN.sub('', summary.surt, count=1).lower()
+        batch.append(summary)
+        if len(batch) >= BATCH_SIZE:
+            URLSummary.objects.using(db_alias).bulk_update(batch, ['surt_norm'])
+            batch = []
+    URLSummary.objects.using(db_alias).bulk_update(batch, ['surt_norm'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nomination', '0026_urlsummary_surt_norm'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_surt_norm, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.30 on 2026-10-18 14:39
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nomination', '0027_populate_urlsummary_surt_norm'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EntityChange',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('url_id', models.IntegerField()),
+                ('entity', models.CharField(max_length=300)),
+                ('deleted', models.BooleanField(default=True)),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='nomination.project')),
+            ],
+            options={
+                'verbose_name': 'entity change',
+                'verbose_name_plural': 'entity changes',
+                'indexes': [models.Index(fields=['project', 'id'], name='entitychange_project_idx')],
+            },
+        ),
+    ]
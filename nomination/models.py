@@ -1,7 +1,9 @@
 import datetime
+import uuid
 from django.db import models
 from django.contrib.sites.models import Site
 from django.conf import settings
+from django.utils import timezone
 from django.utils.safestring import mark_safe
 
 FORM_TYPES = (
@@ -134,10 +136,19 @@ class Project(models.Model):
                                   blank=True)
     registration_required = models.BooleanField()
     metadata = models.ManyToManyField(Metadata, through='Project_Metadata')
+    # Change watermark of the project: advanced whenever one of its URL rows
+    # is inserted, updated or deleted, and when the project itself is saved.
+    last_modified = models.DateTimeField(null=True, editable=False)
+    revision = models.PositiveIntegerField(default=0, editable=False)
 
     def __str__(self):
         return self.project_slug
 
+    def save(self, *args, **kwargs):
+        self.last_modified = timezone.now()
+        self.revision += 1
+        super().save(*args, **kwargs)
+
     def nomination_message(self):
         if datetime.datetime.now() < self.nomination_start:
             return 'Nomination for this project starts on ' + \
@@ -219,7 +230,7 @@ class Nominator(models.Model):
         ordering = ['nominator_name']
 
     def nominations(self):
-        return len(URL.objects.filter(url_nominator=self.id))
+        return URL.objects.filter(url_nominator=self.id).count()
 
 
 class URL(models.Model):
@@ -231,10 +242,43 @@ class URL(models.Model):
                                  help_text='A property of the URL you wish to describe.')
     value = models.CharField(max_length=305, help_text='The value of the associated attribute.')
     date = models.DateTimeField(auto_now=True)
+    # Lowercased copies of entity/attribute/value so case-insensitive lookups
+    # can be answered by the indexes below instead of UPPER()/LIKE scans.
+    entity_norm = models.CharField(max_length=300, editable=False, default='')
+    attribute_norm = models.CharField(max_length=255, editable=False, default='')
+    value_norm = models.CharField(max_length=305, editable=False, default='')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['url_project', 'attribute_norm', 'value_norm'],
+                         name='url_project_attr_value_idx'),
+            models.Index(fields=['url_project', 'entity_norm'],
+                         name='url_project_entity_idx'),
+            models.Index(fields=['url_project', 'date'],
+                         name='url_project_date_idx'),
+        ]
 
     def __str__(self):
         return self.entity
 
+    def normalize(self):
+        """Populate the lowercased lookup columns from entity/attribute/value.
+
+        Called by save(); code that bypasses save() (e.g. bulk_create) must
+        call it on each instance itself.
+        """
+        self.entity_norm = str(self.entity).lower()
+        self.attribute_norm = str(self.attribute).lower()
+        self.value_norm = str(self.value).lower()
+
+    def save(self, *args, **kwargs):
+        self.normalize()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = set(update_fields) | {
+                'entity_norm', 'attribute_norm', 'value_norm'}
+        super().save(*args, **kwargs)
+
     def entity_display(self):
         return mark_safe(
             "<a href=\'http://%s/admin/nomination/url/%s\'>%s</a>&nbsp;"
@@ -248,13 +292,246 @@ class URL(models.Model):
     def get_project(self):
         return mark_safe(
             "<a href=\'http://%s/admin/nomination/project/%s\'>%s</a>" %
-            (Site.objects.get_current().domain, self.url_project.id, self.url_project))
+            (Site.objects.get_current().domain, self.url_project_id, self.url_project))
     get_project.short_description = 'Project'
     get_project.allow_tags = True
 
     def get_nominator(self):
         return mark_safe(
             "<a href=\'http://%s/admin/nomination/nominator/%s\'>%s</a>" %
-            (Site.objects.get_current().domain, self.url_nominator.id, self.url_nominator))
+            (Site.objects.get_current().domain, self.url_nominator_id, self.url_nominator))
     get_nominator.short_description = 'Nominator'
     get_nominator.allow_tags = True
+
+
+class URLSummary(models.Model):
+    """Per-entity facts derived from the URL table, one row per (project, entity).
+
+    Kept current by nomination.summaries as nomination and surt rows change;
+    the rebuild_summaries management command (--table url_summary)
+    regenerates it from scratch.
+    """
+    project = models.ForeignKey(Project, on_delete=models.CASCADE)
+    entity = models.CharField(max_length=300)
+    entity_norm = models.CharField(max_length=300)
+    surt = models.CharField(max_length=305, blank=True)
+    # The SURT lowercased and without its scheme, for prefix range queries.
+    # These and the keyset pages over (surt_norm, entity_norm) need a binary
+    # collation; see the README.
+    surt_norm = models.CharField(max_length=305, blank=True)
+    nomination_count = models.IntegerField(default=0)
+    nomination_score = models.IntegerField(default=0)
+    nominator_count = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'URL summary'
+        verbose_name_plural = 'URL summaries'
+        constraints = [
+            models.UniqueConstraint(fields=['project', 'entity_norm'],
+                                    name='urlsummary_project_entity_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['project', '-nomination_score'],
+                         name='urlsummary_score_idx'),
+            models.Index(fields=['project', '-nomination_count'],
+                         name='urlsummary_count_idx'),
+            models.Index(fields=['project', 'surt_norm', 'entity_norm'],
+                         name='urlsummary_surt_idx'),
+        ]
+
+    def __str__(self):
+        return self.entity
+
+
+class SURTNode(models.Model):
+    """One host segment of the SURT tree of a project.
+
+    A node such as 'com,example,' sits under its parent 'com,' and counts
+    every surt row of the project whose host passes through it.
+    """
+    project = models.ForeignKey(Project, on_delete=models.CASCADE)
+    parent = models.CharField(max_length=305, blank=True)
+    node = models.CharField(max_length=305)
+    name = models.CharField(max_length=305)
+    child_count = models.IntegerField(default=0)
+    url_count = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'SURT node'
+        verbose_name_plural = 'SURT nodes'
+        constraints = [
+            models.UniqueConstraint(fields=['project', 'node'], name='surtnode_project_node_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['project', 'parent', 'name'], name='surtnode_parent_idx'),
+        ]
+
+    def __str__(self):
+        return self.node
+
+    @property
+    def has_children(self):
+        return self.child_count > 0
+
+
+class BrowseIndexEntry(models.Model):
+    """One entry of a project's alphabetical browse index.
+
+    Each top-level domain has an entry with an empty letter, plus one entry
+    per first letter of its second-level domains pointing at the SURT prefix
+    to browse, e.g. ('org', 'A', '(org,a').
+    """
+    project = models.ForeignKey(Project, on_delete=models.CASCADE)
+    top_domain = models.CharField(max_length=305)
+    letter = models.CharField(max_length=4, blank=True)
+    surt_prefix = models.CharField(max_length=305, blank=True)
+
+    class Meta:
+        verbose_name = 'browse index entry'
+        verbose_name_plural = 'browse index entries'
+        constraints = [
+            models.UniqueConstraint(fields=['project', 'top_domain', 'letter'],
+                                    name='browseindex_project_letter_uniq'),
+        ]
+
+    def __str__(self):
+        return '%s %s' % (self.top_domain, self.letter)
+
+
+class EntityTrigram(models.Model):
+    """A three-character substring of the entity of one of a project's surt rows.
+
+    Substring searches look up the trigrams of the search term here instead
+    of scanning every entity with a leading-wildcard LIKE.
+    """
+    project = models.ForeignKey(Project, on_delete=models.CASCADE)
+    trigram = models.CharField(max_length=3)
+    entity_norm = models.CharField(max_length=300)
+
+    class Meta:
+        verbose_name = 'entity trigram'
+        verbose_name_plural = 'entity trigrams'
+        constraints = [
+            models.UniqueConstraint(fields=['project', 'trigram', 'entity_norm'],
+                                    name='entitytrigram_project_trigram_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['project', 'entity_norm'], name='entitytrigram_entity_idx'),
+        ]
+
+    def __str__(self):
+        return self.trigram
+
+
+class EntityChange(models.Model):
+    """A surt row whose entity left or joined a project's typeahead index.
+
+    Rows are written when surt rows are deleted or edited; every process
+    replays the ones past the last it has seen onto its in-memory index
+    instead of reloading the project.
+    """
+    project = models.ForeignKey(Project, on_delete=models.CASCADE)
+    url_id = models.IntegerField()
+    entity = models.CharField(max_length=300)
+    deleted = models.BooleanField(default=True)
+
+    class Meta:
+        verbose_name = 'entity change'
+        verbose_name_plural = 'entity changes'
+        indexes = [
+            models.Index(fields=['project', 'id'], name='entitychange_project_idx'),
+        ]
+
+    def __str__(self):
+        return self.entity
+
+
+class ProjectStats(models.Model):
+    """Counters shown on a project's landing pages.
+
+    url_count is the number of surt rows and nominator_count the number of
+    distinct nominators with an in-scope nomination. Both are adjusted by
+    nomination.summaries as rows change, so the pages need no aggregates.
+    """
+    project = models.OneToOneField(Project, on_delete=models.CASCADE, related_name='stats')
+    url_count = models.IntegerField(default=0)
+    nominator_count = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'project statistics'
+        verbose_name_plural = 'project statistics'
+
+    def __str__(self):
+        return str(self.project)
+
+
+class ProjectInstitution(models.Model):
+    """An institution of a nominator who has added URLs to a project.
+
+    Searched by prefix to autocomplete the institution field of the
+    nomination forms.
+    """
+    project = models.ForeignKey(Project, on_delete=models.CASCADE)
+    institution = models.CharField(max_length=100)
+    institution_norm = models.CharField(max_length=100)
+
+    class Meta:
+        verbose_name = 'project institution'
+        verbose_name_plural = 'project institutions'
+        constraints = [
+            models.UniqueConstraint(fields=['project', 'institution'],
+                                    name='projectinstitution_project_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['project', 'institution_norm'],
+                         name='projectinstitution_norm_idx'),
+        ]
+
+    def __str__(self):
+        return self.institution
+
+
+class Submission(models.Model):
+    """A nomination form submission waiting to be written by process_submissions.
+
+    Used when NOMINATION_ASYNC_INTAKE is on: the views validate the form,
+    store the submitted data here and answer at once. Submissions that fail
+    are retried after a growing delay and marked failed after the last try.
+    The random token, not the id, identifies a submission to the public.
+    """
+    ADD_URL = 'add_url'
+    ADD_METADATA = 'add_metadata'
+    ACTION_CHOICES = (
+        (ADD_URL, 'Add URL'),
+        (ADD_METADATA, 'Add metadata'),
+    )
+    PENDING = 'pending'
+    PROCESSING = 'processing'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (PENDING, 'Pending'),
+        (PROCESSING, 'Processing'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    )
+    token = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    project = models.ForeignKey(Project, on_delete=models.CASCADE)
+    action = models.CharField(max_length=20, choices=ACTION_CHOICES)
+    form_data = models.JSONField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    available_at = models.DateTimeField(default=timezone.now)
+    claimed_by = models.CharField(max_length=32, blank=True)
+    summary = models.JSONField(default=list, blank=True)
+    error = models.TextField(blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'available_at'], name='submission_status_idx'),
+        ]
+
+    def __str__(self):
+        return '%s %s' % (self.action, self.pk)
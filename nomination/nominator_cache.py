@@ -0,0 +1,119 @@
+"""In-process and shared cache of nominators by id and by submitted identity.
+
+A submission names its nominator by (email, name, institution); the id
+that identity resolved to, and the nominator stored under that id, are
+kept both in a per-process dict and in the Django cache, so repeat
+submitters are resolved without a query. Entries are only stored once the
+transaction that read or created the nominator commits, so a rolled back
+nominator is never cached. Saving or deleting a nominator drops its
+entries from the shared cache and from this process at once; every entry,
+shared or in-process, expires after NOMINATION_NOMINATOR_CACHE_TTL
+seconds, so other processes drop their copies by then. A cached identity
+whose nominator has since changed its email is treated as a miss.
+"""
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from nomination.models import Nominator
+
+
+ID_KEY = 'nomination:nominator:%s'
+IDENTITY_KEY = 'nomination:nominator_identity:%s'
+DEFAULT_TTL = 60
+
+_by_id = {}
+_by_identity = {}
+_lock = threading.Lock()
+
+
+def get_ttl():
+    return getattr(settings, 'NOMINATION_NOMINATOR_CACHE_TTL', DEFAULT_TTL)
+
+
+def identity_key(email):
+    return IDENTITY_KEY % hashlib.md5(str(email).encode()).hexdigest()
+
+
+def _get_local(entries, key):
+    with _lock:
+        entry = entries.get(key)
+        if entry is None:
+            return None
+        value, stored_at = entry
+        if time.monotonic() - stored_at >= get_ttl():
+            del entries[key]
+            return None
+        return value
+
+
+def _set_local(entries, key, value):
+    with _lock:
+        entries[key] = (value, time.monotonic())
+
+
+def get_by_id(nominator_id):
+    """Return the nominator with an id, raising Nominator.DoesNotExist if there is none."""
+    nominator_id = int(nominator_id)
+    nominator = _get_local(_by_id, nominator_id)
+    if nominator is None:
+        nominator = cache.get(ID_KEY % nominator_id)
+        if nominator is None:
+            nominator = Nominator.objects.get(id=nominator_id)
+            transaction.on_commit(
+                lambda: cache.set(ID_KEY % nominator_id, nominator, get_ttl()))
+        transaction.on_commit(lambda: _set_local(_by_id, nominator_id, nominator))
+    return nominator
+
+
+def get_by_identity(email, name, institution):
+    """Return the cached nominator an identity resolved to, or None."""
+    identity = (email, name, institution)
+    nominator_id = _get_local(_by_identity, identity)
+    if nominator_id is None:
+        nominator_id = (cache.get(identity_key(email)) or {}).get((name, institution))
+        if nominator_id is None:
+            return None
+        _set_local(_by_identity, identity, nominator_id)
+    try:
+        nominator = get_by_id(nominator_id)
+    except Nominator.DoesNotExist:
+        return None
+    if nominator.nominator_email != email:
+        return None
+    return nominator
+
+
+def remember_identity(email, name, institution, nominator):
+    """Record that an identity resolved to a nominator, once the transaction commits."""
+    transaction.on_commit(lambda: _remember_identity(email, name, institution, nominator))
+
+
+def _remember_identity(email, name, institution, nominator):
+    key = identity_key(email)
+    identities = cache.get(key) or {}
+    identities[(name, institution)] = nominator.id
+    cache.set_many({key: identities, ID_KEY % nominator.id: nominator}, get_ttl())
+    _set_local(_by_identity, (email, name, institution), nominator.id)
+    _set_local(_by_id, nominator.id, nominator)
+
+
+def invalidate(nominator):
+    """Drop a saved or deleted nominator from the shared and in-process caches."""
+    cache.delete_many([ID_KEY % nominator.id, identity_key(nominator.nominator_email)])
+    with _lock:
+        _by_id.pop(nominator.id, None)
+        for identity, (nominator_id, _) in list(_by_identity.items()):
+            if nominator_id == nominator.id or identity[0] == nominator.nominator_email:
+                del _by_identity[identity]
+
+
+def reset():
+    """Forget every nominator cached in this process."""
+    with _lock:
+        _by_id.clear()
+        _by_identity.clear()
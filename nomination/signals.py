@@ -0,0 +1,129 @@
+from django.db.models import QuerySet
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from nomination import nominator_cache, summaries
+from nomination.models import (
+    URL, Metadata, Metadata_Values, Nominator, Project, Project_Metadata, Value, ValueSet,
+    Valueset_Values
+)
+from nomination.url_handler import invalidate_metadata
+
+METADATA_MODELS = (Project_Metadata, Metadata, Metadata_Values, Value, ValueSet,
+                   Valueset_Values)
+
+
+@receiver(pre_save, sender=URL)
+def url_saving(sender, instance, raw=False, **kwargs):
+    """Remember the stored entity, attribute and value of a URL row about to change."""
+    if raw or instance.pk is None:
+        return
+    instance._stored_row = (URL.objects.filter(pk=instance.pk)
+                                       .values(*summaries.UPDATE_FIELDS)
+                                       .first())
+
+
+@receiver(post_save, sender=URL)
+def url_saved(sender, instance, created, raw=False, **kwargs):
+    """Keep the derived tables current when a URL row is written."""
+    if raw:
+        return
+    if created:
+        summaries.record_new_urls([instance])
+    else:
+        summaries.record_updated_url(instance, getattr(instance, '_stored_row', None))
+
+
+@receiver(post_delete, sender=URL)
+def url_deleted(sender, instance, origin=None, **kwargs):
+    """Keep the derived tables current when a URL row is removed.
+
+    Rows removed along with their project or nominator are skipped: the
+    project's derived rows are deleted with it, and the projects of a
+    deleted nominator are rebuilt once it is gone.
+    """
+    if deleting(origin, Project) or deleting(origin, Nominator):
+        return
+    summaries.record_deleted_url(instance)
+
+
+def deleting(origin, model):
+    """Return whether a deletion started from an instance or queryset of model."""
+    return isinstance(origin, model) or (isinstance(origin, QuerySet) and origin.model is model)
+
+
+@receiver(post_save, sender=Nominator)
+@receiver(post_delete, sender=Nominator)
+def nominator_changed(sender, instance, **kwargs):
+    """Drop a nominator from the nominator cache when it is saved or removed."""
+    nominator_cache.invalidate(instance)
+
+
+@receiver(pre_delete, sender=Nominator)
+def nominator_deleting(sender, instance, **kwargs):
+    """Remember the projects and surt rows of a nominator about to be removed."""
+    instance._stored_urls = list(URL.objects.filter(url_nominator=instance)
+                                            .values_list('url_project_id', 'id', 'entity',
+                                                         'attribute_norm'))
+
+
+@receiver(post_delete, sender=Nominator)
+def nominator_deleted(sender, instance, **kwargs):
+    """Rebuild the derived tables of the projects a removed nominator had rows in."""
+    stored_urls = getattr(instance, '_stored_urls', None)
+    if stored_urls:
+        summaries.record_deleted_nominator_urls(stored_urls)
+
+
+@receiver(pre_save, sender=Nominator)
+def nominator_saving(sender, instance, raw=False, **kwargs):
+    """Remember the stored institution of a nominator about to change."""
+    if raw or instance.pk is None:
+        return
+    instance._stored_institution = (Nominator.objects.filter(pk=instance.pk)
+                                                     .values_list('nominator_institution',
+                                                                  flat=True)
+                                                     .first())
+
+
+@receiver(post_save, sender=Nominator)
+def nominator_saved(sender, instance, created, raw=False, **kwargs):
+    """Update the projects that show an edited nominator.
+
+    Their watermark is advanced and, when the institution changed, their
+    institution index is moved to the new one.
+    """
+    if raw or created:
+        return
+    previous = getattr(instance, '_stored_institution', None)
+    if previous is not None and previous != instance.nominator_institution:
+        summaries.record_institution_change(instance, previous)
+    summaries.touch_projects(URL.objects.filter(url_nominator=instance)
+                                        .values_list('url_project_id', flat=True)
+                                        .distinct())
+
+
+def metadata_changed(sender, raw=False, **kwargs):
+    """Expire cached project metadata when a field, value or value set changes."""
+    if not raw:
+        metadata_updated()
+
+
+# Connected per model, since a receiver for every sender would keep Django
+# from deleting cascaded rows in bulk.
+for model in METADATA_MODELS:
+    post_save.connect(metadata_changed, sender=model)
+    post_delete.connect(metadata_changed, sender=model)
+
+
+@receiver(m2m_changed, sender=Metadata.value_sets.through)
+def metadata_value_sets_changed(sender, action, **kwargs):
+    """Expire cached project metadata when value sets are attached or removed."""
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        metadata_updated()
+
+
+def metadata_updated():
+    invalidate_metadata()
+    # fields and values are shared between projects, so every project may show them
+    summaries.touch_projects(Project.objects.values_list('pk', flat=True))
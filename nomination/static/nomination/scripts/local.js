@@ -34,6 +34,46 @@ function initForm() {
     $("form").submit(saveInformation);
 }
 
+// Autocomplete the institution field from the project's institutions
+function bindInstitutionTypeahead(url) {
+    $('#institution-value').typeahead({
+        delay: 200,
+        source: function(query, process) {
+            return $.getJSON(url, {q: query}, function(data) {
+                process(data.results);
+            });
+        }
+    });
+}
+
+// Load further related URLs into the related URLs list of a URL listing
+function bindRelatedUrls(url) {
+    $('#related-urls').on('click', '.related-more', function(e) {
+        e.preventDefault();
+        var $link = $(this);
+        var direction = $link.attr('data-direction');
+        var params = {url: $('#related-urls').attr('data-url')};
+        params[direction] = $link.attr('data-cursor');
+        $.getJSON(url, params, function(data) {
+            var $items = $.map(data.results, function(result) {
+                return $('<li>').append($('<a>').attr('href', result.url).text(result.entity));
+            });
+            var $list = $('#related-urls ul');
+            if (direction === 'before') {
+                $list.prepend($items);
+            } else {
+                $list.append($items);
+            }
+            var cursor = direction === 'before' ? data.prev : data.next;
+            if (cursor) {
+                $link.attr('data-cursor', cursor);
+            } else {
+                $link.remove();
+            }
+        });
+    });
+}
+
 // Toggle for check/uncheck all
 function bindSelectAll() {
     $('input[data-check-all="true"]').on('click', function() {
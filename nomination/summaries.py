@@ -0,0 +1,756 @@
+"""Maintenance of tables derived from the URL table.
+
+The URL table is an entity/attribute/value store, so per-entity facts
+(SURT, nomination count and score, distinct nominators), the SURT host
+tree, the alphabetical browse index and the trigram index used for substring
+search, the per-project URL and nominator counts and the institutions offered
+for autocomplete otherwise have to be aggregated from raw rows on every
+request. The functions here keep
+denormalized copies of those facts current as URL rows are written, and
+advance each project's change watermark.
+"""
+import collections
+import itertools
+import re
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, F, OuterRef
+from django.utils import timezone
+
+from nomination import entity_index
+from nomination.models import (
+    Nominator, Project, ProjectInstitution, ProjectStats, URL, URLSummary, SURTNode,
+    BrowseIndexEntry, EntityChange, EntityTrigram
+)
+
+
+SUMMARY_ATTRIBUTES = ('nomination', 'surt')
+SURT_HOST_PATTERN = re.compile(r'^[^:]+://\(([^)]*)')
+TOP_DOMAIN_PATTERN = re.compile(r'^[^:]+://\(([^,]+),')
+DOMAIN_LETTER_PATTERN = re.compile(r'^[^:]+://(\([^,]+,([^,\)]{1}))')
+SURT_SCHEME_PATTERN = re.compile(r'^[^:(]+://')
+BROWSE_CACHE_KEY = 'nomination:browse_index:%s'
+# Columns of a URL row that record_updated_url compares with the saved row.
+UPDATE_FIELDS = ('entity', 'entity_norm', 'attribute_norm', 'value', 'value_norm')
+# Seconds a cached browse index is served before it is read again, so
+# processes that missed an invalidation recover.
+BROWSE_CACHE_TIMEOUT = 300
+# Value of an in-scope nomination row.
+IN_SCOPE = '1'
+# Entities or SURT nodes read per query when a batch of new rows is recorded.
+CHUNK_SIZE = 500
+
+
+def normalize_surt(surt):
+    """Return a SURT lowercased and without its scheme, e.g. '(com,example,)/a'."""
+    return SURT_SCHEME_PATTERN.sub('', surt, count=1).lower()
+
+
+def summarize_rows(rows):
+    """Build URLSummary field values from (entity, attribute_norm, value, nominator_id) rows."""
+    summary = {
+        'entity': None,
+        'surt': '',
+        'surt_norm': '',
+        'nomination_count': 0,
+        'nomination_score': 0,
+        'nominator_count': 0,
+    }
+    nominators = set()
+    for entity, attribute, value, nominator_id in rows:
+        if attribute == 'surt':
+            summary['surt'] = value
+            summary['surt_norm'] = normalize_surt(value)
+            # Prefer the entity as written on the surt row.
+            summary['entity'] = entity
+        elif attribute == 'nomination':
+            summary['nomination_count'] += 1
+            try:
+                summary['nomination_score'] += int(value)
+            except ValueError:
+                pass
+            nominators.add(nominator_id)
+            if summary['entity'] is None:
+                summary['entity'] = entity
+    summary['nominator_count'] = len(nominators)
+    return summary
+
+
+def refresh_url_summary(project_id, entity_norm):
+    """Recompute the URLSummary row for one entity of a project.
+
+    Only the nomination and surt rows of that entity are read, so the cost
+    is bounded by the number of nominations the URL has received.
+    """
+    rows = (URL.objects.filter(url_project_id=project_id,
+                               entity_norm=entity_norm,
+                               attribute_norm__in=SUMMARY_ATTRIBUTES)
+                       .order_by('id')
+                       .values_list('entity', 'attribute_norm', 'value', 'url_nominator_id'))
+    summary = summarize_rows(rows)
+    if summary['entity'] is None:
+        URLSummary.objects.filter(project_id=project_id, entity_norm=entity_norm).delete()
+        return None
+    url_summary, _ = URLSummary.objects.update_or_create(project_id=project_id,
+                                                         entity_norm=entity_norm,
+                                                         defaults=summary)
+    return url_summary
+
+
+def refresh_url_summaries(urls):
+    """Refresh the summaries touched by an iterable of URL objects.
+
+    Intended for code paths such as bulk_create that bypass model signals.
+    The touched entities are read and their summaries upserted CHUNK_SIZE
+    entities at a time.
+    """
+    touched = {}
+    for url in urls:
+        if url.attribute.lower() in SUMMARY_ATTRIBUTES:
+            touched.setdefault(url.url_project_id, set()).add(url.entity.lower())
+    for project_id, entity_norms in sorted(touched.items()):
+        entity_norms = sorted(entity_norms)
+        for start in range(0, len(entity_norms), CHUNK_SIZE):
+            summarize_entities(project_id, entity_norms[start:start + CHUNK_SIZE])
+
+
+def summarize_entities(project_id, entity_norms):
+    """Recompute the URLSummary rows of some entities with one read and one upsert."""
+    rows = (URL.objects.filter(url_project_id=project_id,
+                               entity_norm__in=entity_norms,
+                               attribute_norm__in=SUMMARY_ATTRIBUTES)
+                       .order_by('entity_norm', 'id')
+                       .values_list('entity_norm', 'entity', 'attribute_norm', 'value',
+                                    'url_nominator_id'))
+    url_summaries = []
+    for entity_norm, entity_rows in itertools.groupby(rows, key=lambda row: row[0]):
+        summary = summarize_rows(row[1:] for row in entity_rows)
+        if summary['entity'] is not None:
+            url_summaries.append(URLSummary(project_id=project_id, entity_norm=entity_norm,
+                                            **summary))
+    missing = set(entity_norms) - {url_summary.entity_norm for url_summary in url_summaries}
+    if missing:
+        URLSummary.objects.filter(project_id=project_id, entity_norm__in=missing).delete()
+    URLSummary.objects.bulk_create(
+        url_summaries, update_conflicts=True, unique_fields=['project', 'entity_norm'],
+        update_fields=['entity', 'surt', 'surt_norm', 'nomination_count', 'nomination_score',
+                       'nominator_count'])
+
+
+def rebuild_url_summaries(project, batch_size=1000):
+    """Regenerate every URLSummary row of a project from the URL table."""
+    URLSummary.objects.filter(project=project).delete()
+    rows = (URL.objects.filter(url_project=project, attribute_norm__in=SUMMARY_ATTRIBUTES)
+                       .order_by('entity_norm', 'id')
+                       .values_list('entity_norm', 'entity', 'attribute_norm', 'value',
+                                    'url_nominator_id'))
+    batch = []
+    created = 0
+    current = None
+    entity_rows = []
+    for row in rows.iterator(chunk_size=batch_size):
+        if row[0] != current:
+            if entity_rows:
+                batch.append(URLSummary(project=project, entity_norm=current,
+                                        **summarize_rows(entity_rows)))
+            current = row[0]
+            entity_rows = []
+        entity_rows.append(row[1:])
+        if len(batch) >= batch_size:
+            URLSummary.objects.bulk_create(batch)
+            created += len(batch)
+            batch = []
+    if entity_rows:
+        batch.append(URLSummary(project=project, entity_norm=current,
+                                **summarize_rows(entity_rows)))
+    URLSummary.objects.bulk_create(batch)
+    return created + len(batch)
+
+
+def surt_segments(surt):
+    """Return the host segments of a SURT, e.g. ['com', 'example', 'www']."""
+    match = SURT_HOST_PATTERN.search(surt)
+    if not match:
+        return []
+    return [segment for segment in match.group(1).split(',') if segment]
+
+
+def surt_node_path(surt):
+    """Yield (parent, node, name) for each host segment of a SURT, top-down."""
+    parent = ''
+    for name in surt_segments(surt):
+        node = parent + name + ','
+        yield parent, node, name
+        parent = node
+
+
+def build_surt_tree(surts):
+    """Compute SURT tree nodes from an iterable of SURT values.
+
+    Returns a dict of node -> {'parent', 'name', 'child_count', 'url_count'}.
+    """
+    tree = {}
+    for surt in surts:
+        for parent, node, name in surt_node_path(surt):
+            if node not in tree:
+                tree[node] = {'parent': parent, 'name': name, 'child_count': 0, 'url_count': 0}
+                if parent:
+                    tree[parent]['child_count'] += 1
+            tree[node]['url_count'] += 1
+    return tree
+
+
+def add_surt_to_tree(project_id, surt):
+    """Count a newly inserted surt row in the project's SURT tree."""
+    for parent, node, name in surt_node_path(surt):
+        nodes = SURTNode.objects.filter(project_id=project_id, node=node)
+        if nodes.update(url_count=F('url_count') + 1):
+            continue
+        try:
+            with transaction.atomic():
+                SURTNode.objects.create(project_id=project_id, parent=parent, node=node,
+                                        name=name, url_count=1)
+        except IntegrityError:
+            # Another writer created the node first.
+            nodes.update(url_count=F('url_count') + 1)
+            continue
+        if parent:
+            SURTNode.objects.filter(project_id=project_id, node=parent).update(
+                child_count=F('child_count') + 1)
+
+
+def add_surts_to_tree(project_id, surts):
+    """Count a batch of newly inserted surt rows in the project's SURT tree.
+
+    The existing nodes are read CHUNK_SIZE at a time, new nodes are bulk
+    inserted and the counts of existing ones bulk updated. If another writer
+    creates one of the new nodes first, the batch is counted row by row.
+    """
+    surts = list(surts)
+    tree = build_surt_tree(surts)
+    nodes = sorted(tree)
+    existing = {}
+    for start in range(0, len(nodes), CHUNK_SIZE):
+        existing.update(
+            (surt_node.node, surt_node)
+            for surt_node in SURTNode.objects.filter(project_id=project_id,
+                                                     node__in=nodes[start:start + CHUNK_SIZE])
+                                             .only('id', 'node'))
+    # every child of a new node is new, so only existing nodes gain children here
+    new_children = collections.Counter(tree[node]['parent'] for node in nodes
+                                       if node not in existing and tree[node]['parent'])
+    try:
+        with transaction.atomic():
+            SURTNode.objects.bulk_create(
+                [SURTNode(project_id=project_id, node=node, **tree[node])
+                 for node in nodes if node not in existing],
+                batch_size=CHUNK_SIZE)
+    except IntegrityError:
+        for surt in surts:
+            add_surt_to_tree(project_id, surt)
+        return
+    for node, surt_node in existing.items():
+        surt_node.url_count = F('url_count') + tree[node]['url_count']
+        surt_node.child_count = F('child_count') + new_children[node]
+    SURTNode.objects.bulk_update(list(existing.values()), ['url_count', 'child_count'],
+                                 batch_size=CHUNK_SIZE)
+
+
+def remove_surt_from_tree(project_id, surt):
+    """Uncount a deleted surt row, pruning nodes that no longer hold any URLs."""
+    for parent, node, name in reversed(list(surt_node_path(surt))):
+        SURTNode.objects.filter(project_id=project_id, node=node).update(
+            url_count=F('url_count') - 1)
+        if SURTNode.objects.filter(project_id=project_id, node=node, url_count__lte=0).delete()[0]:
+            if parent:
+                SURTNode.objects.filter(project_id=project_id, node=parent).update(
+                    child_count=F('child_count') - 1)
+
+
+def rebuild_surt_tree(project, batch_size=1000):
+    """Regenerate the SURT tree of a project from its surt rows."""
+    SURTNode.objects.filter(project=project).delete()
+    surts = (URL.objects.filter(url_project=project, attribute_norm='surt')
+                        .values_list('value', flat=True))
+    tree = build_surt_tree(surts.iterator(chunk_size=batch_size))
+    SURTNode.objects.bulk_create(
+        (SURTNode(project=project, node=node, **fields) for node, fields in tree.items()),
+        batch_size=batch_size)
+    return len(tree)
+
+
+def browse_entries(surt):
+    """Return the (top_domain, letter, surt_prefix) browse index entries of a SURT.
+
+    Uses the same patterns as the full-scan url_handler.alphabetical_browse.
+    """
+    top_domain_search = TOP_DOMAIN_PATTERN.search(surt, 0)
+    if not top_domain_search:
+        return []
+    top_domain = top_domain_search.group(1)
+    entries = [(top_domain, '', '')]
+    domain_single_search = DOMAIN_LETTER_PATTERN.search(surt, 0)
+    if domain_single_search:
+        entries.append((top_domain, domain_single_search.group(2).upper(),
+                        domain_single_search.group(1)))
+    return entries
+
+
+def get_browse_index(project_id):
+    """Return the project's browse index as {top_domain: {letter: surt_prefix}}.
+
+    The index is served from the cache for NOMINATION_BROWSE_INDEX_TTL
+    seconds and read from BrowseIndexEntry rows on a miss. Bare top-level
+    domains map to an empty dict.
+    """
+    key = BROWSE_CACHE_KEY % project_id
+    browse_index = cache.get(key)
+    if browse_index is None:
+        browse_index = {}
+        entries = (BrowseIndexEntry.objects.filter(project_id=project_id)
+                                           .values_list('top_domain', 'letter', 'surt_prefix'))
+        for top_domain, letter, surt_prefix in entries:
+            letters = browse_index.setdefault(top_domain, {})
+            if letter:
+                letters[letter] = surt_prefix
+        cache.set(key, browse_index,
+                  getattr(settings, 'NOMINATION_BROWSE_INDEX_TTL', BROWSE_CACHE_TIMEOUT))
+    return browse_index
+
+
+def invalidate_browse_index(project_id):
+    """Drop the cached browse index of a project once the current transaction commits."""
+    transaction.on_commit(lambda: cache.delete(BROWSE_CACHE_KEY % project_id))
+
+
+def add_surts_to_browse_index(project_id, surts):
+    """Add the browse index entries of a batch of newly inserted surt rows.
+
+    Entries already in the cached index are skipped without a query. The
+    cache is only read, never filled, so a write that rolls back leaves
+    nothing behind in it.
+    """
+    browse_index = cache.get(BROWSE_CACHE_KEY % project_id) or {}
+    entries = {(top_domain, letter): surt_prefix
+               for (top_domain, letter), surt_prefix in build_browse_index(surts).items()
+               if top_domain not in browse_index
+               or (letter and letter not in browse_index[top_domain])}
+    if not entries:
+        return
+    stored = set(BrowseIndexEntry.objects.filter(project_id=project_id,
+                                                 top_domain__in={key[0] for key in entries})
+                                         .values_list('top_domain', 'letter'))
+    new_entries = [BrowseIndexEntry(project_id=project_id, top_domain=top_domain,
+                                    letter=letter, surt_prefix=surt_prefix)
+                   for (top_domain, letter), surt_prefix in entries.items()
+                   if (top_domain, letter) not in stored]
+    if new_entries:
+        BrowseIndexEntry.objects.bulk_create(new_entries, ignore_conflicts=True)
+        invalidate_browse_index(project_id)
+
+
+def remove_surts_from_browse_index(project_id, surts):
+    """Drop the browse index entries that only removed surt rows provided.
+
+    Each entry of the removed SURTs is kept if a URL summary of the project
+    still has a SURT under it, looked up by a range of the indexed
+    surt_norm. Called after the summaries of the removed rows' entities
+    are refreshed.
+    """
+    gone = []
+    for top_domain, letter, _ in {entry for surt in surts for entry in browse_entries(surt)}:
+        prefix = '(%s,%s' % (top_domain, letter)
+        if not URLSummary.objects.filter(project_id=project_id,
+                                         surt_norm__startswith=prefix.lower()).exists():
+            gone.append((top_domain, letter))
+    if gone:
+        for top_domain, letter in gone:
+            BrowseIndexEntry.objects.filter(project_id=project_id, top_domain=top_domain,
+                                            letter=letter).delete()
+        invalidate_browse_index(project_id)
+
+
+def build_browse_index(surts):
+    """Compute browse index entries from an iterable of SURT values."""
+    entries = {}
+    for surt in surts:
+        for top_domain, letter, surt_prefix in browse_entries(surt):
+            entries.setdefault((top_domain, letter), surt_prefix)
+    return entries
+
+
+def rebuild_browse_index(project, batch_size=1000):
+    """Regenerate the alphabetical browse index of a project from its surt rows."""
+    BrowseIndexEntry.objects.filter(project=project).delete()
+    surts = (URL.objects.filter(url_project=project, attribute_norm='surt')
+                        .values_list('value', flat=True))
+    entries = build_browse_index(surts.iterator(chunk_size=batch_size))
+    BrowseIndexEntry.objects.bulk_create(
+        (BrowseIndexEntry(project=project, top_domain=top_domain, letter=letter,
+                          surt_prefix=surt_prefix)
+         for (top_domain, letter), surt_prefix in entries.items()),
+        batch_size=batch_size)
+    invalidate_browse_index(project.id)
+    return len(entries)
+
+
+def check_browse_index(project):
+    """Compare the stored browse index with a full scan of the project's SURTs.
+
+    Returns a list of human-readable differences, empty when they agree.
+    """
+    # Imported here; url_handler depends on this module.
+    from nomination.url_handler import alphabetical_browse, format_browse_index
+
+    cache.delete(BROWSE_CACHE_KEY % project.id)
+    stored = format_browse_index(get_browse_index(project.id))
+    scanned = alphabetical_browse(project)
+    differences = []
+    for top_domain in sorted(set(stored) | set(scanned)):
+        if top_domain not in stored:
+            differences.append('%s: missing from index' % top_domain)
+        elif top_domain not in scanned:
+            differences.append('%s: not in any SURT' % top_domain)
+        else:
+            stored_letters = dict(stored[top_domain])
+            scanned_letters = dict(scanned[top_domain])
+            for letter in sorted(set(stored_letters) | set(scanned_letters)):
+                stored_prefix = stored_letters.get(letter)
+                scanned_prefix = scanned_letters.get(letter)
+                # The full scan keeps the last matching SURT's case; compare loosely.
+                if (stored_prefix or '').lower() != (scanned_prefix or '').lower():
+                    differences.append('%s %s: index has %r, scan has %r'
+                                       % (top_domain, letter, stored_prefix, scanned_prefix))
+    return differences
+
+
+def entity_trigrams(entity_norm):
+    """Return the set of three-character substrings of a lowercased entity."""
+    return {entity_norm[i:i + 3] for i in range(len(entity_norm) - 2)}
+
+
+def add_entity_trigrams(project_id, entity_norms, batch_size=1000):
+    """Index the trigrams of entities that gained a surt row."""
+    EntityTrigram.objects.bulk_create(
+        (EntityTrigram(project_id=project_id, trigram=trigram, entity_norm=entity_norm)
+         for entity_norm in entity_norms
+         for trigram in entity_trigrams(entity_norm)),
+        batch_size=batch_size, ignore_conflicts=True)
+
+
+def refresh_entity_trigrams(project_id, entity_norm):
+    """Re-index one entity's trigrams, dropping them if it has no surt row left."""
+    EntityTrigram.objects.filter(project_id=project_id, entity_norm=entity_norm).delete()
+    if URL.objects.filter(url_project_id=project_id, entity_norm=entity_norm,
+                          attribute_norm='surt').exists():
+        add_entity_trigrams(project_id, [entity_norm])
+
+
+def rebuild_entity_trigrams(project, batch_size=1000):
+    """Regenerate the trigram index of a project from its surt rows."""
+    EntityTrigram.objects.filter(project=project).delete()
+    entity_norms = (URL.objects.filter(url_project=project, attribute_norm='surt')
+                               .values_list('entity_norm', flat=True)
+                               .distinct())
+    entity_norms = list(entity_norms.iterator(chunk_size=batch_size))
+    add_entity_trigrams(project.id, entity_norms, batch_size=batch_size)
+    return EntityTrigram.objects.filter(project=project).count()
+
+
+def add_institutions(urls):
+    """Index the institutions of the nominators of newly inserted URL rows."""
+    institutions = set()
+    uncached = {}
+    for url in urls:
+        if URL.url_nominator.is_cached(url):
+            institutions.add((url.url_project_id, url.url_nominator.nominator_institution))
+        else:
+            uncached.setdefault(url.url_nominator_id, set()).add(url.url_project_id)
+    if uncached:
+        nominators = Nominator.objects.filter(pk__in=uncached).values_list('id',
+                                                                           'nominator_institution')
+        for nominator_id, institution in nominators:
+            for project_id in uncached[nominator_id]:
+                institutions.add((project_id, institution))
+    ProjectInstitution.objects.bulk_create(
+        [ProjectInstitution(project_id=project_id, institution=institution,
+                            institution_norm=institution.lower())
+         for project_id, institution in sorted(institutions) if institution],
+        ignore_conflicts=True)
+
+
+def record_institution_change(nominator, previous):
+    """Move the institution index of a nominator's projects off its previous institution.
+
+    The previous institution stays listed in a project as long as another
+    nominator of that project still has it.
+    """
+    project_ids = list(URL.objects.filter(url_nominator=nominator)
+                                  .values_list('url_project_id', flat=True)
+                                  .distinct())
+    if not project_ids:
+        return
+    if nominator.nominator_institution:
+        ProjectInstitution.objects.bulk_create(
+            [ProjectInstitution(project_id=project_id,
+                                institution=nominator.nominator_institution,
+                                institution_norm=nominator.nominator_institution.lower())
+             for project_id in project_ids],
+            ignore_conflicts=True)
+    others = URL.objects.filter(
+        url_project_id=OuterRef('project_id'),
+        url_nominator__in=Nominator.objects.filter(nominator_institution=previous))
+    (ProjectInstitution.objects.filter(project_id__in=project_ids, institution=previous)
+                               .exclude(Exists(others))
+                               .delete())
+
+
+def rebuild_institutions(project, batch_size=1000):
+    """Regenerate the institution index of a project from its nominators."""
+    ProjectInstitution.objects.filter(project=project).delete()
+    institutions = (Nominator.objects.filter(url__url_project=project)
+                                     .exclude(nominator_institution='')
+                                     .values_list('nominator_institution', flat=True)
+                                     .distinct())
+    ProjectInstitution.objects.bulk_create(
+        [ProjectInstitution(project=project, institution=institution,
+                            institution_norm=institution.lower())
+         for institution in institutions],
+        batch_size=batch_size, ignore_conflicts=True)
+    return ProjectInstitution.objects.filter(project=project).count()
+
+
+def count_project_stats(project_id):
+    """Count a project's URLs and in-scope nominators from the URL table."""
+    urls = URL.objects.filter(url_project_id=project_id)
+    nominators = (urls.filter(attribute_norm='nomination', value_norm=IN_SCOPE)
+                      .values('url_nominator_id')
+                      .distinct())
+    return {
+        'url_count': urls.filter(attribute_norm='surt').count(),
+        'nominator_count': nominators.count(),
+    }
+
+
+def reconcile_project_stats(project_id):
+    """Reset a project's counters to a full count of the URL table."""
+    stats, _ = ProjectStats.objects.update_or_create(project_id=project_id,
+                                                     defaults=count_project_stats(project_id))
+    return stats
+
+
+def get_project_stats(project):
+    """Return the counters of a project, counting them first if it has none yet."""
+    try:
+        return ProjectStats.objects.get(project=project)
+    except ProjectStats.DoesNotExist:
+        return reconcile_project_stats(project.id)
+
+
+def adjust_project_stats(project_id, url_delta=0, nominator_delta=0):
+    """Add to a project's counters.
+
+    A project without counters is left alone; get_project_stats counts it
+    in full the first time they are read.
+    """
+    if url_delta or nominator_delta:
+        ProjectStats.objects.filter(project_id=project_id).update(
+            url_count=F('url_count') + url_delta,
+            nominator_count=F('nominator_count') + nominator_delta)
+
+
+def has_in_scope_nomination(project_id, nominator_id, new_count=0):
+    """Return whether a nominator has in-scope nominations besides new_count new ones."""
+    rows = (URL.objects.filter(url_project_id=project_id, url_nominator_id=nominator_id,
+                               attribute_norm='nomination', value_norm=IN_SCOPE)
+                       .values_list('pk', flat=True))
+    return len(rows[:new_count + 1]) > new_count
+
+
+def rebuild_project_stats(project, batch_size=1000):
+    """Recount the counters of a project; returns the number of rows written."""
+    reconcile_project_stats(project.id)
+    return 1
+
+
+def check_project_stats(project):
+    """Compare a project's counters with a full count of the URL table.
+
+    Returns a list of human-readable differences, empty when they agree.
+    """
+    stored = ProjectStats.objects.filter(project=project).values('url_count',
+                                                                 'nominator_count').first()
+    if stored is None:
+        return ['no counters stored']
+    counted = count_project_stats(project.id)
+    return ['%s: stored %s, counted %s' % (name, stored[name], counted[name])
+            for name in sorted(counted) if stored[name] != counted[name]]
+
+
+def touch_projects(project_ids):
+    """Advance the change watermark of projects whose rows changed.
+
+    The update runs once the current transaction commits, in a transaction
+    of its own, so writers to the same project do not hold the project row
+    locked for the length of their transactions.
+    """
+    project_ids = set(project_ids)
+    if project_ids:
+        transaction.on_commit(lambda: Project.objects.filter(pk__in=project_ids).update(
+            last_modified=timezone.now(), revision=F('revision') + 1))
+
+
+def record_entity_changes(project_id, rows, deleted):
+    """Log (surt row id, entity) pairs leaving or joining the typeahead index.
+
+    Every process replays the log onto its entity index; this one does so
+    on its next search after the transaction commits.
+    """
+    EntityChange.objects.bulk_create(
+        [EntityChange(project_id=project_id, url_id=url_id, entity=entity, deleted=deleted)
+         for url_id, entity in rows], batch_size=CHUNK_SIZE)
+    entity_index.expire(project_id)
+
+
+def record_new_urls(urls):
+    """Update every derived table for newly inserted URL rows.
+
+    Called by the post_save handler for single rows and directly by code
+    paths such as bulk_create that bypass model signals.
+    """
+    urls = list(urls)
+    refresh_url_summaries(urls)
+    surts = {}
+    surt_rows = {}
+    for url in urls:
+        if url.attribute.lower() == 'surt':
+            surts.setdefault(url.url_project_id, []).append(url.value)
+            surt_rows.setdefault(url.url_project_id, []).append((url.id, url.entity))
+    for project_id, project_surts in surts.items():
+        add_surts_to_tree(project_id, project_surts)
+        add_surts_to_browse_index(project_id, project_surts)
+        add_entity_trigrams(project_id, {entity.lower() for _, entity in surt_rows[project_id]})
+        entity_index.add_entities(project_id, surt_rows[project_id])
+    record_new_stats(urls)
+    add_institutions(urls)
+    touch_projects(url.url_project_id for url in urls)
+
+
+def record_new_stats(urls):
+    """Adjust project counters for newly inserted URL rows."""
+    url_deltas = {}
+    in_scope = {}
+    for url in urls:
+        attribute = url.attribute.lower()
+        if attribute == 'surt':
+            url_deltas[url.url_project_id] = url_deltas.get(url.url_project_id, 0) + 1
+        elif attribute == 'nomination' and str(url.value).lower() == IN_SCOPE:
+            key = (url.url_project_id, url.url_nominator_id)
+            in_scope[key] = in_scope.get(key, 0) + 1
+    nominator_deltas = {}
+    for (project_id, nominator_id), new_count in in_scope.items():
+        if not has_in_scope_nomination(project_id, nominator_id, new_count):
+            nominator_deltas[project_id] = nominator_deltas.get(project_id, 0) + 1
+    for project_id in set(url_deltas) | set(nominator_deltas):
+        adjust_project_stats(project_id, url_deltas.get(project_id, 0),
+                             nominator_deltas.get(project_id, 0))
+
+
+def record_updated_url(url, previous=None):
+    """Update every derived table for a changed URL row.
+
+    previous is the row as it was stored before, with the UPDATE_FIELDS
+    columns, where known. A surt row whose value or entity changed, or a
+    row that became or stopped being a surt row, moves in the SURT tree,
+    browse index, typeahead index and URL count.
+    """
+    project_id = url.url_project_id
+    previous = previous or {}
+    was_surt = previous.get('attribute_norm') == 'surt'
+    is_surt = url.attribute_norm == 'surt'
+    entity_norms = {url.entity_norm}
+    if previous.get('entity_norm'):
+        entity_norms.add(previous['entity_norm'])
+    for entity_norm in sorted(entity_norms):
+        if {url.attribute_norm, previous.get('attribute_norm')} & set(SUMMARY_ATTRIBUTES):
+            refresh_url_summary(project_id, entity_norm)
+        if is_surt or was_surt:
+            refresh_entity_trigrams(project_id, entity_norm)
+    if previous:
+        value_moved = was_surt != is_surt or previous['value'] != url.value
+        entity_moved = was_surt != is_surt or previous['entity'] != url.entity
+        if was_surt and value_moved:
+            remove_surt_from_tree(project_id, previous['value'])
+            remove_surts_from_browse_index(project_id, [previous['value']])
+        if was_surt and entity_moved:
+            record_entity_changes(project_id, [(url.id, previous['entity'])], deleted=True)
+        if is_surt and value_moved:
+            add_surt_to_tree(project_id, url.value)
+            add_surts_to_browse_index(project_id, [url.value])
+        if is_surt and entity_moved:
+            record_entity_changes(project_id, [(url.id, url.entity)], deleted=False)
+        if was_surt != is_surt:
+            adjust_project_stats(project_id, url_delta=1 if is_surt else -1)
+        was_in_scope = (previous['attribute_norm'] == 'nomination'
+                        and previous['value_norm'] == IN_SCOPE)
+        in_scope = url.attribute_norm == 'nomination' and url.value_norm == IN_SCOPE
+        if (in_scope != was_in_scope
+                and not has_in_scope_nomination(project_id, url.url_nominator_id,
+                                                int(in_scope))):
+            adjust_project_stats(project_id, nominator_delta=1 if in_scope else -1)
+    touch_projects([project_id])
+
+
+def record_deleted_url(url):
+    """Update every derived table for a deleted URL row."""
+    if url.attribute_norm in SUMMARY_ATTRIBUTES:
+        refresh_url_summary(url.url_project_id, url.entity_norm)
+    if url.attribute_norm == 'surt':
+        record_entity_changes(url.url_project_id, [(url.id, url.entity)], deleted=True)
+        remove_surt_from_tree(url.url_project_id, url.value)
+        remove_surts_from_browse_index(url.url_project_id, [url.value])
+        refresh_entity_trigrams(url.url_project_id, url.entity_norm)
+        adjust_project_stats(url.url_project_id, url_delta=-1)
+    elif (url.attribute_norm == 'nomination' and url.value_norm == IN_SCOPE
+            and not has_in_scope_nomination(url.url_project_id, url.url_nominator_id)):
+        adjust_project_stats(url.url_project_id, nominator_delta=-1)
+    touch_projects([url.url_project_id])
+
+
+def record_deleted_nominator_urls(rows):
+    """Rebuild the derived tables of projects that lost a deleted nominator's URL rows.
+
+    rows are the (project id, row id, entity, attribute_norm) of the
+    deleted rows. One rebuild per project replaces the per-row maintenance
+    the cascade skipped.
+    """
+    surt_rows = {}
+    for project_id, url_id, entity, attribute_norm in rows:
+        project_rows = surt_rows.setdefault(project_id, [])
+        if attribute_norm == 'surt':
+            project_rows.append((url_id, entity))
+    for project in Project.objects.filter(pk__in=surt_rows):
+        for rebuild in REBUILDERS.values():
+            rebuild(project)
+        if surt_rows[project.id]:
+            record_entity_changes(project.id, surt_rows[project.id], deleted=True)
+    touch_projects(surt_rows)
+
+
+# Rebuild functions for the rebuild_summaries management command, by table name.
+REBUILDERS = {
+    'url_summary': rebuild_url_summaries,
+    'surt_tree': rebuild_surt_tree,
+    'browse_index': rebuild_browse_index,
+    'entity_trigrams': rebuild_entity_trigrams,
+    'project_stats': rebuild_project_stats,
+    'institutions': rebuild_institutions,
+}
+
+# Consistency checks for the rebuild_summaries --check option, by table name.
+CHECKERS = {
+    'browse_index': check_browse_index,
+    'project_stats': check_project_stats,
+}
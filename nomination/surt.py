@@ -0,0 +1,80 @@
+"""SURT canonicalization shared by the web views and the ingest command.
+
+A SURT (Sort-friendly URI Reordering Transform) reverses the host of a URL
+so that URLs sort by domain, e.g. http://www.example.com/a becomes
+http://(com,example,www,)/a. Based on Heritrix's SURT.java.
+"""
+import re
+from functools import lru_cache
+
+
+# 1: scheme://
+# 2: userinfo (if present)
+# 3: @ (if present)
+# 4: dotted-quad host
+# 5: other host
+# 6: :port
+# 7: path
+# group def.                1          2                           3
+URI_SPLITTER = re.compile(r"^(\w+://)(?:([-\w\.!~\*'\(\)%;:&=+$,]+?)(@))?"
+                          r"(?:((?:\d{1,3}\.){3}\d{1,3})|(\S+?))(:\d+)?(/\S*)?$")
+#                                4                         5      6      7
+
+# Secure schemes share the SURT of their plain counterparts.
+SCHEME_PREFIXES = {'https://': 'http://(', 'ftps://': 'ftp://('}
+
+# Number of distinct hosts whose reversed form is kept in memory.
+HOST_CACHE_SIZE = 10000
+
+
+def surtize(orig_url, preserveCase=False):
+    """Create a surt from a url, or return '' if the url can't be parsed."""
+    # if url is submitted without scheme, add http://
+    orig_url = addImpliedHttpIfNecessary(orig_url)
+
+    # check URI validity
+    mobj = URI_SPLITTER.match(orig_url)
+    if not mobj:
+        return ''
+
+    scheme, userinfo, at, dotted_quad, host, port, path = mobj.groups()
+    # start building surt form
+    surt = SCHEME_PREFIXES.get(scheme) or scheme + '('
+    # if dotted-quad ip match, don't reverse; otherwise, reverse host
+    surt += dotted_quad if dotted_quad is not None else reverse_host(host)
+    # add port, @ and userinfo if they exist, then close parentheses
+    # before the path
+    surt += (port or '') + (at or '') + (userinfo or '') + ')' + (path or '')
+
+    # return surt
+    if preserveCase is False:
+        return surt.lower()
+    else:
+        return surt
+
+
+def surtize_batch(urls, preserveCase=False):
+    """Return the surts of an iterable of urls as a list, in the same order."""
+    return [surtize(url, preserveCase) for url in urls]
+
+
+@lru_cache(maxsize=HOST_CACHE_SIZE)
+def reverse_host(host):
+    """Return the comma-joined, reversed labels of a host, e.g. 'com,example,www,'."""
+    splithost = host.split('.')
+    splithost.reverse()
+    return ','.join(splithost) + ','
+
+
+def appendToSurt(matchobj, groupnum, surt):
+    if matchobj.group(groupnum) is not None:
+        surt += matchobj.group(groupnum)
+    return surt
+
+
+def addImpliedHttpIfNecessary(uri):
+    colon = uri.find(':')
+    period = uri.find('.')
+    if colon == -1 or (period >= 0 and period < colon):
+        uri = 'http://' + uri
+    return uri
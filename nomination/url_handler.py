@@ -1,4 +1,7 @@
+import base64
+import binascii
 import datetime
+import hashlib
 import itertools
 import json
 import re
@@ -8,45 +11,77 @@ from urllib.parse import urlparse
 
 from django import http
 from django.conf import settings
+from django.core.cache import cache
 from django.shortcuts import get_object_or_404
-from django.db import IntegrityError
-
-from nomination.models import Project, Nominator, URL, Value
+from django.db import DatabaseError, IntegrityError, transaction
+from django.db.models import F, Q, Sum
+from django.utils.http import quote_etag
+
+from nomination import nominator_cache
+from nomination.entity_index import search_entities
+from nomination.models import (
+    Project, Nominator, URL, SURTNode, EntityTrigram, Metadata_Values, ProjectInstitution,
+    URLSummary, Valueset_Values
+)
+from nomination.summaries import (
+    TOP_DOMAIN_PATTERN, DOMAIN_LETTER_PATTERN, get_browse_index, get_project_stats,
+    normalize_surt, record_new_urls
+)
+from nomination.surt import surtize, appendToSurt, addImpliedHttpIfNecessary  # noqa: F401
 
 
 SCHEME_ONE_SLASH = re.compile(r'(https?|ftps?):/([^/])')
-ANCHOR_PATTERN = re.compile(r'^<a href=\"[^>]+>([^<]+)</a>')
+METADATA_VERSION_KEY = 'nomination:metadata_version'
+METADATA_CACHE_KEY = 'nomination:metadata:%s:%s'
+METADATA_CACHE_TIMEOUT = 300
+# Most trigrams of a search term looked up in the trigram index.
+MAX_QUERY_TRIGRAMS = 6
 
 
 def alphabetical_browse(project):
-    browse_key_list = string.digits + string.ascii_uppercase
+    """Build the alphabetical browse dictionary by scanning every SURT in the project.
+
+    Views use get_alphabetical_browse, which serves the same dictionary from
+    the maintained browse index; this full scan remains as its reference.
+    """
     browse_dict = {}
     try:
         surt_list = (
-            URL.objects.filter(url_project=project, attribute__iexact='surt').order_by('value')
+            URL.objects.filter(url_project=project, attribute_norm='surt').order_by('value')
         )
     except Exception:
         raise http.Http404
 
-    # compile regex
-    topdom_rgx = re.compile(r'^[^:]+://\(([^,]+),')
-    singdom_rgx = re.compile(r'^[^:]+://(\([^,]+,([^,\)]{1}))')
-
     for url_item in surt_list:
-        top_domain_search = topdom_rgx.search(url_item.value, 0)
+        top_domain_search = TOP_DOMAIN_PATTERN.search(url_item.value, 0)
         if top_domain_search:
             top_domain = top_domain_search.group(1)
             if top_domain not in browse_dict:
                 browse_dict[top_domain] = {}
-                for key in browse_key_list:
-                    browse_dict[top_domain][key] = None
-            domain_single_search = singdom_rgx.search(url_item.value, 0)
+            domain_single_search = DOMAIN_LETTER_PATTERN.search(url_item.value, 0)
             if domain_single_search:
                 domain_single = domain_single_search.group(2).upper()
                 browse_dict[top_domain][domain_single] = domain_single_search.group(1)
 
+    return format_browse_index(browse_dict)
+
+
+def get_alphabetical_browse(project):
+    """Return the alphabetical browse dictionary from the project's cached browse index."""
+    return format_browse_index(get_browse_index(project.id))
+
+
+def format_browse_index(browse_index):
+    """Turn {top_domain: {letter: surt_prefix}} into sorted (letter, prefix) lists.
+
+    Every digit and uppercase letter is listed for each top-level domain,
+    with None for letters that have no SURTs.
+    """
+    browse_key_list = string.digits + string.ascii_uppercase
     sorted_dict = {}
-    for top_domain, alpha_dict in browse_dict.items():
+    for top_domain, letters in browse_index.items():
+        alpha_dict = dict.fromkeys(browse_key_list)
+        alpha_dict.update(letters)
         alpha_list = []
         for key in sorted(alpha_dict.keys()):
             alpha_list.append((key, alpha_dict[key],))
@@ -55,21 +90,90 @@ def alphabetical_browse(project):
 
 
 def get_metadata(project):
-    """Creates metadata/values set to pass to template."""
-    all_vals = None
-    metadata_vals = []
+    """Creates metadata/values set to pass to template.
 
-    # combine values from value_sets and additional values
-    for x in project.project_metadata_set.all():
-        # get individual values in order by value_order
-        all_vals = x.metadata.values.all().order_by('metadata_values')
-        # get the set of value_sets and combine with other values
-        for z in x.metadata.value_sets.all():
-            all_vals = itertools.chain(z.values.all().order_by('valueset_values'), all_vals)
-        metadata_vals.append((x, all_vals))
+    Returns a tuple of (Project_Metadata, tuple of Values) pairs. The result
+    is cached per project under the current metadata version, which the
+    signal handlers bump whenever a field, value or value set changes. The
+    version and the entries expire after NOMINATION_METADATA_CACHE_TTL
+    seconds, so a process whose cache is not shared sees a change by then.
+    """
+    key = METADATA_CACHE_KEY % (project.id, get_metadata_version())
+    metadata_vals = cache.get(key)
+    if metadata_vals is None:
+        metadata_vals = resolve_metadata(project)
+        cache.set(key, metadata_vals, get_metadata_cache_ttl())
     return metadata_vals
 
 
+def get_metadata_cache_ttl():
+    return getattr(settings, 'NOMINATION_METADATA_CACHE_TTL', METADATA_CACHE_TIMEOUT)
+
+
+def resolve_metadata(project):
+    """Read a project's metadata fields with their ordered values in three queries."""
+    project_metadata = list(project.project_metadata_set.select_related('metadata'))
+    metadata_ids = [pm.metadata_id for pm in project_metadata]
+    field_values = {}
+    for field_value in (Metadata_Values.objects.filter(metadata_id__in=metadata_ids)
+                                               .select_related('value')):
+        field_values.setdefault(field_value.metadata_id, []).append(field_value.value)
+    # values from each value set are placed before those of the sets
+    # attached earlier, followed by the field's own values
+    set_values = {}
+    valueset_values = (Valueset_Values.objects.filter(valueset__metadata__in=metadata_ids)
+                                              .annotate(field_id=F('valueset__metadata'))
+                                              .select_related('value')
+                                              .order_by('valueset_id', 'value_order',
+                                                        'value__value'))
+    for valueset_value in valueset_values:
+        value_sets = set_values.setdefault(valueset_value.field_id, {})
+        value_sets.setdefault(valueset_value.valueset_id, []).append(valueset_value.value)
+    metadata_vals = []
+    for pm in project_metadata:
+        all_vals = []
+        for values in reversed(list(set_values.get(pm.metadata_id, {}).values())):
+            all_vals.extend(values)
+        all_vals.extend(field_values.get(pm.metadata_id, []))
+        metadata_vals.append((pm, tuple(all_vals)))
+    return tuple(metadata_vals)
+
+
+def get_metadata_version():
+    """Return the current metadata version used in metadata cache keys."""
+    version = cache.get(METADATA_VERSION_KEY)
+    if version is None:
+        # start from the clock so a lost version never reuses old keys
+        cache.add(METADATA_VERSION_KEY, int(time.time() * 1000), get_metadata_cache_ttl())
+        version = cache.get(METADATA_VERSION_KEY)
+    return version
+
+
+def invalidate_metadata():
+    """Bump the metadata version so every project's metadata is resolved again."""
+    try:
+        cache.incr(METADATA_VERSION_KEY)
+    except ValueError:
+        get_metadata_version()
+
+
+def get_project_validators(project, *parts):
+    """Return (ETag, Last-Modified timestamp) for a response rendered from a project.
+
+    Both come from the project's change watermark, so they are found without
+    reading the URL table, and are the same in every process. The ETag also
+    covers whether nominations are open and any extra parts given, e.g. the
+    feed type. The timestamp is None for a project that has no watermark yet.
+    """
+    key = ':'.join(str(part) for part in (
+        project.pk, project.revision,
+        project.last_modified.isoformat() if project.last_modified else '',
+        project.nomination_active()) + parts)
+    etag = quote_etag(hashlib.md5(key.encode('utf-8')).hexdigest())
+    last_modified = int(project.last_modified.timestamp()) if project.last_modified else None
+    return etag, last_modified
+
+
 def handle_metadata(request, posted_data):
     """Handles multivalue metadata and user supplied metadata values."""
     for k in posted_data.keys():
@@ -120,14 +224,11 @@ def validate_date(dateinput):
 
 
 def add_url(project, form_data):
-    summary_list = []
     form_data['url_value'] = check_url(form_data['url_value'])
     # Get the system nominator
-    system_nominator = get_object_or_404(Nominator, id=settings.SYSTEM_NOMINATOR_ID)
-
-    # Check for or add surt
-    surt_successful = surt_exists(project, system_nominator, form_data['url_value'])
-    if not surt_successful:
+    try:
+        system_nominator = nominator_cache.get_by_id(settings.SYSTEM_NOMINATOR_ID)
+    except Nominator.DoesNotExist:
         raise http.Http404
 
     # Get/Add a nominator
@@ -135,32 +236,110 @@ def add_url(project, form_data):
     if not nominator:
         return False
 
-    # Nominate a URL
-    summary_list = nominate_url(project, nominator, form_data, '1')
-
-    # Add other URL attributes
-    summary_list = add_other_attribute(project, nominator, form_data, summary_list)
-
-    return summary_list
+    # Add the surt, nomination and other URL attributes
+    return write_nomination(project, nominator, form_data, '1', system_nominator)
 
 
 def add_metadata(project, form_data):
-    summary_list = []
     # Get/Add a nominator
     nominator = get_nominator(form_data)
     if not nominator:
         raise http.Http404
 
-    if form_data['scope'] != '':
-        # Nominate a URL
-        summary_list = nominate_url(project, nominator, form_data, form_data['scope'])
+    # Nominate the URL if a scope was given, and add other URL attributes
+    scope_value = form_data['scope'] if form_data['scope'] != '' else None
+    return write_nomination(project, nominator, form_data, scope_value)
+
 
-    # Add other URL attributes
-    summary_list = add_other_attribute(project, nominator, form_data, summary_list)
+def write_nomination(project, nominator, form_data, scope_value=None, system_nominator=None):
+    """Write the rows of one URL submission in one transaction.
 
+    The project's rows for the URL are read in one query and compared in
+    memory with the submission: the surt (when a system nominator is
+    given), the nomination (when scope_value is given) and each submitted
+    metadata value. Missing rows are written with one bulk insert and a
+    changed scope is saved on its existing row. Returns the summary list.
+    """
+    url_value = form_data['url_value']
+    entity_norm = url_value.lower()
+    summary_list = []
+    try:
+        with transaction.atomic():
+            existing = list(URL.objects.filter(url_project=project, entity_norm=entity_norm))
+            new_urls = []
+            if (system_nominator is not None
+                    and not any(url.attribute_norm == 'surt' for url in existing)):
+                new_urls.append(URL(url_project=project, url_nominator=system_nominator,
+                                    entity=url_value, attribute='surt',
+                                    value=surtize(url_value)))
+            nominator_rows = {(url.attribute_norm, url.value_norm): url for url in existing
+                              if url.url_nominator_id == nominator.id}
+            if scope_value is not None:
+                nomination = next((url for (attribute, _), url in nominator_rows.items()
+                                   if attribute == 'nomination'), None)
+                if nomination is None:
+                    new_urls.append(URL(url_project=project, url_nominator=nominator,
+                                        entity=url_value, attribute='nomination',
+                                        value=scope_value))
+                    summary_list.append(nomination_message(url_value, scope_value, 'created'))
+                elif nomination.value == scope_value:
+                    summary_list.append(nomination_message(url_value, scope_value, 'unchanged'))
+                else:
+                    nomination.value = scope_value
+                    nomination.save()
+                    summary_list.append(nomination_message(url_value, scope_value, 'changed'))
+            for attribute_name, value in iter_submitted_attributes(project, form_data):
+                key = (attribute_name.lower(), value.lower())
+                created = key not in nominator_rows
+                if created:
+                    nominator_rows[key] = URL(url_project=project, url_nominator=nominator,
+                                              entity=url_value, attribute=attribute_name,
+                                              value=value)
+                    new_urls.append(nominator_rows[key])
+                summary_list.append(attribute_message(attribute_name, value, url_value, created))
+            for url in new_urls:
+                url.normalize()
+            URL.objects.bulk_create(new_urls)
+            record_new_urls(new_urls)
+    except DatabaseError:
+        raise http.Http404
     return summary_list
 
 
+def iter_submitted_attributes(project, form_data):
+    """Yield (attribute name, value) for each non-empty metadata value submitted."""
+    for project_metadata, _ in get_metadata(project):
+        attribute_name = project_metadata.metadata.name
+        if attribute_name not in form_data:
+            continue
+        values = form_data[attribute_name]
+        # If attribute has a list of values associated
+        if not isinstance(values, list):
+            values = [values]
+        for value in values:
+            if len(value) > 0:
+                yield attribute_name, value
+
+
+def nomination_message(url_value, scope_value, status):
+    """Return the summary message for a created, unchanged or changed nomination."""
+    if status == 'created':
+        return 'You have successfully nominated ' + url_value
+    scope = '\"In Scope\"' if scope_value == '1' else '\"Out of Scope\"'
+    if status == 'unchanged':
+        return 'You have already declared ' + url_value + ' as ' + scope
+    return 'You have successfully declared ' + url_value + ' as ' + scope
+
+
+def attribute_message(attribute_name, value, url_value, created):
+    """Return the summary message for an added or already present attribute value."""
+    if created:
+        return ('You have successfully added the ' + attribute_name + ' \"' + value
+                + '\" for ' + url_value)
+    return ('You have already added the ' + attribute_name + ' \"' + value + '\" for '
+            + url_value)
+
+
 def check_url(url):
     url = url.strip()
     url = addImpliedHttpIfNecessary(url)
@@ -169,6 +348,18 @@ def check_url(url):
 
 
 def get_nominator(form_data):
+    """Return the nominator of a submission, creating it if the email is new.
+
+    Identities seen before are resolved from nominator_cache without a query.
+    """
+    try:
+        identity = (form_data['nominator_email'], form_data['nominator_name'],
+                    form_data['nominator_institution'])
+    except KeyError:
+        raise http.Http404
+    nominator = nominator_cache.get_by_identity(*identity)
+    if nominator is not None:
+        return nominator
     try:
         # Try to retrieve the nominator
         nominator, created = Nominator.objects.get_or_create(
@@ -189,134 +380,13 @@ def get_nominator(form_data):
         except (Nominator.MultipleObjectsReturned, Nominator.DoesNotExist):
             return False
 
-    except (IntegrityError, KeyError):
+    except IntegrityError:
         raise http.Http404
 
+    nominator_cache.remember_identity(*identity, nominator)
     return nominator
 
 
-def nominate_url(project, nominator, form_data, scope_value):
-    summary_list = []
-    # Nominate URL
-    try:
-        # Check if user has already nominated the URL
-        nomination_url, created = URL.objects.get_or_create(url_nominator__id__iexact=nominator.id,
-                                                            url_project=project,
-                                                            entity__iexact=form_data['url_value'],
-                                                            attribute__iexact='nomination',
-                                                            defaults={
-                                                                  'entity': form_data['url_value'],
-                                                                  'attribute': 'nomination',
-                                                                  'value': scope_value,
-                                                                  'url_nominator': nominator,
-                                                                 })
-    except Exception:
-        raise http.Http404
-
-    if created:
-        summary_list.append('You have successfully nominated ' + form_data['url_value'])
-    else:
-        if nomination_url.value == scope_value:
-            if scope_value == '1':
-                summary_list.append(
-                    'You have already declared ' + form_data['url_value'] + ' as \"In Scope\"'
-                )
-            else:
-                summary_list.append(
-                    'You have already declared ' + form_data['url_value'] + ' as \"Out of Scope\"'
-                )
-        else:
-            nomination_url.value = scope_value
-            nomination_url.save()
-            if scope_value == '1':
-                summary_list.append(
-                    'You have successfully declared ' + form_data['url_value'] + ' as \"In Scope\"'
-                )
-            else:
-                summary_list.append(
-                    'You have successfully declared ' + form_data['url_value']
-                    + ' as \"Out of Scope\"'
-                )
-
-    return summary_list
-
-
-def add_other_attribute(project, nominator, form_data, summary_list):
-    # add to att_list the project specific attributes
-    att_list = []
-
-    for aobj in project.project_metadata_set.all():
-        att_list.append(aobj.metadata.name)
-
-    for attribute_name in att_list:
-        # Add attribute URL entry
-        if attribute_name in form_data:
-
-            # If attribute has a list of values associated
-            if isinstance(form_data[attribute_name], list):
-                for oneval in form_data[attribute_name]:
-                    if len(oneval) > 0:
-                        summary_list = save_attribute(project, nominator, form_data, summary_list,
-                                                      attribute_name, oneval)
-
-            elif len(form_data[attribute_name]) > 0:
-                summary_list = save_attribute(project, nominator, form_data, summary_list,
-                                              attribute_name, form_data[attribute_name])
-
-    return summary_list
-
-
-def save_attribute(project, nominator, form_data, summary_list, attribute_name, valvar):
-    """Stores attribute/value for given url in database.
-
-    Separated out of add_other_attribute to handle attributes where a list
-    of values was submitted.
-    """
-    try:
-        # Check if URL attribute and value already exist
-        added_url, created = URL.objects.get_or_create(url_nominator=nominator,
-                                                       url_project=project,
-                                                       entity__iexact=form_data['url_value'],
-                                                       value__iexact=valvar,
-                                                       attribute__iexact=attribute_name,
-                                                       defaults={
-                                                                 'entity': form_data['url_value'],
-                                                                 'value': valvar,
-                                                                 'attribute': attribute_name,
-                                                                })
-    except Exception:
-        raise http.Http404
-
-    if created:
-        summary_list.append('You have successfully added the '
-                            + attribute_name + ' \"' + valvar + '\" for '
-                            + form_data['url_value'])
-    else:
-        summary_list.append('You have already added the '
-                            + attribute_name + ' \"' + valvar + '\" for '
-                            + form_data['url_value'])
-
-    return summary_list
-
-
-def surt_exists(project, system_nominator, url_entity):
-    # Create a SURT if the url doesn't already have one
-    try:
-        URL.objects.get_or_create(url_project=project,
-                                  entity__iexact=url_entity,
-                                  attribute__iexact='surt',
-                                  defaults={
-                                            'entity': url_entity,
-                                            'attribute': 'surt',
-                                            'value': surtize(url_entity),
-                                            'url_nominator': system_nominator
-                                           })
-    except Exception:
-        raise http.Http404
-
-    return True
-
-
 def url_formatter(line):
     """
         Formats the given url into the proper url format
@@ -327,184 +397,150 @@ def url_formatter(line):
     return url
 
 
-def surtize(orig_url, preserveCase=False):
-    """
-        Create a surt from a url. Based on Heritrix's SURT.java.
-    """
-    # if url is submitted without scheme, add http://
-    orig_url = addImpliedHttpIfNecessary(orig_url)
-
-    # 1: scheme://
-    # 2: userinfo (if present)
-    # 3: @ (if present)
-    # 4: dotted-quad host
-    # 5: other host
-    # 6: :port
-    # 7: path
-    # group def.     1          2                           3
-    URI_SPLITTER = r"^(\w+://)(?:([-\w\.!~\*'\(\)%;:&=+$,]+?)(@))?" + \
-        r"(?:((?:\d{1,3}\.){3}\d{1,3})|(\S+?))(:\d+)?(/\S*)?$"
-    #       4                         5      6      7
-
-    # check URI validity
-    m = re.compile(URI_SPLITTER)
-    mobj = m.match(orig_url)
-    if not mobj:
-        return ''
-
-    # start building surt form
-    if mobj.group(1) == 'https://':
-        surt = 'http://('
-    elif mobj.group(1) == 'ftps://':
-        surt = 'ftp://('
-    else:
-        surt = mobj.group(1) + '('
-    # if dotted-quad ip match, don't reverse
-    if mobj.group(4) is not None:
-        surt += mobj.group(4)
-    # otherwise, reverse host
-    else:
-        splithost = mobj.group(5).split('.')
-        splithost.reverse()
-        hostpart = ','.join(splithost)
-        surt += hostpart + ','
-    # add port if it exists
-    surt = appendToSurt(mobj, 6, surt)
-    # add @ if it exists
-    surt = appendToSurt(mobj, 3, surt)
-    # add userinfo if it exists
-    surt = appendToSurt(mobj, 2, surt)
-    # close parentheses before path
-    surt += ')'
-    # add path if it exists
-    surt = appendToSurt(mobj, 7, surt)
-
-    # return surt
-    if preserveCase is False:
-        return surt.lower()
-    else:
-        return surt
-
-
-def appendToSurt(matchobj, groupnum, surt):
-    if matchobj.group(groupnum) is not None:
-        surt += matchobj.group(groupnum)
-    return surt
-
-
-def addImpliedHttpIfNecessary(uri):
-    colon = uri.find(':')
-    period = uri.find('.')
-    if colon == -1 or (period >= 0 and period < colon):
-        uri = 'http://' + uri
-    return uri
-
-
 def create_json_browse(slug, url_attribute, root=''):
     """Create a JSON list which can be used to represent a tree of the SURT domains.
 
     If a root is specified, the JSON list will show just the tree of domains under
     the specified base domain. Otherwise, it will show all of the domains. Each entry
     in the JSON list is a dict which states the base domain, child domain,
-    and whether the child domain has children or not.
+    whether the child domain has children or not, and how many URLs it holds.
+
+    The entries come from the project's SURT tree, so each expansion is a single
+    lookup of the direct children of one node. A root that does not end in a
+    comma is a letter bucket, selecting the children whose names start with the
+    letters after the last comma.
     """
     json_list = []
 
     # Make sure the project exist in the database
     project = get_object_or_404(Project, project_slug=slug)
 
-    if root != '':
-        # Find all URLs with the project and domain specified
-        url_list = URL.objects.filter(
-            url_project=project,
-            attribute__iexact='surt',
-            value__icontains=root
-        ).order_by('value')
-    else:
-        # Find all URLs with the project specified (the base domains)
-        url_list = URL.objects.filter(
-            url_project=project,
-            attribute__iexact='surt'
-        ).order_by('value')
-
-    if len(url_list) >= 100 and root != '':
-        category_list = []
-        for url_item in url_list:
-            name_search = re.compile(r'^[^:]+://\('+root+'([A-Za-z0-9]{1})').search(
-                url_item.value, 0)
-            if name_search:
-                if not name_search.group(1) in category_list:
-                    category_list.append(name_search.group(1))
-        for category in category_list:
-            category_dict = {'text': category,
-                             'id': root+category,
-                             'hasChildren': True}
-            json_list.append(category_dict)
+    root = root or ''
+    parent = root[:root.rfind(',') + 1]
+    prefix = root[len(parent):]
+    children = SURTNode.objects.filter(project=project, parent=parent).order_by('name')
+    if prefix:
+        children = children.filter(name__startswith=prefix)
+
+    if root != '' and sum(child.url_count for child in children) >= 100:
+        # Too many URLs to list at once; group the children by their next character.
+        categories = {}
+        for child in children:
+            category = child.name[len(prefix):len(prefix) + 1]
+            if category.isascii() and category.isalnum():
+                categories[category] = categories.get(category, 0) + child.url_count
+        for category, url_count in categories.items():
+            json_list.append({'text': category,
+                              'id': root + category,
+                              'hasChildren': True,
+                              'urlCount': url_count})
     else:
-        name_pattern = re.compile(r'^[^:]+://\('+root+r'([^,\)]+)')
-        child_pattern = re.compile(r'^[^:]+://\('+root+r'[^,]+,[^,\)]+')
-        for url_item in url_list:
-            domain_dict = {}
-            # Determine if URL is a child of the expanded node
-            name_search = name_pattern.search(url_item.value, 0)
-            # if the URL exists under the expanded node
-            if name_search:
-                # Determine if the URL has children
-                child_found = child_pattern.search(url_item.value, 0)
-                # Create a new domain name for the new URL
-                domain_name = root + name_search.group(1)
-                domain_not_found = True
-                # For all URLs in the json list already
-                for existing_domain in json_list:
-                    # Find the domain name within the anchor
-                    found_anchor = ANCHOR_PATTERN.search(existing_domain['text'], 0)
-                    if found_anchor:
-                        removed_anchor = found_anchor.group(1)
-                    else:
-                        removed_anchor = None
-                    # if the domain name already exists in the json list
-                    if existing_domain['text'] == domain_name or removed_anchor == domain_name:
-                        domain_not_found = False
-                # if the domain hasn't been added already, and it has a child node
-                if domain_not_found and child_found:
-                    if len(domain_name.split(',')) > 1:
-                        domain_dict = {'text': '<a href=\"surt/(' +
-                                       domain_name+'\">' +
-                                       domain_name+'</a>',
-                                       'id': domain_name+',',
-                                       'hasChildren': True}
-                    else:
-                        domain_dict = {'text': domain_name,
-                                       'id': domain_name+',',
-                                       'hasChildren': True}
-                # otherwise if the domain hasn't been added already, and it has no child
-                elif domain_not_found:
-                    domain_dict = {'text': '<a href=\"surt/(' +
-                                   domain_name+'\">' +
-                                   domain_name+'</a>',
-                                   'id': domain_name+','}
-            # if the domain dictionary isn't empty
-            if domain_dict:
-                json_list.append(domain_dict)
+        for child in children:
+            domain_name = parent + child.name
+            if child.has_children and len(domain_name.split(',')) == 1:
+                text = domain_name
+            else:
+                text = '<a href=\"surt/(' + domain_name + '\">' + domain_name + '</a>'
+            domain_dict = {'text': text,
+                           'id': domain_name + ',',
+                           'urlCount': child.url_count}
+            if child.has_children:
+                domain_dict['hasChildren'] = True
+            json_list.append(domain_dict)
     return json.dumps(json_list)
 
 
-def create_json_search(slug):
-    """Create JSON list of all URLs added to the specified project."""
+def create_json_search(slug, prefix='', limit=None, cursor=None, any_scheme=False):
+    """Create JSON list of the URLs added to the specified project.
+
+    Without arguments every URL is listed. A prefix, limit and cursor select
+    one page of the URLs starting with prefix, as in search_project_entities.
+    """
     project = get_object_or_404(Project, project_slug=slug)
+    entities, _ = search_project_entities(project, prefix, limit, cursor, any_scheme)
+    return json.dumps(entities)
 
-    json_list = []
-    query_list = (URL.objects.filter(url_project=project)
-                             .values_list('entity', flat=True)
-                             .distinct()
-                             .order_by('entity'))
-    for url_item in query_list:
-        json_list.append(url_item)
 
-    return json.dumps(json_list)
+def search_project_entities(project, prefix='', limit=None, cursor=None, any_scheme=False):
+    """Return (URLs, next cursor) for the project's URLs starting with prefix.
+
+    URLs are compared case-insensitively, and without their schemes when
+    any_scheme is set. Pass the returned cursor back to get the next page;
+    it is None on the last page.
+    """
+    return search_entities(project.id, prefix, limit, any_scheme, cursor)
+
+
+def search_institutions(project, prefix='', limit=None):
+    """Return the project's nominator institutions that start with prefix, sorted."""
+    institutions = ProjectInstitution.objects.filter(project=project)
+    prefix = prefix.lower()
+    if prefix:
+        # a range on the indexed column rather than a LIKE the index can't serve
+        institutions = institutions.filter(institution_norm__gte=prefix,
+                                           institution_norm__lt=prefix_upper_bound(prefix))
+    institutions = (institutions.order_by('institution_norm', 'institution')
+                                .values_list('institution', flat=True))
+    if limit is not None:
+        institutions = institutions[:limit]
+    return list(institutions)
+
+
+def search_surt_urls(project, term):
+    """Return the project's surt rows whose entity contains term, ordered by SURT.
+
+    Terms of three or more characters are narrowed down through the trigram
+    index first; shorter terms fall back to scanning the project's surt rows.
+    """
+    term = term.lower()
+    url_list = URL.objects.filter(url_project=project, attribute_norm='surt')
+    for trigram in query_trigrams(term):
+        url_list = url_list.filter(entity_norm__in=EntityTrigram.objects.filter(
+            project=project, trigram=trigram).values('entity_norm'))
+    if term:
+        # trigram matches can come from different parts of the entity
+        url_list = url_list.filter(entity_norm__contains=term)
+    return url_list.order_by('value')
+
+
+def query_trigrams(term, limit=MAX_QUERY_TRIGRAMS):
+    """Return up to limit trigrams of term, spread evenly from its start to its end."""
+    count = len(term) - 2
+    if count <= 0:
+        return []
+    if count <= limit:
+        positions = range(count)
+    else:
+        positions = sorted({round(i * (count - 1) / (limit - 1)) for i in range(limit)})
+    trigrams = []
+    for position in positions:
+        if term[position:position + 3] not in trigrams:
+            trigrams.append(term[position:position + 3])
+    return trigrams
+
+
+def get_metadata_value_map(project):
+    """Map each preset-valued metadata field of a project to {value key: Value}.
+
+    Fields without preset values (or whose name is attached to the project
+    more than once) are left out, so their raw values are displayed as-is.
+    """
+    value_map = {}
+    duplicates = set()
+    for pm, vals in get_metadata(project):
+        name = pm.metadata.name
+        if name in value_map:
+            duplicates.add(name)
+        value_map[name] = {value.key: value for value in vals}
+    return {name: values for name, values in value_map.items()
+            if values and name not in duplicates}
 
 
 def create_url_list(project, base_list):
+    """Merge the URL rows of one entity into the dictionary shown on its listing page."""
+    if hasattr(base_list, 'select_related'):
+        base_list = base_list.select_related('url_nominator')
+    value_map = None
     url_dict = {}
     for url_object in base_list:
         url_dict['entity'] = url_object.entity
@@ -514,12 +550,10 @@ def create_url_list(project, base_list):
                 url_dict['nomination_list'] = []
                 url_dict['nomination_count'] = 0
                 url_dict['nomination_score'] = 0
-            if url_object.url_nominator.nominator_name + ' - ' + \
-                    url_object.url_nominator.nominator_institution \
-                    not in url_dict['nomination_list']:
-                url_dict['nomination_list'].append(
-                    url_object.url_nominator.nominator_name + ' - ' +
-                    url_object.url_nominator.nominator_institution)
+            nominator = url_object.url_nominator.nominator_name + ' - ' + \
+                url_object.url_nominator.nominator_institution
+            if nominator not in url_dict['nomination_list']:
+                url_dict['nomination_list'].append(nominator)
             url_dict['nomination_count'] += 1
             url_dict['nomination_score'] += int(url_object.value)
         elif url_object.attribute == 'surt':
@@ -530,26 +564,30 @@ def create_url_list(project, base_list):
             attrib_key = string.capwords(url_object.attribute.replace('_', ' '))
             if attrib_key not in url_dict['attribute_dict']:
                 url_dict['attribute_dict'][attrib_key] = []
-            # try statement to replace value key with value value where applicable
-            try:
-                url_metadata = project.project_metadata_set.get(
-                    metadata__name__exact=url_object.attribute).metadata
-                if len(url_metadata.values.all()) > 0 or len(url_metadata.value_sets.all()) > 0:
-                    fullval = Value.objects.get(key__exact=url_object.value)
-                    if fullval not in url_dict['attribute_dict'][attrib_key]:
-                        url_dict['attribute_dict'][attrib_key].append(fullval)
-                else:
-                    raise Exception()
-            except Exception:
-                if url_object.value not in url_dict['attribute_dict'][attrib_key]:
-                    url_dict['attribute_dict'][attrib_key].append(url_object.value)
+            if value_map is None:
+                value_map = get_metadata_value_map(project)
+            # replace value key with value value where applicable
+            fullval = value_map.get(url_object.attribute, {}).get(url_object.value,
+                                                                  url_object.value)
+            if fullval not in url_dict['attribute_dict'][attrib_key]:
+                url_dict['attribute_dict'][attrib_key].append(fullval)
     return url_dict
 
 
 def create_url_dump(project):
-    url_dict = {}
-    # get QuerySet of url_data
-    entity_list = URL.objects.filter(url_project=project)
+    """Return the whole project dump as a dict keyed by entity."""
+    return dict(iter_url_dump(project))
+
+
+def iter_url_dump(project, chunk_size=2000):
+    """Yield (entity, entity_data) pairs for a project, one entity at a time.
+
+    URL rows are read in entity order with their nominators joined, so each
+    entity is assembled in a single pass without holding the whole project
+    in memory. Rows are ordered and grouped by the lowercased entity first,
+    so entities differing only in case stay together even where the database
+    compares entity case-insensitively, and are then split by exact entity.
+    """
     # get metadata and values
     metadata_vals = get_metadata(project)
     # turn metadata_vals into usable dict
@@ -558,72 +596,101 @@ def create_url_dump(project):
         val_dict[met.metadata.name] = {}
         for eachv in vals:
             val_dict[met.metadata.name][eachv.key] = eachv.value
+    # get QuerySet of url_data
+    entity_list = (URL.objects.filter(url_project=project)
+                              .select_related('url_nominator')
+                              .order_by('entity_norm', 'entity', 'id'))
     # merge the data for URLs with same entity
-    for url_object in entity_list:
-        url_ent = url_object.entity
+    for _, norm_objects in itertools.groupby(entity_list.iterator(chunk_size=chunk_size),
+                                             key=lambda url_object: url_object.entity_norm):
+        entities = {}
+        for url_object in norm_objects:
+            entities.setdefault(url_object.entity, []).append(url_object)
+        for url_ent in sorted(entities):
+            yield url_ent, create_entity_dump(entities[url_ent], val_dict)
+
+
+def create_entity_dump(url_objects, val_dict):
+    """Merge the URL rows of one entity into its project dump entry."""
+    entity_data = {'nominators': [],
+                   'nomination_count': 0,
+                   'nomination_score': 0,
+                   'attributes': {}}
+    for url_object in url_objects:
         attrib_key = url_object.attribute
-        # if first time we've seen the entity, create url_dict entry
-        if url_ent not in url_dict.keys():
-            url_dict[url_ent] = \
-              {'nominators': [],
-               'nomination_count': 0,
-               'nomination_score': 0,
-               'attributes': {}}
         if attrib_key == 'nomination':
             nominator = url_object.url_nominator.nominator_name + ' - ' + \
               url_object.url_nominator.nominator_institution
-            if nominator not in url_dict[url_ent]['nominators']:
-                url_dict[url_ent]['nominators'].append(nominator)
-            url_dict[url_ent]['nomination_count'] += 1
-            url_dict[url_ent]['nomination_score'] += int(url_object.value)
+            if nominator not in entity_data['nominators']:
+                entity_data['nominators'].append(nominator)
+            entity_data['nomination_count'] += 1
+            entity_data['nomination_score'] += int(url_object.value)
         elif attrib_key == 'surt':
-            url_dict[url_ent]['surt'] = url_object.value
-            url_dict[url_ent]['domain_surt'] = get_domain_surt(url_object.value)
+            entity_data['surt'] = url_object.value
+            entity_data['domain_surt'] = get_domain_surt(url_object.value)
         else:
-            if attrib_key not in url_dict[url_ent]['attributes'].keys():
-                url_dict[url_ent]['attributes'][attrib_key] = []
+            if attrib_key not in entity_data['attributes'].keys():
+                entity_data['attributes'][attrib_key] = []
             # replace value key with value value if applicable
             try:
                 # see if the field has preset values
                 if val_dict[attrib_key]:
                     fullval = val_dict[attrib_key][url_object.value]
-                    if fullval not in url_dict[url_ent]['attributes'][attrib_key]:
-                        url_dict[url_ent]['attributes'][attrib_key].append(fullval)
+                    if fullval not in entity_data['attributes'][attrib_key]:
+                        entity_data['attributes'][attrib_key].append(fullval)
                 else:
                     raise Exception()
             except Exception:
-                if url_object.value not in \
-                  url_dict[url_ent]['attributes'][attrib_key]:
-                    url_dict[url_ent]['attributes'][attrib_key].append(url_object.value)
+                if url_object.value not in entity_data['attributes'][attrib_key]:
+                    entity_data['attributes'][attrib_key].append(url_object.value)
     # sort attribute lists
-    for u, udata in url_dict.items():
-        if udata.get('attributes'):
-            for att_key, att_vals in udata['attributes'].items():
-                att_vals.sort()
-    return url_dict
+    for att_vals in entity_data['attributes'].values():
+        att_vals.sort()
+    return entity_data
 
 
-def create_surt_dict(project, surt):
-    if strip_scheme(surt) == surt:
-        # SURTs with no scheme are ok
-        surt_pattern = r'^[^:]+://\{0}'.format(strip_scheme(surt))
-        try:
-            url_list = URL.objects.filter(
-                url_project=project,
-                attribute__iexact='surt',
-                value__iregex=surt_pattern
-            ).order_by('value')
-        except Exception:
-            url_list = None
-    else:
-        try:
-            url_list = URL.objects.filter(
-                url_project=project,
-                attribute__iexact='surt',
-                value__istartswith=surt
-            ).order_by('value')
-        except Exception:
-            url_list = None
+def iter_json_dump(entities):
+    """Serialize (entity, entity_data) pairs as one JSON object, piece by piece.
+
+    Each entry is formatted as json.dump(..., sort_keys=True, indent=4,
+    ensure_ascii=False) would, but the entities keep the order they arrive in;
+    from iter_url_dump that is by lowercased entity, then by entity.
+    """
+    separator = '{\n'
+    for entity, entity_data in entities:
+        entity_json = json.dumps(entity_data, sort_keys=True, indent=4, ensure_ascii=False)
+        yield '{0}    {1}: {2}'.format(separator, json.dumps(entity, ensure_ascii=False),
+                                       entity_json.replace('\n', '\n    '))
+        separator = ',\n'
+    yield '{}' if separator == '{\n' else '\n}'
+
+
+def iter_ndjson_dump(entities):
+    """Serialize (entity, entity_data) pairs as newline-delimited JSON, one entity per line."""
+    for entity, entity_data in entities:
+        entity_data['entity'] = entity
+        yield json.dumps(entity_data, sort_keys=True, ensure_ascii=False) + '\n'
+
+
+def create_surt_dict(project, surt, after=None, before=None, page_size=None):
+    """Return one page of the project's URLs whose SURT starts with surt.
+
+    The scheme of surt is ignored, so the URLs of every scheme under a host
+    are listed, ordered by SURT. Matches are read as a range of the indexed
+    URLSummary.surt_norm column. With page_size, at most that many URLs are
+    returned, after or before the URL named by a cursor from a previous
+    page; next_cursor and prev_cursor name the pages either side. total is
+    read from the SURT tree, and is None when surt reaches past the host.
+    """
+    prefix = normalize_surt(surt)
+    try:
+        summaries = URLSummary.objects.filter(project=project, surt_norm__gte=prefix)
+        if prefix:
+            summaries = summaries.filter(surt_norm__lt=prefix_upper_bound(prefix))
+        else:
+            summaries = summaries.exclude(surt_norm='')
+    except Exception:
+        summaries = None
 
     letter = False
     single_letter_search = re.compile(r'^(?:[^:]+://)?\([^,]+,([^,\)]+)').search(surt, 0)
@@ -632,10 +699,139 @@ def create_surt_dict(project, surt):
         if len(result) == 1:
             letter = result
 
-    return {
-        'url_list': url_list,
+    surt_dict = {
+        'url_list': None,
         'letter': letter,
+        'next_cursor': None,
+        'prev_cursor': None,
+        'total': None,
     }
+    if summaries is None:
+        return surt_dict
+    url_list, surt_dict['prev_cursor'], surt_dict['next_cursor'] = get_surt_page(
+        summaries, after, before, page_size)
+    surt_dict['url_list'] = url_list
+    surt_dict['total'] = count_surt_prefix(project, prefix)
+    return surt_dict
+
+
+def get_related_urls(project, entity, surt, limit, after=None, before=None):
+    """Return the URLs nearest to entity in SURT order that share its domain SURT.
+
+    Without a cursor, up to limit URLs either side of entity are returned in
+    'before' and 'after'. With one, a page of limit URLs after or before the
+    cursor is returned instead. prev_cursor and next_cursor page further out
+    and total counts every related URL, read from the SURT tree.
+    """
+    prefix = normalize_surt(get_domain_surt(surt))
+    summaries = URLSummary.objects.filter(project=project, surt_norm__gte=prefix)
+    if prefix:
+        summaries = summaries.filter(surt_norm__lt=prefix_upper_bound(prefix))
+    summaries = summaries.exclude(entity_norm=entity.lower())
+    related = {'before': [], 'after': [], 'prev_cursor': None, 'next_cursor': None}
+    if after is None and before is None:
+        current = make_surt_cursor(normalize_surt(surt), entity.lower())
+        related['before'], related['prev_cursor'], _ = get_surt_page(
+            summaries, before=current, page_size=limit)
+        related['after'], _, related['next_cursor'] = get_surt_page(
+            summaries, after=current, page_size=limit)
+    elif before is not None:
+        related['before'], related['prev_cursor'], _ = get_surt_page(
+            summaries, before=before, page_size=limit)
+    else:
+        related['after'], _, related['next_cursor'] = get_surt_page(
+            summaries, after=after, page_size=limit)
+    total = count_surt_prefix(project, prefix)
+    # the tree counts entity itself
+    related['total'] = None if total is None else max(total - 1, 0)
+    return related
+
+
+def get_surt_page(summaries, after=None, before=None, page_size=None):
+    """Return (URL summaries, prev cursor, next cursor) for a page in SURT order.
+
+    The page starts after the after cursor or ends before the before cursor;
+    a cursor is None when there is nothing more in its direction.
+    """
+    summaries = summaries.only('entity', 'entity_norm', 'surt_norm')
+    order = ('surt_norm', 'entity_norm')
+    if before is not None:
+        surt_norm, entity_norm = decode_surt_cursor(before)
+        summaries = summaries.filter(Q(surt_norm__lt=surt_norm)
+                                     | Q(surt_norm=surt_norm, entity_norm__lt=entity_norm))
+        order = ('-surt_norm', '-entity_norm')
+    elif after is not None:
+        surt_norm, entity_norm = decode_surt_cursor(after)
+        summaries = summaries.filter(Q(surt_norm__gt=surt_norm)
+                                     | Q(surt_norm=surt_norm, entity_norm__gt=entity_norm))
+    summaries = summaries.order_by(*order)
+    if page_size is None:
+        url_list = list(summaries)
+        has_more = False
+    else:
+        url_list = list(summaries[:page_size + 1])
+        has_more = len(url_list) > page_size
+        url_list = url_list[:page_size]
+    if before is not None:
+        url_list.reverse()
+    prev_cursor = next_cursor = None
+    if url_list:
+        if before is not None:
+            # paging back from a later page: there is always a next page
+            has_prev, has_next = has_more, True
+        else:
+            has_prev, has_next = after is not None, has_more
+        if has_next:
+            next_cursor = make_surt_cursor(url_list[-1].surt_norm, url_list[-1].entity_norm)
+        if has_prev:
+            prev_cursor = make_surt_cursor(url_list[0].surt_norm, url_list[0].entity_norm)
+    return url_list, prev_cursor, next_cursor
+
+
+def prefix_upper_bound(prefix):
+    """Return the smallest string above every string that starts with prefix.
+
+    Filtering on gte prefix and lt this bound is a range an index can serve.
+    """
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def make_surt_cursor(surt_norm, entity_norm):
+    """Return the page cursor naming a position in SURT order."""
+    key = json.dumps([surt_norm, entity_norm])
+    return base64.urlsafe_b64encode(key.encode()).decode()
+
+
+def decode_surt_cursor(cursor):
+    """Return (surt_norm, entity_norm) from a page cursor, raising ValueError if invalid."""
+    try:
+        surt_norm, entity_norm = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (TypeError, ValueError, binascii.Error):
+        raise ValueError('Invalid cursor: %s' % cursor)
+    if not isinstance(surt_norm, str) or not isinstance(entity_norm, str):
+        raise ValueError('Invalid cursor: %s' % cursor)
+    return surt_norm, entity_norm
+
+
+def count_surt_prefix(project, prefix):
+    """Count the project's URLs whose normalized SURT starts with prefix.
+
+    The count is read from the SURT tree: the node the prefix names, or the
+    nodes under its parent whose name starts with its last, partial segment.
+    Returns None for prefixes that reach past the host.
+    """
+    if not prefix.startswith('(') or ')' in prefix:
+        return None
+    *complete, partial = prefix[1:].split(',')
+    parent = ''.join(segment + ',' for segment in complete)
+    if not partial:
+        if not parent:
+            return get_project_stats(project).url_count
+        return (SURTNode.objects.filter(project=project, node=parent)
+                                .values_list('url_count', flat=True).first() or 0)
+    return (SURTNode.objects.filter(project=project, parent=parent, name__gte=partial,
+                                    name__lt=prefix_upper_bound(partial))
+                            .aggregate(total=Sum('url_count'))['total'] or 0)
 
 
 def get_domain_surt(surt):
@@ -3,7 +3,8 @@ from nomination.views import (
     project_listing, robot_ban, nomination_about, nomination_help, url_lookup, search_json,
     browse_json, project_dump, url_score_report, url_nomination_report, url_date_report,
     url_report, surt_report, nominator_report, nominator_url_report, field_report, value_report,
-    reports_view, url_listing, url_surt, url_add, project_about, project_urls
+    reports_view, url_listing, url_surt, url_add, project_about, project_urls, typeahead_json,
+    institutions_json, related_json, submission_status
 )
 from nomination.feeds import url_feed, nomination_feed
 
@@ -14,6 +15,11 @@ urlpatterns = [
     path("help/", nomination_help, name='nomination_help'),
     path("<slug>/lookup/", url_lookup, name='url_lookup'),
     path("<slug>/search.json", search_json, name='search_json'),
+    path("<slug>/typeahead.json", typeahead_json, name='typeahead_json'),
+    path("<slug>/institutions.json", institutions_json, name='institutions_json'),
+    path("<slug>/related.json", related_json, name='related_json'),
+    path("<slug>/submissions/<uuid:token>.json", submission_status,
+         name='submission_status'),
     path("<slug>/browse/<attribute>/browse.json", browse_json, name='browse_json'),
     path("<slug>/reports/projectdump/", project_dump, name='project_dump'),
     path("<slug>/reports/urls/score/", url_score_report, name='url_score_report'),
@@ -2,30 +2,56 @@ import json
 import datetime
 import re
 
+from functools import wraps
 from urllib.parse import quote, unquote
 
 from django.shortcuts import render, get_object_or_404
 from django import http
-from django.http import HttpResponse, HttpResponseRedirect
+from django.http import HttpResponse, HttpResponseRedirect, QueryDict, StreamingHttpResponse
 from django.conf import settings
-from django.db.models import Sum, Count, Max
+from django.core.paginator import Paginator
+from django.core.exceptions import BadRequest
+from django.db.models import Count, Max
 from django import forms
+from django.views.decorators.cache import never_cache
 from django.views.decorators.csrf import csrf_protect
+from django.utils.cache import get_conditional_response
 from django.utils.encoding import iri_to_uri
+from django.utils.http import http_date
 from django.contrib.sites.models import Site
 from django.urls import reverse
 
-from nomination.models import Project, URL, Nominator
+from nomination.intake import async_intake_enabled, enqueue
+from nomination.models import Project, URL, URLSummary, Nominator, Submission
 from nomination.url_handler import (
-    add_url, create_json_browse, create_url_list, create_json_search,
+    add_url, check_url, create_json_browse, create_url_list,
     add_metadata, fix_scheme_double_slash, create_surt_dict,
-    alphabetical_browse, get_metadata, handle_metadata, validate_date,
-    create_url_dump, strip_scheme
+    get_alphabetical_browse, get_metadata, get_project_validators, get_related_urls,
+    handle_metadata, validate_date,
+    iter_url_dump, iter_json_dump, iter_ndjson_dump, search_institutions, search_project_entities,
+    search_surt_urls, strip_scheme
 )
+from nomination.summaries import get_project_stats
 
 
 SCOPE_CHOICES = (('1', 'In Scope',),
                  ('-1', 'Out of Scope',),)
+# Rows fetched per database round trip, and characters per write, for streamed reports.
+REPORT_CHUNK_SIZE = 2000
+REPORT_BUFFER_SIZE = 64 * 1024
+# Default and largest number of URLs returned by the typeahead endpoint.
+TYPEAHEAD_LIMIT = 10
+TYPEAHEAD_MAX_LIMIT = 100
+# Matches shown per page of partial URL search results.
+SEARCH_PAGE_SIZE = 100
+# URLs shown per page when browsing by SURT prefix.
+SURT_PAGE_SIZE = 100
+# Related URLs shown either side of a URL on its listing page, and the
+# largest page of them returned by the related URLs endpoint.
+RELATED_URLS = 10
+RELATED_MAX_LIMIT = 100
+# Summary shown for a submission queued by async intake.
+QUEUED_MESSAGE = 'Your submission has been received and will be recorded shortly.'
 
 
 class URLForm(forms.Form):
@@ -67,6 +93,33 @@ class ScopeForm(forms.Form):
     )
 
 
+def project_conditional(view):
+    """Answer conditional GETs of a project page from the project's change watermark.
+
+    Requests whose If-None-Match or If-Modified-Since still match the project
+    get a 304 without the view running; other successful GET responses get
+    the project's ETag and Last-Modified. Not for pages with a form: a 304
+    would keep serving a stale CSRF token.
+    """
+    @wraps(view)
+    def wrapper(request, slug, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return view(request, slug, *args, **kwargs)
+        project = Project.objects.filter(project_slug=slug).first()
+        if project is None:
+            return view(request, slug, *args, **kwargs)
+        etag, last_modified = get_project_validators(project)
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = view(request, slug, *args, **kwargs)
+            if response.status_code == 200:
+                response.headers['ETag'] = etag
+                if last_modified is not None:
+                    response.headers['Last-Modified'] = http_date(last_modified)
+        return response
+    return wrapper
+
+
 def project_listing(request):
     # get the project by the project slug
     try:
@@ -108,32 +161,37 @@ def nomination_help(request):
     )
 
 
+@project_conditional
 def url_lookup(request, slug):
     # get the project by the project slug
     project = get_object_or_404(Project, project_slug=slug)
 
-    # handle the post
-    if request.method == 'POST':
-        posted_data = dict(request.POST.copy())
+    # handle the post, or a GET for a further page of partial search results
+    if request.method == 'POST' or 'search-url-value' in request.GET:
+        query = request.POST if request.method == 'POST' else request.GET
+        posted_data = dict(query.copy())
         if 'search-url-value' in posted_data:
             url_entity = posted_data['search-url-value'][0].strip().rstrip('/')
             if 'partial-search' in posted_data or not url_entity:
-                url_list = URL.objects.filter(
-                    url_project=project,
-                    attribute__iexact='surt',
-                    entity__icontains=strip_scheme(url_entity)
-                ).order_by('value')
-                if url_list:
+                url_list = search_surt_urls(project, strip_scheme(url_entity))
+                paginator = Paginator(url_list, getattr(settings, 'NOMINATION_SEARCH_PAGE_SIZE',
+                                                        SEARCH_PAGE_SIZE))
+                page = paginator.get_page(request.GET.get('page'))
+                if page:
+                    page_params = QueryDict(mutable=True)
+                    page_params['search-url-value'] = url_entity
+                    page_params['partial-search'] = ''
                     return render(
                         request,
                         'nomination/url_search_results.html',
-                        {'project': project, 'url_list': url_list}
+                        {'project': project, 'url_list': page,
+                         'page_query': page_params.urlencode()}
                     )
             if 'partial-search' not in posted_data and url_entity:
                 # check for scheme agnostic url matches
                 url_list = URL.objects.filter(
                     url_project=project,
-                    attribute__iexact='surt',
+                    attribute_norm='surt',
                     entity__endswith='://'+strip_scheme(url_entity)
                 ).values_list('entity', flat=True)
                 if url_list:
@@ -156,12 +214,10 @@ def project_urls(request, slug):
     project = get_object_or_404(Project, project_slug=slug)
 
     # Create the alphabetical browse dictionary
-    browse_tup = sorted(tuple(alphabetical_browse(project).items()))
+    browse_tup = sorted(tuple(get_alphabetical_browse(project).items()))
 
     # get general project statistics
-    urls = URL.objects.filter(url_project__project_slug__exact=slug)
-    url_count = get_project_url_count(urls)
-    nominator_count = get_project_nominator_count(urls)
+    stats = get_project_stats(project)
 
     return render(
         request,
@@ -169,8 +225,8 @@ def project_urls(request, slug):
         {
          'project': project,
          'browse_tup': browse_tup,
-         'url_count': url_count,
-         'nominator_count': nominator_count,
+         'url_count': stats.url_count,
+         'nominator_count': stats.nominator_count,
         },
         )
 
@@ -181,6 +237,7 @@ def url_listing(request, slug, url_entity):
     url_entity = fix_scheme_double_slash(url_entity)
     url_exists = True
     posted_data = None
+    submission = None
     # get the project by the project slug
     project = get_object_or_404(Project, project_slug=slug)
 
@@ -189,14 +246,11 @@ def url_listing(request, slug, url_entity):
     for pm in project.project_metadata_set.all():
         form_types[pm.metadata.name] = str(pm.form_type)
 
-    # get list of institutions to populate autocomplete
-    institutions = get_look_ahead(project)
-
     # create metadata/values set
     metadata_vals = get_metadata(project)
     # get the list of URLs
     try:
-        find_url = URL.objects.filter(entity__iexact=url_entity, url_project=project)
+        find_url = URL.objects.filter(entity_norm=url_entity.lower(), url_project=project)
     except Exception:
         url_exists = False
 
@@ -284,7 +338,11 @@ def url_listing(request, slug, url_entity):
                     posted_data = handle_metadata(request, posted_data)
 
                     posted_data['url_value'] = url_entity
-                    summary_list = add_metadata(project, posted_data)
+                    if async_intake_enabled():
+                        submission = enqueue(project, Submission.ADD_METADATA, posted_data)
+                        summary_list = [QUEUED_MESSAGE]
+                    else:
+                        summary_list = add_metadata(project, posted_data)
 
                     # clear out posted data, so it is not sent back to form
                     posted_data = None
@@ -295,20 +353,19 @@ def url_listing(request, slug, url_entity):
             scope_form = ScopeForm()
 
         # Create a dictionary from the URLs information pulled from all the URLs entries
-        url_list = URL.objects.filter(
-            entity__iexact=url_entity,
+        url_list = list(URL.objects.filter(
+            entity_norm=url_entity.lower(),
             url_project=project
-        ).order_by('attribute')
+        ).select_related('url_nominator').order_by('attribute'))
         url_data = create_url_list(project, url_list)
-        # Grab all related URLs
-        try:
-            related_url_list = URL.objects.filter(
-                url_project=project,
-                attribute__iexact='surt',
-                value__istartswith=url_data['surt']
-            ).order_by('value').exclude(entity__iexact=url_entity)
-        except Exception:
-            related_url_list = None
+        # Grab the nearest related URLs; the rest are paged from related.json
+        surt = next((url.value for url in url_list if url.attribute_norm == 'surt'), None)
+        if surt is None:
+            related = None
+        else:
+            related = get_related_urls(
+                project, url_entity, surt,
+                getattr(settings, 'NOMINATION_RELATED_URLS', RELATED_URLS))
 
         # in case of a user input error, send back data to repopulate form
         json_data = None
@@ -321,14 +378,14 @@ def url_listing(request, slug, url_entity):
             {
              'project': project,
              'url_data': url_data,
-             'related_url_list': related_url_list,
+             'related': related,
              'scope_form': scope_form,
              'form_errors': form_errors,
              'summary_list': summary_list,
+             'submission': submission,
              'metadata_vals': metadata_vals,
              'json_data': json_data,
              'form_types': json.dumps(form_types),
-             'institutions': institutions,
             },
             )
     else:
@@ -346,21 +403,26 @@ def url_listing(request, slug, url_entity):
              'summary_list': None,
              'json_data': None,
              'form_types': json.dumps(form_types),
-             'institutions': institutions,
              'url_entity': url_entity,
             },
             )
 
 
+@project_conditional
 def url_surt(request, slug, surt):
     # Add back the slash lost by Apache removing null path segments.
     surt = fix_scheme_double_slash(surt)
     # Get the project by the project slug.
     project = get_object_or_404(Project, project_slug=slug)
-    # Create the SURT dictionary containing url_list and single_letter.
-    surt_dict = create_surt_dict(project, surt)
+    # Create the SURT dictionary containing a page of url_list and single_letter.
+    try:
+        surt_dict = create_surt_dict(
+            project, surt, after=request.GET.get('after'), before=request.GET.get('before'),
+            page_size=getattr(settings, 'NOMINATION_SURT_PAGE_SIZE', SURT_PAGE_SIZE))
+    except ValueError as error:
+        raise BadRequest(str(error))
     # Create the alphabetical browse dictionary.
-    browse_dict = alphabetical_browse(project)
+    browse_dict = get_alphabetical_browse(project)
     # Add Browse by if browsing surts by letter.
     top_domain_search = re.compile(r'^(?:[^:]+://)?\(([^,]+),?').search(surt, 0)
     if top_domain_search:
@@ -375,6 +437,9 @@ def url_surt(request, slug, surt):
             'project': project,
             'url_list': surt_dict['url_list'],
             'letter': surt_dict['letter'],
+            'next_cursor': surt_dict['next_cursor'],
+            'prev_cursor': surt_dict['prev_cursor'],
+            'total': surt_dict['total'],
             'browse_domain': top_domain,
             'browse_dict': browse_dict,
         },
@@ -387,10 +452,9 @@ def url_add(request, slug):
     project = get_object_or_404(Project, project_slug=slug)
     # handle the post
     form_errors = None
-    # get list of institutions to populate autocomplete
-    institutions = get_look_ahead(project)
     some_errors = {}
     summary_list = []
+    submission = None
     req_fields = project.project_metadata_set.filter(required=True)
     date_fields = project.project_metadata_set.filter(form_type='date')
     posted_data = None
@@ -481,7 +545,12 @@ def url_add(request, slug):
                     # handle multivalue metadata and user supplied values
                     posted_data = handle_metadata(request, posted_data)
 
-                    summary_list = add_url(project, posted_data)
+                    if async_intake_enabled():
+                        posted_data['url_value'] = check_url(posted_data['url_value'])
+                        submission = enqueue(project, Submission.ADD_URL, posted_data)
+                        summary_list = [QUEUED_MESSAGE]
+                    else:
+                        summary_list = add_url(project, posted_data)
                     if not summary_list:
                         return HttpResponse('There was a problem processing your nominator '
                                             'details. Please contact {admin_email} for '
@@ -527,22 +596,21 @@ def url_add(request, slug):
          'form': form,
          'form_errors': form_errors,
          'summary_list': summary_list,
+         'submission': submission,
          'metadata_vals': metadata_vals,
          'json_data': json_data,
          'form_types': json.dumps(form_types),
-         'institutions': institutions,
          'url_entity': url_entity,
         },
         )
 
 
+@project_conditional
 def project_about(request, slug):
     # get the project by the project slug
     project = get_object_or_404(Project, project_slug=slug)
     # get general project statistics
-    urls = URL.objects.filter(url_project__project_slug__exact=slug)
-    url_count = get_project_url_count(urls)
-    nominator_count = get_project_nominator_count(urls)
+    stats = get_project_stats(project)
     # figure out if we need to show bookmarklets
     show_bookmarklets = datetime.datetime.now() < project.nomination_end
     url_base = ''
@@ -563,26 +631,15 @@ def project_about(request, slug):
         'nomination/project_about.html',
         {
          'project': project,
-         'url_count': url_count,
-         'nominator_count': nominator_count,
+         'url_count': stats.url_count,
+         'nominator_count': stats.nominator_count,
          'url_base': url_base,
          'show_bookmarklets': show_bookmarklets,
         },
         )
 
 
-def get_project_url_count(urls):
-    # get count of urls nominated to this project
-    return urls.filter(attribute__exact="surt").count()
-
-
-def get_project_nominator_count(urls):
-    # get count of unique nominators to project
-    return urls.filter(attribute__exact='nomination').filter(
-      value__exact=1).values_list(
-      'url_nominator', flat=True).distinct().count()
-
-
+@project_conditional
 def browse_json(request, slug, attribute):
     """Return a page with a JSON list representing a domain tree for added URLs."""
     if request.method == 'GET':
@@ -601,13 +658,114 @@ def browse_json(request, slug, attribute):
     return HttpResponse(json_string, content_type='application/json')
 
 
+@project_conditional
 def search_json(request, slug):
-    """Return a page with a JSON list of all URLs added to the specified project."""
-    json_string = create_json_search(slug)
+    """Return a page with a JSON list of the URLs added to the specified project.
 
-    return HttpResponse(json_string, content_type='application/json')
+    All URLs are listed unless the q, limit or cursor parameters select a
+    page of them; a Link header then points to the next page.
+    """
+    project = get_object_or_404(Project, project_slug=slug)
+    prefix, limit, cursor, any_scheme = get_search_params(request)
+    entities, next_cursor = search_project_entities(project, prefix, limit, cursor, any_scheme)
+    response = HttpResponse(json.dumps(entities), content_type='application/json')
+    if next_cursor is not None:
+        next_params = request.GET.copy()
+        next_params['cursor'] = next_cursor
+        response['Link'] = '<%s?%s>; rel="next"' % (request.path, next_params.urlencode())
+    return response
+
+
+@project_conditional
+def typeahead_json(request, slug):
+    """Return a JSON page of the project's URLs that start with the q parameter."""
+    project = get_object_or_404(Project, project_slug=slug)
+    prefix, limit, cursor, any_scheme = get_search_params(
+        request, default_limit=TYPEAHEAD_LIMIT,
+        max_limit=getattr(settings, 'NOMINATION_TYPEAHEAD_MAX_LIMIT', TYPEAHEAD_MAX_LIMIT))
+    entities, next_cursor = search_project_entities(project, prefix, limit, cursor, any_scheme)
+    return HttpResponse(json.dumps({'results': entities, 'next': next_cursor}),
+                        content_type='application/json')
 
 
+@project_conditional
+def institutions_json(request, slug):
+    """Return a JSON page of the project's nominator institutions that start with q."""
+    project = get_object_or_404(Project, project_slug=slug)
+    prefix, limit, _, _ = get_search_params(
+        request, default_limit=TYPEAHEAD_LIMIT,
+        max_limit=getattr(settings, 'NOMINATION_TYPEAHEAD_MAX_LIMIT', TYPEAHEAD_MAX_LIMIT))
+    return HttpResponse(json.dumps({'results': search_institutions(project, prefix, limit)}),
+                        content_type='application/json')
+
+
+@project_conditional
+def related_json(request, slug):
+    """Return a JSON page of the URLs related to the url parameter, by SURT.
+
+    Without an after or before cursor the URLs either side of url are
+    returned, as on its listing page.
+    """
+    project = get_object_or_404(Project, project_slug=slug)
+    entity = request.GET.get('url', '').strip()
+    if not entity:
+        raise BadRequest('url is required.')
+    _, limit, _, _ = get_search_params(
+        request, default_limit=getattr(settings, 'NOMINATION_RELATED_URLS', RELATED_URLS),
+        max_limit=RELATED_MAX_LIMIT)
+    surt = (URLSummary.objects.filter(project=project, entity_norm=entity.lower())
+                              .values_list('surt', flat=True).first())
+    if not surt:
+        raise http.Http404
+    try:
+        related = get_related_urls(project, entity, surt, limit,
+                                   after=request.GET.get('after'),
+                                   before=request.GET.get('before'))
+    except ValueError as error:
+        raise BadRequest(str(error))
+    results = [{'entity': summary.entity,
+                'url': reverse('url_listing', args=[slug, summary.entity])}
+               for summary in related['before'] + related['after']]
+    return HttpResponse(json.dumps({
+        'results': results,
+        'prev': related['prev_cursor'],
+        'next': related['next_cursor'],
+        'total': related['total'],
+    }), content_type='application/json')
+
+
+@never_cache
+def submission_status(request, slug, token):
+    """Return the status of a submission queued by async intake as JSON."""
+    submission = get_object_or_404(Submission, token=token, project__project_slug=slug)
+    return HttpResponse(json.dumps({
+        'token': str(submission.token),
+        'status': submission.status,
+        'attempts': submission.attempts,
+        'summary': submission.summary,
+        'created': submission.created.isoformat(),
+    }), content_type='application/json')
+
+
+def get_search_params(request, default_limit=None, max_limit=None):
+    """Read the q, limit, cursor and any_scheme parameters of a URL search."""
+    prefix = request.GET.get('q', '').strip()
+    cursor = request.GET.get('cursor') or None
+    any_scheme = request.GET.get('any_scheme', '').lower() in ('1', 'true', 'yes', 'on')
+    limit = default_limit
+    if request.GET.get('limit'):
+        try:
+            limit = int(request.GET['limit'])
+        except ValueError:
+            raise BadRequest('limit must be a number.')
+        if limit < 1:
+            raise BadRequest('limit must be a positive number.')
+    if max_limit is not None and limit is not None:
+        limit = min(limit, max_limit)
+    return prefix, limit, cursor, any_scheme
+
+
+@project_conditional
 def reports_view(request, slug):
     # get the project by the project slug
     project = get_object_or_404(Project, project_slug=slug)
@@ -629,6 +787,7 @@ def reports_view(request, slug):
         )
 
 
+@project_conditional
 def url_report(request, slug):
     # get the project by the project slug
     project = get_object_or_404(Project, project_slug=slug)
@@ -636,7 +795,7 @@ def url_report(request, slug):
     # get the list of URLs
     try:
         url_list = URL.objects.filter(
-            attribute__iexact='surt',
+            attribute_norm='surt',
             url_project=project
         ).order_by('value').values_list('entity', flat=True).distinct()
     except Exception:
@@ -647,11 +806,10 @@ def url_report(request, slug):
                     ' project.\n#Unique URLs sorted by SURT\n#List generated on ' + \
                     datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%SZ') + '\n\n'
 
-    report_text = report_header + '\n'.join(url_list)
-
-    return HttpResponse(report_text, content_type='text/plain; charset="UTF-8"')
+    return report_response(report_header, join_lines(iterate(url_list)))
 
 
+@project_conditional
 def surt_report(request, slug):
     # get the project by the project slug
     project = get_object_or_404(Project, project_slug=slug)
@@ -659,7 +817,7 @@ def surt_report(request, slug):
     # get the list of URLs
     try:
         surt_list = URL.objects.filter(
-            attribute__iexact='surt',
+            attribute_norm='surt',
             url_project=project
         ).values_list('value', flat=True).distinct().order_by('value')
     except Exception:
@@ -670,33 +828,29 @@ def surt_report(request, slug):
                     ' project.\n#SURTs sorted by SURT\n#List generated on ' + \
                     datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%SZ') + '\n\n'
 
-    report_text = report_header + '\n'.join(surt_list)
-
-    return HttpResponse(report_text, content_type='text/plain; charset="UTF-8"')
+    return report_response(report_header, join_lines(iterate(surt_list)))
 
 
+@project_conditional
 def url_score_report(request, slug):
     # get the project by the project slug
     project = get_object_or_404(Project, project_slug=slug)
 
-    results = (URL.objects.values('entity')
-                  .annotate(nomination_score=Sum('value'))
-                  .filter(url_project__id=project.id, attribute='nomination')
-                  .order_by('-nomination_score')
-                  .values_list('nomination_score', 'entity'))
-
-    report_text = '#This list of URLs was created for the ' + project.project_name + \
-                  ' project.\n#URLs and overall nomination score\n' + \
-                  '#List generated on ' + \
-                  datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%SZ") + "\n\n"
+    results = (URLSummary.objects.filter(project=project, nomination_count__gt=0)
+                                 .order_by('-nomination_score', 'entity_norm')
+                                 .values_list('nomination_score', 'entity'))
 
-    for row in results:
-        nomination_score, entity = row
-        report_text += '{0};"{1}"\n'.format(int(nomination_score), entity)
+    report_header = '#This list of URLs was created for the ' + project.project_name + \
+                    ' project.\n#URLs and overall nomination score\n' + \
+                    '#List generated on ' + \
+                    datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%SZ") + "\n\n"
 
-    return HttpResponse(report_text, content_type='text/plain; charset="UTF-8"')
+    lines = ('{0};"{1}"\n'.format(int(nomination_score), entity)
+             for nomination_score, entity in iterate(results))
+    return report_response(report_header, lines)
 
 
+@project_conditional
 def url_date_report(request, slug):
     # get the project by the project slug
     project = get_object_or_404(Project, project_slug=slug)
@@ -706,42 +860,37 @@ def url_date_report(request, slug):
                   .order_by('nomination_date')
                   .values_list('nomination_date', 'entity', 'value'))
 
-    report_text = '#This list of URLs was created for the ' + project.project_name + \
-                  ' project.\n#Nomination date, URL, and in/out of scope are given\n' +\
-                  '#List generated on ' + \
-                  datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%SZ") + "\n\n"
-
-    for row in results:
-        date, entity, value = row
-        report_text += '{0};"{1}";{2}\n'.format(date.strftime('%Y-%m-%dT%H:%M:%S'),
-                                                entity, value)
+    report_header = '#This list of URLs was created for the ' + project.project_name + \
+                    ' project.\n#Nomination date, URL, and in/out of scope are given\n' +\
+                    '#List generated on ' + \
+                    datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%SZ") + "\n\n"
 
-    return HttpResponse(report_text, content_type='text/plain; charset="UTF-8"')
+    lines = ('{0};"{1}";{2}\n'.format(date.strftime('%Y-%m-%dT%H:%M:%S'), entity, value)
+             for date, entity, value in iterate(results))
+    return report_response(report_header, lines)
 
 
+@project_conditional
 def url_nomination_report(request, slug):
     # get the project by the project slug
     project = get_object_or_404(Project, project_slug=slug)
 
-    results = (URL.objects.values('entity')
-                  .annotate(nominations=Count('entity'))
-                  .filter(url_project__id=project.id, attribute='nomination')
-                  .order_by('-nominations')
-                  .values_list('nominations', 'entity'))
-
-    report_text = '#This list of URLs was created for the ' + project.project_name + \
-                  ' project.\n#URLs and number of nominations ' + \
-                  '(could be either positive or negative nominations)\n' + \
-                  '#List generated on ' + \
-                  datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%SZ") + "\n\n"
+    results = (URLSummary.objects.filter(project=project, nomination_count__gt=0)
+                                 .order_by('-nomination_count', 'entity_norm')
+                                 .values_list('nomination_count', 'entity'))
 
-    for row in results:
-        nominations, entity = row
-        report_text += '{0};"{1}"\n'.format(int(nominations), entity)
+    report_header = '#This list of URLs was created for the ' + project.project_name + \
+                    ' project.\n#URLs and number of nominations ' + \
+                    '(could be either positive or negative nominations)\n' + \
+                    '#List generated on ' + \
+                    datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%SZ") + "\n\n"
 
-    return HttpResponse(report_text, content_type='text/plain; charset="UTF-8"')
+    lines = ('{0};"{1}"\n'.format(int(nominations), entity)
+             for nominations, entity in iterate(results))
+    return report_response(report_header, lines)
 
 
+@project_conditional
 def field_report(request, slug, field):
     # get the project by the project slug
     project = get_object_or_404(Project, project_slug=slug)
@@ -787,6 +936,7 @@ def field_report(request, slug, field):
         )
 
 
+@project_conditional
 def value_report(request, slug, field, val):
     val = unquote(val)
     # Add back the slash lost by Apache removing null path segments.
@@ -796,19 +946,20 @@ def value_report(request, slug, field, val):
     # If there are no URLs in the queryset, Apache rewrote the url,
     # so we need to add a trailing slash to do a lookup properly.
     urls = URL.objects.filter(url_project_id=project.id, attribute=field, value=val)
-    if urls.count() == 0:
+    if not urls.exists():
         val = val + '/'
         urls = URL.objects.filter(url_project_id=project.id, attribute=field, value=val)
-    report_text = '#This list of URLs was created for the ' + project.project_name + \
-                  ' project.\n#URLs for value "' + val + '" in metadata field "' + \
-                  field + '"\n' + \
-                  '#List generated on ' + \
-                  datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%SZ") + "\n\n"
-    for entity in urls.values_list('entity', flat=True).order_by('entity').distinct():
-        report_text += entity + '\n'
-    return HttpResponse(report_text, content_type='text/plain;')
+    report_header = '#This list of URLs was created for the ' + project.project_name + \
+                    ' project.\n#URLs for value "' + val + '" in metadata field "' + \
+                    field + '"\n' + \
+                    '#List generated on ' + \
+                    datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%SZ") + "\n\n"
+    entities = urls.values_list('entity', flat=True).order_by('entity').distinct()
+    lines = (entity + '\n' for entity in iterate(entities))
+    return report_response(report_header, lines, content_type='text/plain;')
 
 
+@project_conditional
 def nominator_report(request, slug, field):
     # get the project by the project slug
     project = get_object_or_404(Project, project_slug=slug)
@@ -837,6 +988,7 @@ def nominator_report(request, slug, field):
         )
 
 
+@project_conditional
 def nominator_url_report(request, slug, field, nomid):
     # get the project by the project slug
     project = get_object_or_404(Project, project_slug=slug)
@@ -863,34 +1015,61 @@ def nominator_url_report(request, slug, field, nomid):
                       .values_list('entity', flat=True)
                       .distinct())
 
-    report_text = ('#This list of URLs was created for the ' + project.project_name +
-                   ' project.\n#URLs for ' + field + ' "' + nomname + '"\n' +
-                   '#List generated on ' +
-                   datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%SZ") + '\n\n')
-    for entity in results:
-        report_text += entity + '\n'
+    report_header = ('#This list of URLs was created for the ' + project.project_name +
+                     ' project.\n#URLs for ' + field + ' "' + nomname + '"\n' +
+                     '#List generated on ' +
+                     datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%SZ") + '\n\n')
 
-    return HttpResponse(report_text, content_type='text/plain; charset="UTF-8"')
+    return report_response(report_header, (entity + '\n' for entity in iterate(results)))
 
 
+@project_conditional
 def project_dump(request, slug):
+    """Stream every URL of a project as JSON, or as NDJSON with ?format=ndjson."""
     # get the project by the project slug
     project = get_object_or_404(Project, project_slug=slug)
-    project_urls = {}
-    # Create dictionary from the URLs data pulled from all URLs entries
-    project_urls = create_url_dump(project)
-    response = HttpResponse(content_type='application/json; charset=utf-8')
-    json.dump(project_urls, fp=response, sort_keys=True, indent=4, ensure_ascii=False)
-    response['Content-Disposition'] = 'attachment; filename=' + slug + '_urls.json'
+    entities = iter_url_dump(project, chunk_size=REPORT_CHUNK_SIZE)
+    if request.GET.get('format') == 'ndjson':
+        response = report_response('', iter_ndjson_dump(entities),
+                                   content_type='application/x-ndjson; charset=utf-8')
+        response['Content-Disposition'] = 'attachment; filename=' + slug + '_urls.ndjson'
+    else:
+        response = report_response('', iter_json_dump(entities),
+                                   content_type='application/json; charset=utf-8')
+        response['Content-Disposition'] = 'attachment; filename=' + slug + '_urls.json'
     return response
 
 
-def get_look_ahead(project):
-    """Returns nominating institution list."""
-    nominator_list = URL.objects.filter(
-      url_project__exact=project.id).select_related(
-      'url_nominator__nominator_institution').values_list(
-      'url_nominator__nominator_institution', flat=True).distinct().order_by(
-      'url_nominator__nominator_institution')
+def iterate(queryset):
+    """Iterate a report queryset in chunks instead of loading it all at once."""
+    return queryset.iterator(chunk_size=REPORT_CHUNK_SIZE)
+
+
+def join_lines(lines):
+    """Yield lines separated, but not terminated, by newlines (like '\\n'.join)."""
+    separator = ''
+    for line in lines:
+        yield separator + line
+        separator = '\n'
+
+
+def report_response(header, lines, content_type='text/plain; charset="UTF-8"'):
+    """Stream a plain-text report as UTF-8 without building it in memory.
+
+    Lines are gathered into blocks of about REPORT_BUFFER_SIZE characters so
+    that each write to the client carries a useful amount of data.
+    """
+    def content():
+        buffer = [header]
+        size = len(header)
+        for line in lines:
+            buffer.append(line)
+            size += len(line)
+            if size >= REPORT_BUFFER_SIZE:
+                yield ''.join(buffer).encode('utf-8')
+                buffer = []
+                size = 0
+        if buffer:
+            yield ''.join(buffer).encode('utf-8')
 
-    return json.dumps(list(nominator_list))
+    return StreamingHttpResponse(content(), content_type=content_type)
@@ -0,0 +1,38 @@
+from django.core.cache import cache
+import pytest
+
+from nomination import entity_index, nominator_cache
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """Start every test with an empty cache.
+
+    Database rows are rolled back between tests and primary keys get reused,
+    so cached per-project data must not outlive the test that created it.
+    """
+    cache.clear()
+    entity_index.reset()
+    nominator_cache.reset()
+    yield
+    cache.clear()
+    entity_index.reset()
+    nominator_cache.reset()
+
+
+@pytest.fixture
+def synthetic_project(db):
+    """A generated project large enough for per-row queries to show in query counts."""
+    from nomination.management.commands.generate_project import ProjectGenerator
+    return ProjectGenerator('synthetic', entities=200, nominators=20, fields=3,
+                            values=4).run()
+
+
+@pytest.fixture
+def committed(django_capture_on_commit_callbacks):
+    """Return a context manager that runs the on_commit callbacks of its block.
+
+    Tests run inside a transaction that never commits, so caches and
+    watermarks updated on commit need this to see the change.
+    """
+    return lambda: django_capture_on_commit_callbacks(execute=True)
@@ -0,0 +1,108 @@
+import pytest
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from nomination import admin, models
+from . import factories
+
+
+pytestmark = pytest.mark.django_db
+
+
+def changelist_queries(client, url, params=None):
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(url, params or {})
+    assert response.status_code == 200
+    return response, len(queries)
+
+
+class TestURLAdmin:
+
+    def test_query_count_does_not_grow_with_rows(self, admin_client):
+        url = reverse('admin:nomination_url_changelist')
+        factories.URLFactory.create_batch(2)
+        # The first request also loads the session and the current site.
+        changelist_queries(admin_client, url)
+        _, few = changelist_queries(admin_client, url)
+        factories.URLFactory.create_batch(10)
+        response, many = changelist_queries(admin_client, url)
+
+        assert len(response.context['cl'].result_list) == 12
+        assert many == few
+
+    def test_project_filter(self, admin_client):
+        project = factories.ProjectFactory()
+        url = factories.URLFactory(url_project=project)
+        factories.URLFactory.create_batch(2)
+        response, _ = changelist_queries(admin_client, reverse('admin:nomination_url_changelist'),
+                                         {'project': project.project_slug})
+
+        assert list(response.context['cl'].result_list) == [url]
+
+    @pytest.mark.parametrize('field', ['id', 'nominator_email', 'nominator_name'])
+    def test_nominator_filter(self, admin_client, field):
+        url = factories.URLFactory()
+        factories.URLFactory.create_batch(2)
+        value = getattr(url.url_nominator, field)
+        response, _ = changelist_queries(admin_client, reverse('admin:nomination_url_changelist'),
+                                         {'nominator': str(value)})
+
+        assert list(response.context['cl'].result_list) == [url]
+
+    def test_attribute_filter(self, admin_client):
+        surt = factories.SURTFactory()
+        factories.URLFactory.create_batch(2)
+        response, _ = changelist_queries(admin_client, reverse('admin:nomination_url_changelist'),
+                                         {'attribute': 'surt'})
+
+        assert list(response.context['cl'].result_list) == [surt]
+
+    def test_input_filters_rendered(self, admin_client):
+        project = factories.ProjectFactory()
+        surt = factories.SURTFactory(url_project=project)
+        factories.URLFactory(url_project=project)
+        response, _ = changelist_queries(admin_client, reverse('admin:nomination_url_changelist'),
+                                         {'project': project.project_slug, 'attribute': 'surt'})
+        content = response.content.decode()
+
+        assert list(response.context['cl'].result_list) == [surt]
+        assert '<input type="text" name="project" value="%s">' % project.project_slug in content
+        assert '<input type="text" name="nominator" value="">' in content
+        # each input filter's form carries the other active filters along
+        assert '<input type="hidden" name="attribute" value="surt">' in content
+        assert '<input type="hidden" name="project" value="%s">' % project.project_slug \
+            in content
+
+    def test_count_is_capped(self, admin_client, settings):
+        settings.NOMINATION_ADMIN_COUNT_LIMIT = 3
+        factories.URLFactory.create_batch(5)
+        response, _ = changelist_queries(admin_client, reverse('admin:nomination_url_changelist'))
+
+        assert response.context['cl'].result_count == 3
+
+
+class TestNominatorAdmin:
+
+    def test_nominations_annotated(self, admin_client):
+        nominator = factories.NominatorFactory()
+        factories.NominatedURLFactory.create_batch(3, url_nominator=nominator)
+        factories.NominatorFactory()
+        url = reverse('admin:nomination_nominator_changelist')
+        changelist_queries(admin_client, url)
+        response, few = changelist_queries(admin_client, url)
+        counts = {obj.pk: obj.nomination_count for obj in response.context['cl'].result_list}
+        factories.NominatorFactory.create_batch(5)
+        _, many = changelist_queries(admin_client, url)
+
+        assert counts.pop(nominator.pk) == 3
+        assert set(counts.values()) == {0}
+        assert many == few
+
+
+def test_capped_count_paginator():
+    factories.URLFactory.create_batch(3)
+    paginator = admin.CappedCountPaginator(models.URL.objects.order_by('pk'), 2)
+
+    assert paginator.count == 3
@@ -0,0 +1,64 @@
+import json
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+import pytest
+
+from nomination import nominator_cache, summaries
+from nomination.management.commands import benchmark_project, generate_project
+from nomination.models import URL, Nominator
+
+
+pytestmark = pytest.mark.django_db
+
+
+class TestBenchmarkProject:
+
+    def test_writes_results(self, tmp_path):
+        generate_project.ProjectGenerator('generated', entities=20, nominators=3).run()
+        output = tmp_path / 'results.json'
+        call_command('benchmark_project', 'generated', '-o', str(output), '--repeat', '1',
+                     '--ingest', '5')
+        results = json.loads(output.read_text())
+        benchmarks = {benchmark['name']: benchmark for benchmark in results['benchmarks']}
+
+        assert results['entities'] == 20
+        assert {'url_listing', 'url_surt', 'nomination_feed', 'project_dump',
+                'fielded_batch_ingest'} <= set(benchmarks)
+        assert {benchmark['status'] for benchmark in benchmarks.values()} <= {200, 'ok'}
+        assert all(benchmark['queries'] > 0 for benchmark in benchmarks.values())
+        assert all(len(benchmark['times']) == 1 for benchmark in benchmarks.values())
+        # the ingest is rolled back
+        assert URL.objects.filter(url_project__project_slug='generated',
+                                  attribute='surt').count() == 20
+
+    def test_compare(self, tmp_path):
+        generate_project.ProjectGenerator('generated', entities=5, nominators=2).run()
+        first = tmp_path / 'first.json'
+        call_command('benchmark_project', 'generated', '-o', str(first), '--repeat', '1',
+                     '--ingest', '0')
+        second = tmp_path / 'second.json'
+        call_command('benchmark_project', 'generated', '-o', str(second), '--repeat', '1',
+                     '--ingest', '0', '--compare', str(first))
+
+        assert 'fielded_batch_ingest' not in second.read_text()
+
+    def test_missing_project(self, tmp_path):
+        with pytest.raises(CommandError, match='does not exist'):
+            call_command('benchmark_project', 'missing', '-o', str(tmp_path / 'out.json'))
+
+
+@pytest.mark.django_db(transaction=True)
+def test_ingest_leaves_nothing_cached():
+    project = generate_project.ProjectGenerator('generated', entities=5, nominators=2).run()
+    summaries.get_browse_index(project.id)
+    benchmark = benchmark_project.IngestBenchmark(project, 5)
+    benchmark.execute()
+    # the rolled back benchmark nominator's id may be handed out again
+    nominator = Nominator.objects.create(nominator_name='Real', nominator_institution='UNT',
+                                         nominator_email='real@example.com')
+
+    assert benchmark.status == 'ok'
+    assert cache.get(summaries.BROWSE_CACHE_KEY % project.id) is None
+    assert nominator_cache.get_by_id(nominator.id).nominator_name == 'Real'
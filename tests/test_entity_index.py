@@ -0,0 +1,198 @@
+import pytest
+
+from nomination import entity_index
+from nomination.models import URL, EntityChange
+from . import factories
+
+
+pytestmark = pytest.mark.django_db
+
+ENTITIES = [
+    'http://www.example.com',
+    'http://www.example.com/about',
+    'https://www.example.com/contact',
+    'http://www.Example.org',
+    'ftp://files.example.com',
+]
+
+
+@pytest.fixture
+def project():
+    project = factories.ProjectFactory()
+    for entity in ENTITIES:
+        factories.SURTFactory(url_project=project, entity=entity)
+    return project
+
+
+class TestSearchEntities:
+
+    def test_all_entities_sorted(self, project):
+        entities, cursor = entity_index.search_entities(project.id)
+
+        assert entities == [
+            'ftp://files.example.com',
+            'http://www.example.com',
+            'http://www.example.com/about',
+            'http://www.Example.org',
+            'https://www.example.com/contact',
+        ]
+        assert cursor is None
+
+    def test_prefix_is_case_insensitive(self, project):
+        entities, _ = entity_index.search_entities(project.id, 'HTTP://WWW.EXAMPLE.')
+
+        assert entities == ['http://www.example.com', 'http://www.example.com/about',
+                            'http://www.Example.org']
+
+    def test_any_scheme(self, project):
+        entities, _ = entity_index.search_entities(project.id, 'www.example.com',
+                                                   any_scheme=True)
+
+        assert entities == ['http://www.example.com', 'http://www.example.com/about',
+                            'https://www.example.com/contact']
+
+    def test_any_scheme_ignores_prefix_scheme(self, project):
+        entities, _ = entity_index.search_entities(project.id, 'ftp://www.example.com/c',
+                                                   any_scheme=True)
+
+        assert entities == ['https://www.example.com/contact']
+
+    def test_pages_with_cursor(self, project):
+        pages = []
+        cursor = None
+        while True:
+            entities, cursor = entity_index.search_entities(project.id, 'http', limit=2,
+                                                            cursor=cursor)
+            pages.append(entities)
+            if cursor is None:
+                break
+
+        assert pages == [
+            ['http://www.example.com', 'http://www.example.com/about'],
+            ['http://www.Example.org', 'https://www.example.com/contact'],
+        ]
+
+    def test_no_matches(self, project):
+        assert entity_index.search_entities(project.id, 'gopher://') == ([], None)
+
+    def test_other_projects_excluded(self, project):
+        factories.SURTFactory(entity='http://www.example.com/other')
+        entities, _ = entity_index.search_entities(project.id, 'http://www.example.com/o')
+
+        assert entities == []
+
+    def test_distinct_entities(self, project):
+        factories.NominatedURLFactory(url_project=project, entity='http://www.example.com')
+        entities, _ = entity_index.search_entities(project.id, 'http://www.example.com')
+
+        assert entities == ['http://www.example.com', 'http://www.example.com/about']
+
+
+class TestRefresh:
+
+    def test_new_entities_added_on_commit(self, project, committed, django_assert_num_queries):
+        entity_index.search_entities(project.id)
+        with committed():
+            factories.SURTFactory(url_project=project, entity='http://www.example.com/new')
+
+        with django_assert_num_queries(0):
+            entities, _ = entity_index.search_entities(project.id, 'http://www.example.com/n')
+        assert entities == ['http://www.example.com/new']
+
+    def test_uncommitted_entities_not_added(self, project, settings):
+        settings.NOMINATION_ENTITY_INDEX_REFRESH = 60
+        entity_index.search_entities(project.id)
+        factories.SURTFactory(url_project=project, entity='http://www.example.com/new')
+        entities, _ = entity_index.search_entities(project.id, 'http://www.example.com/n')
+
+        assert entities == []
+
+    def test_only_surt_rows_indexed(self, project):
+        factories.NominatedURLFactory(url_project=project, entity='http://www.example.com/nom')
+        entities, _ = entity_index.search_entities(project.id, 'http://www.example.com/n')
+
+        assert entities == []
+
+    def test_rows_written_elsewhere_read_on_refresh(self, project, settings):
+        settings.NOMINATION_ENTITY_INDEX_REFRESH = 0
+        entity_index.search_entities(project.id)
+        # bulk_create skips the code that records new entities, as if another
+        # process had written the row
+        URL.objects.bulk_create([URL(url_project=project,
+                                     url_nominator=factories.NominatorFactory(),
+                                     entity='http://www.example.com/bulk', attribute='surt',
+                                     value='http://(com,example,www,)/bulk',
+                                     attribute_norm='surt')])
+        entities, _ = entity_index.search_entities(project.id, 'http://www.example.com/b')
+
+        assert entities == ['http://www.example.com/bulk']
+
+    def test_refresh_waits_for_interval(self, project, settings, django_assert_num_queries):
+        settings.NOMINATION_ENTITY_INDEX_REFRESH = 60
+        entity_index.search_entities(project.id)
+
+        with django_assert_num_queries(0):
+            entity_index.search_entities(project.id)
+
+    def test_search_does_not_wait_for_refresh(self, project, settings,
+                                              django_assert_num_queries):
+        settings.NOMINATION_ENTITY_INDEX_REFRESH = 0
+        index = entity_index.get_entity_index(project.id)
+        with index.refresh_lock:
+            with django_assert_num_queries(0):
+                entities, _ = entity_index.search_entities(project.id, 'ftp://')
+
+        assert entities == ['ftp://files.example.com']
+
+    def test_removed_after_delete(self, project, committed, settings):
+        settings.NOMINATION_ENTITY_INDEX_REFRESH = 60
+        entity_index.search_entities(project.id)
+        with committed():
+            URL.objects.get(url_project=project, entity='http://www.example.com/about').delete()
+        entities, _ = entity_index.search_entities(project.id, 'http://www.example.com')
+
+        assert entities == ['http://www.example.com']
+
+    def test_deletes_elsewhere_replayed_without_reload(self, project, settings,
+                                                       django_assert_num_queries):
+        settings.NOMINATION_ENTITY_INDEX_REFRESH = 0
+        entity_index.search_entities(project.id)
+        url = URL.objects.get(url_project=project, entity='http://www.example.com/about')
+        # another process deleting the row leaves only the change log behind
+        EntityChange.objects.create(project=project, url_id=url.id, entity=url.entity)
+        # one query for new surt rows and one for new changes
+        with django_assert_num_queries(2):
+            entities, _ = entity_index.search_entities(project.id, 'http://www.example.com')
+
+        assert entities == ['http://www.example.com']
+
+    def test_change_for_replaced_row_ignored(self, project, settings):
+        settings.NOMINATION_ENTITY_INDEX_REFRESH = 0
+        entity_index.search_entities(project.id)
+        EntityChange.objects.create(project=project, url_id=0, entity='http://www.example.com')
+        entities, _ = entity_index.search_entities(project.id, 'http://www.example.com')
+
+        assert entities == ['http://www.example.com', 'http://www.example.com/about']
+
+
+class TestEntityIndex:
+
+    def test_remove_many(self):
+        index = entity_index.EntityIndex(1)
+        rows = [(i, 'http://example.com/%03d' % i) for i in range(250)]
+        index.add(rows)
+        index.remove(rows[:200])
+
+        assert index.search() == ([entity for _, entity in rows[200:]], None)
+        assert len(index.agnostic_keys) == 50
+
+    def test_changes_replayed_in_order(self):
+        index = entity_index.EntityIndex(1)
+        index.add([(1, 'http://example.com/a')])
+        index.apply_changes([(1, 1, 'http://example.com/a', True),
+                             (2, 1, 'http://example.com/b', False),
+                             (3, 1, 'http://example.com/b', True),
+                             (4, 1, 'http://example.com/c', False)])
+
+        assert index.search() == (['http://example.com/c'], None)
+        assert index.last_change_id == 4
@@ -2,6 +2,8 @@ import pytest
 from datetime import timedelta
 
 from django.http import Http404
+from django.urls import reverse
+from django.utils.http import http_date
 
 from nomination import feeds
 from . import factories
@@ -314,3 +316,111 @@ class TestNominationFeed:
         item_description = feed.item_description(nom)
 
         assert item_description == nom.entity
+
+
+class TestFeedLimits:
+
+    def test_items_are_capped(self, settings):
+        settings.NOMINATION_FEED_ITEMS = 2
+        project = factories.ProjectFactory()
+        factories.SURTFactory.create_batch(3, url_project=project)
+
+        items = feeds.url_feed().items(project)
+
+        assert len(items) == 2
+
+    def test_item_attributes_are_read_in_one_query(self, rf, django_assert_num_queries):
+        project = factories.ProjectFactory()
+        surts = factories.SURTFactory.create_batch(3, url_project=project)
+        for surt in surts:
+            factories.URLFactory(url_project=project, entity=surt.entity, attribute='Title')
+            factories.URLFactory(url_project=project, entity=surt.entity, attribute='Description')
+        feed = feeds.url_feed()
+        feed.get_object(rf.get('/'), project.project_slug)
+
+        with django_assert_num_queries(2):
+            items = feed.items(project)
+            for item in items:
+                feed.item_title(item)
+                feed.item_description(item)
+
+    def test_nomination_feed_skips_conflicting_titles(self, rf):
+        project = factories.ProjectFactory()
+        nom = factories.NominatedURLFactory(url_project=project)
+        factories.URLFactory.create_batch(2, url_project=project, entity=nom.entity,
+                                          attribute='Title')
+        feed = feeds.nomination_feed()
+        feed.get_object(rf.get('/'), project.project_slug)
+
+        assert feed.item_title(nom) == nom.entity
+
+    def test_requests_do_not_share_state(self, rf):
+        first, second = factories.ProjectFactory(), factories.ProjectFactory()
+        entity = 'http://www.example.com'
+        factories.SURTFactory(url_project=first, entity=entity)
+        factories.SURTFactory(url_project=second, entity=entity)
+        factories.URLFactory(url_project=first, entity=entity, attribute='Title',
+                             value='First')
+        feed = feeds.url_feed()
+        # two requests served by the one feed instance, interleaved
+        first_items = feed.items(feed.get_object(rf.get('/'), first.project_slug))
+        second_items = feed.items(feed.get_object(rf.get('/'), second.project_slug))
+
+        assert feed.item_title(first_items[0]) == 'First'
+        assert feed.item_title(second_items[0]) == entity
+        assert feed.item_link(first_items[0]) == reverse('url_listing',
+                                                         args=[first.project_slug, entity])
+
+
+class TestFeedConditionalGet:
+
+    @pytest.mark.parametrize('name', ['url_feed', 'nomination_feed'])
+    def test_response_has_validators(self, client, name):
+        project = factories.ProjectFactory()
+        surt = factories.SURTFactory(url_project=project)
+        factories.NominatedURLFactory(url_project=project, entity=surt.entity)
+        project.refresh_from_db()
+
+        response = client.get(reverse(name, args=[project.project_slug]))
+
+        assert response.status_code == 200
+        assert response['ETag']
+        assert response['Last-Modified'] == http_date(int(project.last_modified.timestamp()))
+
+    def test_matching_etag_returns_304(self, client):
+        project = factories.ProjectFactory()
+        factories.SURTFactory(url_project=project)
+        url = reverse('url_feed', args=[project.project_slug])
+        etag = client.get(url)['ETag']
+
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        assert response.status_code == 304
+
+    def test_unmodified_since_returns_304(self, client):
+        project = factories.ProjectFactory()
+        factories.SURTFactory(url_project=project)
+        url = reverse('url_feed', args=[project.project_slug])
+        last_modified = client.get(url)['Last-Modified']
+
+        response = client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+
+        assert response.status_code == 304
+
+    def test_new_url_changes_etag(self, client, committed):
+        project = factories.ProjectFactory()
+        surt = factories.SURTFactory(url_project=project)
+        url = reverse('url_feed', args=[project.project_slug])
+        etag = client.get(url)['ETag']
+        with committed():
+            factories.URLFactory(url_project=project, entity=surt.entity, attribute='Title')
+
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        assert response.status_code == 200
+        assert response['ETag'] != etag
+
+    def test_missing_project_raises_404(self, client):
+        response = client.get(reverse('url_feed', args=['missing']))
+
+        assert response.status_code == 404
@@ -1,13 +1,21 @@
 import datetime
 import pathlib
+import pickle
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from unittest.mock import patch, Mock
 
 from django.core.management import call_command
-from django.db import IntegrityError
+from django.core.management.base import CommandError
+from django.db import IntegrityError, connection
+from django.test.utils import CaptureQueriesContext
 import pytest
 
+from nomination import summaries
 from nomination.management.commands import fielded_batch_ingest
-from nomination.models import URL
+from nomination.models import SURTNode, URL, URLSummary
 from . import factories
 
 
@@ -21,63 +29,90 @@ EXPECTED = [
      'entity': 'https://example1.com',
      'attribute': 'nomination',
      'value': '1',
-     'date': MOCKED_DATETIME},
+     'date': MOCKED_DATETIME,
+     'entity_norm': 'https://example1.com',
+     'attribute_norm': 'nomination',
+     'value_norm': '1'},
     {'id': 2,
      'url_project_id': 1,
      'url_nominator_id': 1,
      'entity': 'https://example1.com',
      'attribute': 'surt',
      'value': 'http://(com,example1,)',
-     'date': MOCKED_DATETIME},
+     'date': MOCKED_DATETIME,
+     'entity_norm': 'https://example1.com',
+     'attribute_norm': 'surt',
+     'value_norm': 'http://(com,example1,)'},
     {'id': 3,
      'url_project_id': 1,
      'url_nominator_id': 2,
      'entity': 'https://example1.com',
      'attribute': 'List_Name',
      'value': 'file.txt',
-     'date': MOCKED_DATETIME},
+     'date': MOCKED_DATETIME,
+     'entity_norm': 'https://example1.com',
+     'attribute_norm': 'list_name',
+     'value_norm': 'file.txt'},
     {'id': 4,
      'url_project_id': 1,
      'url_nominator_id': 2,
      'entity': 'https://example1.com',
      'attribute': 'State',
      'value': 'Texas',
-     'date': MOCKED_DATETIME},
+     'date': MOCKED_DATETIME,
+     'entity_norm': 'https://example1.com',
+     'attribute_norm': 'state',
+     'value_norm': 'texas'},
     {'id': 5,
      'url_project_id': 1,
      'url_nominator_id': 2,
      'entity': 'http://example3.com',
      'attribute': 'nomination',
      'value': '1',
-     'date': MOCKED_DATETIME},
+     'date': MOCKED_DATETIME,
+     'entity_norm': 'http://example3.com',
+     'attribute_norm': 'nomination',
+     'value_norm': '1'},
     {'id': 6,
      'url_project_id': 1,
      'url_nominator_id': 1,
      'entity': 'http://example3.com',
      'attribute': 'surt',
      'value': 'http://(com,example3,)',
-     'date': MOCKED_DATETIME},
+     'date': MOCKED_DATETIME,
+     'entity_norm': 'http://example3.com',
+     'attribute_norm': 'surt',
+     'value_norm': 'http://(com,example3,)'},
     {'id': 7,
      'url_project_id': 1,
      'url_nominator_id': 2,
      'entity': 'http://example3.com',
      'attribute': 'List_Name',
      'value': 'file.txt',
-     'date': MOCKED_DATETIME},
+     'date': MOCKED_DATETIME,
+     'entity_norm': 'http://example3.com',
+     'attribute_norm': 'list_name',
+     'value_norm': 'file.txt'},
     {'id': 8,
      'url_project_id': 1,
      'url_nominator_id': 2,
      'entity': 'http://example3.com',
      'attribute': 'State',
      'value': 'Arkansas',
-     'date': MOCKED_DATETIME},
+     'date': MOCKED_DATETIME,
+     'entity_norm': 'http://example3.com',
+     'attribute_norm': 'state',
+     'value_norm': 'arkansas'},
     {'id': 9,
      'url_project_id': 1,
      'url_nominator_id': 2,
      'entity': 'http://example3.com',
      'attribute': 'List_Name',
      'value': 'file2.txt',
-     'date': MOCKED_DATETIME}]
+     'date': MOCKED_DATETIME,
+     'entity_norm': 'http://example3.com',
+     'attribute_norm': 'list_name',
+     'value_norm': 'file2.txt'}]
 
 
 class TestCommandHandle():
@@ -93,7 +128,9 @@ class TestCommandHandle():
                      f'--nominator={self.nominator}',
                      f'--project={self.slug}',
                      '--verify')
-        mocked_url_ingest.assert_called_once_with(input_file, self.nominator, self.slug, True)
+        mocked_url_ingest.assert_called_once_with(input_file, self.nominator, self.slug, True,
+                                                  batch_size=1000, progress=False,
+                                                  verify_workers=16, verify_per_host=2)
 
     @patch('nomination.management.commands.fielded_batch_ingest.csv_ingest')
     def test_command_handle_csv_ingest(self, mocked_csv_ingest):
@@ -103,7 +140,9 @@ class TestCommandHandle():
                      f'--nominator={self.nominator}',
                      f'--project={self.slug}',
                      '--csv')
-        mocked_csv_ingest.assert_called_once_with(input_file, self.nominator, self.slug, False)
+        mocked_csv_ingest.assert_called_once_with(input_file, self.nominator, self.slug, False,
+                                                  batch_size=1000, progress=False,
+                                                  verify_workers=16, verify_per_host=2)
 
     @patch('nomination.management.commands.fielded_batch_ingest.pydict_ingest')
     def test_command_handle_pydict_ingest(self, mocked_pydict_ingest):
@@ -113,7 +152,30 @@ class TestCommandHandle():
                      f'--nominator={self.nominator}',
                      f'--project={self.slug}',
                      '--dict')
-        mocked_pydict_ingest.assert_called_once_with(input_file, self.nominator, self.slug, False)
+        mocked_pydict_ingest.assert_called_once_with(input_file, self.nominator, self.slug, False,
+                                                     batch_size=1000, progress=False,
+                                                     verify_workers=16, verify_per_host=2)
+
+    @patch('nomination.management.commands.fielded_batch_ingest.url_ingest')
+    def test_command_handle_batch_options(self, mocked_url_ingest):
+        input_file = 'seeds.txt'
+        call_command('fielded_batch_ingest',
+                     input_file,
+                     f'--nominator={self.nominator}',
+                     f'--project={self.slug}',
+                     '--batch-size=50',
+                     '--progress')
+        mocked_url_ingest.assert_called_once_with(input_file, self.nominator, self.slug, False,
+                                                  batch_size=50, progress=True,
+                                                  verify_workers=16, verify_per_host=2)
+
+    def test_command_handle_rejects_bad_batch_size(self):
+        with pytest.raises(CommandError):
+            call_command('fielded_batch_ingest',
+                         'seeds.txt',
+                         f'--nominator={self.nominator}',
+                         f'--project={self.slug}',
+                         '--batch-size=0')
 
 
 @pytest.mark.django_db
@@ -146,6 +208,26 @@ class TestCSVIngest():
                                 'Created 5 other attribute entries.\n')
         assert list(URL.objects.all().values()) == EXPECTED
 
+    def test_csv_ingest_in_small_batches(self, capsys):
+        project = factories.ProjectFactory()
+        nominator = factories.NominatorFactory()
+
+        call_command('fielded_batch_ingest',
+                     CSV,
+                     f'--nominator={nominator.id}',
+                     f'--project={project.project_slug}',
+                     '--csv',
+                     '--batch-size=2',
+                     '--progress')
+
+        captured = capsys.readouterr()
+        assert captured.out == ('Created 2 new SURT entries.\n'
+                                'Created 2 new nomination entries.\n'
+                                'Created 5 other attribute entries.\n')
+        assert captured.err.splitlines()[-1] == 'Processed 3 records, created 9 URL rows.'
+        assert list(URL.objects.all().values()) == EXPECTED
+        assert URLSummary.objects.filter(project=project).count() == 2
+
     def test_csv_ingest_reingest_does_nothing(self, capsys):
         """Verify running the same file a second time does nothing."""
         project = factories.ProjectFactory()
@@ -178,104 +260,425 @@ class TestCSVIngest():
 
 
 @pytest.mark.django_db
-class TestCreateURLEntryLessDB:
+@patch('django.utils.timezone.now', Mock(return_value=MOCKED_DATETIME))
+class TestURLIngest():
 
-    @patch('django.utils.timezone.now', Mock(return_value=MOCKED_DATETIME))
-    def test_create_url_entry_less_db_creates_surt(self):
-        """Verify we create a SURT entry for a newly-nominated URL."""
+    def test_url_ingest(self, tmp_path, capsys):
         project = factories.ProjectFactory()
         nominator = factories.NominatorFactory()
-        url = 'https://example1.com'
-        attribute = 'surt'
-        value = 'http://(com,example1,)'
-        surts_set = set()
-        result = fielded_batch_ingest.create_url_entry_less_db(project,
-                                                               nominator,
-                                                               url,
-                                                               attribute,
-                                                               value,
-                                                               surts_set=surts_set)
-        assert result
-        assert list(URL.objects.all().values()) == [{'id': 1,
-                                                     'url_project_id': project.id,
-                                                     'url_nominator_id': nominator.id,
-                                                     'entity': url,
-                                                     'attribute': attribute,
-                                                     'value': value,
-                                                     'date': MOCKED_DATETIME}]
-        assert surts_set == {'https://example1.com'}
+        seeds = tmp_path / 'seeds.txt'
+        seeds.write_text('www.example.com\n\nhttp://example.com/page/\nwww.example.com\n')
 
-    def test_create_url_entry_less_db_surt_exists(self):
-        """Verify we don't create another SURT for an already-nominated URL."""
+        fielded_batch_ingest.url_ingest(seeds, nominator.id, project.project_slug, False)
+
+        captured = capsys.readouterr()
+        assert captured.out == ('Created 2 new url surt entries.\n'
+                                'Created 2 new url nomination entries out of 3 possible '
+                                'entries.\n')
+        assert set(URL.objects.values_list('entity', 'attribute', 'value')) == {
+            ('http://www.example.com', 'nomination', '1'),
+            ('http://www.example.com', 'surt', 'http://(com,example,www,)'),
+            ('http://example.com/page', 'nomination', '1'),
+            ('http://example.com/page', 'surt', 'http://(com,example,)/page'),
+        }
+
+    @pytest.mark.parametrize('url_count', [100, 300])
+    def test_query_count_does_not_grow_with_urls(self, tmp_path, url_count):
         project = factories.ProjectFactory()
         nominator = factories.NominatorFactory()
-        url = 'https://example1.com'
-        attribute = 'surt'
-        value = 'http://(com,example1,)'
-        result = fielded_batch_ingest.create_url_entry_less_db(project,
-                                                               nominator,
-                                                               url,
-                                                               attribute,
-                                                               value,
-                                                               surts_set={url})
-        assert not result
+        factories.SURTFactory(url_project=project, entity='http://host0.example.com/',
+                              value='http://(com,example,host0,)/')
+        seeds = tmp_path / 'seeds.txt'
+        seeds.write_text(''.join('http://host%s.example%s.com/page%s\n' % (i % 7, i % 3, i)
+                                 for i in range(url_count)))
+
+        with CaptureQueriesContext(connection) as queries:
+            fielded_batch_ingest.url_ingest(seeds, nominator.id, project.project_slug, False)
+
+        # A fixed number of reads and updates per batch; bulk inserts are
+        # split into as many statements as the backend's parameter limit needs.
+        assert len([query for query in queries
+                    if not query['sql'].startswith('INSERT')]) <= 20
+
+        assert URLSummary.objects.filter(project=project).count() == url_count + 1
+        assert summaries.check_browse_index(project) == []
+        surts = (URL.objects.filter(url_project=project, attribute_norm='surt')
+                            .values_list('value', flat=True))
+        expected_tree = {node: (fields['child_count'], fields['url_count'])
+                         for node, fields in summaries.build_surt_tree(surts).items()}
+        tree = {node: (child_count, url_count) for node, child_count, url_count
+                in SURTNode.objects.filter(project=project)
+                                   .values_list('node', 'child_count', 'url_count')}
+        assert tree == expected_tree
 
-    @patch('django.utils.timezone.now', Mock(return_value=MOCKED_DATETIME))
-    def test_create_url_entry_less_db_non_surt_new_nomination(self):
+
+@pytest.mark.django_db
+class TestPydictIngest():
+
+    def test_pydict_ingest(self, tmp_path, capsys):
         project = factories.ProjectFactory()
         nominator = factories.NominatorFactory()
-        url = 'https://example4.com'
-        attribute = 'nomination'
-        value = '1'
-        nominator_urls = set()
-        result = fielded_batch_ingest.create_url_entry_less_db(project,
-                                                               nominator,
-                                                               url,
-                                                               attribute,
-                                                               value,
-                                                               nominator_urls_set=nominator_urls)
-        assert result
+        data_file = tmp_path / 'data.pkl'
+        with open(data_file, 'wb') as f:
+            pickle.dump({'url': 'www.example.com', 'Title': 'Example',
+                         'Tags': ['one', 'two'], 'Empty': ''}, f)
+            pickle.dump({'url': 'www.example.com', 'Tags': ['two', 'three']}, f)
+
+        fielded_batch_ingest.pydict_ingest(data_file, nominator.id, project.project_slug, False)
+
+        captured = capsys.readouterr()
+        assert captured.out == ('Created 1 new SURT entries.\n'
+                                'Created 1 new nomination entries.\n'
+                                'Created 4 other attribute entries.\n')
+        assert sorted(URL.objects.filter(attribute='Tags').values_list('value', flat=True)) == [
+            'one', 'three', 'two']
+
+
+@pytest.mark.django_db
+class TestURLBatchWriter:
+
+    def get_writer(self, **kwargs):
+        project = factories.ProjectFactory()
+        nominator = factories.NominatorFactory()
+        system_nominator = factories.NominatorFactory()
+        return fielded_batch_ingest.URLBatchWriter(project, nominator, system_nominator,
+                                                   **kwargs)
+
+    @patch('django.utils.timezone.now', Mock(return_value=MOCKED_DATETIME))
+    def test_creates_surt(self):
+        """Verify we create a SURT entry for a newly-nominated URL."""
+        writer = self.get_writer()
+        system_nominator = writer.system_nominator
+        url = 'https://example1.com'
+        assert writer.add_surt(url)
+        writer.flush()
+
         assert list(URL.objects.all().values()) == [{'id': 1,
-                                                     'url_project_id': project.id,
-                                                     'url_nominator_id': nominator.id,
+                                                     'url_project_id': writer.project.id,
+                                                     'url_nominator_id': system_nominator.id,
                                                      'entity': url,
-                                                     'attribute': attribute,
-                                                     'value': value,
-                                                     'date': MOCKED_DATETIME}]
-        assert f'{url}{attribute}{value}' in nominator_urls
+                                                     'attribute': 'surt',
+                                                     'value': 'http://(com,example1,)',
+                                                     'date': MOCKED_DATETIME,
+                                                     'entity_norm': url,
+                                                     'attribute_norm': 'surt',
+                                                     'value_norm': 'http://(com,example1,)'}]
+        assert writer.counts['surt'] == 1
+
+    def test_surt_exists(self):
+        """Verify we don't create another SURT for an already-nominated URL."""
+        writer = self.get_writer()
+        factories.SURTFactory(url_project=writer.project, entity='https://example1.com')
+        writer = fielded_batch_ingest.URLBatchWriter(writer.project, writer.nominator,
+                                                     writer.system_nominator)
+
+        assert not writer.add_surt('HTTPS://example1.com')
 
     @patch('django.utils.timezone.now', Mock(return_value=MOCKED_DATETIME))
-    def test_create_url_entry_less_db_non_surt_duplicate_nomination(self):
+    def test_new_nomination(self):
+        writer = self.get_writer()
+        url = 'https://example4.com'
+        assert writer.add(url, 'nomination', '1')
+        writer.flush()
+
+        assert list(URL.objects.all().values()) == [{'id': 1,
+                                                     'url_project_id': writer.project.id,
+                                                     'url_nominator_id': writer.nominator.id,
+                                                     'entity': url,
+                                                     'attribute': 'nomination',
+                                                     'value': '1',
+                                                     'date': MOCKED_DATETIME,
+                                                     'entity_norm': url,
+                                                     'attribute_norm': 'nomination',
+                                                     'value_norm': '1'}]
+        assert writer.counts['nomination'] == 1
+
+    def test_duplicate_nomination(self):
+        writer = self.get_writer()
+        factories.NominatedURLFactory(url_project=writer.project, url_nominator=writer.nominator,
+                                      entity='https://example4.com', value='1')
+        writer = fielded_batch_ingest.URLBatchWriter(writer.project, writer.nominator,
+                                                     writer.system_nominator)
+
+        # Nomination appears to be a duplicate, so don't create a nomination.
+        assert not writer.add('https://Example4.com', 'nomination', '1')
+        assert not writer.pending
+
+    def test_writes_full_batches(self):
+        writer = self.get_writer(batch_size=3)
+        writer.add('https://example1.com', 'nomination', '1')
+        writer.add('https://example2.com', 'nomination', '1')
+
+        assert URL.objects.count() == 0
+        writer.add('https://example3.com', 'nomination', '1')
+        assert URL.objects.count() == 3
+        assert not writer.pending
+
+    @patch('nomination.models.URL.objects.bulk_create', side_effect=IntegrityError())
+    def test_integrity_error_falls_back_to_single_rows(self, mocked_bulk_create, capsys):
+        writer = self.get_writer()
+        url = 'https://example5.com'
+        writer.add(url, 'nomination', '1')
+        writer.add(url, 'nomination', None)
+        writer.flush()
+
+        captured = capsys.readouterr()
+        assert captured.out == (f'Failed to create a new entry for url: {url} '
+                                'attribute: nomination value: None\n')
+        assert list(URL.objects.values_list('entity', 'value')) == [(url, '1')]
+        assert writer.counts['nomination'] == 1
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Answer HEAD and GET requests like a small web site, recording each request."""
+    protocol_version = 'HTTP/1.1'
+
+    def do_HEAD(self):
+        self.respond()
+
+    def do_GET(self):
+        self.respond()
+
+    def respond(self):
+        server = self.server
+        started = time.monotonic()
+        with server.lock:
+            server.requests.append((self.command, self.path, self.client_address[1]))
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+        if self.path.startswith('/slow'):
+            time.sleep(0.05)
+        elif self.path.startswith('/hang'):
+            time.sleep(0.5)
+        location = None
+        if self.path == '/missing':
+            status = 404
+        elif self.path.startswith('/moved'):
+            status, location = 301, self.path[len('/moved'):]
+        elif self.path == '/loop':
+            status, location = 302, '/loop'
+        elif self.path == '/nohead' and self.command == 'HEAD':
+            status = 405
+        else:
+            status = 200
+        with server.lock:
+            server.active -= 1
+            server.intervals.append((started, time.monotonic()))
+        self.send_response(status)
+        if location:
+            self.send_header('Location', location)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+def start_stand_in_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StandInHandler)
+    server.lock = threading.Lock()
+    server.requests = []
+    server.active = 0
+    server.max_active = 0
+    server.intervals = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    server.base_url = 'http://127.0.0.1:%s' % server.server_address[1]
+    return server
+
+
+@pytest.fixture
+def stand_in_server():
+    server = start_stand_in_server()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def other_server():
+    server = start_stand_in_server()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def max_overlap(intervals):
+    """Return the largest number of (start, end) intervals open at once."""
+    events = sorted([(start, 1) for start, _ in intervals] + [(end, -1) for _, end in intervals])
+    open_count = most = 0
+    for _, change in events:
+        open_count += change
+        most = max(most, open_count)
+    return most
+
+
+def closed_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class TestURLVerifier:
+
+    def test_verify(self, stand_in_server, capsys):
+        base = stand_in_server.base_url
+        verifier = fielded_batch_ingest.URLVerifier(workers=4, per_host=2)
+        verified = verifier.verify([base + '/ok', base + '/missing', base + '/nohead',
+                                    base + '/ok', 'ftp://example.com/file'])
+
+        assert verified == {base + '/ok', base + '/nohead'}
+        requests = [request[:2] for request in stand_in_server.requests]
+        assert ('GET', '/nohead') in requests
+        # repeated URLs are checked once
+        assert requests.count(('HEAD', '/ok')) == 1
+        captured = capsys.readouterr()
+        assert 'Response: 404; skipping URL %s/missing' % base in captured.out
+
+    def test_per_host_limit(self, stand_in_server):
+        base = stand_in_server.base_url
+        verifier = fielded_batch_ingest.URLVerifier(workers=8, per_host=2)
+        verifier.verify(['%s/slow/%s' % (base, i) for i in range(8)])
+
+        assert len(stand_in_server.requests) == 8
+        assert stand_in_server.max_active <= 2
+
+    def test_hosts_checked_in_turn(self, stand_in_server, other_server):
+        verifier = fielded_batch_ingest.URLVerifier(workers=4, per_host=1)
+        # sorted by host, so workers taking URLs in input order would all
+        # wait on the first host
+        verifier.verify(['%s/slow/%s' % (stand_in_server.base_url, i) for i in range(8)]
+                        + ['%s/slow/%s' % (other_server.base_url, i) for i in range(4)])
+
+        assert stand_in_server.max_active == other_server.max_active == 1
+        assert max_overlap(stand_in_server.intervals + other_server.intervals) == 2
+        first_starts = sorted(start for start, _ in stand_in_server.intervals)
+        assert min(start for start, _ in other_server.intervals) < first_starts[1]
+
+    def test_connection_reused(self, stand_in_server):
+        base = stand_in_server.base_url
+        verifier = fielded_batch_ingest.URLVerifier(workers=1, per_host=1)
+        verifier.verify(['%s/page/%s' % (base, i) for i in range(5)])
+
+        client_ports = {request[2] for request in stand_in_server.requests}
+        assert len(stand_in_server.requests) == 5
+        assert len(client_ports) == 1
+
+    def test_connection_closed_when_host_is_done(self, stand_in_server, other_server):
+        verifier = fielded_batch_ingest.URLVerifier(workers=1, per_host=1)
+        open_at_close = []
+
+        def close():
+            open_at_close.extend(connection.port for connection in verifier._connections)
+            fielded_batch_ingest.URLVerifier.close(verifier)
+
+        with patch.object(verifier, 'close', side_effect=close):
+            verifier.verify([stand_in_server.base_url + '/one', stand_in_server.base_url + '/two',
+                             other_server.base_url + '/one'])
+
+        # each host's connection was closed as soon as its URLs were checked
+        assert open_at_close == []
+        assert verifier._connections == set()
+
+    def test_connections_per_worker_are_limited(self, stand_in_server, other_server):
+        verifier = fielded_batch_ingest.URLVerifier(workers=1, per_host=1)
+        verifier.max_connections = 1
+        verifier.verify([stand_in_server.base_url + '/one', other_server.base_url + '/one',
+                         stand_in_server.base_url + '/two', other_server.base_url + '/two'])
+
+        # each switch of host evicted the other host's connection
+        assert len({request[2] for request in stand_in_server.requests}) == 2
+        assert len({request[2] for request in other_server.requests}) == 2
+
+    def test_redirects_followed(self, stand_in_server, other_server, capsys):
+        base = stand_in_server.base_url
+        verifier = fielded_batch_ingest.URLVerifier(workers=2, per_host=1)
+        verified = verifier.verify([base + '/moved/ok', base + '/moved/missing',
+                                    base + '/moved' + other_server.base_url + '/ok',
+                                    base + '/loop'])
+
+        assert verified == {base + '/moved/ok', base + '/moved' + other_server.base_url + '/ok'}
+        assert [request[:2] for request in other_server.requests] == [('HEAD', '/ok')]
+        captured = capsys.readouterr()
+        assert 'Response: 404; skipping URL %s/moved/missing' % base in captured.out
+        assert 'Too many redirects; skipping URL %s/loop' % base in captured.out
+
+    def test_unreachable_host_not_checked_again(self):
+        base = 'http://127.0.0.1:%s' % closed_port()
+        verifier = fielded_batch_ingest.URLVerifier(workers=1, per_host=1)
+        with patch.object(verifier, '_request', wraps=verifier._request) as mocked_request:
+            verified = verifier.verify([base + '/one', base + '/two'])
+
+        assert verified == set()
+        assert mocked_request.call_count == 1
+
+    def test_timed_out_host_not_checked_again(self, stand_in_server):
+        base = stand_in_server.base_url
+        verifier = fielded_batch_ingest.URLVerifier(workers=1, per_host=1, timeout=0.1)
+        verified = verifier.verify([base + '/hang/one', base + '/hang/two'])
+
+        assert verified == set()
+        assert [request[1] for request in stand_in_server.requests] == ['/hang/one']
+        assert base[len('http://'):] in verifier.dead_hosts
+
+    def test_results_file(self, stand_in_server, tmp_path):
+        base = stand_in_server.base_url
+        results_file = tmp_path / 'seeds.txt.verified'
+        verifier = fielded_batch_ingest.URLVerifier(results_file=str(results_file))
+        verifier.verify([base + '/ok', base + '/missing'])
+
+        assert sorted(results_file.read_text().splitlines()) == [
+            base + '/missing\tResponse: 404',
+            base + '/ok\tok',
+        ]
+
+        # a rerun reads the results back instead of checking again
+        stand_in_server.requests.clear()
+        verifier = fielded_batch_ingest.URLVerifier(results_file=str(results_file))
+        verified = verifier.verify([base + '/ok', base + '/missing', base + '/nohead'])
+
+        assert verified == {base + '/ok', base + '/nohead'}
+        assert [request[:2] for request in stand_in_server.requests] == [('HEAD', '/nohead'),
+                                                                         ('GET', '/nohead')]
+
+
+@pytest.mark.django_db
+class TestVerifiedIngest:
+
+    def test_url_ingest_skips_unavailable_urls(self, stand_in_server, tmp_path, capsys):
+        base = stand_in_server.base_url
         project = factories.ProjectFactory()
         nominator = factories.NominatorFactory()
-        nominator_urls = {'https://example4.comnomination1'}
-        # Nomination appears to be a duplicate, so don't create a nomination.
-        result = fielded_batch_ingest.create_url_entry_less_db(project,
-                                                               nominator,
-                                                               'https://example4.com',
-                                                               'nomination',
-                                                               '1',
-                                                               nominator_urls_set=nominator_urls)
-        assert not result
-
-    @patch('nomination.models.URL.objects.create', side_effect=IntegrityError())
-    def test_create_url_entry_less_db_raises_IntegrityError(self, mocked_create, capsys):
+        seeds = tmp_path / 'seeds.txt'
+        seeds.write_text('%s/ok\n%s/missing\n' % (base, base))
+
+        call_command('fielded_batch_ingest',
+                     seeds,
+                     f'--nominator={nominator.id}',
+                     f'--project={project.project_slug}',
+                     '--verify')
+
+        captured = capsys.readouterr()
+        assert captured.out.endswith('Created 1 new url surt entries.\n'
+                                     'Created 1 new url nomination entries out of 1 possible '
+                                     'entries.\n')
+        nominated = URL.objects.filter(attribute='nomination').values_list('entity', flat=True)
+        assert list(nominated) == [base + '/ok']
+        assert (tmp_path / 'seeds.txt.verified').exists()
+
+    def test_csv_ingest_skips_unavailable_urls(self, stand_in_server, tmp_path, capsys):
+        base = stand_in_server.base_url
         project = factories.ProjectFactory()
         nominator = factories.NominatorFactory()
-        url = 'https://example5.com'
-        attribute = 'nomination'
-        value = '1'
-        result = fielded_batch_ingest.create_url_entry_less_db(project,
-                                                               nominator,
-                                                               url,
-                                                               attribute,
-                                                               value)
-        assert not result
+        seeds = tmp_path / 'seeds.csv'
+        seeds.write_text('url,Title\n%s/ok,Fine\n%s/missing,Gone\n' % (base, base))
+
+        fielded_batch_ingest.csv_ingest(seeds, nominator.id, project.project_slug, True)
+
         captured = capsys.readouterr()
-        assert captured.out == (f'Failed to create a new entry for url: {url} '
-                                f'attribute: {attribute} value: {value}\n')
-        mocked_create.assert_called_once_with(url_project=project, url_nominator=nominator,
-                                              entity=url, attribute=attribute, value=value)
+        assert captured.out.endswith('Created 1 new SURT entries.\n'
+                                     'Created 1 new nomination entries.\n'
+                                     'Created 1 other attribute entries.\n')
 
 
 class TestURLFormatter:
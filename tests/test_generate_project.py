@@ -0,0 +1,54 @@
+from django.core.management import call_command
+from django.core.management.base import CommandError
+import pytest
+
+from nomination import summaries
+from nomination.management.commands import generate_project
+from nomination.models import URL, Project, ProjectStats, SURTNode
+from . import factories
+
+
+pytestmark = pytest.mark.django_db
+
+
+class TestGenerateProject:
+
+    def test_creates_project(self):
+        call_command('generate_project', 'generated', '--entities', '50', '--nominators', '5',
+                     '--fields', '2', '--values', '3', '--batch-size', '40')
+        project = Project.objects.get(project_slug='generated')
+        urls = URL.objects.filter(url_project=project)
+
+        assert urls.filter(attribute='surt').count() == 50
+        assert urls.filter(attribute='nomination').values('entity').distinct().count() == 50
+        assert set(urls.values_list('attribute', flat=True)) <= {
+            'surt', 'nomination', 'generated_field_0', 'generated_field_1'}
+        assert all(url.entity_norm == url.entity.lower() and url.value_norm == url.value.lower()
+                   for url in urls)
+        assert project.project_metadata_set.count() == 2
+
+    def test_derived_tables_are_consistent(self):
+        generate_project.ProjectGenerator('generated', entities=30, nominators=4).run()
+        project = Project.objects.get(project_slug='generated')
+
+        assert ProjectStats.objects.get(project=project).url_count == 30
+        assert SURTNode.objects.filter(project=project).exists()
+        for check in summaries.CHECKERS.values():
+            assert not check(project)
+
+    def test_seed_is_repeatable(self):
+        def entities(slug):
+            generate_project.ProjectGenerator(slug, entities=20, nominators=3, seed=7).run()
+            return list(URL.objects.filter(url_project__project_slug=slug, attribute='surt')
+                                   .order_by('id').values_list('entity', flat=True))
+
+        assert entities('first') == entities('second')
+
+    def test_existing_project(self):
+        factories.ProjectFactory(project_slug='taken')
+        with pytest.raises(CommandError, match='already exists'):
+            call_command('generate_project', 'taken')
+
+    def test_invalid_count(self):
+        with pytest.raises(CommandError, match='--entities must be a positive number'):
+            call_command('generate_project', 'generated', '--entities', '0')
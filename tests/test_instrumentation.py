@@ -0,0 +1,106 @@
+import logging
+
+from django.http import StreamingHttpResponse
+from django.test import RequestFactory
+from django.urls import reverse
+import pytest
+
+from nomination import instrumentation
+from nomination.models import Project
+from . import factories
+
+
+pytestmark = pytest.mark.django_db
+
+MIDDLEWARE = 'nomination.instrumentation.MetricsMiddleware'
+
+
+@pytest.fixture
+def metrics_middleware(settings):
+    settings.MIDDLEWARE = [MIDDLEWARE] + list(settings.MIDDLEWARE)
+
+
+class TestMeasure:
+
+    def test_counts_queries(self):
+        factories.ProjectFactory.create_batch(2)
+        with instrumentation.measure() as metrics:
+            list(Project.objects.all())
+            Project.objects.count()
+
+        assert metrics.queries == 2
+        assert metrics.db_time > 0
+        assert metrics.total_time >= metrics.db_time
+
+    def test_times_rendering(self, client):
+        project = factories.ProjectFactory()
+        with instrumentation.measure() as metrics:
+            client.get(reverse('project_about', args=[project.project_slug]))
+
+        assert metrics.render_time > 0
+
+    def test_nested_blocks(self):
+        with instrumentation.measure() as outer:
+            Project.objects.count()
+            with instrumentation.measure() as inner:
+                Project.objects.count()
+
+        assert (outer.queries, inner.queries) == (2, 1)
+        assert instrumentation.get_active_metrics() == []
+
+    def test_query_budget(self):
+        with instrumentation.query_budget(1):
+            Project.objects.count()
+        with pytest.raises(AssertionError, match='2 queries were run, over the budget of 1'):
+            with instrumentation.query_budget(1):
+                Project.objects.count()
+                Project.objects.count()
+
+
+class TestMetricsMiddleware:
+
+    def test_debug_headers(self, client, settings, metrics_middleware):
+        settings.DEBUG = True
+        project = factories.ProjectFactory()
+        response = client.get(reverse('project_about', args=[project.project_slug]))
+
+        assert int(response['X-Nomination-Queries']) > 0
+        assert int(response['X-Nomination-Response-Size']) == len(response.content)
+        assert response['Server-Timing'].startswith('db;dur=')
+
+    def test_no_headers_without_debug(self, client, settings, metrics_middleware):
+        settings.DEBUG = False
+        project = factories.ProjectFactory()
+        response = client.get(reverse('project_about', args=[project.project_slug]))
+
+        assert not response.has_header('X-Nomination-Queries')
+        assert not response.has_header('Server-Timing')
+
+    def test_logs_metrics(self, client, caplog, metrics_middleware):
+        project = factories.ProjectFactory()
+        with caplog.at_level(logging.INFO, logger='nomination.metrics'):
+            client.get(reverse('project_about', args=[project.project_slug]))
+        record = caplog.records[-1]
+
+        assert record.levelno == logging.INFO
+        assert record.metrics['view'] == 'project_about'
+        assert record.metrics['queries'] > 0
+
+    def test_warns_over_budget(self, client, caplog, settings, metrics_middleware):
+        settings.NOMINATION_QUERY_BUDGETS = {'project_about': 1}
+        project = factories.ProjectFactory()
+        with caplog.at_level(logging.INFO, logger='nomination.metrics'):
+            client.get(reverse('project_about', args=[project.project_slug]))
+        warnings = [record for record in caplog.records if record.levelno == logging.WARNING]
+
+        assert len(warnings) == 1
+        assert 'over its budget of 1' in warnings[0].getMessage()
+
+    def test_streamed_response_size(self, settings):
+        settings.DEBUG = True
+        middleware = instrumentation.MetricsMiddleware(
+            lambda request: StreamingHttpResponse(iter([b'a', b'b'])))
+        response = middleware(RequestFactory().get('/'))
+
+        assert not response.has_header('X-Nomination-Response-Size')
+        assert response.has_header('X-Nomination-Queries')
@@ -0,0 +1,227 @@
+import datetime
+import json
+
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+import pytest
+
+from nomination import intake, nominator_cache, url_handler
+from nomination.models import URL, Nominator, Submission
+from . import factories
+
+
+pytestmark = pytest.mark.django_db
+
+NOMINATOR = {
+    'nominator_name': 'Eddie',
+    'nominator_institution': 'UNT',
+    'nominator_email': 'someone@somewhere.com',
+}
+
+
+def add_url_data(url_value='http://www.example.com', **extra):
+    return dict(NOMINATOR, url_value=url_value, **extra)
+
+
+class TestEnqueue:
+
+    def test_stores_form_data(self):
+        project = factories.ProjectFactory()
+        submission = intake.enqueue(project, Submission.ADD_URL,
+                                    add_url_data(field=['a', 'b'], csrfmiddlewaretoken='x'))
+        submission.refresh_from_db()
+
+        assert submission.status == Submission.PENDING
+        assert submission.form_data == add_url_data(field=['a', 'b'])
+
+
+class TestProcessBatch:
+
+    def test_writes_add_url_submission(self):
+        project = factories.ProjectWithMetadataFactory()
+        name = project.metadata.first().name
+        submission = intake.enqueue(project, Submission.ADD_URL,
+                                    add_url_data(**{name: ['one', 'two']}))
+
+        assert intake.process_batch() == {'done': 1, 'pending': 0, 'failed': 0}
+        submission.refresh_from_db()
+        assert submission.status == Submission.DONE
+        assert submission.attempts == 1
+        assert submission.summary[0] == 'You have successfully nominated http://www.example.com'
+        assert URL.objects.filter(url_project=project).count() == 4
+
+    def test_writes_add_metadata_submission(self):
+        project = factories.ProjectFactory()
+        intake.enqueue(project, Submission.ADD_METADATA,
+                       add_url_data(scope='-1'))
+        intake.process_batch()
+
+        assert URL.objects.get(attribute='nomination').value == '-1'
+
+    def test_batches(self):
+        project = factories.ProjectFactory()
+        for i in range(3):
+            intake.enqueue(project, Submission.ADD_URL, add_url_data('http://%s.com' % i))
+
+        assert intake.process_batch(batch_size=2)['done'] == 2
+        assert intake.process_batch(batch_size=2)['done'] == 1
+        assert intake.process_batch(batch_size=2)['done'] == 0
+
+    def test_failure_is_retried_then_failed(self, monkeypatch, settings):
+        settings.NOMINATION_INTAKE_RETRY_DELAY = 0
+        project = factories.ProjectFactory()
+        submission = intake.enqueue(project, Submission.ADD_URL, add_url_data())
+
+        def broken(project, form_data):
+            raise ValueError('broken')
+
+        monkeypatch.setitem(intake.ACTIONS, Submission.ADD_URL, broken)
+        assert intake.process_batch(max_attempts=2)['pending'] == 1
+        submission.refresh_from_db()
+        assert (submission.status, submission.attempts) == (Submission.PENDING, 1)
+        assert submission.error == 'ValueError: broken'
+
+        assert intake.process_batch(max_attempts=2)['failed'] == 1
+        submission.refresh_from_db()
+        assert (submission.status, submission.attempts) == (Submission.FAILED, 2)
+        assert not URL.objects.exists()
+
+    def test_retry_waits(self, monkeypatch):
+        project = factories.ProjectFactory()
+        submission = intake.enqueue(project, Submission.ADD_URL, add_url_data())
+        monkeypatch.setitem(intake.ACTIONS, Submission.ADD_URL,
+                            lambda project, form_data: 1 / 0)
+        intake.process_batch()
+        submission.refresh_from_db()
+
+        assert submission.available_at > timezone.now()
+        assert intake.process_batch() == {'done': 0, 'pending': 0, 'failed': 0}
+
+    def test_ambiguous_nominator_fails_at_once(self, monkeypatch):
+        project = factories.ProjectFactory()
+        submission = intake.enqueue(project, Submission.ADD_URL, add_url_data())
+        # add_url returns False when the nominator details are ambiguous
+        monkeypatch.setitem(intake.ACTIONS, Submission.ADD_URL, lambda project, form_data: False)
+        intake.process_batch()
+        submission.refresh_from_db()
+
+        assert submission.status == Submission.FAILED
+        assert submission.error == intake.NOMINATOR_ERROR
+
+    def test_stale_claims_are_taken_again(self):
+        project = factories.ProjectFactory()
+        submission = intake.enqueue(project, Submission.ADD_URL, add_url_data())
+        assert intake.claim() == [submission]
+        assert intake.claim() == []
+        Submission.objects.filter(pk=submission.pk).update(
+            updated=timezone.now() - datetime.timedelta(seconds=700))
+
+        assert intake.claim(stale_after=600) == [submission]
+        submission.refresh_from_db()
+        assert submission.attempts == 2
+
+    def test_requeue_failed(self):
+        project = factories.ProjectFactory()
+        submission = intake.enqueue(project, Submission.ADD_URL, add_url_data())
+        Submission.objects.filter(pk=submission.pk).update(status=Submission.FAILED, attempts=5)
+
+        assert intake.requeue_failed() == 1
+        assert intake.process_batch()['done'] == 1
+
+
+@pytest.mark.django_db(transaction=True)
+def test_failed_submission_leaves_no_cached_nominator(monkeypatch):
+    project = factories.ProjectFactory()
+    submission = intake.enqueue(project, Submission.ADD_URL, add_url_data())
+
+    def broken(*args, **kwargs):
+        raise ValueError('broken')
+
+    # the nominator is created, then the write fails and rolls it back
+    monkeypatch.setattr(url_handler, 'write_nomination', broken)
+    intake.process_batch()
+    submission.refresh_from_db()
+
+    assert submission.status == Submission.PENDING
+    assert not Nominator.objects.filter(nominator_email=NOMINATOR['nominator_email']).exists()
+    assert nominator_cache.get_by_identity(NOMINATOR['nominator_email'],
+                                           NOMINATOR['nominator_name'],
+                                           NOMINATOR['nominator_institution']) is None
+
+
+class TestProcessSubmissionsCommand:
+
+    def test_drains_queue(self, capsys):
+        project = factories.ProjectFactory()
+        for i in range(3):
+            intake.enqueue(project, Submission.ADD_URL, add_url_data('http://%s.com' % i))
+        call_command('process_submissions', '--batch-size', '2')
+
+        assert 'Wrote 3 submissions, 0 will be retried and 0 failed.' in capsys.readouterr().out
+        assert not Submission.objects.exclude(status=Submission.DONE).exists()
+
+    def test_retry_failed(self, capsys):
+        project = factories.ProjectFactory()
+        submission = intake.enqueue(project, Submission.ADD_URL, add_url_data())
+        Submission.objects.filter(pk=submission.pk).update(status=Submission.FAILED)
+        call_command('process_submissions', '--retry-failed', '-p', project.project_slug)
+
+        assert 'Requeued 1 failed submissions.' in capsys.readouterr().out
+        submission.refresh_from_db()
+        assert submission.status == Submission.DONE
+
+
+class TestAsyncViews:
+
+    @pytest.fixture(autouse=True)
+    def async_intake(self, settings):
+        settings.NOMINATION_ASYNC_INTAKE = True
+
+    def test_url_add_queues_submission(self, client):
+        project = factories.ProjectFactory()
+        response = client.post(reverse('url_add', args=[project.project_slug]),
+                               add_url_data('www.example.com'))
+        submission = Submission.objects.get()
+
+        assert response.context['submission'] == submission
+        assert submission.form_data['url_value'] == 'http://www.example.com'
+        assert not URL.objects.exists()
+        assert reverse('submission_status', args=[project.project_slug, submission.token]) \
+            in response.content.decode()
+
+    def test_url_listing_queues_submission(self, client):
+        entity = 'http://www.example.com'
+        project = factories.ProjectFactory(registration_required=False)
+        factories.URLFactory(url_project=project, entity=entity)
+        response = client.post(reverse('url_listing', args=[project.project_slug, entity]),
+                               dict(NOMINATOR, scope='1'))
+        submission = Submission.objects.get()
+
+        assert response.context['summary_list'] == [
+            'Your submission has been received and will be recorded shortly.']
+        assert submission.action == Submission.ADD_METADATA
+        assert submission.form_data['url_value'] == entity
+
+    def test_status(self, client):
+        project = factories.ProjectFactory()
+        submission = intake.enqueue(project, Submission.ADD_URL, add_url_data())
+        url = reverse('submission_status', args=[project.project_slug, submission.token])
+        pending = json.loads(client.get(url).content)
+        intake.process_batch()
+        response = client.get(url)
+        done = json.loads(response.content)
+
+        assert pending['status'] == 'pending'
+        assert done['status'] == 'done'
+        assert done['summary'] == ['You have successfully nominated http://www.example.com']
+        assert 'no-cache' in response['Cache-Control']
+
+    def test_status_of_other_project(self, client):
+        submission = intake.enqueue(factories.ProjectFactory(), Submission.ADD_URL,
+                                    add_url_data())
+        other = factories.ProjectFactory()
+        response = client.get(reverse('submission_status',
+                                      args=[other.project_slug, submission.token]))
+
+        assert response.status_code == 404
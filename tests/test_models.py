@@ -48,6 +48,15 @@ class TestProject:
         project = factories.ProjectFactory.build()
         assert str(project) == project.project_slug
 
+    def test_save_advances_watermark(self):
+        project = factories.ProjectFactory()
+        revision, last_modified = project.revision, project.last_modified
+        project.project_name = 'Renamed'
+        project.save()
+
+        assert project.revision == revision + 1
+        assert project.last_modified > last_modified
+
     def test_nomination_message_before_nomination_window(self):
         project = factories.ProjectFactory.build(
             nomination_start=datetime.now() + timedelta(days=1),
@@ -180,3 +189,19 @@ class TestURL:
         url = factories.URLFactory.create()
         assert url.get_nominator() == self.nominator_link_html.format(
             url.url_nominator.id, url.url_nominator)
+
+    def test_save_populates_normalized_fields(self):
+        url = factories.URLFactory.create(entity='http://www.Example.COM',
+                                          attribute='Site_Name',
+                                          value='Example Site')
+        url.refresh_from_db()
+        assert url.entity_norm == 'http://www.example.com'
+        assert url.attribute_norm == 'site_name'
+        assert url.value_norm == 'example site'
+
+    def test_save_with_update_fields_refreshes_normalized_fields(self):
+        url = factories.URLFactory.create(value='Old')
+        url.value = 'NEW'
+        url.save(update_fields=['value'])
+        url.refresh_from_db()
+        assert url.value_norm == 'new'
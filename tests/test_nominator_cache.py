@@ -0,0 +1,157 @@
+import time
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+import pytest
+
+from nomination import nominator_cache, url_handler
+from nomination.models import Nominator
+from . import factories
+
+
+pytestmark = pytest.mark.django_db
+
+
+def form_data(nominator):
+    return {'nominator_email': nominator.nominator_email,
+            'nominator_name': nominator.nominator_name,
+            'nominator_institution': nominator.nominator_institution}
+
+
+@pytest.fixture
+def resolve(committed):
+    """Resolve a nominator in a transaction that commits, filling the cache."""
+    def resolve(data):
+        with committed():
+            return url_handler.get_nominator(data)
+    return resolve
+
+
+def nominator_queries(queries):
+    return [query for query in queries.captured_queries
+            if 'nomination_nominator' in query['sql']]
+
+
+class TestGetNominator:
+
+    def test_repeat_submitter_needs_no_query(self, resolve, django_assert_num_queries):
+        nominator = factories.NominatorFactory()
+        resolve(form_data(nominator))
+
+        with django_assert_num_queries(0):
+            assert url_handler.get_nominator(form_data(nominator)) == nominator
+
+    def test_shared_cache_used_by_other_processes(self, resolve, django_assert_num_queries):
+        nominator = factories.NominatorFactory()
+        resolve(form_data(nominator))
+        nominator_cache.reset()
+
+        with django_assert_num_queries(0):
+            assert url_handler.get_nominator(form_data(nominator)) == nominator
+
+    def test_expired_local_entries_fall_back_to_shared_cache(
+            self, resolve, monkeypatch, django_assert_num_queries):
+        nominator = factories.NominatorFactory()
+        resolve(form_data(nominator))
+        now = time.monotonic()
+        monkeypatch.setattr(time, 'monotonic', lambda: now + nominator_cache.DEFAULT_TTL)
+
+        with django_assert_num_queries(0):
+            assert url_handler.get_nominator(form_data(nominator)) == nominator
+
+    def test_shared_entries_expire_after_ttl(self, resolve, settings, monkeypatch):
+        settings.NOMINATION_NOMINATOR_CACHE_TTL = 30
+        timeouts = []
+        set_many = cache.set_many
+
+        def recording_set_many(data, timeout=None):
+            timeouts.append(timeout)
+            return set_many(data, timeout)
+
+        monkeypatch.setattr(cache, 'set_many', recording_set_many)
+        resolve(form_data(factories.NominatorFactory()))
+
+        assert timeouts == [30]
+
+    def test_nothing_cached_before_commit(self):
+        nominator = factories.NominatorFactory()
+        url_handler.get_nominator(form_data(nominator))
+
+        assert nominator_cache.get_by_identity(*form_data(nominator).values()) is None
+        assert cache.get(nominator_cache.ID_KEY % nominator.id) is None
+
+    def test_new_nominator_is_created_and_cached(self, resolve, django_assert_num_queries):
+        data = {'nominator_email': 'new@example.com', 'nominator_name': 'New',
+                'nominator_institution': 'UNT'}
+        nominator = resolve(data)
+
+        assert Nominator.objects.get(nominator_email='new@example.com') == nominator
+        with django_assert_num_queries(0):
+            assert url_handler.get_nominator(data) == nominator
+
+    def test_saved_nominator_is_invalidated(self, resolve):
+        nominator = factories.NominatorFactory()
+        data = form_data(nominator)
+        resolve(data)
+        nominator.nominator_email = 'changed@example.com'
+        nominator.save()
+        # the old email no longer resolves to the nominator
+        other = url_handler.get_nominator(data)
+
+        assert other != nominator
+        assert other.nominator_email == data['nominator_email']
+
+    def test_deleted_nominator_is_invalidated(self, resolve):
+        nominator = factories.NominatorFactory()
+        data = form_data(nominator)
+        resolve(data)
+        nominator_id = nominator.pk
+        nominator.delete()
+
+        assert url_handler.get_nominator(data).pk != nominator_id
+        with pytest.raises(Nominator.DoesNotExist):
+            nominator_cache.get_by_id(nominator_id)
+
+    def test_identities_cached_separately(self, resolve):
+        nominator = factories.NominatorFactory()
+        resolve(form_data(nominator))
+        data = dict(form_data(nominator), nominator_name='Someone Else')
+
+        # get_or_create matches by email, so the other name gets the same nominator
+        assert resolve(data) == nominator
+        assert nominator_cache.get_by_identity(*data.values()) == nominator
+
+
+class TestAddURL:
+
+    def test_resolves_nominators_from_cache(self, committed):
+        project = factories.ProjectFactory()
+        nominator = factories.NominatorFactory()
+        data = dict(form_data(nominator), url_value='http://example.com')
+        with committed():
+            url_handler.add_url(project, dict(data))
+        with CaptureQueriesContext(connection) as queries:
+            url_handler.add_url(project, dict(data, url_value='http://example.org'))
+
+        assert nominator_queries(queries) == []
+
+
+def test_get_by_id_raises_for_missing_nominator():
+    with pytest.raises(Nominator.DoesNotExist):
+        nominator_cache.get_by_id(999)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_rolled_back_nominator_is_not_cached():
+    data = {'nominator_email': 'rolled@example.com', 'nominator_name': 'Rolled',
+            'nominator_institution': 'UNT'}
+    with pytest.raises(RuntimeError):
+        with transaction.atomic():
+            url_handler.get_nominator(data)
+            raise RuntimeError
+    nominator_cache.reset()
+
+    assert not Nominator.objects.filter(nominator_email='rolled@example.com').exists()
+    assert nominator_cache.get_by_identity(*data.values()) is None
+    assert cache.get(nominator_cache.identity_key('rolled@example.com')) is None
@@ -0,0 +1,72 @@
+"""Query budgets of each page, report and endpoint, against a generated project.
+
+The budgets are the most queries a request may run on a cold cache. They
+do not depend on the size of the project, so a per-row query shows up as a
+failure here long before it shows up as a slow page.
+"""
+from django.urls import reverse
+import pytest
+
+from nomination.instrumentation import query_budget
+from nomination.management.commands.benchmark_project import get_project_requests
+
+
+pytestmark = pytest.mark.django_db
+
+BUDGETS = {
+    'project_listing': 2,
+    'project_urls': 4,
+    'project_about': 4,
+    'url_add': 9,
+    'reports_view': 3,
+    'url_report': 3,
+    'url_score_report': 3,
+    'url_nomination_report': 3,
+    'url_date_report': 3,
+    'surt_report': 3,
+    'nominator_report': 3,
+    'institution_report': 3,
+    'project_dump': 6,
+    'browse_json': 3,
+    'search_json': 4,
+    'url_feed': 5,
+    'nomination_feed': 5,
+    'institutions_json': 3,
+    'url_listing': 14,
+    'url_surt': 5,
+    'related_json': 6,
+    'url_lookup': 4,
+    'search_json_prefix': 4,
+    'typeahead_json': 4,
+    'field_report': 7,
+    'value_report': 4,
+    'nominator_url_report': 4,
+}
+ADMIN_BUDGETS = {
+    'admin:nomination_url_changelist': 6,
+    'admin:nomination_nominator_changelist': 6,
+}
+
+
+def get_within_budget(client, path, budget):
+    with query_budget(budget):
+        response = client.get(path)
+        if response.streaming:
+            b''.join(response.streaming_content)
+    assert response.status_code == 200
+    return response
+
+
+def test_every_request_has_a_budget(synthetic_project):
+    assert {name for name, _ in get_project_requests(synthetic_project)} == set(BUDGETS)
+
+
+@pytest.mark.parametrize('name', sorted(BUDGETS))
+def test_view_budget(client, synthetic_project, name):
+    path = dict(get_project_requests(synthetic_project))[name]
+    get_within_budget(client, path, BUDGETS[name])
+
+
+@pytest.mark.parametrize('url_name', sorted(ADMIN_BUDGETS))
+def test_admin_budget(admin_client, synthetic_project, url_name):
+    get_within_budget(admin_client, reverse(url_name), ADMIN_BUDGETS[url_name])
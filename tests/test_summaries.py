@@ -0,0 +1,631 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import IntegrityError, transaction
+import pytest
+
+from nomination import entity_index, models, summaries, url_handler
+from . import factories
+
+
+pytestmark = pytest.mark.django_db
+
+
+class TestSummarizeRows:
+
+    def test_counts_nominations_and_nominators(self):
+        rows = [
+            ('http://example.com', 'surt', 'http://(com,example,)', 1),
+            ('http://example.com', 'nomination', '1', 2),
+            ('http://example.com', 'nomination', '1', 3),
+            ('http://example.com', 'nomination', '-1', 3),
+        ]
+        assert summaries.summarize_rows(rows) == {
+            'entity': 'http://example.com',
+            'surt': 'http://(com,example,)',
+            'surt_norm': '(com,example,)',
+            'nomination_count': 3,
+            'nomination_score': 1,
+            'nominator_count': 2,
+        }
+
+    def test_no_rows(self):
+        assert summaries.summarize_rows([])['entity'] is None
+
+
+class TestSummaryMaintenance:
+
+    def test_surt_creates_summary(self):
+        url = factories.SURTFactory(entity='http://Example.com', value='http://(com,example,)')
+        summary = models.URLSummary.objects.get(project=url.url_project)
+        assert summary.entity == 'http://Example.com'
+        assert summary.entity_norm == 'http://example.com'
+        assert summary.surt_norm == '(com,example,)'
+        assert summary.surt == 'http://(com,example,)'
+        assert summary.nomination_count == 0
+
+    def test_nominations_update_summary(self):
+        project = factories.ProjectFactory()
+        nominator = factories.NominatorFactory()
+        form_data = {'url_value': 'http://example.com'}
+        url_handler.write_nomination(project, nominator, form_data, '1')
+        url_handler.write_nomination(project, factories.NominatorFactory(), form_data, '1')
+        summary = models.URLSummary.objects.get(project=project)
+        assert (summary.nomination_count, summary.nomination_score) == (2, 2)
+        assert summary.nominator_count == 2
+
+        # Changing scope adjusts the score, not the count.
+        url_handler.write_nomination(project, nominator, form_data, '-1')
+        summary.refresh_from_db()
+        assert (summary.nomination_count, summary.nomination_score) == (2, 0)
+
+    def test_other_attributes_ignored(self):
+        factories.URLFactory(attribute='Title')
+        assert not models.URLSummary.objects.exists()
+
+    def test_delete_removes_summary(self):
+        url = factories.NominatedURLFactory()
+        url.delete()
+        assert not models.URLSummary.objects.exists()
+
+
+class TestRebuildSummaries:
+
+    def test_rebuild_matches_incremental(self):
+        project = factories.ProjectFactory()
+        system_nominator = models.Nominator.objects.get(id=settings.SYSTEM_NOMINATOR_ID)
+        for entity in ['http://a.com', 'http://b.com']:
+            url_handler.write_nomination(project, system_nominator, {'url_value': entity},
+                                         system_nominator=system_nominator)
+            factories.NominatedURLFactory(url_project=project, entity=entity, value='1')
+        expected = list(models.URLSummary.objects.order_by('entity_norm').values(
+            'entity', 'surt', 'nomination_count', 'nomination_score', 'nominator_count'))
+        models.URLSummary.objects.all().delete()
+
+        call_command('rebuild_summaries', '-p', project.project_slug, '-t', 'url_summary',
+                     '--batch-size', '1')
+
+        assert list(models.URLSummary.objects.order_by('entity_norm').values(
+            'entity', 'surt', 'nomination_count', 'nomination_score',
+            'nominator_count')) == expected
+
+    def test_unknown_project(self):
+        with pytest.raises(CommandError):
+            call_command('rebuild_summaries', '-p', 'nope')
+
+
+class TestSURTTree:
+
+    def tree(self, project):
+        return {node.node: (node.parent, node.name, node.child_count, node.url_count)
+                for node in models.SURTNode.objects.filter(project=project)}
+
+    @pytest.mark.parametrize('surt, expected', [
+        ('http://(com,example,www,)/a', ['com', 'example', 'www']),
+        ('ftp://(com,example,www)', ['com', 'example', 'www']),
+        ('http://(192.168.1.1)', ['192.168.1.1']),
+        ('not a surt', []),
+    ])
+    def test_surt_segments(self, surt, expected):
+        assert summaries.surt_segments(surt) == expected
+
+    def test_surt_rows_build_tree(self):
+        project = factories.ProjectFactory()
+        factories.SURTFactory(url_project=project, value='http://(com,example,)')
+        factories.SURTFactory(url_project=project, value='http://(com,example,www,)')
+        factories.SURTFactory(url_project=project, value='http://(org,other,)')
+
+        assert self.tree(project) == {
+            'com,': ('', 'com', 1, 2),
+            'com,example,': ('com,', 'example', 1, 2),
+            'com,example,www,': ('com,example,', 'www', 0, 1),
+            'org,': ('', 'org', 1, 1),
+            'org,other,': ('org,', 'other', 0, 1),
+        }
+
+    def test_delete_prunes_tree(self):
+        project = factories.ProjectFactory()
+        factories.SURTFactory(url_project=project, value='http://(com,example,)')
+        www = factories.SURTFactory(url_project=project, value='http://(com,example,www,)')
+        www.delete()
+
+        assert self.tree(project) == {
+            'com,': ('', 'com', 1, 1),
+            'com,example,': ('com,', 'example', 0, 1),
+        }
+
+    def test_batch_counts_into_existing_nodes(self):
+        project = factories.ProjectFactory()
+        factories.SURTFactory(url_project=project, value='http://(com,example,)')
+        summaries.add_surts_to_tree(project.id, ['http://(com,example,www,)',
+                                                 'http://(com,example,www,)/a',
+                                                 'http://(com,other,)'])
+
+        assert self.tree(project) == {
+            'com,': ('', 'com', 2, 4),
+            'com,example,': ('com,', 'example', 1, 3),
+            'com,example,www,': ('com,example,', 'www', 0, 2),
+            'com,other,': ('com,', 'other', 0, 1),
+        }
+
+    def test_batch_falls_back_to_rows_when_a_node_is_taken(self, monkeypatch):
+        project = factories.ProjectFactory()
+        models.SURTNode.objects.create(project=project, node='com,', name='com', url_count=1)
+
+        def racing_bulk_create(*args, **kwargs):
+            # another writer created one of the new nodes first
+            raise IntegrityError
+
+        monkeypatch.setattr(models.SURTNode.objects, 'bulk_create', racing_bulk_create)
+        summaries.add_surts_to_tree(project.id, ['http://(com,example,)'])
+
+        assert self.tree(project) == {
+            'com,': ('', 'com', 1, 2),
+            'com,example,': ('com,', 'example', 0, 1),
+        }
+
+    def test_rebuild_matches_incremental(self):
+        project = factories.ProjectFactory()
+        factories.SURTFactory.create_batch(5, url_project=project)
+        factories.SURTFactory(url_project=project, value='http://(org,example,www,)')
+        expected = self.tree(project)
+        models.SURTNode.objects.all().delete()
+
+        call_command('rebuild_summaries', '-p', project.project_slug, '-t', 'surt_tree')
+
+        assert self.tree(project) == expected
+
+
+class TestBrowseIndex:
+
+    @pytest.mark.parametrize('surt, expected', [
+        ('http://(org,alarm,)', [('org', '', ''), ('org', 'A', '(org,a')]),
+        ('http://(org,)', [('org', '', '')]),
+        ('http://(,)', []),
+    ])
+    def test_browse_entries(self, surt, expected):
+        assert summaries.browse_entries(surt) == expected
+
+    def test_new_surts_update_cached_index(self, committed):
+        project = factories.ProjectFactory()
+        factories.SURTFactory(url_project=project, value='http://(org,alarm,)')
+        assert summaries.get_browse_index(project.id) == {'org': {'A': '(org,a'}}
+
+        with committed():
+            factories.SURTFactory(url_project=project, value='http://(com,charlie,)')
+        assert summaries.get_browse_index(project.id) == {
+            'org': {'A': '(org,a'},
+            'com': {'C': '(com,c'},
+        }
+
+    def test_writes_do_not_fill_cache(self):
+        project = factories.ProjectFactory()
+        factories.SURTFactory(url_project=project, value='http://(org,alarm,)')
+        assert cache.get(summaries.BROWSE_CACHE_KEY % project.id) is None
+
+    def test_cached_index_expires(self, settings, monkeypatch):
+        settings.NOMINATION_BROWSE_INDEX_TTL = 30
+        timeouts = []
+        monkeypatch.setattr(cache, 'set',
+                            lambda key, value, timeout=None: timeouts.append(timeout))
+        summaries.get_browse_index(factories.ProjectFactory().id)
+
+        assert timeouts == [30]
+
+    def test_index_served_from_cache(self, django_assert_num_queries):
+        project = factories.ProjectFactory()
+        factories.SURTFactory(url_project=project, value='http://(org,alarm,)')
+        expected = url_handler.alphabetical_browse(project)
+        url_handler.get_alphabetical_browse(project)
+
+        with django_assert_num_queries(0):
+            assert url_handler.get_alphabetical_browse(project) == expected
+
+    def test_check_reports_consistency(self):
+        project = factories.ProjectFactory()
+        factories.SURTFactory(url_project=project, value='http://(org,alarm,)')
+        factories.SURTFactory(url_project=project, value='http://(com,charlie,)')
+        assert summaries.check_browse_index(project) == []
+
+        models.BrowseIndexEntry.objects.filter(top_domain='com').delete()
+        cache.clear()
+        assert summaries.check_browse_index(project) == ['com: missing from index']
+
+    def test_rebuild_command_fixes_index(self, capsys):
+        project = factories.ProjectFactory()
+        factories.SURTFactory(url_project=project, value='http://(org,alarm,)')
+        models.BrowseIndexEntry.objects.all().delete()
+
+        with pytest.raises(CommandError):
+            call_command('rebuild_summaries', '-p', project.project_slug, '-t', 'browse_index',
+                         '--check')
+        call_command('rebuild_summaries', '-p', project.project_slug, '-t', 'browse_index')
+        call_command('rebuild_summaries', '-p', project.project_slug, '-t', 'browse_index',
+                     '--check')
+
+        assert 'browse_index for %s is consistent.' % project.project_slug in \
+            capsys.readouterr().out
+
+
+class TestEntityTrigrams:
+
+    def trigrams(self, project):
+        return set(models.EntityTrigram.objects.filter(project=project)
+                                               .values_list('trigram', 'entity_norm'))
+
+    def test_entity_trigrams(self):
+        assert summaries.entity_trigrams('abcda') == {'abc', 'bcd', 'cda'}
+        assert summaries.entity_trigrams('ab') == set()
+
+    def test_surt_indexes_entity(self):
+        url = factories.SURTFactory(entity='http://Ab.c')
+
+        assert self.trigrams(url.url_project) == {
+            (trigram, 'http://ab.c') for trigram in summaries.entity_trigrams('http://ab.c')}
+
+    def test_other_attributes_not_indexed(self):
+        factories.NominatedURLFactory()
+        factories.URLFactory(attribute='Title')
+
+        assert not models.EntityTrigram.objects.exists()
+
+    def test_delete_removes_trigrams(self):
+        url = factories.SURTFactory(entity='http://ab.c')
+        url.delete()
+
+        assert not models.EntityTrigram.objects.exists()
+
+    def test_entity_change_reindexes(self):
+        url = factories.SURTFactory(entity='http://ab.c')
+        url.entity = 'http://xy.z'
+        url.save()
+
+        assert {entity for _, entity in self.trigrams(url.url_project)} == {'http://xy.z'}
+
+    def test_bulk_recorded_urls_indexed(self):
+        project = factories.ProjectFactory()
+        nominator = factories.NominatorFactory()
+        urls = [models.URL(url_project=project, url_nominator=nominator, entity=entity,
+                           attribute='surt', value='http://(c,ab,)')
+                for entity in ['http://ab.c', 'https://ab.c']]
+        models.URL.objects.bulk_create(urls)
+        summaries.record_new_urls(urls)
+
+        assert {entity for _, entity in self.trigrams(project)} == {'http://ab.c',
+                                                                    'https://ab.c'}
+
+    def test_rebuild_matches_incremental(self):
+        project = factories.ProjectFactory()
+        for entity in ['http://a.com/one', 'http://b.com/two']:
+            factories.SURTFactory(url_project=project, entity=entity)
+        expected = self.trigrams(project)
+        models.EntityTrigram.objects.all().delete()
+
+        call_command('rebuild_summaries', '-p', project.project_slug, '-t', 'entity_trigrams')
+
+        assert self.trigrams(project) == expected
+
+
+class TestProjectWatermark:
+
+    def watermark(self, project):
+        project.refresh_from_db()
+        return project.revision, project.last_modified
+
+    def test_insert_advances_watermark(self, committed):
+        project = factories.ProjectFactory()
+        before = self.watermark(project)
+        with committed():
+            factories.URLFactory(url_project=project)
+
+        revision, last_modified = self.watermark(project)
+        assert revision == before[0] + 1
+        assert last_modified > before[1]
+
+    def test_update_advances_watermark(self, committed):
+        url = factories.URLFactory()
+        before = self.watermark(url.url_project)
+        url.value = 'changed'
+        with committed():
+            url.save()
+
+        assert self.watermark(url.url_project)[0] == before[0] + 1
+
+    def test_delete_advances_watermark(self, committed):
+        url = factories.URLFactory()
+        before = self.watermark(url.url_project)
+        with committed():
+            url.delete()
+
+        assert self.watermark(url.url_project)[0] == before[0] + 1
+
+    def test_bulk_recorded_urls_advance_watermark_once(self, committed):
+        project = factories.ProjectFactory()
+        other = factories.ProjectFactory()
+        before = self.watermark(project)
+        nominator = factories.NominatorFactory()
+        urls = [models.URL(url_project=project, url_nominator=nominator, entity=entity,
+                           attribute='Title', value='title')
+                for entity in ['http://a.com', 'http://b.com']]
+        models.URL.objects.bulk_create(urls)
+        with committed():
+            summaries.record_new_urls(urls)
+
+        assert self.watermark(project)[0] == before[0] + 1
+        assert self.watermark(other)[0] == 1
+
+
+class TestProjectStats:
+
+    def counts(self, project):
+        stats = summaries.get_project_stats(project)
+        return stats.url_count, stats.nominator_count
+
+    def test_counts_created_on_first_read(self):
+        project = factories.ProjectFactory()
+        factories.SURTFactory.create_batch(2, url_project=project)
+        factories.NominatedURLFactory.create_batch(3, url_project=project, value='1')
+
+        assert self.counts(project) == (2, 3)
+        assert models.ProjectStats.objects.filter(project=project).exists()
+
+    def test_surts_adjust_url_count(self):
+        project = factories.ProjectFactory()
+        summaries.get_project_stats(project)
+        surts = factories.SURTFactory.create_batch(2, url_project=project)
+        assert self.counts(project) == (2, 0)
+
+        surts[0].delete()
+        assert self.counts(project) == (1, 0)
+
+    def test_nominations_adjust_nominator_count(self):
+        project = factories.ProjectFactory()
+        summaries.get_project_stats(project)
+        nominator = factories.NominatorFactory()
+        url_handler.write_nomination(project, nominator, {'url_value': 'http://a.com'}, '1')
+        url_handler.write_nomination(project, nominator, {'url_value': 'http://b.com'}, '1')
+        assert self.counts(project)[1] == 1
+
+        url_handler.write_nomination(project, nominator, {'url_value': 'http://a.com'}, '-1')
+        assert self.counts(project)[1] == 1
+        url_handler.write_nomination(project, nominator, {'url_value': 'http://b.com'}, '-1')
+        assert self.counts(project)[1] == 0
+        url_handler.write_nomination(project, nominator, {'url_value': 'http://b.com'}, '1')
+        assert self.counts(project)[1] == 1
+
+        models.URL.objects.filter(url_project=project, attribute='nomination').delete()
+        assert self.counts(project)[1] == 0
+
+    def test_out_of_scope_nominations_not_counted(self):
+        project = factories.ProjectFactory()
+        summaries.get_project_stats(project)
+        factories.NominatedURLFactory(url_project=project, value='-1')
+
+        assert self.counts(project) == (0, 0)
+
+    def test_bulk_recorded_urls_adjust_counts(self):
+        project = factories.ProjectFactory()
+        summaries.get_project_stats(project)
+        nominator = factories.NominatorFactory()
+        urls = []
+        for entity in ['http://a.com', 'http://b.com']:
+            urls.append(models.URL(url_project=project, url_nominator=nominator, entity=entity,
+                                   attribute='surt', value='http://(com,)'))
+            urls.append(models.URL(url_project=project, url_nominator=nominator, entity=entity,
+                                   attribute='nomination', value='1'))
+        models.URL.objects.bulk_create(urls)
+        summaries.record_new_urls(urls)
+
+        assert self.counts(project) == (2, 1)
+
+    def test_check_and_rebuild_command(self, capsys):
+        project = factories.ProjectFactory()
+        factories.SURTFactory(url_project=project)
+        summaries.get_project_stats(project)
+        models.ProjectStats.objects.filter(project=project).update(url_count=5)
+        assert summaries.check_project_stats(project) == ['url_count: stored 5, counted 1']
+
+        call_command('rebuild_summaries', '-p', project.project_slug, '-t', 'project_stats')
+        call_command('rebuild_summaries', '-p', project.project_slug, '-t', 'project_stats',
+                     '--check')
+
+        assert self.counts(project) == (1, 0)
+        assert 'project_stats for %s is consistent.' % project.project_slug in \
+            capsys.readouterr().out
+
+
+class TestInstitutions:
+
+    def institutions(self, project):
+        institutions = models.ProjectInstitution.objects.filter(project=project)
+        return set(institutions.values_list('institution', 'institution_norm'))
+
+    def test_first_nomination_adds_institution(self):
+        project = factories.ProjectFactory()
+        nominator = factories.NominatorFactory(nominator_institution='UNT')
+        factories.URLFactory.create_batch(2, url_project=project, url_nominator=nominator)
+        factories.URLFactory(url_nominator__nominator_institution='Other')
+
+        assert self.institutions(project) == {('UNT', 'unt')}
+
+    def test_empty_institution_skipped(self):
+        url = factories.URLFactory(url_nominator__nominator_institution='')
+
+        assert self.institutions(url.url_project) == set()
+
+    def test_bulk_recorded_urls_add_institutions(self):
+        project = factories.ProjectFactory()
+        nominator = factories.NominatorFactory(nominator_institution='UNT')
+        urls = [models.URL(url_project=project, url_nominator_id=nominator.id,
+                           entity='http://a.com', attribute='Title', value='A')]
+        models.URL.objects.bulk_create(urls)
+        summaries.record_new_urls(urls)
+
+        assert self.institutions(project) == {('UNT', 'unt')}
+
+    def test_renamed_institution_moves(self):
+        project, other_project = factories.ProjectFactory(), factories.ProjectFactory()
+        nominator = factories.NominatorFactory(nominator_institution='UNT')
+        factories.URLFactory(url_project=project, url_nominator=nominator)
+        factories.URLFactory(url_project=other_project, url_nominator=nominator)
+        # another nominator keeps the old institution listed in one project
+        factories.URLFactory(url_project=other_project,
+                             url_nominator__nominator_institution='UNT')
+        nominator.nominator_institution = 'UNT Libraries'
+        nominator.save()
+
+        assert self.institutions(project) == {('UNT Libraries', 'unt libraries')}
+        assert self.institutions(other_project) == {('UNT', 'unt'),
+                                                    ('UNT Libraries', 'unt libraries')}
+
+    def test_cleared_institution_removed(self):
+        url = factories.URLFactory(url_nominator__nominator_institution='UNT')
+        url.url_nominator.nominator_institution = ''
+        url.url_nominator.save()
+
+        assert self.institutions(url.url_project) == set()
+
+    def test_rebuild_matches_incremental(self):
+        project = factories.ProjectFactory()
+        for institution in ['UNT', 'Stanford', '']:
+            factories.URLFactory(url_project=project,
+                                 url_nominator__nominator_institution=institution)
+        expected = self.institutions(project)
+        models.ProjectInstitution.objects.all().delete()
+
+        call_command('rebuild_summaries', '-p', project.project_slug, '-t', 'institutions')
+
+        assert self.institutions(project) == expected
+
+
+@pytest.mark.django_db(transaction=True)
+def test_rolled_back_surts_leave_browse_index_cache_alone():
+    project = factories.ProjectFactory()
+    assert summaries.get_browse_index(project.id) == {}
+    with pytest.raises(RuntimeError):
+        with transaction.atomic():
+            factories.SURTFactory(url_project=project, value='http://(com,zebra,)')
+            factories.SURTFactory(url_project=project, value='http://(com,zulu,)')
+            raise RuntimeError
+
+    assert not models.BrowseIndexEntry.objects.filter(project=project).exists()
+    assert summaries.get_browse_index(project.id) == {}
+
+
+class TestSurtEdits:
+
+    @pytest.fixture
+    def project(self):
+        project = factories.ProjectFactory()
+        summaries.get_project_stats(project)
+        return project
+
+    def state(self, project):
+        """Return the SURT tree nodes, URL count and typeahead entities of a project."""
+        nodes = set(models.SURTNode.objects.filter(project=project).values_list('node', flat=True))
+        entities, _ = entity_index.search_entities(project.id)
+        return nodes, summaries.get_project_stats(project).url_count, entities
+
+    def test_value_change(self, project, committed):
+        url = factories.SURTFactory(url_project=project, entity='http://a.com',
+                                    value='http://(com,a,)')
+        with committed():
+            url.value = 'http://(org,a,)'
+            url.save()
+
+        assert self.state(project) == ({'org,', 'org,a,'}, 1, ['http://a.com'])
+        assert summaries.check_browse_index(project) == []
+        assert models.URLSummary.objects.get(project=project).surt == 'http://(org,a,)'
+
+    def test_entity_change(self, project, committed):
+        url = factories.SURTFactory(url_project=project, entity='http://a.com',
+                                    value='http://(com,a,)')
+        entity_index.search_entities(project.id)
+        with committed():
+            url.entity = 'http://b.com'
+            url.save()
+
+        assert self.state(project) == ({'com,', 'com,a,'}, 1, ['http://b.com'])
+        assert list(models.URLSummary.objects.filter(project=project)
+                    .values_list('entity_norm', flat=True)) == ['http://b.com']
+
+    def test_attribute_changed_to_surt(self, project, committed):
+        url = factories.URLFactory(url_project=project, entity='http://a.com',
+                                   attribute='Title', value='http://(com,a,)')
+        entity_index.search_entities(project.id)
+        with committed():
+            url.attribute = 'surt'
+            url.save()
+
+        assert self.state(project) == ({'com,', 'com,a,'}, 1, ['http://a.com'])
+        assert summaries.check_browse_index(project) == []
+        assert {entity for _, entity in models.EntityTrigram.objects.values_list(
+            'trigram', 'entity_norm')} == {'http://a.com'}
+
+    def test_attribute_changed_from_surt(self, project, committed):
+        url = factories.SURTFactory(url_project=project, entity='http://a.com',
+                                    value='http://(com,a,)')
+        entity_index.search_entities(project.id)
+        with committed():
+            url.attribute = 'Title'
+            url.save()
+
+        assert self.state(project) == (set(), 0, [])
+        assert summaries.check_browse_index(project) == []
+        assert not models.BrowseIndexEntry.objects.filter(project=project).exists()
+        assert not models.EntityTrigram.objects.exists()
+
+    def test_browse_entry_kept_while_another_surt_has_it(self, project):
+        factories.SURTFactory(url_project=project, entity='http://a.com',
+                              value='http://(com,a,)')
+        url = factories.SURTFactory(url_project=project, entity='http://ab.com',
+                                    value='http://(com,ab,)')
+        url.delete()
+
+        assert summaries.check_browse_index(project) == []
+        assert models.BrowseIndexEntry.objects.filter(project=project, letter='A').exists()
+
+
+class TestCascadeDeletes:
+
+    def test_project_delete_skips_per_row_maintenance(self, django_assert_max_num_queries):
+        project = factories.ProjectFactory()
+        for i in range(100):
+            entity = 'http://example.com/%s' % i
+            factories.SURTFactory(url_project=project, entity=entity)
+            factories.NominatedURLFactory(url_project=project, entity=entity, value='1')
+
+        # one DELETE per derived table and per 100 URL rows, rather than
+        # per-row maintenance
+        with django_assert_max_num_queries(15):
+            project.delete()
+
+        assert not models.URL.objects.exists()
+        assert not models.URLSummary.objects.exists()
+        assert not models.SURTNode.objects.exists()
+
+    def test_nominator_delete_rebuilds_projects(self):
+        project = factories.ProjectFactory()
+        nominator = factories.NominatorFactory(nominator_institution='Gone')
+        factories.SURTFactory(url_project=project, entity='http://a.com',
+                              value='http://(com,a,)')
+        factories.NominatedURLFactory(url_project=project, entity='http://a.com', value='1')
+        factories.SURTFactory(url_project=project, url_nominator=nominator,
+                              entity='http://b.com', value='http://(com,b,)')
+        factories.NominatedURLFactory(url_project=project, url_nominator=nominator,
+                                      entity='http://a.com', value='1')
+        summaries.get_project_stats(project)
+
+        nominator.delete()
+
+        stats = summaries.get_project_stats(project)
+        assert (stats.url_count, stats.nominator_count) == (1, 1)
+        assert list(models.URLSummary.objects.filter(project=project)
+                    .values_list('entity_norm', 'nomination_count')) == [('http://a.com', 1)]
+        assert not models.SURTNode.objects.filter(project=project, node__contains='com,b').exists()
+        assert summaries.check_browse_index(project) == []
+        assert not models.ProjectInstitution.objects.filter(project=project,
+                                                            institution='Gone').exists()
+        assert list(models.EntityChange.objects.filter(project=project)
+                    .values_list('entity', flat=True)) == ['http://b.com']
@@ -0,0 +1,50 @@
+import pytest
+
+from nomination import surt, url_handler
+from nomination.management.commands import fielded_batch_ingest
+
+
+def test_surtize_batch_keeps_order():
+    urls = ['https://www.example.com/a', 'Not a URL.', 'ftp://files.example.org', '1.2.3.4/b']
+
+    assert surt.surtize_batch(urls) == [
+        'http://(com,example,www,)/a',
+        '',
+        'ftp://(org,example,files,)',
+        'http://(1.2.3.4)/b',
+    ]
+
+
+def test_surtize_batch_accepts_generators():
+    urls = ('http://www.example.com/%s' % i for i in range(3))
+
+    assert surt.surtize_batch(urls) == ['http://(com,example,www,)/%s' % i for i in range(3)]
+
+
+def test_surtize_batch_preserve_case():
+    assert surt.surtize_batch(['http://www.eXaMple.cOm/Path'], preserveCase=True) == [
+        'http://(cOm,eXaMple,www,)/Path']
+
+
+@pytest.mark.parametrize('url', [
+    'http://www.example.com/one',
+    'ftps://www.example.com/two',
+    'http://user@www.example.com:8080/three',
+])
+def test_surtize_batch_matches_surtize(url):
+    assert surt.surtize_batch([url]) == [surt.surtize(url)]
+
+
+def test_host_cache_is_bounded():
+    surt.reverse_host.cache_clear()
+    surt.surtize_batch(['http://www.example.com/%s' % i for i in range(5)])
+    info = surt.reverse_host.cache_info()
+
+    assert info.maxsize == surt.HOST_CACHE_SIZE
+    assert info.misses == 1
+    assert info.hits == 4
+
+
+def test_shared_by_views_and_ingest():
+    assert url_handler.surtize is surt.surtize
+    assert fielded_batch_ingest.surtize_batch is surt.surtize_batch
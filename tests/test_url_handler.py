@@ -5,11 +5,13 @@ import datetime
 
 from django import http
 from django.conf import settings
-from django.db import transaction
+from django.core.cache import cache
+from django.db import DatabaseError, connection
+from django.test.utils import CaptureQueriesContext
 
 import pytest
 
-from nomination import url_handler, models
+from nomination import summaries, url_handler, models
 from . import factories
 
 
@@ -54,6 +56,11 @@ class TestAlphabeticalBrowse():
             url_handler.alphabetical_browse(project)
 
 
+def rename_value(value):
+    value.value = 'renamed'
+    value.save()
+
+
 class TestGetMetadata():
 
     def test_returns_metadata_list(self):
@@ -84,6 +91,68 @@ class TestGetMetadata():
             assert all(value in vals for value in value_list)
             assert len(value_list) == 3
 
+    def test_valueset_values_precede_field_values(self):
+        project = factories.ProjectFactory()
+        first_set, second_set = factories.ValuesetFactory.create_batch(2)
+        metadata = factories.MetadataFactory(value_sets=[first_set, second_set])
+        factories.ProjectMetadataFactory(project=project, metadata=metadata)
+        field_value = factories.MetadataValuesFactory(metadata=metadata).value
+        first_value = factories.ValuesetValuesFactory(valueset=first_set).value
+        second_value = factories.ValuesetValuesFactory(valueset=second_set).value
+        results = url_handler.get_metadata(project)
+
+        assert results[0][1] == (second_value, first_value, field_value)
+
+    def test_served_from_cache(self, django_assert_num_queries):
+        project = factories.ProjectWithMetadataFactory()
+        expected = url_handler.get_metadata(project)
+
+        with django_assert_num_queries(0):
+            assert url_handler.get_metadata(project) == expected
+
+    def test_cache_expires(self, settings, monkeypatch):
+        settings.NOMINATION_METADATA_CACHE_TTL = 30
+        timeouts = []
+        cache_set, cache_add = cache.set, cache.add
+
+        def recording_set(key, value, timeout=None):
+            timeouts.append(timeout)
+            return cache_set(key, value, timeout)
+
+        def recording_add(key, value, timeout=None):
+            timeouts.append(timeout)
+            return cache_add(key, value, timeout)
+
+        monkeypatch.setattr(cache, 'set', recording_set)
+        monkeypatch.setattr(cache, 'add', recording_add)
+        url_handler.get_metadata(factories.ProjectWithMetadataFactory())
+
+        # both the metadata version and the project's entry
+        assert timeouts == [30, 30]
+
+    @pytest.mark.parametrize('change', [
+        lambda pm: factories.MetadataValuesFactory(metadata=pm.metadata),
+        lambda pm: pm.metadata.values.first().delete(),
+        lambda pm: rename_value(pm.metadata.values.first()),
+        lambda pm: pm.metadata.value_sets.add(factories.ValuesetWithValuesFactory()),
+        lambda pm: factories.ProjectMetadataFactory(project=pm.project),
+        lambda pm: pm.delete(),
+    ])
+    def test_invalidated_on_change(self, change):
+        def snapshot(metadata_vals):
+            return [(pm.pk, [(value.key, value.value) for value in vals])
+                    for pm, vals in metadata_vals]
+
+        project = factories.ProjectFactory()
+        pm = factories.ProjectMetadataFactory(project=project,
+                                              metadata=factories.MetadataWithValuesFactory())
+        before = snapshot(url_handler.get_metadata(project))
+        change(pm)
+        after = snapshot(url_handler.get_metadata(project))
+
+        assert after != before
+        assert after == snapshot(url_handler.resolve_metadata(project))
+
 
 @pytest.mark.parametrize('posted_data, processed_posted_data, expected', [
     (
@@ -217,67 +286,84 @@ class TestAddMetadata():
             url_handler.add_metadata(project, form_data)
 
 
-@pytest.mark.parametrize('url, expected', [
-    ('http://www.example.com', 'http://www.example.com'),
-    ('   http://www.example.com   ', 'http://www.example.com'),
-    ('https://www.example.com', 'https://www.example.com'),
-    ('http://www.example.com///', 'http://www.example.com')
-])
-def test_check_url(url, expected):
-    assert url_handler.check_url(url) == expected
+class TestWriteNomination():
 
-
-class TestGetNominator():
-
-    def test_returns_nominator(self):
+    @pytest.fixture
+    def setup(self):
+        project = factories.ProjectFactory()
         nominator = factories.NominatorFactory()
-        form_data = {
-            'nominator_email': nominator.nominator_email,
-            'nominator_name': nominator.nominator_name,
-            'nominator_institution': nominator.nominator_institution
-        }
-        assert url_handler.get_nominator(form_data) == nominator
+        system_nominator = models.Nominator.objects.get(id=settings.SYSTEM_NOMINATOR_ID)
+        return project, nominator, system_nominator
 
-    def test_creates_and_returns_nominator(self):
-        form_data = {
-            'nominator_email': 'somebody@somewhere.com',
-            'nominator_name': 'John Smith',
-            'nominator_institution': 'UNT'
-        }
+    def submission(self, project, field_count, value_count):
+        form_data = {'url_value': 'http://www.example.com'}
+        for _ in range(field_count):
+            name = factories.ProjectMetadataFactory(project=project).metadata.name
+            form_data[name] = ['value %s' % i for i in range(value_count)]
+        return form_data
+
+    def test_query_count_does_not_grow_with_fields(self, setup, django_assert_max_num_queries):
+        project, nominator, system_nominator = setup
+        few = self.submission(project, 1, 1)
+        url_handler.get_metadata(project)
+        with CaptureQueriesContext(connection) as queries:
+            url_handler.write_nomination(project, nominator, few, '1', system_nominator)
+        other_project = factories.ProjectFactory()
+        many = self.submission(other_project, 10, 3)
+        url_handler.get_metadata(other_project)
+
+        with django_assert_max_num_queries(len(queries)):
+            summary_list = url_handler.write_nomination(other_project, nominator, many, '1',
+                                                        system_nominator)
+        assert len(summary_list) == 31
+        assert models.URL.objects.filter(url_project=other_project).count() == 32
+
+    def test_reports_existing_rows(self, setup):
+        project, nominator, system_nominator = setup
+        form_data = self.submission(project, 1, 2)
+        url_handler.write_nomination(project, nominator, form_data, '1', system_nominator)
+        name = next(key for key in form_data if key != 'url_value')
+        form_data[name].append('Value 0')
+
+        assert url_handler.write_nomination(project, nominator, form_data, '1',
+                                            system_nominator) == [
+            'You have already declared http://www.example.com as "In Scope"',
+            'You have already added the {0} "value 0" for http://www.example.com'.format(name),
+            'You have already added the {0} "value 1" for http://www.example.com'.format(name),
+            'You have already added the {0} "Value 0" for http://www.example.com'.format(name),
+        ]
+        assert models.URL.objects.filter(url_project=project).count() == 4
 
-        assert len(models.Nominator.objects.all()) == 1
-        new_nominator = url_handler.get_nominator(form_data)
-        assert len(models.Nominator.objects.all()) == 2
-        for key in form_data.keys():
-            assert getattr(new_nominator, key) == form_data[key]
+    def test_changes_scope(self, setup):
+        project, nominator, system_nominator = setup
+        form_data = {'url_value': 'http://www.example.com'}
+        summaries.get_project_stats(project)
+        url_handler.write_nomination(project, nominator, form_data, '1', system_nominator)
 
-    def test_cannot_create_nominator(self):
-        form_data = {
-            'nominator_email': 'somebody@somewhere.com',
-            'nominator_name': None,
-            'nominator_institution': None
-        }
-        with pytest.raises(http.Http404):
-            url_handler.get_nominator(form_data)
+        assert url_handler.write_nomination(project, nominator, form_data, '-1') == [
+            'You have successfully declared http://www.example.com as "Out of Scope"']
+        assert models.URL.objects.get(attribute='nomination').value == '-1'
+        stats = summaries.get_project_stats(project)
+        assert (stats.url_count, stats.nominator_count) == (1, 0)
 
+    def test_no_scope_or_surt(self, setup):
+        project, nominator, _ = setup
+        form_data = self.submission(project, 1, 1)
 
-class TestNominateURL():
+        assert len(url_handler.write_nomination(project, nominator, form_data)) == 1
+        assert list(models.URL.objects.values_list('attribute', flat=True)) == [
+            next(key for key in form_data if key != 'url_value')]
 
     @pytest.mark.parametrize('scope_value, scope', [
         ('1', 'In Scope'),
         ('0', 'Out of Scope')
     ])
-    def test_nomination_exists(self, scope_value, scope):
-        project = factories.ProjectFactory()
-        nominator = factories.NominatorFactory()
+    def test_nomination_exists(self, setup, scope_value, scope):
+        project, nominator, _ = setup
         form_data = {'url_value': 'http://www.example.com'}
-        factories.NominatedURLFactory(
-            url_nominator=nominator,
-            url_project=project,
-            entity=form_data['url_value'],
-            value=scope_value
-        )
-        results = url_handler.nominate_url(project, nominator, form_data, scope_value)[0]
+        factories.NominatedURLFactory(url_nominator=nominator, url_project=project,
+                                      entity=form_data['url_value'], value=scope_value)
+        results = url_handler.write_nomination(project, nominator, form_data, scope_value)[0]
 
         assert 'already' in results
         assert scope in results
@@ -286,143 +372,131 @@ class TestNominateURL():
         ('1', 'In Scope'),
         ('0', 'Out of Scope')
     ])
-    def test_nomination_gets_modified(self, scope_value, scope):
-        project = factories.ProjectFactory()
-        nominator = factories.NominatorFactory()
+    def test_nomination_gets_modified(self, setup, scope_value, scope):
+        project, nominator, _ = setup
         form_data = {'url_value': 'http://www.example.com'}
-        factories.NominatedURLFactory(
-            url_nominator=nominator,
-            url_project=project,
-            entity=form_data['url_value'],
-            value='1' if scope_value == '0' else '0'
-        )
-        results = url_handler.nominate_url(project, nominator, form_data, scope_value)[0]
+        factories.NominatedURLFactory(url_nominator=nominator, url_project=project,
+                                      entity=form_data['url_value'],
+                                      value='1' if scope_value == '0' else '0')
+        results = url_handler.write_nomination(project, nominator, form_data, scope_value)[0]
 
         assert 'successfully' in results
         assert scope in results
 
-    def test_creates_new_nomination(self):
-        project = factories.ProjectFactory()
-        nominator = factories.NominatorFactory()
+    def test_creates_new_nomination(self, setup):
+        project, nominator, _ = setup
         form_data = {'url_value': 'http://www.example.com'}
-        scope_value = 1
-        results = url_handler.nominate_url(project, nominator, form_data, scope_value)[0]
-        expected = 'You have successfully nominated {0}'.format(form_data['url_value'])
-
-        assert results == expected
-
-    def test_cannot_create_nomination(self):
-        project = nominator = scope_value = None
-        form_data = {}
-
-        with pytest.raises(http.Http404):
-            url_handler.nominate_url(project, nominator, form_data, scope_value)
-
 
-class TestAddOtherAttribute():
+        assert url_handler.write_nomination(project, nominator, form_data, '1') == [
+            'You have successfully nominated http://www.example.com']
+        assert models.URL.objects.get().attribute == 'nomination'
 
-    @pytest.fixture
-    def setup(self):
-        nominator = factories.NominatorFactory()
+    @pytest.mark.parametrize('values', [
+        'some_value',
+        ['some_value', 'some_other_value'],
+    ])
+    def test_adds_attributes(self, setup, values):
+        _, nominator, _ = setup
         project = factories.ProjectWithMetadataFactory()
         metadata_names = [md.name for md in project.metadata.all()]
-        return project, metadata_names, nominator
-
-    def test_returns_expected(self, setup):
-        project, metadata_names, nominator = setup
         entity = 'http://www.example.com'
-        value = 'some_value'
-
         form_data = {'url_value': entity}
         for metadata in metadata_names:
-            form_data[metadata] = value
-
-        results = url_handler.add_other_attribute(project, nominator, form_data, [])
-
+            form_data[metadata] = values
+        results = url_handler.write_nomination(project, nominator, form_data)
         expected = [
             'You have successfully added the {0} "{1}" for {2}'.format(met_name, value, entity)
             for met_name in metadata_names
+            for value in (values if isinstance(values, list) else [values])
         ]
-        assert sorted(results) == sorted(expected)
 
-    def test_returns_expected_with_multiple_attribute_values(self, setup):
-        project, metadata_names, nominator = setup
-        entity = 'http://www.example.com'
-        values = ['some_value', 'some_other_value']
+        assert sorted(results) == sorted(expected)
 
-        form_data = {'url_value': entity}
-        for metadata in metadata_names:
-            form_data[metadata] = values
+    def test_does_not_add_existing_attribute(self, setup):
+        _, nominator, _ = setup
+        project = factories.ProjectWithMetadataFactory(metadata2=None)
+        attribute = project.metadata.get().name
+        url = factories.URLFactory(url_project=project, url_nominator=nominator,
+                                   attribute=attribute)
+        results = url_handler.write_nomination(project, nominator,
+                                               {'url_value': url.entity, attribute: url.value})
 
-        results = url_handler.add_other_attribute(project, nominator, form_data, [])
-        expected = [
-            'You have successfully added the {0} "{1}" for {2}'.format(met_name, value, entity)
-            for met_name in metadata_names
-            for value in values
-        ]
+        assert 'You have already added' in results[0]
+        assert models.URL.objects.count() == 1
 
-        assert sorted(results) == sorted(expected)
+    def test_creates_surt(self, setup):
+        project, nominator, system_nominator = setup
+        url_handler.write_nomination(project, nominator, {'url_value': 'http://example.com'},
+                                     system_nominator=system_nominator)
+        surt = models.URL.objects.get()
 
+        assert (surt.attribute, surt.value) == ('surt', 'http://(com,example,)')
+        assert surt.url_nominator == system_nominator
 
-class TestSaveAttribute():
+    def test_existing_surt_matched_case_insensitively(self, setup):
+        _, nominator, system_nominator = setup
+        url = factories.SURTFactory(entity='http://www.Example.com')
+        url_handler.write_nomination(url.url_project, nominator,
+                                     {'url_value': 'HTTP://WWW.EXAMPLE.COM'},
+                                     system_nominator=system_nominator)
 
-    def test_creates_url(self):
-        results = url_handler.save_attribute(
-            factories.ProjectFactory(),
-            factories.NominatorFactory(),
-            {'url_value': 'http://www.example.com'},
-            [],
-            'Language',
-            'English'
-        )
+        assert models.URL.objects.get() == url
 
-        assert 'You have successfully added' in results[0]
-        assert models.URL.objects.all().count() == 1
-
-    def test_does_not_create_url_if_it_exists_already(self):
-        url = factories.URLFactory()
-        results = url_handler.save_attribute(
-            url.url_project,
-            url.url_nominator,
-            {'url_value': url.entity},
-            [],
-            url.attribute,
-            url.value
-        )
+    def test_failed_write_leaves_nothing(self, setup, monkeypatch):
+        project, nominator, system_nominator = setup
+        form_data = self.submission(project, 2, 2)
 
-        assert 'You have already added' in results[0]
-        assert models.URL.objects.all().count() == 1
+        def fail(*args, **kwargs):
+            raise DatabaseError
 
-    def test_url_cannot_be_saved(self):
+        monkeypatch.setattr(url_handler, 'record_new_urls', fail)
         with pytest.raises(http.Http404):
-            with transaction.atomic():
-                url_handler.save_attribute(None, None, {'url_value': ''}, [], '', '',)
-        assert models.URL.objects.all().count() == 0
+            url_handler.write_nomination(project, nominator, form_data, '1', system_nominator)
+        assert not models.URL.objects.exists()
 
 
-class TestSurtExists():
+@pytest.mark.parametrize('url, expected', [
+    ('http://www.example.com', 'http://www.example.com'),
+    ('   http://www.example.com   ', 'http://www.example.com'),
+    ('https://www.example.com', 'https://www.example.com'),
+    ('http://www.example.com///', 'http://www.example.com')
+])
+def test_check_url(url, expected):
+    assert url_handler.check_url(url) == expected
+
 
-    def test_returns_true_with_existing_surt(self):
-        system_nominator = models.Nominator.objects.get(id=settings.SYSTEM_NOMINATOR_ID)
-        url = factories.SURTFactory()
-        assert url_handler.surt_exists(url.url_project, system_nominator, url.entity) is True
+class TestGetNominator():
 
-    def test_creates_surt_when_surt_does_not_exist(self):
-        system_nominator = models.Nominator.objects.get(id=settings.SYSTEM_NOMINATOR_ID)
-        project = factories.ProjectFactory()
-        url = 'http://example.com'
+    def test_returns_nominator(self):
+        nominator = factories.NominatorFactory()
+        form_data = {
+            'nominator_email': nominator.nominator_email,
+            'nominator_name': nominator.nominator_name,
+            'nominator_institution': nominator.nominator_institution
+        }
+        assert url_handler.get_nominator(form_data) == nominator
 
-        assert len(models.URL.objects.all()) == 0
-        assert url_handler.surt_exists(project, system_nominator, url) is True
-        assert len(models.URL.objects.all()) == 1
+    def test_creates_and_returns_nominator(self):
+        form_data = {
+            'nominator_email': 'somebody@somewhere.com',
+            'nominator_name': 'John Smith',
+            'nominator_institution': 'UNT'
+        }
 
-    def test_surt_cannot_be_created(self):
-        system_nominator = models.Nominator.objects.get(id=settings.SYSTEM_NOMINATOR_ID)
-        project = factories.ProjectFactory()
-        url = None
+        assert len(models.Nominator.objects.all()) == 1
+        new_nominator = url_handler.get_nominator(form_data)
+        assert len(models.Nominator.objects.all()) == 2
+        for key in form_data.keys():
+            assert getattr(new_nominator, key) == form_data[key]
 
+    def test_cannot_create_nominator(self):
+        form_data = {
+            'nominator_email': 'somebody@somewhere.com',
+            'nominator_name': None,
+            'nominator_institution': None
+        }
         with pytest.raises(http.Http404):
-            url_handler.surt_exists(project, system_nominator, url)
+            url_handler.get_nominator(form_data)
 
 
 @pytest.mark.parametrize('url, expected', [
@@ -487,7 +561,8 @@ class TestCreateJsonBrowse():
         expected = [{
             'hasChildren': True,
             'id': id_group,
-            'text': text
+            'text': text,
+            'urlCount': 1
         }]
         results = url_handler.create_json_browse(project.project_slug, None, root)
 
@@ -507,7 +582,8 @@ class TestCreateJsonBrowse():
         expected = [{
             'hasChildren': True,
             'id': id_group,
-            'text': text
+            'text': text,
+            'urlCount': 1
         }]
         results = url_handler.create_json_browse(project.project_slug, None, root)
 
@@ -523,7 +599,8 @@ class TestCreateJsonBrowse():
         root = 'com,example,'
         expected = [{
             'id': 'com,example,www,',
-            'text': '<a href="surt/(com,example,www">com,example,www</a>'
+            'text': '<a href="surt/(com,example,www">com,example,www</a>',
+            'urlCount': 1
         }]
         results = url_handler.create_json_browse(project.project_slug, None, root)
 
@@ -549,7 +626,8 @@ class TestCreateJsonBrowse():
         expected = [{
             'hasChildren': True,
             'id': id_group,
-            'text': text
+            'text': text,
+            'urlCount': 3
         }]
         results = url_handler.create_json_browse(project.project_slug, None, root)
 
@@ -562,10 +640,13 @@ class TestCreateJsonBrowse():
         expected = []
         results = url_handler.create_json_browse(project.project_slug, None, root)
         for url in urls:
+            category = url.value[url.value.find(root) + 4]
             surt_dict = {
                 'hasChildren': True,
-                'id': root + url.value[url.value.find(root) + 4],
-                'text': url.value[url.value.find(root) + 4]
+                'id': root + category,
+                'text': category,
+                'urlCount': sum(
+                    u.value[u.value.find(root) + 4] == category for u in urls)
             }
             if surt_dict not in expected:
                 expected.append(surt_dict)
@@ -573,6 +654,33 @@ class TestCreateJsonBrowse():
         assert sorted(json.loads(results), key=lambda x: x['id']) == \
             sorted(expected, key=lambda x: x['id'])
 
+    def test_children_listed_with_counts(self):
+        project = factories.ProjectFactory()
+        for value in ['http://(com,example,)', 'http://(com,example,www,)',
+                      'http://(com,example,www,)/page', 'http://(org,example,)']:
+            factories.SURTFactory(url_project=project, value=value)
+        results = json.loads(url_handler.create_json_browse(project.project_slug, None, ''))
+
+        assert results == [
+            {'text': 'com', 'id': 'com,', 'hasChildren': True, 'urlCount': 3},
+            {'text': 'org', 'id': 'org,', 'hasChildren': True, 'urlCount': 1},
+        ]
+        results = json.loads(url_handler.create_json_browse(project.project_slug, None,
+                                                            'com,example,'))
+        assert results == [{
+            'text': '<a href="surt/(com,example,www">com,example,www</a>',
+            'id': 'com,example,www,',
+            'urlCount': 2
+        }]
+
+    def test_letter_bucket_lists_matching_children(self):
+        project = factories.ProjectFactory()
+        for value in ['http://(com,apple,)', 'http://(com,acme,)', 'http://(com,banana,)']:
+            factories.SURTFactory(url_project=project, value=value)
+        results = json.loads(url_handler.create_json_browse(project.project_slug, None, 'com,a'))
+
+        assert [entry['id'] for entry in results] == ['com,acme,', 'com,apple,']
+
     def test_cannot_find_project(self):
         slug = 'blah'
         with pytest.raises(http.Http404):
@@ -593,8 +701,8 @@ class TestCreateJsonSearch():
 
     def test_returns_expected(self):
         project = factories.ProjectFactory()
-        expected_urls = factories.URLFactory.create_batch(10, url_project=project)
-        other_urls = factories.URLFactory.create_batch(10)
+        expected_urls = factories.SURTFactory.create_batch(10, url_project=project)
+        other_urls = factories.SURTFactory.create_batch(10)
         json_url_list = url_handler.create_json_search(project.project_slug)
 
         for url in expected_urls:
@@ -608,6 +716,55 @@ class TestCreateJsonSearch():
             url_handler.create_json_search('fake_slug')
 
 
+class TestSearchSurtUrls():
+
+    def test_substring_matches_ordered_by_surt(self):
+        project = factories.ProjectFactory()
+        b = factories.SURTFactory(url_project=project, entity='http://www.example.com/Blog',
+                                  value='http://(com,example,www,)/blog')
+        a = factories.SURTFactory(url_project=project, entity='http://blog.example.org',
+                                  value='http://(org,example,blog,)')
+        factories.SURTFactory(url_project=project, entity='http://www.example.com/news',
+                              value='http://(com,example,www,)/news')
+        factories.SURTFactory(entity='http://blog.example.net')
+
+        assert list(url_handler.search_surt_urls(project, 'BLOG')) == [b, a]
+
+    def test_short_and_empty_terms(self):
+        project = factories.ProjectFactory()
+        urls = [factories.SURTFactory(url_project=project, entity=entity, value=surt)
+                for entity, surt in [('http://a.org', 'http://(org,a,)'),
+                                     ('http://b.com', 'http://(com,b,)')]]
+
+        assert list(url_handler.search_surt_urls(project, 'a.')) == [urls[0]]
+        assert list(url_handler.search_surt_urls(project, '')) == [urls[1], urls[0]]
+
+    def test_trigrams_must_be_adjacent(self):
+        project = factories.ProjectFactory()
+        factories.SURTFactory(url_project=project, entity='http://abc.com/xyz')
+
+        assert not url_handler.search_surt_urls(project, 'abcxyz').exists()
+
+    def test_uses_trigram_index(self):
+        project = factories.ProjectFactory()
+        url = factories.SURTFactory(url_project=project, entity='http://example.com')
+        models.EntityTrigram.objects.all().delete()
+
+        assert not url_handler.search_surt_urls(project, 'example').exists()
+        assert list(url_handler.search_surt_urls(project, 'ex')) == [url]
+
+
+@pytest.mark.parametrize('term, expected', [
+    ('ab', []),
+    ('abc', ['abc']),
+    ('aaaa', ['aaa']),
+    ('abcdefgh', ['abc', 'bcd', 'cde', 'def', 'efg', 'fgh']),
+    ('abcdefghijk', ['abc', 'cde', 'def', 'fgh', 'ghi', 'ijk']),
+])
+def test_query_trigrams(term, expected):
+    assert url_handler.query_trigrams(term) == expected
+
+
 class TestCreateURLList():
 
     def test_returns_expected(self):
@@ -654,6 +811,45 @@ class TestCreateURLList():
 
         assert results['attribute_dict'][attribute] == [met_value]
 
+    def test_returns_expected_with_valueset_values(self):
+        project = factories.ProjectFactory()
+        valueset = factories.ValuesetFactory()
+        metadata = factories.MetadataFactory(value_sets=[valueset])
+        factories.ProjectMetadataFactory(project=project, metadata=metadata)
+        set_value = factories.ValuesetValuesFactory(valueset=valueset, value__key='two').value
+        url = factories.URLFactory(url_project=project, attribute=metadata.name, value='two')
+        results = url_handler.create_url_list(project, [url])
+        attribute = capwords(url.attribute.replace('_', ' '))
+
+        assert results['attribute_dict'][attribute] == [set_value]
+
+    def test_unknown_key_returns_raw_value(self):
+        project = factories.ProjectFactory()
+        metadata = factories.MetadataFactory()
+        factories.ProjectMetadataFactory(project=project, metadata=metadata)
+        factories.MetadataValuesFactory(metadata=metadata, value__key='one')
+        url = factories.URLFactory(url_project=project, attribute=metadata.name, value='other')
+        results = url_handler.create_url_list(project, [url])
+        attribute = capwords(url.attribute.replace('_', ' '))
+
+        assert results['attribute_dict'][attribute] == ['other']
+
+    def test_query_count_is_bounded(self, django_assert_num_queries):
+        project = factories.ProjectWithMetadataFactory()
+        entity = 'www.example.com'
+        for project_metadata in project.project_metadata_set.all():
+            for value in project_metadata.metadata.values.all():
+                factories.URLFactory(url_project=project, entity=entity,
+                                     attribute=project_metadata.metadata.name, value=value.key)
+        factories.URLFactory.create_batch(10, url_project=project, entity=entity)
+        factories.NominatedURLFactory.create_batch(10, url_project=project, entity=entity)
+        url_list = models.URL.objects.filter(url_project=project, entity=entity)
+
+        # The URL rows with their nominators, then the project's metadata
+        # fields, field values and value set values.
+        with django_assert_num_queries(4):
+            url_handler.create_url_list(project, url_list)
+
 
 class TestCreateURLDump():
 
@@ -724,6 +920,22 @@ class TestCreateURLDump():
             }
         }
 
+    def test_entities_differing_in_case_kept_apart(self):
+        project = factories.ProjectFactory()
+        nominator = factories.NominatorFactory()
+        for entity, value in [('http://www.Example.com', '1'), ('http://www.example.com', '1'),
+                              ('http://www.Example.com', '-1'), ('http://www.b.com', '1')]:
+            factories.NominatedURLFactory(url_project=project, url_nominator=nominator,
+                                          entity=entity, value=value)
+        results = list(url_handler.iter_url_dump(project))
+
+        assert [(entity, data['nomination_count'], data['nomination_score'])
+                for entity, data in results] == [
+            ('http://www.b.com', 1, 1),
+            ('http://www.Example.com', 2, 0),
+            ('http://www.example.com', 1, 1),
+        ]
+
 
 class TestCreateSurtDict():
 
@@ -743,14 +955,135 @@ class TestCreateSurtDict():
         surt_dict = url_handler.create_surt_dict(project, surt_root)
 
         assert len(surt_dict['url_list']) == len(surts)
-        for url in surt_dict['url_list']:
-            assert url in urls
+        assert ({summary.entity for summary in surt_dict['url_list']}
+                == {url.entity for url in urls})
         assert surt_dict['letter'] == expected_letter
 
     def test_returns_none_when_no_surts_found(self):
         surt_dict = url_handler.create_surt_dict('', 'http://(com,example,)')
         assert surt_dict['url_list'] is None
 
+    def test_matches_prefix_range_in_surt_order(self):
+        project = factories.ProjectFactory()
+        surts = ['http://(com,example,)/b', 'http://(com,example,)/a',
+                 'http://(com,examples,)/', 'http://(com,exampla,)/', 'http://(org,example,)/']
+        for surt in surts:
+            factories.SURTFactory(url_project=project, value=surt)
+        surt_dict = url_handler.create_surt_dict(project, 'http://(com,example')
+
+        assert ([summary.surt_norm for summary in surt_dict['url_list']]
+                == ['(com,example,)/a', '(com,example,)/b', '(com,examples,)/'])
+
+    def test_ignores_scheme(self):
+        project = factories.ProjectFactory()
+        http_url = factories.SURTFactory(url_project=project, value='http://(com,example,)/a')
+        https_url = factories.SURTFactory(url_project=project, value='https://(com,example,)/b')
+        for surt in ['http://(com,example,', 'https://(com,example,', '(com,example,']:
+            surt_dict = url_handler.create_surt_dict(project, surt)
+
+            assert ([summary.entity for summary in surt_dict['url_list']]
+                    == [http_url.entity, https_url.entity])
+
+    def test_pages_forward_and_back(self):
+        project = factories.ProjectFactory()
+        for i in range(5):
+            factories.SURTFactory(url_project=project, value='http://(com,example,)/%s' % i)
+        surt = 'http://(com,example,'
+
+        first = url_handler.create_surt_dict(project, surt, page_size=2)
+        second = url_handler.create_surt_dict(project, surt, after=first['next_cursor'],
+                                              page_size=2)
+        third = url_handler.create_surt_dict(project, surt, after=second['next_cursor'],
+                                             page_size=2)
+        back = url_handler.create_surt_dict(project, surt, before=third['prev_cursor'],
+                                            page_size=2)
+        start = url_handler.create_surt_dict(project, surt, before=back['prev_cursor'],
+                                             page_size=2)
+
+        def paths(surt_dict):
+            return [summary.surt_norm[-1] for summary in surt_dict['url_list']]
+
+        assert paths(first) == ['0', '1']
+        assert first['prev_cursor'] is None
+        assert paths(second) == ['2', '3']
+        assert paths(third) == ['4']
+        assert third['next_cursor'] is None
+        assert paths(back) == ['2', '3']
+        assert back['next_cursor'] == second['next_cursor']
+        assert paths(start) == ['0', '1']
+        assert start['prev_cursor'] is None
+        assert start['next_cursor'] is not None
+
+    def test_invalid_cursor_raises_value_error(self):
+        project = factories.ProjectFactory()
+        with pytest.raises(ValueError):
+            url_handler.create_surt_dict(project, 'http://(com,', after='not a cursor')
+
+    @pytest.mark.parametrize('surt, expected', [
+        ('http://(', 4),
+        ('http://(com,', 3),
+        ('http://(com,example', 2),
+        ('(com,example,', 2),
+        ('http://(com,example,www,', 1),
+        ('http://(net,', 0),
+        ('http://(com,example,)/a', None),
+    ])
+    def test_total_is_read_from_surt_tree(self, surt, expected):
+        project = factories.ProjectFactory()
+        surts = ['http://(com,example,)/a', 'https://(com,example,www,)/',
+                 'http://(com,other,)/', 'http://(org,example,)/']
+        for value in surts:
+            factories.SURTFactory(url_project=project, value=value)
+        summaries.get_project_stats(project)
+
+        with CaptureQueriesContext(connection) as queries:
+            total = url_handler.count_surt_prefix(project, summaries.normalize_surt(surt))
+
+        assert total == expected
+        assert not any('COUNT(' in query['sql'] for query in queries)
+
+    @pytest.mark.parametrize('prefix, expected', [
+        ('(com,ex', '(com,ey'),
+        ('a', 'b'),
+    ])
+    def test_prefix_upper_bound(self, prefix, expected):
+        assert url_handler.prefix_upper_bound(prefix) == expected
+
+
+class TestGetRelatedUrls():
+
+    def test_excludes_entity_and_other_domains(self):
+        project = factories.ProjectFactory()
+        url = factories.SURTFactory(url_project=project, entity='http://example.com/b',
+                                    value='http://(com,example,)/b')
+        factories.SURTFactory(url_project=project, entity='https://www.example.com/',
+                              value='https://(com,example,www,)/')
+        factories.SURTFactory(url_project=project, entity='http://example.com/a',
+                              value='http://(com,example,)/a')
+        factories.SURTFactory(url_project=project, entity='http://example.org/',
+                              value='http://(org,example,)/')
+        related = url_handler.get_related_urls(project, url.entity, url.value, 10)
+
+        assert [summary.entity for summary in related['before']] == ['http://example.com/a']
+        assert [summary.entity for summary in related['after']] == ['https://www.example.com/']
+        assert related['prev_cursor'] is None
+        assert related['next_cursor'] is None
+        assert related['total'] == 2
+
+    def test_query_count_is_bounded(self, django_assert_num_queries):
+        project = factories.ProjectFactory()
+        for i in range(20):
+            factories.SURTFactory(url_project=project, entity='http://example.com/%02d' % i,
+                                  value='http://(com,example,)/%02d' % i)
+
+        # The URLs before and after, then the domain's SURT tree counter.
+        with django_assert_num_queries(3):
+            related = url_handler.get_related_urls(
+                project, 'http://example.com/10', 'http://(com,example,)/10', 3)
+
+        assert len(related['before']) == len(related['after']) == 3
+        assert related['total'] == 19
+
 
 @pytest.mark.parametrize('surt, expected', [
     ('http://(com,example,www,)', 'http://(com,example,'),
@@ -33,6 +33,16 @@ def test_search_json():
     assert resolve(url).func == views.search_json
 
 
+def test_typeahead_json():
+    url = '/nomination/some_project/typeahead.json'
+    assert resolve(url).func == views.typeahead_json
+
+
+def test_institutions_json():
+    url = '/nomination/some_project/institutions.json'
+    assert resolve(url).func == views.institutions_json
+
+
 def test_browse_json():
     url = '/nomination/some_project/browse/some_attribute/browse.json'
     assert resolve(url).func == views.browse_json
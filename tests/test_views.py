@@ -4,13 +4,17 @@ from urllib.parse import quote
 import pytest
 import json
 
+from django.core.cache import cache
 from django.http import Http404
 from django.urls import reverse
 from django.contrib.sites.models import Site
 from django.conf import settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.utils.html import escape
+from django.utils.http import http_date
 
-from nomination import views, models
+from nomination import views, models, url_handler
 from . import factories
 
 pytestmark = pytest.mark.django_db
@@ -142,6 +146,26 @@ class TestUrlLookup():
         assert expected in response.content.decode()
         assert response.status_code == 200
 
+    def test_partial_search_is_paged(self, client, settings):
+        settings.NOMINATION_SEARCH_PAGE_SIZE = 2
+        project = factories.ProjectFactory()
+        urls = [factories.URLFactory(url_project=project, entity='http://example.com/%s' % i,
+                                     attribute='surt', value='http://(com,example,)/%s' % i)
+                for i in range(3)]
+        lookup_url = reverse('url_lookup', args=[project.project_slug])
+        response = client.post(lookup_url, {'search-url-value': 'example.com',
+                                            'partial-search': ''})
+
+        assert list(response.context['url_list']) == urls[:2]
+        next_link = '?search-url-value=example.com&amp;partial-search=&amp;page=2'
+        assert next_link in response.content.decode()
+
+        response = client.get(lookup_url, {'search-url-value': 'example.com',
+                                           'partial-search': '', 'page': 2})
+
+        assert list(response.context['url_list']) == urls[2:]
+        assert 'Page 2 of 2 (3 URLs)' in response.content.decode()
+
     def test_exact_lookup_prefers_exact_scheme(self, rf):
         project = factories.ProjectFactory()
         url = factories.URLFactory(url_project=project,
@@ -237,6 +261,19 @@ class TestProjectUrls():
         assert response.context['nominator_count'] == 2
         assert len(response.context['browse_tup']) == 1
 
+    def test_counts_need_no_aggregates(self, client):
+        project = factories.ProjectFactory()
+        factories.SURTFactory(url_project=project)
+        factories.NominatedURLFactory(url_project=project, value=1)
+        client.get(reverse('project_urls', args=[project.project_slug]))
+        factories.NominatedURLFactory(url_project=project, value=1)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(reverse('project_urls', args=[project.project_slug]))
+
+        assert response.context['nominator_count'] == 2
+        assert not [query for query in queries if 'COUNT(' in query['sql'].upper()]
+
 
 class TestUrlListing():
 
@@ -304,7 +341,6 @@ class TestUrlListing():
             'summary_list': None,
             'json_data': None,
             'form_types': json.dumps({project_metadata.metadata.name: project_metadata.form_type}),
-            'institutions': views.get_look_ahead(project),
             'url_entity': entity,
         }
 
@@ -331,7 +367,6 @@ class TestUrlListing():
         expected_context = {
             'project': project,
             'metadata_vals': views.get_metadata(project),
-            'institutions': views.get_look_ahead(project),
             'form_types': json.dumps({project_metadata.metadata.name: project_metadata.form_type}),
         }
         response = client.get(reverse('url_listing', args=[project.project_slug, entity]))
@@ -339,9 +374,55 @@ class TestUrlListing():
         for key in expected_context:
             assert str(response.context[key]) == str(expected_context[key])
 
-        assert list(response.context['related_url_list']) == related_urls
+        related = response.context['related']
+        assert related['before'] == []
+        assert [summary.entity for summary in related['after']] == [related_urls[0].entity]
+        assert related['total'] == 1
         assert response.context['url_data'] == views.create_url_list(project, related_urls + [url])
 
+    def test_related_urls_are_capped_either_side(self, client, settings):
+        settings.NOMINATION_RELATED_URLS = 2
+        project = factories.ProjectFactory()
+        for i in range(7):
+            factories.SURTFactory(url_project=project, entity='http://example.com/%s' % i,
+                                  value='http://(com,example,)/%s' % i)
+        response = client.get(reverse('url_listing',
+                                      args=[project.project_slug, 'http://example.com/3']))
+        related = response.context['related']
+
+        assert [summary.entity for summary in related['before']] == [
+            'http://example.com/1', 'http://example.com/2']
+        assert [summary.entity for summary in related['after']] == [
+            'http://example.com/4', 'http://example.com/5']
+        assert related['prev_cursor'] is not None
+        assert related['next_cursor'] is not None
+        assert related['total'] == 6
+        assert 'Show more' in response.content.decode()
+
+    def test_query_count_independent_of_attributes(self, client):
+        entity = 'www.example.com'
+        project = factories.ProjectWithMetadataFactory()
+        factories.SURTFactory(url_project=project, entity=entity,
+                              value='http://(com,example,www,)')
+        factories.NominatedURLFactory(url_project=project, entity=entity)
+        factories.URLFactory(url_project=project, entity=entity)
+        url = reverse('url_listing', args=[project.project_slug, entity])
+        # warm the metadata cache
+        client.get(url)
+        with CaptureQueriesContext(connection) as few:
+            client.get(url)
+
+        for project_metadata in project.project_metadata_set.all():
+            for value in project_metadata.metadata.values.all():
+                factories.URLFactory(url_project=project, entity=entity,
+                                     attribute=project_metadata.metadata.name, value=value.key)
+        factories.URLFactory.create_batch(10, url_project=project, entity=entity)
+        factories.NominatedURLFactory.create_batch(10, url_project=project, entity=entity)
+        with CaptureQueriesContext(connection) as many:
+            client.get(url)
+
+        assert len(many) == len(few)
+
     def test_context_with_post(self, client):
         data = {
             'scope': 1,
@@ -462,6 +543,65 @@ class TestUrlListing():
             assert str(response.context[key]) == str(expected_context[key])
 
 
+class TestRelatedJson():
+
+    def make_urls(self, project, count=7):
+        for i in range(count):
+            factories.SURTFactory(url_project=project, entity='http://example.com/%s' % i,
+                                  value='http://(com,example,)/%s' % i)
+        factories.SURTFactory(url_project=project, entity='http://other.com/',
+                              value='http://(com,other,)/')
+
+    def get_json(self, client, project, **params):
+        response = client.get(reverse('related_json', args=[project.project_slug]), params)
+        assert response.status_code == 200
+        return json.loads(response.content)
+
+    def test_returns_neighbors(self, client):
+        project = factories.ProjectFactory()
+        self.make_urls(project)
+        data = self.get_json(client, project, url='http://example.com/3', limit=1)
+
+        assert [result['entity'] for result in data['results']] == [
+            'http://example.com/2', 'http://example.com/4']
+        assert data['results'][0]['url'] == reverse(
+            'url_listing', args=[project.project_slug, 'http://example.com/2'])
+        assert data['total'] == 6
+
+    def test_pages_outward(self, client):
+        project = factories.ProjectFactory()
+        self.make_urls(project)
+        first = self.get_json(client, project, url='http://example.com/3', limit=1)
+        after = self.get_json(client, project, url='http://example.com/3', limit=2,
+                              after=first['next'])
+        before = self.get_json(client, project, url='http://example.com/3', limit=5,
+                               before=first['prev'])
+
+        assert [result['entity'] for result in after['results']] == [
+            'http://example.com/5', 'http://example.com/6']
+        assert after['next'] is None
+        assert [result['entity'] for result in before['results']] == [
+            'http://example.com/0', 'http://example.com/1']
+        assert before['prev'] is None
+
+    def test_unknown_url_raises_404(self, client):
+        project = factories.ProjectFactory()
+        response = client.get(reverse('related_json', args=[project.project_slug]),
+                              {'url': 'http://example.com/'})
+        assert response.status_code == 404
+
+    @pytest.mark.parametrize('params', [
+        {},
+        {'url': 'http://example.com/3', 'after': 'not a cursor'},
+        {'url': 'http://example.com/3', 'limit': 'many'},
+    ])
+    def test_bad_request(self, client, params):
+        project = factories.ProjectFactory()
+        self.make_urls(project)
+        response = client.get(reverse('related_json', args=[project.project_slug]), params)
+        assert response.status_code == 400
+
+
 class TestUrlSurt():
 
     def test_status_ok(self, rf):
@@ -500,11 +640,37 @@ class TestUrlSurt():
 
         assert response.context['surt'] == surt_root
         assert response.context['project'] == project
-        assert list(response.context['url_list']) == ([url] if num_matching_surts else [])
+        assert ([summary.entity for summary in response.context['url_list']]
+                == ([url.entity] if num_matching_surts else []))
         assert response.context['letter'] == letter
         assert response.context['browse_domain'] == 'com'
         assert len(response.context['browse_dict']) == 1
 
+    def test_pages_with_cursors(self, client, settings):
+        settings.NOMINATION_SURT_PAGE_SIZE = 2
+        project = factories.ProjectFactory()
+        for i in range(3):
+            factories.SURTFactory(url_project=project, value='http://(com,example,)/%s' % i)
+        url = reverse('url_surt', args=[project.project_slug, 'http://(com,example,'])
+        response = client.get(url)
+
+        assert len(response.context['url_list']) == 2
+        assert response.context['total'] == 3
+        assert response.context['prev_cursor'] is None
+        assert 'after=' in response.content.decode()
+
+        response = client.get(url, {'after': response.context['next_cursor']})
+
+        assert len(response.context['url_list']) == 1
+        assert response.context['next_cursor'] is None
+        assert 'before=' in response.content.decode()
+
+    def test_invalid_cursor_is_bad_request(self, client):
+        project = factories.ProjectFactory()
+        response = client.get(reverse('url_surt', args=[project.project_slug, 'http://(com,']),
+                              {'after': 'not a cursor'})
+        assert response.status_code == 400
+
 
 class TestUrlAdd():
 
@@ -545,14 +711,15 @@ class TestUrlAdd():
             entity='{0}/main/page'.format(entity),
             value='{0}/main/page'.format(entity_surt)
         ))
-        institutions = [url.url_nominator.nominator_institution for url in urls]
         response = client.get(reverse('url_add', args=[project.project_slug]))
 
         assert response.context['project'] == project
         assert isinstance(response.context['form'], views.URLForm)
         assert response.context['metadata_vals'][0][0] == project_metadata
         assert list(response.context['metadata_vals'][0][1]) == []
-        assert response.context['institutions'] == json.dumps(sorted(institutions))
+        assert 'institutions' not in response.context
+        assert reverse('institutions_json', args=[project.project_slug]) in \
+            response.content.decode()
         assert response.context['form_types'] == '{{"{0}": "{1}"}}'.format(
             project_metadata.metadata.name, project_metadata.form_type)
 
@@ -745,7 +912,8 @@ class TestBrowseJson():
         assert json.loads(response.content) == [{
             'hasChildren': True,
             'id': id,
-            'text': text
+            'text': text,
+            'urlCount': 1
         }]
 
 
@@ -759,6 +927,114 @@ class TestSearchJson():
         assert response.status_code == 200
         assert response['Content-Type'] == 'application/json'
 
+    def test_lists_all_urls_without_params(self, rf):
+        project = factories.ProjectFactory()
+        entities = ['http://a.com', 'http://B.com', 'http://c.com']
+        for entity in reversed(entities):
+            factories.SURTFactory(url_project=project, entity=entity)
+        response = views.search_json(rf.get('/'), project.project_slug)
+
+        assert json.loads(response.content) == entities
+        assert not response.has_header('Link')
+
+    def test_paged_with_params(self, rf):
+        project = factories.ProjectFactory()
+        for entity in ['http://a.com', 'http://b.com/1', 'http://b.com/2', 'http://b.com/3']:
+            factories.SURTFactory(url_project=project, entity=entity)
+        response = views.search_json(rf.get('/search.json', {'q': 'http://b', 'limit': 2}),
+                                     project.project_slug)
+
+        assert json.loads(response.content) == ['http://b.com/1', 'http://b.com/2']
+        assert response['Link'] == ('</search.json?q=http%3A%2F%2Fb&limit=2'
+                                    '&cursor=http%3A%2F%2Fb.com%2F2>; rel="next"')
+
+        response = views.search_json(
+            rf.get('/search.json', {'q': 'http://b', 'limit': 2, 'cursor': 'http://b.com/2'}),
+            project.project_slug)
+
+        assert json.loads(response.content) == ['http://b.com/3']
+        assert not response.has_header('Link')
+
+    @pytest.mark.parametrize('limit', ['ten', '0'])
+    def test_bad_limit(self, client, limit):
+        project = factories.ProjectFactory()
+        response = client.get(reverse('search_json', args=[project.project_slug]),
+                              {'limit': limit})
+
+        assert response.status_code == 400
+
+
+class TestTypeaheadJson():
+
+    def test_prefix_matches(self, client):
+        project = factories.ProjectFactory()
+        for entity in ['http://www.example.com', 'https://www.example.com/a',
+                       'http://www.other.com']:
+            factories.SURTFactory(url_project=project, entity=entity)
+        response = client.get(reverse('typeahead_json', args=[project.project_slug]),
+                              {'q': 'www.example', 'any_scheme': '1'})
+
+        assert response.status_code == 200
+        assert response['Content-Type'] == 'application/json'
+        assert json.loads(response.content) == {
+            'results': ['http://www.example.com', 'https://www.example.com/a'],
+            'next': None,
+        }
+
+    def test_default_and_max_limit(self, client, settings):
+        settings.NOMINATION_TYPEAHEAD_MAX_LIMIT = 12
+        project = factories.ProjectFactory()
+        for i in range(20):
+            factories.SURTFactory(url_project=project, entity='http://example.com/%02d' % i)
+        url = reverse('typeahead_json', args=[project.project_slug])
+
+        default_page = json.loads(client.get(url, {'q': 'http://example.com/'}).content)
+        assert len(default_page['results']) == views.TYPEAHEAD_LIMIT
+        assert default_page['next'] == 'http://example.com/09'
+
+        large_page = json.loads(client.get(url, {'limit': 1000}).content)
+        assert len(large_page['results']) == 12
+
+    def test_project_not_found(self, client):
+        response = client.get(reverse('typeahead_json', args=['fake_slug']))
+
+        assert response.status_code == 404
+
+
+class TestInstitutionsJson():
+
+    def test_prefix_matches(self, client):
+        project = factories.ProjectFactory()
+        for institution in ['UNT Libraries', 'University of Texas', 'Stanford', 'unt press']:
+            factories.URLFactory(url_project=project,
+                                 url_nominator__nominator_institution=institution)
+        factories.URLFactory(url_nominator__nominator_institution='Unrelated')
+        response = client.get(reverse('institutions_json', args=[project.project_slug]),
+                              {'q': 'un'})
+
+        assert response.status_code == 200
+        assert response['Content-Type'] == 'application/json'
+        # revalidated against the project's watermark rather than reused blindly
+        assert 'ETag' in response
+        assert 'max-age' not in response.get('Cache-Control', '')
+        assert json.loads(response.content) == {
+            'results': ['University of Texas', 'UNT Libraries', 'unt press'],
+        }
+
+    def test_default_limit(self, client):
+        project = factories.ProjectFactory()
+        for i in range(12):
+            factories.URLFactory(url_project=project,
+                                 url_nominator__nominator_institution='Institution %02d' % i)
+        response = client.get(reverse('institutions_json', args=[project.project_slug]))
+
+        assert len(json.loads(response.content)['results']) == views.TYPEAHEAD_LIMIT
+
+    def test_project_not_found(self, client):
+        response = client.get(reverse('institutions_json', args=['fake_slug']))
+
+        assert response.status_code == 404
+
 
 class TestReportsView():
 
@@ -800,10 +1076,11 @@ class TestUrlReport():
         urls = factories.URLFactory.create_batch(3, url_project=project, attribute='surt')
         request = rf.get('/')
         response = views.url_report(request, project.project_slug)
+        content = b''.join(response.streaming_content).decode()
 
-        assert '#This list of urls' in response.content.decode()
+        assert '#This list of urls' in content
         for url in urls:
-            assert url.entity in response.content.decode()
+            assert url.entity in content
 
 
 class TestSurtReport():
@@ -821,10 +1098,11 @@ class TestSurtReport():
         urls = factories.URLFactory.create_batch(3, url_project=project, attribute='surt')
         request = rf.get('/')
         response = views.surt_report(request, project.project_slug)
+        content = b''.join(response.streaming_content).decode()
 
-        assert '#This list of SURTs' in response.content.decode()
+        assert '#This list of SURTs' in content
         for url in urls:
-            assert url.value in response.content.decode()
+            assert url.value in content
 
 
 class TestUrlScoreReport():
@@ -842,10 +1120,11 @@ class TestUrlScoreReport():
         urls = factories.NominatedURLFactory.create_batch(3, url_project=project)
         request = rf.get('/')
         response = views.url_score_report(request, project.project_slug)
+        content = b''.join(response.streaming_content).decode()
 
-        assert '#This list of URLs' in response.content.decode()
+        assert '#This list of URLs' in content
         for url in urls:
-            assert '{0};"{1}"\n'.format(url.value, url.entity) in response.content.decode()
+            assert '{0};"{1}"\n'.format(url.value, url.entity) in content
 
 
 class TestUrlDateReport():
@@ -863,14 +1142,15 @@ class TestUrlDateReport():
         urls = factories.NominatedURLFactory.create_batch(3, url_project=project)
         request = rf.get('/')
         response = views.url_date_report(request, project.project_slug)
+        content = b''.join(response.streaming_content).decode()
 
-        assert '#This list of URLs' in response.content.decode()
+        assert '#This list of URLs' in content
         for url in urls:
             assert '{0};"{1}";{2}\n'.format(
                 url.date.replace(microsecond=0).isoformat(),
                 url.entity,
                 url.value
-            ) in response.content.decode()
+            ) in content
 
 
 class TestUrlNominationReport():
@@ -888,10 +1168,11 @@ class TestUrlNominationReport():
         urls = factories.NominatedURLFactory.create_batch(3, url_project=project)
         request = rf.get('/')
         response = views.url_nomination_report(request, project.project_slug)
+        content = b''.join(response.streaming_content).decode()
 
-        assert '#This list of URLs' in response.content.decode()
+        assert '#This list of URLs' in content
         for url in urls:
-            assert '1;"{0}"\n'.format(url.entity) in response.content.decode()
+            assert '1;"{0}"\n'.format(url.entity) in content
 
 
 class TestFieldReport():
@@ -971,10 +1252,11 @@ class TestValueReport():
         )
         request = rf.get('/')
         response = views.value_report(request, project.project_slug, field, val)
+        content = b''.join(response.streaming_content).decode()
 
-        assert '#This list of URLs' in response.content.decode()
+        assert '#This list of URLs' in content
         for url in urls:
-            assert url.entity in response.content.decode()
+            assert url.entity in content
 
 
 class TestNominatorReport():
@@ -1042,9 +1324,10 @@ class TestNominatorUrlReport():
             project.project_slug,
             field, url.url_nominator.id
         )
+        content = b''.join(response.streaming_content).decode()
 
-        assert '#This list of URLs' in response.content.decode()
-        assert url.entity in response.content.decode()
+        assert '#This list of URLs' in content
+        assert url.entity in content
 
 
 class TestProjectDump():
@@ -1081,4 +1364,177 @@ class TestProjectDump():
             }
         }
 
-        assert json.loads(response.content) == expected
+        assert json.loads(b''.join(response.streaming_content)) == expected
+
+    def test_streamed_json_matches_json_dump(self, rf):
+        project = factories.ProjectFactory()
+        for entity in ['http://b.com', 'http://a.com', 'http://é.com']:
+            factories.SURTFactory(url_project=project, entity=entity)
+            factories.NominatedURLFactory(url_project=project, entity=entity)
+            factories.URLFactory(url_project=project, entity=entity)
+        request = rf.get('/')
+        response = views.project_dump(request, project.project_slug)
+        expected = json.dumps(url_handler.create_url_dump(project), sort_keys=True, indent=4,
+                              ensure_ascii=False)
+
+        assert b''.join(response.streaming_content).decode() == expected
+
+    def test_nominators_joined(self, rf, django_assert_num_queries):
+        project = factories.ProjectFactory()
+        factories.NominatedURLFactory.create_batch(5, url_project=project)
+        response = views.project_dump(rf.get('/'), project.project_slug)
+
+        # The project dump reads the metadata fields and the URL rows, no matter
+        # how many nominations there are.
+        with django_assert_num_queries(2):
+            b''.join(response.streaming_content)
+
+    def test_empty_project_json(self, rf):
+        project = factories.ProjectFactory()
+        response = views.project_dump(rf.get('/'), project.project_slug)
+
+        assert b''.join(response.streaming_content) == b'{}'
+
+    def test_ndjson_format(self, rf):
+        project = factories.ProjectFactory()
+        urls = [factories.NominatedURLFactory(url_project=project, entity=entity, value='1')
+                for entity in ['http://b.com', 'http://a.com']]
+        request = rf.get('/', {'format': 'ndjson'})
+        response = views.project_dump(request, project.project_slug)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+
+        assert response['Content-Type'] == 'application/x-ndjson; charset=utf-8'
+        assert response['Content-Disposition'] == 'attachment; filename={0}_urls.ndjson'.format(
+            project.project_slug)
+        assert [json.loads(line) for line in lines] == [{
+            'entity': url.entity,
+            'attributes': {},
+            'nomination_count': 1,
+            'nomination_score': 1,
+            'nominators': ['{0} - {1}'.format(url.url_nominator.nominator_name,
+                                              url.url_nominator.nominator_institution)],
+        } for url in reversed(urls)]
+
+
+class TestProjectConditional():
+
+    @pytest.fixture
+    def project(self, committed):
+        project = factories.ProjectFactory(project_slug='watermark')
+        with committed():
+            factories.SURTFactory(url_project=project, entity='http://www.example.com',
+                                  value='http://(com,example,www,)')
+            factories.NominatedURLFactory(url_project=project, entity='http://www.example.com',
+                                          value='1')
+        return project
+
+    @pytest.mark.parametrize('name,args', [
+        ('project_about', []),
+        ('url_surt', ['http://(com,example,www,)']),
+        ('browse_json', ['surt']),
+        ('search_json', []),
+        ('typeahead_json', []),
+        ('reports_view', []),
+        ('url_report', []),
+        ('surt_report', []),
+        ('url_score_report', []),
+        ('url_date_report', []),
+        ('url_nomination_report', []),
+        ('nominator_report', ['nominator']),
+        ('project_dump', []),
+    ])
+    def test_unchanged_project_returns_304(self, client, project, name, args,
+                                           django_assert_num_queries):
+        url = reverse(name, args=[project.project_slug] + args)
+        response = client.get(url)
+        assert response.status_code == 200
+        etag = response['ETag']
+
+        # Only the project row is read to answer the conditional request.
+        with django_assert_num_queries(1):
+            response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304
+
+    @pytest.mark.parametrize('name,args', [
+        ('project_urls', []),
+        ('url_listing', ['http://www.example.com']),
+        ('url_add', []),
+    ])
+    def test_form_pages_are_not_conditional(self, client, project, name, args):
+        url = reverse(name, args=[project.project_slug] + args)
+        response = client.get(url)
+
+        assert not response.has_header('ETag')
+        assert client.get(url, HTTP_IF_MODIFIED_SINCE=http_date()).status_code == 200
+
+    def test_unmodified_since_returns_304(self, client, project):
+        url = reverse('project_about', args=[project.project_slug])
+        last_modified = client.get(url)['Last-Modified']
+
+        response = client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+
+        assert response.status_code == 304
+
+    @pytest.mark.parametrize('change', ['insert', 'update', 'delete'])
+    def test_url_change_invalidates_etag(self, client, project, committed, change):
+        url = reverse('url_report', args=[project.project_slug])
+        etag = client.get(url)['ETag']
+        with committed():
+            if change == 'insert':
+                factories.URLFactory(url_project=project)
+            else:
+                surt = models.URL.objects.get(url_project=project, attribute='surt')
+                if change == 'update':
+                    surt.value = 'http://(com,example,)'
+                    surt.save()
+                else:
+                    surt.delete()
+
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        assert response.status_code == 200
+        assert response['ETag'] != etag
+
+    def test_metadata_change_invalidates_etag(self, client, project, committed):
+        url = reverse('reports_view', args=[project.project_slug])
+        etag = client.get(url)['ETag']
+        with committed():
+            factories.ProjectMetadataFactory(project=project)
+
+        assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+    def test_nominator_change_invalidates_etag(self, client, project, committed):
+        url = reverse('nominator_report', args=[project.project_slug, 'nominator'])
+        etag = client.get(url)['ETag']
+        nominator = models.URL.objects.get(url_project=project,
+                                           attribute='nomination').url_nominator
+        nominator.nominator_name = 'Renamed'
+        with committed():
+            nominator.save()
+
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        assert response.status_code == 200
+        assert 'Renamed' in response.content.decode()
+
+    def test_etag_is_the_same_in_every_process(self, client, project):
+        url = reverse('url_report', args=[project.project_slug])
+        etag = client.get(url)['ETag']
+        # another process has its own cache
+        cache.clear()
+
+        assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 304
+
+    def test_post_is_not_conditional(self, client, project):
+        url = reverse('url_lookup', args=[project.project_slug])
+        etag = client.get(url, {'search-url-value': 'example', 'partial-search': ''})['ETag']
+
+        response = client.post(url, {'search-url-value': 'example', 'partial-search': ''},
+                               HTTP_IF_NONE_MATCH=etag)
+
+        assert response.status_code == 200
+
+    def test_missing_project_is_not_found(self, client):
+        response = client.get(reverse('url_report', args=['missing']))
+
+        assert response.status_code == 404
@@ -0,0 +1,92 @@
+import random
+import re
+import sys
+import time
+from optparse import OptionParser
+
+from nomination.surt import addImpliedHttpIfNecessary, appendToSurt, surtize_batch
+
+
+TOP_DOMAINS = ['com', 'org', 'net', 'edu', 'gov', 'us', 'uk', 'de']
+WORDS = ['news', 'library', 'archive', 'data', 'report', 'texas', 'state', 'city',
+         'health', 'water', 'energy', 'press', 'about', 'index', 'events', 'files']
+
+
+def legacy_surtize(orig_url, preserveCase=False):
+    """The surtize implementation that recompiled its pattern on every call."""
+    orig_url = addImpliedHttpIfNecessary(orig_url)
+    URI_SPLITTER = r"^(\w+://)(?:([-\w\.!~\*'\(\)%;:&=+$,]+?)(@))?" + \
+        r"(?:((?:\d{1,3}\.){3}\d{1,3})|(\S+?))(:\d+)?(/\S*)?$"
+    m = re.compile(URI_SPLITTER)
+    mobj = m.match(orig_url)
+    if not mobj:
+        return ''
+    if mobj.group(1) == 'https://':
+        surt = 'http://('
+    elif mobj.group(1) == 'ftps://':
+        surt = 'ftp://('
+    else:
+        surt = mobj.group(1) + '('
+    if mobj.group(4) is not None:
+        surt += mobj.group(4)
+    else:
+        splithost = mobj.group(5).split('.')
+        splithost.reverse()
+        hostpart = ','.join(splithost)
+        surt += hostpart + ','
+    surt = appendToSurt(mobj, 6, surt)
+    surt = appendToSurt(mobj, 3, surt)
+    surt = appendToSurt(mobj, 2, surt)
+    surt += ')'
+    surt = appendToSurt(mobj, 7, surt)
+    if preserveCase is False:
+        return surt.lower()
+    else:
+        return surt
+
+
+def make_corpus(count, host_count, seed):
+    """Build a list of count URLs spread over host_count hosts."""
+    rand = random.Random(seed)
+    hosts = ['%s.%s.%s' % (rand.choice(['www', 'web', 'en']), rand.choice(WORDS) + str(i),
+                           rand.choice(TOP_DOMAINS))
+             for i in range(host_count)]
+    corpus = []
+    for i in range(count):
+        path = '/'.join(rand.choice(WORDS) for _ in range(rand.randint(0, 4)))
+        corpus.append('%s://%s/%s' % (rand.choice(['http', 'https']), rand.choice(hosts), path))
+    return corpus
+
+
+def benchmark(corpus):
+    """Time both implementations over corpus and check they agree."""
+    start = time.perf_counter()
+    legacy = [legacy_surtize(url) for url in corpus]
+    legacy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch = surtize_batch(corpus)
+    batch_time = time.perf_counter() - start
+
+    if legacy != batch:
+        print('The implementations returned different SURTs.')
+        sys.exit(1)
+    return legacy_time, batch_time
+
+
+if __name__ == '__main__':
+    usage = 'usage: %prog [options]'
+    parser = OptionParser(usage)
+    parser.add_option('-c', '--count', action='store', type='int', dest='count',
+                      default=1000000, help='Number of URLs in the corpus.')
+    parser.add_option('--hosts', action='store', type='int', dest='host_count',
+                      default=5000, help='Number of distinct hosts in the corpus.')
+    parser.add_option('--seed', action='store', type='int', dest='seed', default=0,
+                      help='Random seed used to build the corpus.')
+    (options, args) = parser.parse_args()
+    corpus = make_corpus(options.count, options.host_count, options.seed)
+    legacy_time, batch_time = benchmark(corpus)
+    print('URLs:          %s (%s hosts)' % (options.count, options.host_count))
+    print('legacy:        %.2fs (%.0f URLs/s)' % (legacy_time, options.count / legacy_time))
+    print('surtize_batch: %.2fs (%.0f URLs/s)' % (batch_time, options.count / batch_time))
+    print('speedup:       %.2fx' % (legacy_time / batch_time))